@@ -4,16 +4,8 @@ import pandas as pd
 import pickle
 import numpy as np
 from glob import glob
-from joblib import Parallel, delayed
-import matplotlib.pyplot as plt
-import matplotlib.ticker as ticker
-from scipy import stats
-import seaborn as sns
-sns.set(font = '',style='ticks',font_scale=1.4)
-import statsmodels.api as sm
-import statsmodels.formula.api as smf
-from scipy.stats import norm
 import math
+# matplotlib / seaborn 只在画图时导入（见 huatu），统计计算只需要 pandas / numpy
 
 pd_display_rows  = 1000
 pd_display_cols  = 100
@@ -125,6 +117,10 @@ effect_ratio(data1)
 
 
 def huatu(time,close,diff,filename="figure.png"):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    sns.set(font = '',style='ticks',font_scale=1.4)
+
     time = pd.to_datetime(time)
 
     # 创建图形和主轴
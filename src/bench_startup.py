@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析脚本冷启动耗时对比
+在全新的子进程中用 python -X importtime 导入各脚本（只导入、不运行），统计：
+- 导入总耗时（多次运行取最小值）及耗时最多的直接依赖
+- 导入后已加载的绘图 / 统计 / Excel 依赖（延迟导入时应为空，只在对应代码路径中加载）
+
+用法:
+    python bench_startup.py                   # 全部脚本，各运行 5 次
+    python bench_startup.py put2 call -n 10 --top 8
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 名称 → (脚本目录, 模块名)
+TARGETS = {
+    'put2': ('put2', 'put2'),
+    'call': ('call', 'yqcallxjb'),
+    'sweep': ('call', 'sweep'),
+    'service': ('service', 'server'),
+}
+
+# 应当延迟到对应代码路径才导入的依赖
+DEFERRED_MODULES = ['matplotlib', 'matplotlib.pyplot', 'seaborn', 'scipy', 'statsmodels', 'joblib',
+                    'xlsxwriter', 'openpyxl']
+
+PROBE = (
+    "import json, sys; sys.path.insert(0, {path!r}); import {module}; "
+    "print(json.dumps([m for m in {deferred!r} if m in sys.modules]))"
+)
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 输出，返回 [(模块, 自身耗时us, 累计耗时us, 嵌套层级), ...]
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def direct_imports(rows, module):
+    """module 直接导入的依赖 {模块: 累计ms}（importtime 先输出子模块，再输出父模块）"""
+    children = {}
+    for name, _, cumulative, depth in rows:
+        if depth == 0:
+            if name == module:
+                return children
+            children = {}
+        elif depth == 1:
+            children[name] = cumulative / 1000
+    return {}
+
+
+def measure(directory, module):
+    """在子进程中导入一次，返回 (导入总耗时ms, 直接依赖 {模块: 累计ms}, 已加载的延迟依赖)"""
+    path = os.path.join(SRC_DIR, directory)
+    code = PROBE.format(path=path, module=module, deferred=DEFERRED_MODULES)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=path,
+                          capture_output=True, text=True, check=True)
+    rows = parse_importtime(proc.stderr)
+    total = next(cumulative / 1000 for name, _, cumulative, depth in rows if depth == 0 and name == module)
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    return total, direct_imports(rows, module), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析脚本冷启动（导入）耗时对比")
+    parser.add_argument('targets', nargs='*',
+                        help=f"要测量的脚本（默认全部：{', '.join(TARGETS)}）")
+    parser.add_argument('-n', '--repeat', type=int, default=5, help="每个脚本的运行次数（取最小值）")
+    parser.add_argument('--top', type=int, default=5, help="列出耗时最多的直接依赖数量")
+    args = parser.parse_args()
+
+    names = args.targets or list(TARGETS)
+    unknown = [name for name in names if name not in TARGETS]
+    if unknown:
+        parser.error(f"未知脚本: {', '.join(unknown)}（可选: {', '.join(TARGETS)}）")
+
+    print(f"Python {sys.version.split()[0]}，每个脚本导入 {args.repeat} 次取最小值\n")
+    for name in names:
+        directory, module = TARGETS[name]
+        runs = [measure(directory, module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run[0])
+        total, children, loaded = best
+        print(f"{name:<8} {module:<12} 导入耗时 {total:8.1f} ms")
+        deps = sorted(((ms, dep) for dep, ms in children.items()), reverse=True)
+        for ms, dep in deps[:args.top]:
+            print(f"    {dep:<28} {ms:8.1f} ms")
+        print(f"    已加载的延迟依赖: {', '.join(loaded) if loaded else '无'}\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+看涨期权 IV 列补全校验（yqcallxjb.solve_implied_vols）
+在交易所导出格式的模拟看涨期权链（common.synthetic）上随机删去部分 IV 报价 / IV 询价，经 build_feature_frame：
+- 交易所已有的 IV 不被覆盖
+- 补全的 IV 代回 Black-76 后重现对应的买价 / 卖价；价格不高于内在价值（深度实值的买价）时无解，保持缺失
+- IV 中间值为买卖两侧 IV 的均值（只有一侧时取该侧），analysis_results 中每条腿的 iv 取自 IV 中间值
+
+用法: python check_implied_vol.py
+"""
+
+import contextlib
+import io
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import yqcallxjb as call
+from common.pricing import black76, year_fraction
+from common.synthetic import VALUATION_TIME, export_frame, synthetic_chain
+
+SPOT = 65000.0
+
+
+def main():
+    chain = synthetic_chain(n_expiries=6, n_strikes=60, spot=SPOT, option_types=('C',))
+    # 现价列使反解与生成时一致（缺少时按 |Delta|≈0.5 的行权价推断，深度实值可能低于内在价值而无解）
+    raw = export_frame(chain).assign(**{'标的价格': SPOT})
+    rng = np.random.default_rng(3)
+    missing = {col: rng.random(len(raw)) < 0.2 for col in (call.BID_IV_COLUMN, call.ASK_IV_COLUMN)}
+    for col, gap in missing.items():
+        raw.loc[gap, col] = '-'
+
+    call.GREEKS_CONFIG['valuation_time'] = VALUATION_TIME
+    with contextlib.redirect_stdout(io.StringIO()):
+        df, spot_price = call.build_feature_frame(call.prepare_chain(raw))
+    rows = df.index.to_numpy()
+    print(f"{len(df)} 个合约，推断现价 {spot_price:,.0f}；删去 IV 报价 {int(missing[call.BID_IV_COLUMN].sum())} 个、"
+          f"IV 询价 {int(missing[call.ASK_IV_COLUMN].sum())} 个")
+
+    t = year_fraction(df['Expiry'], VALUATION_TIME)
+    for col, price_col in ((call.BID_IV_COLUMN, '买价'), (call.ASK_IV_COLUMN, '卖价')):
+        gap = missing[col][rows]
+        exchange = pd.to_numeric(raw[col], errors='coerce').to_numpy(dtype=float)[rows]
+        values = df[col].to_numpy(dtype=float)
+        assert np.array_equal(values[~gap], exchange[~gap]), f"{col}: 交易所已有的 IV 被覆盖"
+        strike = df['Strike'].to_numpy()
+        quote = df[price_col].to_numpy(dtype=float) * spot_price
+        solvable = gap & (quote > np.maximum(spot_price - strike, 0))
+        assert np.array_equal(np.isnan(values), gap & ~solvable), f"{col}: 可解的行未补全或无解的行被补全"
+        model = black76(spot_price, strike[solvable], t[solvable], values[solvable] / 100, True)['price']
+        err = np.max(np.abs(model - quote[solvable]) / quote[solvable])
+        print(f"{col}: 补全 {int(solvable.sum())} 个（{int((gap & ~solvable).sum())} 个低于内在价值无解），"
+              f"代回 Black-76 重现{price_col}的最大相对误差 {err:.2e}")
+        assert err < 1e-6, f"{col}: 补全的 IV 与{price_col}不一致"
+
+    mid = df[[call.BID_IV_COLUMN, call.ASK_IV_COLUMN]].mean(axis=1).to_numpy()
+    assert np.allclose(df[call.MID_IV_COLUMN].to_numpy(), mid, equal_nan=True), "IV 中间值不是买卖两侧 IV 的均值"
+    result = call.analysis_results(df.assign(Score=0.0), spot_price)
+    legs_iv = np.array([strategy.legs[0].iv for strategy in result.strategies])
+    assert np.allclose(legs_iv, mid / 100, equal_nan=True), "analysis_results 的 iv 未取 IV 中间值"
+    print("看涨期权 IV 列补全校验通过")
+
+
+if __name__ == '__main__':
+    main()
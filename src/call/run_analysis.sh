@@ -24,7 +24,7 @@ echo ""
 
 # 运行分析程序
 echo "开始运行期权分析..."
-python3 yqcallxjb.py
+python3 yqcallxjb.py "$@"
 
 echo ""
 echo "分析完成！请查看 export 文件夹中的结果文件。"
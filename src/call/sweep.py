@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+看涨期权综合评分权重/阈值扫描
+对 data/ 下每个期权链，只计算一次特征表，然后在批量 NumPy 中评估成千上万组
+权重 (W_*) 与阈值 (THRESH_*) 组合，统计每个合约进入综合排名 Top1~Top3 的频次。
+不生成图表和Excel，适合在正式运行 yqcallxjb.py 前调参。
+
+用法:
+    python sweep.py                 # 按 SWEEP_GRID 网格扫描
+    python sweep.py --random 10000  # 在 SWEEP_GRID 各参数的 [最小值, 最大值] 内随机采样
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.chain_cache import load_chain
+from common.scoring import SCORE_METRICS, feature_matrix, rank_pool_mask, score_scenarios, top_k_by_scenario
+from yqcallxjb import build_feature_frame, find_csv_files, prepare_chain, resolve_settings
+
+# ==================== 用户配置区域 ====================
+# 每个参数的候选取值；网格模式取笛卡尔积，随机模式在 [最小值, 最大值] 内均匀采样
+# （THRESH_LEVERAGE_OFF 为开关，随机模式下从列表中随机选取）
+SWEEP_GRID = {
+    "W_GAMMA_THETA": [0.0, 0.1, 0.25, 0.4, 0.55],
+    "W_DELTA_THETA": [0.0, 0.1, 0.25, 0.4, 0.55],
+    "W_VEGA_THETA": [0.0, 0.1, 0.25, 0.4, 0.55],
+    "W_LEVERAGE": [0.0, 0.1, 0.25, 0.4, 0.55],
+    "THRESH_VEGA_THETA": [1.0, 1.2, 1.5],
+    "THRESH_GAMMA_THETA": [0.0015],
+    "THRESH_DELTA_THETA": [0.03],
+    "THRESH_LEVERAGE_MIN": [8],
+    "THRESH_LEVERAGE_MAX": [15],
+    "THRESH_LEVERAGE_OFF": [0],
+}
+
+SWEEP_CONFIG = {
+    "data_dir": "data",
+    "export_dir": "export",
+    "top_k": 3,                    # 统计 Top1~TopK
+    "chunk_elements": 1 << 22,     # 每批 合约数×组合数 上限，控制内存占用
+    "print_rows": 15,              # 控制台显示的合约数量
+}
+# ====================================================
+
+PARAM_NAMES = list(SWEEP_GRID)
+WEIGHT_NAMES = ["W_GAMMA_THETA", "W_DELTA_THETA", "W_VEGA_THETA", "W_LEVERAGE"]  # 与 SCORE_METRICS 顺序一致
+
+
+def grid_params(grid):
+    """网格模式：所有参数取值的笛卡尔积，返回 (组合数, 参数数) 数组"""
+    return np.array(list(itertools.product(*(grid[name] for name in PARAM_NAMES))), dtype=float)
+
+
+def random_params(grid, n_samples, seed=None):
+    """随机模式：各参数在取值范围内均匀采样，开关参数随机选取"""
+    rng = np.random.default_rng(seed)
+    cols = []
+    for name in PARAM_NAMES:
+        values = np.asarray(grid[name], dtype=float)
+        if name == "THRESH_LEVERAGE_OFF":
+            cols.append(rng.choice(values, n_samples))
+        else:
+            cols.append(rng.uniform(values.min(), values.max(), n_samples))
+    return np.column_stack(cols)
+
+
+def sweep_chain(df, spot_price, params, top_k=3, chunk_elements=1 << 22, normalize=True):
+    """
+    在一个期权链上评估所有参数组合
+    返回 (合约数, top_k) 计数矩阵：第 r 列为该合约排名第 r+1 的组合数
+    """
+    n = len(df)
+    counts = np.zeros((n, top_k), dtype=np.int64)
+    if n == 0 or len(params) == 0:
+        return counts
+
+    p = dict(zip(PARAM_NAMES, params.T))
+    features = feature_matrix(df, SCORE_METRICS, normalize=normalize)
+    weights = params[:, [PARAM_NAMES.index(name) for name in WEIGHT_NAMES]]
+
+    vega_theta = df["Vega/Theta"].to_numpy(dtype=float)[:, None]
+    gamma_theta = df["Gamma/Theta"].to_numpy(dtype=float)[:, None]
+    delta_theta = df["Delta/Theta"].to_numpy(dtype=float)[:, None]
+    leverage = df["Leverage"].to_numpy(dtype=float)
+    roi = df["ROI@S+10%"].to_numpy(dtype=float)
+    if pd.notna(spot_price):
+        strike = df["Strike"].to_numpy(dtype=float)
+        atm_light_otm = ((strike >= spot_price) & (strike <= 1.1 * spot_price))[:, None]
+    else:
+        atm_light_otm = np.ones((n, 1), dtype=bool)
+
+    chunk = max(1, chunk_elements // n)
+    for start in range(0, len(params), chunk):
+        sl = slice(start, start + chunk)
+        scores = score_scenarios(features, weights[sl])
+        initial = (
+            (vega_theta > p["THRESH_VEGA_THETA"][sl])
+            & (gamma_theta > p["THRESH_GAMMA_THETA"][sl])
+            & (delta_theta > p["THRESH_DELTA_THETA"][sl])
+            & atm_light_otm
+        )
+        leverage_ok = (
+            ((leverage[:, None] >= p["THRESH_LEVERAGE_MIN"][sl]) & (leverage[:, None] <= p["THRESH_LEVERAGE_MAX"][sl]))
+            | (p["THRESH_LEVERAGE_OFF"][sl] > 0)
+        )
+        pool = rank_pool_mask(initial & leverage_ok, initial, k=top_k)
+        top = top_k_by_scenario(scores, pool, (roi, leverage), k=top_k)
+        for r in range(top_k):
+            pos = top[:, r]
+            counts[:, r] += np.bincount(pos[pos >= 0], minlength=n)
+    return counts
+
+
+def toprank_frequency_table(df, counts, n_combos):
+    """整理为紧凑的频次表：仅保留至少进入一次 Top 的合约，按进入次数降序"""
+    top_k = counts.shape[1]
+    table = df[["产品", "Strike"]].reset_index(drop=True)
+    for r in range(top_k):
+        table[f"Top{r + 1}"] = counts[:, r]
+    table["TopAny"] = counts.sum(axis=1)
+    table["TopAny占比"] = table["TopAny"] / n_combos if n_combos else 0.0
+    table = table[table["TopAny"] > 0]
+    return table.sort_values(["TopAny", "Top1"], ascending=False, kind="stable").reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="综合评分权重/阈值扫描")
+    parser.add_argument("--random", type=int, default=None, metavar="N", help="随机采样 N 组参数（默认网格扫描）")
+    parser.add_argument("--seed", type=int, default=None, help="随机采样种子")
+    parser.add_argument("--data-dir", default=SWEEP_CONFIG["data_dir"], help="期权数据文件夹")
+    args = parser.parse_args()
+
+    if args.random:
+        params = random_params(SWEEP_GRID, args.random, args.seed)
+        mode = f"随机采样 {args.random} 组"
+    else:
+        params = grid_params(SWEEP_GRID)
+        mode = f"网格 {len(params)} 组"
+    normalize = resolve_settings()["normalize_for_score"]
+
+    csv_files = find_csv_files(args.data_dir)
+    if not csv_files:
+        print("没有找到CSV文件，程序退出")
+        return
+    export_dir = SWEEP_CONFIG["export_dir"]
+    os.makedirs(export_dir, exist_ok=True)
+
+    print(f"综合评分参数扫描：{mode}")
+    for file_path in csv_files:
+        base_name = os.path.splitext(os.path.basename(file_path))[0]
+        df = load_chain(file_path, prepare_chain, tag="call")
+        if len(df) == 0:
+            print(f"警告: {os.path.basename(file_path)} 中没有找到看涨期权数据")
+            continue
+        df, spot_price = build_feature_frame(df)
+
+        t0 = time.perf_counter()
+        counts = sweep_chain(df, spot_price, params, top_k=SWEEP_CONFIG["top_k"],
+                             chunk_elements=SWEEP_CONFIG["chunk_elements"], normalize=normalize)
+        elapsed = time.perf_counter() - t0
+
+        table = toprank_frequency_table(df, counts, len(params))
+        out_path = os.path.join(export_dir, f"{base_name}_sweep_toprank.csv")
+        table.to_csv(out_path, index=False, encoding="utf-8-sig")
+
+        print(f"\n{'='*60}")
+        print(f"{os.path.basename(file_path)}: {len(df)} 个合约 × {len(params)} 组参数，耗时 {elapsed:.2f} 秒")
+        print(table.head(SWEEP_CONFIG["print_rows"]).to_string(index=False))
+        print(f"频次表已导出: {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,132 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import re
 import numpy as np
-from matplotlib.patches import FancyArrowPatch
 import os
 import glob
 import sys
+import argparse
+import io
+import json
+import time
+from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.band_index import BandIndex
+from common.chain_cache import load_chain
+from common.symbols import parse_option_symbols
+from common.excel_export import color_marks, write_highlighted_excel
+from common.features import greek_theta_ratios, leverage, roi_column_name, taylor_roi
+from common.implied_vol import chain_implied_vols
+from common.pricing import GREEK_COLUMNS, chain_greeks, fill_missing_greeks
+from common.ranking import top_k
+from common.results import AnalysisResult, Leg, Score, Strategy
+from common.render import ChartRenderer, pyplot
+from common.scenario_grid import (export_roi_parquet, grid_weights, roi_tensor, shock_range,
+                                  summarize_roi)
+from common.scoring import (SCORE_METRICS, dense_rank_desc, feature_matrix, rank_pool_mask,
+                            score_scenarios, top_k_by_scenario, top_k_labels, weight_matrix)
+from common.snapshot_diff import diff_snapshots, load_state, row_fingerprints, save_state
+from common.snapshot_store import append_snapshot
+
+# 预设情景：(名称, (W_GammaTheta, W_DeltaTheta, W_VegaTheta, W_Leverage))，可追加任意多组
+SCENARIO_PRESETS = [
+    ("均衡", (0.25, 0.25, 0.25, 0.25)),
+    ("强势看涨", (0.1, 0.4, 0.1, 0.4)),
+    ("波动驱动", (0.3, 0.1, 0.5, 0.1)),
+]
+
+# 图表渲染：进程池中渲染，dpi/格式（png/svg/webp）可调，数据未变化时复用 .render_cache/ 中的图表
+RENDER_CONFIG = {
+    "dpi": 150,
+    "format": "png",
+    "max_workers": 2,
+    "use_cache": True,
+}
+
+# 分析参数默认值：综合评分权重、筛选阈值与输出选项。
+# 运行时按 默认值 < 环境变量（同名大写，如 W_GAMMA_THETA） < 配置文件 < 命令行 的顺序合并，
+# 合并结果显式传给 process_single_file，不再通过全局变量或环境变量传递
+DEFAULT_SETTINGS = {
+    "w_gamma_theta": 0.25,
+    "w_delta_theta": 0.25,
+    "w_vega_theta": 0.25,
+    "w_leverage": 0.25,
+    "normalize_for_score": True,      # 评分前按列截尾归一化，避免单一尺度主导
+    "thresh_vega_theta": 1.2,
+    "thresh_gamma_theta": 0.0015,
+    "thresh_delta_theta": 0.03,
+    "thresh_leverage_off": False,     # True 时关闭 Leverage 区间筛选
+    "thresh_leverage_min": 8.0,
+    "thresh_leverage_max": 15.0,
+    "charts": True,                   # False 时跳过图表（不导入 matplotlib），配合 excel=False 为纯表格快速模式
+    "excel": True,                    # False 时跳过 Excel，只写 CSV 与 Parquet（快速模式）
+    "excel_engine": None,             # None 自动选择（优先 xlsxwriter），也可指定 "openpyxl"
+    "parquet": False,
+    "results": None,                  # "arrow" / "jsonl"：额外导出机器可读结果 {文件名}_results.<格式>（common/results.py）
+}
+
+# OTM 范围：|Delta| 区间（Delta/Theta、Vega/Theta 推荐只在该范围内选取）
+OTM_DELTA_RANGE = (0.15, 0.45)
+
+# 希腊字母补全：交易所缺失（"-"）的 Delta/Gamma/Theta/Vega 用 Black-76（推断现价 + 中间IV，无IV时由权利金反解）重算，
+# 避免流动性差的行权价被 dropna 丢弃；valuation_time 为 None 时按当前 UTC 时间计算到期剩余时间
+# solve_iv: 由买价/卖价/权利金反解隐含波动率，补全缺失的 IV 报价 / IV 询价 并写入 IV 中间值 列（百分数）
+GREEKS_CONFIG = {
+    "fill_missing": True,
+    "solve_iv": True,
+    "valuation_time": None,
+}
+
+# 交易所 IV 列（百分数）与反解后写入的中间 IV 列
+BID_IV_COLUMN, ASK_IV_COLUMN, MID_IV_COLUMN = "IV 报价", "IV 询价", "IV 中间值"
+
+# 常见买卖价 / 单列价格列名
+BID_CANDIDATES = ["Bid", "bid", "买价", "买一价", "买盘价"]
+ASK_CANDIDATES = ["Ask", "ask", "卖价", "卖一价", "卖盘价"]
+PRICE_CANDIDATES = ["价格", "最新价", "Last Price", "Mark Price", "标记价格", "期权价格", "Option Price", "收盘价"]
+
+# 情景 ROI 的现货冲击比例；0.10 对应 ROI@S+10%（综合排名的次要排序键），可追加如 -0.10、0.20
+ROI_SHOCKS = (0.10,)
+
+# 增量模式（--incremental）的快照状态目录：记录每个文件上次处理时的期权链逐行指纹
+INCREMENTAL_CONFIG = {
+    "state_dir": ".snapshot_state",
+}
+
+# 历史快照库：每个文件的分析结果（含各比率、Score、排名）追加到按 日期/标的/到期日 分区的 Parquet 数据集，
+# root 为 None 时放在CSV所在目录的 .call_snapshot_store/；快照时刻取CSV修改时间，重复处理同一文件不会重复写入
+SNAPSHOT_STORE_CONFIG = {
+    "enabled": True,
+    "root": None,
+}
+
+# 现货 × IV 情景网格：ROI 张量导出为长表 Parquet，并按合约汇总最好/最差/期望 ROI
+SCENARIO_GRID_CONFIG = {
+    "enabled": True,
+    "spot_shocks": (-0.30, 0.50, 0.01),   # 现货冲击 起点, 终点, 步长（相对比例）
+    "iv_shocks": (-10, 10, 1),            # IV 冲击 起点, 终点, 步长（波动率百分点）
+    "spot_sigma": 0.15,                   # 期望 ROI 的正态权重标准差，None 表示等权
+    "iv_sigma": 5,
+}
+
+def _quote_columns(df: pd.DataFrame):
+    """买价 / 卖价列名（按常见列名推断），不存在时为 None"""
+    bid_col = next((c for c in BID_CANDIDATES if c in df.columns), None)
+    ask_col = next((c for c in ASK_CANDIDATES if c in df.columns), None)
+    return bid_col, ask_col
 
 def _infer_premium_columns(df: pd.DataFrame):
     """在常见列名中推断期权权利金（Premium）。返回(series, name)或(None, None)。
     优先使用中间价 (bid/ask)，否则退化为单列价格。
     """
-    # 常见买卖价列名集合
-    bid_candidates = [
-        "Bid", "bid", "买价", "买一价", "买盘价"
-    ]
-    ask_candidates = [
-        "Ask", "ask", "卖价", "卖一价", "卖盘价"
-    ]
-    price_candidates = [
-        "价格", "最新价", "Last Price", "Mark Price", "标记价格", "期权价格", "Option Price", "收盘价"
-    ]
-
-    bid_col = next((c for c in bid_candidates if c in df.columns), None)
-    ask_col = next((c for c in ask_candidates if c in df.columns), None)
+    bid_col, ask_col = _quote_columns(df)
     if bid_col and ask_col:
         mid = (pd.to_numeric(df[bid_col], errors="coerce") + pd.to_numeric(df[ask_col], errors="coerce")) / 2.0
         return mid, f"mid({bid_col}/{ask_col})"
 
-    price_col = next((c for c in price_candidates if c in df.columns), None)
+    price_col = next((c for c in PRICE_CANDIDATES if c in df.columns), None)
     if price_col:
         price = pd.to_numeric(df[price_col], errors="coerce")
         return price, price_col
@@ -78,15 +176,388 @@ def find_csv_files(data_dir="data"):
     
     return csv_files
 
-def process_single_file(file_path):
-    """处理单个CSV文件"""
+def prepare_chain(df):
+    """清洗原始CSV：解析合约代码、只保留看涨期权、希腊字母转为数值（结果由 load_chain 缓存）"""
+    # 从 "产品" 字段解析出标的、到期日、行权价与类型
+    # 格式类似：ETH-26DEC25-1200-C
+    parsed = parse_option_symbols(df["产品"])
+    
+    # 只保留看涨期权
+    call_mask = (parsed["option_type"] == "C").to_numpy()
+    df = df[call_mask].copy()
+    df["Strike"] = parsed["strike"].to_numpy()[call_mask]
+    df["Expiry"] = parsed["expiry"].to_numpy()[call_mask]
+    
+    # 转换关键列为数值型（避免有 "-" 字符）
+    # 使用 Δ|增量 列作为 Delta 值
+    for col in ["Δ|增量", "Theta", "Gamma", "Vega"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    
+    return df
+
+def _recommendation_tops(df, otm_pos):
+    """
+    与权重无关的推荐入选行位置：OTM 内 Delta/Theta、全量 Gamma/Theta、OTM 内 Vega/Theta 各取前 3
+    （OTM 内不足 3 个时跳过 OTM 两项），返回 {指标列: 行位置}，按打标签的顺序排列
+    otm_pos: OTM 合约的行位置（升序，见 otm_positions）
+    """
+    tags = {"Gamma/Theta": np.arange(len(df))}
+    if len(otm_pos) >= 3:
+        tags = {"Delta/Theta": otm_pos, **tags, "Vega/Theta": otm_pos}
+    return {col: pos[top_k(df[col].to_numpy(dtype=float)[pos], 3)] for col, pos in tags.items()}
+
+
+def _recommendation_labels(n, tops):
+    """由 {指标列: 行位置} 生成推荐标签（如 "Top1 (Delta/Theta) + Top3 (Score)"），未入选为 Normal"""
+    rec = np.full(n, "", dtype=object)
+    for col, pos in tops.items():
+        for r, i in enumerate(pos, start=1):
+            rec[i] = f"{rec[i]} + Top{r} ({col})" if rec[i] else f"Top{r} ({col})"
+    rec[rec == ""] = "Normal"
+    return rec
+
+
+def _base_recommendation(df, otm_pos):
+    """与权重无关的推荐标签（见 _recommendation_tops）"""
+    return _recommendation_labels(len(df), _recommendation_tops(df, otm_pos))
+
+
+def delta_band_index(df):
+    """|Delta| 的有序区间索引（同一特征表的 OTM 等 Delta 区间查询共用）"""
+    return BandIndex(df["Δ|增量"].abs())
+
+
+def otm_mask(df, delta_index=None):
+    """
+    OTM 范围：OTM_DELTA_RANGE[0] ≤ |Delta| ≤ OTM_DELTA_RANGE[1]
+    delta_index: delta_band_index(df) 的结果，缺省时临时构建
+    """
+    delta_min, delta_max = OTM_DELTA_RANGE
+    if delta_index is None:
+        delta_index = delta_band_index(df)
+    return pd.Series(delta_index.mask(delta_min, delta_max), index=df.index)
+
+
+def otm_positions(df, delta_index=None):
+    """
+    OTM 合约的行位置（升序），只需要行时用它代替 otm_mask：有序索引上两次 searchsorted，不扫描整张表
+    """
+    if delta_index is None:
+        delta_index = delta_band_index(df)
+    return delta_index.positions(*OTM_DELTA_RANGE)
+
+
+def apply_screens(df, spot_price, settings):
+    """
+    写入 InitialScreen（希腊效率阈值 + ATM~轻度OTM，K ∈ [S, 1.1S]）
+    与 OptimizedScreen（初筛 + Leverage 区间，可关闭）两列
+    """
+    base_screen = (
+        (df["Vega/Theta"] > settings["thresh_vega_theta"])
+        & (df["Gamma/Theta"] > settings["thresh_gamma_theta"])
+        & (df["Delta/Theta"] > settings["thresh_delta_theta"])
+    )
+    if pd.notna(spot_price):
+        atm_light_otm = (df["Strike"] >= spot_price) & (df["Strike"] <= 1.1 * spot_price)
+    else:
+        atm_light_otm = pd.Series([True] * len(df), index=df.index)  # 无 S 时不加此限制
+    initial_screen = base_screen & atm_light_otm
+    df["InitialScreen"] = initial_screen
+
+    if settings["thresh_leverage_off"]:
+        leverage_mask = pd.Series([True] * len(df), index=df.index)
+    else:
+        leverage_mask = df["Leverage"].between(settings["thresh_leverage_min"], settings["thresh_leverage_max"],
+                                               inclusive="both")
+    df["OptimizedScreen"] = initial_screen & leverage_mask
+    return df
+
+
+def score_presets(df, features, scenarios, otm_mask, k=3):
+    """
+    所有预设情景一次性评分：Score = 特征矩阵 @ 权重矩阵.T，
+    综合 TopRank（Score→ROI→Leverage）与稠密名次按列向量化计算，返回推荐集合的长表
+    """
+    names, weights = weight_matrix(scenarios)
+    scores = score_scenarios(features, weights)
+    n, n_scen = scores.shape
+
+    pool = rank_pool_mask(df["OptimizedScreen"].to_numpy(), df["InitialScreen"].to_numpy(), k=k)
+    top = top_k_by_scenario(scores, pool, (df["ROI@S+10%"].to_numpy(dtype=float),
+                                           df["Leverage"].to_numpy(dtype=float)), k=max(k, 5))
+    top_rank = top_k_labels(top[:, :k], n)
+    ranks = dense_rank_desc(scores)
+    rec = _base_recommendation(df, np.flatnonzero(np.asarray(otm_mask)))
+
+    # 打印调试信息：各情景前5名得分
+    for j, name in enumerate(names):
+        pos = top[j][top[j] >= 0]
+        head5 = df.iloc[pos][["产品", "Strike"]].assign(Score=scores[pos, j])
+        print(f"[调试] 预设={name} Top5 by Score:\n{head5.to_string(index=False)}")
+
+    # 仅保留推荐集合：情景优先、行顺序其次
+    keep = (top_rank != "") | (rec != "Normal")[:, None]
+    scen_idx, row_idx = np.nonzero(keep.T)
+    base_cols = [c for c in ["产品", "Strike", "Leverage", "ROI@S+10%",
+                             "Delta/Theta", "Gamma/Theta", "Vega/Theta"] if c in df.columns]
+    out = df.iloc[row_idx][base_cols].reset_index(drop=True)
+    out.insert(0, "Scenario", np.asarray(names, dtype=object)[scen_idx])
+    out.insert(1, "TopRank", top_rank[row_idx, scen_idx])
+    out.insert(2, "Recommendation", rec[row_idx])
+    out.insert(out.columns.get_loc("Leverage") + 1, "Score", scores[row_idx, scen_idx])
+    out.insert(out.columns.get_loc("Score") + 1, "RankByScore", ranks[row_idx, scen_idx])
+    # 记录权重以便排查
+    for col, w in zip(["W_GammaTheta", "W_DeltaTheta", "W_VegaTheta", "W_Leverage"], weights.T):
+        out[col] = w[scen_idx]
+    return out
+
+
+def mid_iv(df):
+    """
+    中间 IV（小数）：solve_implied_vols 写入的 IV 中间值 列；没有该列时取交易所 IV 报价/询价均值
+    """
+    if MID_IV_COLUMN in df.columns:
+        return pd.to_numeric(df[MID_IV_COLUMN], errors="coerce").to_numpy(dtype=float) / 100
+    iv_cols = [c for c in (BID_IV_COLUMN, ASK_IV_COLUMN) if c in df.columns]
+    if not iv_cols:
+        return np.full(len(df), np.nan)
+    return df[iv_cols].apply(pd.to_numeric, errors="coerce").mean(axis=1).to_numpy() / 100
+
+
+def solve_implied_vols(df, config=GREEKS_CONFIG):
+    """
+    Black-76 反解买价 / 卖价 / 权利金（币本位，按推断的现价换算）的隐含波动率
+    只补全 IV 报价 / IV 询价 的缺失值（百分数，与交易所一致），并写入 IV 中间值：
+    买卖两侧 IV 的均值（只有一侧时取该侧），两侧都缺失时取权利金反解的 IV；无法推断现价时原样返回
+    """
+    spot_price, _ = _infer_spot_price(df)
+    if spot_price is None:
+        return df
+    bid_col, ask_col = _quote_columns(df)
+    premium_series, _ = _infer_premium_columns(df)
+    prices = {name: df[col] for name, col in (("bid", bid_col), ("ask", ask_col)) if col is not None}
+    if premium_series is not None:
+        prices["premium"] = premium_series
+    if not prices:
+        return df
+
+    df = df.copy()
+    solved = chain_implied_vols(prices, df["Strike"], df["Expiry"], np.ones(len(df), dtype=bool), spot_price,
+                                coin=True, valuation_time=config["valuation_time"])
+    filled = {}
+    for side, col in (("bid", BID_IV_COLUMN), ("ask", ASK_IV_COLUMN)):
+        values = (pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float) if col in df.columns
+                  else np.full(len(df), np.nan))
+        if f"{side}_iv" in solved.columns:
+            gap = np.isnan(values) & solved[f"{side}_iv"].notna().to_numpy()
+            values = np.where(gap, solved[f"{side}_iv"].to_numpy() * 100, values)
+            filled[col] = int(gap.sum())
+        df[col] = values
+    mid = df[[BID_IV_COLUMN, ASK_IV_COLUMN]].mean(axis=1).to_numpy()
+    if "premium_iv" in solved.columns:
+        mid = np.where(np.isnan(mid), solved["premium_iv"].to_numpy() * 100, mid)
+    df[MID_IV_COLUMN] = mid
+    if any(filled.values()):
+        print("已由价格反解补全缺失的隐含波动率: " + ", ".join(f"{c} {n}" for c, n in filled.items() if n))
+    return df
+
+
+def fill_model_greeks(df, config=GREEKS_CONFIG):
+    """
+    用 Black-76 补全缺失的希腊字母（只填缺失值，不覆盖交易所数值）
+    波动率取中间 IV（见 mid_iv），缺失时由权利金（币本位）反解；没有缺失值或无法推断现价时原样返回
+    """
+    if not df[list(GREEK_COLUMNS)].isna().any(axis=None):
+        return df
+    spot_price, _ = _infer_spot_price(df)
+    if spot_price is None:
+        return df
+
+    df = df.copy()
+    iv = mid_iv(df)
+    premium_series, _ = _infer_premium_columns(df)
+    if premium_series is not None and MID_IV_COLUMN not in df.columns and np.isnan(iv).any():
+        solved = chain_implied_vols({"premium": premium_series}, df["Strike"], df["Expiry"],
+                                    np.ones(len(df), dtype=bool), spot_price, coin=True,
+                                    valuation_time=config["valuation_time"])
+        iv = np.where(np.isnan(iv), solved["premium_iv"].to_numpy(), iv)
+    model = chain_greeks(df["Strike"], df["Expiry"], np.ones(len(df), dtype=bool), spot_price, iv,
+                         valuation_time=config["valuation_time"])
+    filled = fill_missing_greeks(df, model)
+    if any(filled.values()):
+        print("已用 Black-76 补全缺失的希腊字母: " + ", ".join(f"{c} {n}" for c, n in filled.items() if n))
+    return df
+
+
+def build_feature_frame(df, roi_shocks=ROI_SHOCKS):
+    """
+    由清洗后的看涨期权链计算评分所需的特征列
+    （Delta/Theta、Gamma/Theta、Vega/Theta、Premium、Spot、Leverage、每个冲击的 ROI@S±x%），
+    返回 (特征表, 现货价)。单文件分析与权重扫描共用此函数。
+    """
+    # 反解隐含波动率（补全 IV 报价/询价、写入 IV 中间值），补全缺失的希腊字母后再去掉仍缺失的行
+    if GREEKS_CONFIG["solve_iv"]:
+        df = solve_implied_vols(df)
+    if GREEKS_CONFIG["fill_missing"]:
+        df = fill_model_greeks(df)
+    df = df.dropna(subset=["Δ|增量", "Theta", "Vega"])
+    
+    # 添加Theta过滤条件：剔除Theta绝对值太小的点
+    df = df[df["Theta"].abs() >= 1e-3].copy()
+    
+    # 计算性价比指标
+    ratios = greek_theta_ratios(df["Δ|增量"], df["Gamma"], df["Vega"], df["Theta"])
+    for col, values in ratios.items():
+        df[col] = values
+
+    # 推断权利金与现货价，计算 Leverage
+    premium_series, premium_name = _infer_premium_columns(df)
+    spot_price, spot_src = _infer_spot_price(df)
+    if premium_series is not None:
+        df["Premium"] = premium_series
+    else:
+        df["Premium"] = np.nan
+    df["Spot"] = spot_price if spot_price is not None else np.nan
+
+    # Leverage = Delta * S / Premium（仅当 Premium 与 S 都可用且 >0）
+    df["Leverage"] = leverage(df["Δ|增量"], df["Spot"], df["Premium"])
+
+    # 风险调整场景：S 变动 roi_shocks 时的近似 PnL 与 ROI（泰勒展开，假设 dIV=0）
+    roi = taylor_roi(df["Δ|增量"], df["Gamma"], df["Spot"], df["Premium"], shocks=list(roi_shocks))
+    for j, shock in enumerate(roi_shocks):
+        df[roi_column_name(shock)] = roi[:, j]
+    return df, spot_price
+
+
+def _float(value):
+    return float(value) if pd.notna(value) else float("nan")
+
+
+def analysis_results(df, spot_price, features=None):
+    """
+    分析结果表（含 Score / InitialScreen / OptimizedScreen / TopRank / Recommendation）转为 common.results.AnalysisResult
+    每个合约为一个单腿策略（structure="long_call"），价格为 Premium 的原始单位；rank 为综合 TopRank 名次（未入选为 0），
+    scores 含各性价比指标、Leverage、ROI、Score，以及提供 features 时各预设情景的得分（Score[预设名]），
+    tags 为筛选标记与推荐标签
+    """
+    score_cols = [c for c in ["Delta/Theta", "Gamma/Theta", "Vega/Theta", "Leverage"] if c in df.columns]
+    score_cols += [c for c in df.columns if str(c).startswith("ROI@")] + ["Score"]
+    preset_names, preset_scores = [], None
+    if features is not None:
+        preset_names, preset_weights = weight_matrix(SCENARIO_PRESETS)
+        preset_scores = score_scenarios(features, preset_weights)
+    iv = mid_iv(df)
+    expiry = pd.to_datetime(df["Expiry"]).dt.date.to_numpy()
+
+    strategies = []
+    for i, row in enumerate(df.to_dict("records")):
+        premium = _float(row["Premium"])
+        leg = Leg(str(row["产品"]), "C", _float(row["Strike"]), 1.0, premium, _float(iv[i]),
+                  _float(row["Δ|增量"]), _float(row["Gamma"]), _float(row["Theta"]), _float(row["Vega"]))
+        scores = [Score(col, _float(row[col])) for col in score_cols]
+        if preset_scores is not None:
+            scores += [Score(f"Score[{name}]", float(preset_scores[i, j])) for j, name in enumerate(preset_names)]
+        tags = [col for col in ("InitialScreen", "OptimizedScreen") if row.get(col)]
+        tags += [tag for tag in str(row.get("Recommendation", "Normal")).split(" + ") if tag != "Normal"]
+        top_rank = str(row.get("TopRank") or "")
+        strategies.append(Strategy(
+            "long_call", "买入看涨", expiry[i], [leg], premium,
+            rank=int(top_rank[3:]) if top_rank.startswith("Top") else 0,
+            max_risk=premium, scores=scores, tags=tags,
+        ))
+    return AnalysisResult("call", _float(spot_price), datetime.now(), strategies)
+
+
+def run_analysis(chain, config=None):
+    """
+    进程内分析入口：与 process_single_file 相同的评分、筛选、推荐与综合排名，
+    但不生成图表和输出文件，返回 common.results.AnalysisResult（见 analysis_results）
+    chain: prepare_chain 清洗后的看涨期权链（如 load_chain(path, prepare_chain, tag="call") 的结果）
+    config: 分析参数（见 DEFAULT_SETTINGS，缺省项取默认值）
+    """
+    df, spot_price = build_feature_frame(chain)
+    return rank_feature_frame(df, spot_price, config)
+
+
+def rank_features(df, spot_price, settings, otm_pos):
+    """
+    评分、筛选、推荐与综合排名（process_single_file 与 rank_feature_frame 共用），原地写入
+    Score / InitialScreen / OptimizedScreen / Recommendation / TopRank 列
+    settings: 完整的分析参数；otm_pos: OTM 合约的行位置（otm_positions 的结果）
+    返回 (特征矩阵, {推荐指标列: 入选行位置})
+    """
+    # 复合评分：默认权重均等（例如强势看涨提升 Delta/Theta 与 Leverage 权重）；特征矩阵供多情景复用
+    weights = [settings["w_gamma_theta"], settings["w_delta_theta"],
+               settings["w_vega_theta"], settings["w_leverage"]]
+    features = feature_matrix(df, SCORE_METRICS, normalize=settings["normalize_for_score"])
+    score = score_scenarios(features, weights)
+    df["Score"] = score[:, 0]
+    apply_screens(df, spot_price, settings)
+
+    # 推荐标签：Delta/Theta、Gamma/Theta、Vega/Theta 各取前 3，再加优化筛选集合内 Score 前 3
+    tops = _recommendation_tops(df, otm_pos)
+    screened = np.flatnonzero(df["OptimizedScreen"].to_numpy())
+    if len(screened) >= 3:
+        tops["Score"] = screened[top_k(score[screened, 0], 3)]
+    df["Recommendation"] = _recommendation_labels(len(df), tops)
+
+    # 综合排名：OptimizedScreen 内按 Score→ROI@S+10%→Leverage（不足 3 个时依次退化为 InitialScreen、全量）
+    pool = rank_pool_mask(df["OptimizedScreen"].to_numpy(), df["InitialScreen"].to_numpy(), k=3)
+    top = top_k_by_scenario(score, pool, (df["ROI@S+10%"].to_numpy(dtype=float),
+                                          df["Leverage"].to_numpy(dtype=float)), k=3)
+    df["TopRank"] = top_k_labels(top, len(df))[:, 0]
+    return features, tops
+
+
+def rank_feature_frame(df, spot_price, config=None, delta_index=None):
+    """
+    对 build_feature_frame 的结果按参数（权重、筛选阈值）评分、筛选、推荐与综合排名
+    特征表只与期权链有关，可缓存后用不同参数反复调用；不修改传入的 df
+    delta_index: delta_band_index(df) 的结果，随特征表一起缓存时传入
+    """
+    settings = {**DEFAULT_SETTINGS, **(config or {})}
+    df = df.copy()
+    features, _ = rank_features(df, spot_price, settings, otm_positions(df, delta_index))
+    return analysis_results(df, spot_price, features)
+
+
+def export_scenario_grid(df, base_name, export_dir, config=SCENARIO_GRID_CONFIG):
+    """
+    计算现货 × IV 情景网格的 ROI 张量，导出长表 Parquet 与每个合约的汇总 CSV
+    """
+    spot_shocks = shock_range(*config["spot_shocks"])
+    iv_shocks = shock_range(*config["iv_shocks"])
+    roi = roi_tensor(df["Δ|增量"], df["Gamma"], df["Vega"], df["Spot"], df["Premium"],
+                     spot_shocks, iv_shocks, dtype=np.float32)
+
+    weights = grid_weights(spot_shocks, iv_shocks, config.get("spot_sigma"), config.get("iv_sigma"))
+    summary = summarize_roi(roi, spot_shocks, iv_shocks, weights)
+    summary.insert(0, "产品", df["产品"].to_numpy())
+    summary.insert(1, "Strike", df["Strike"].to_numpy())
+    summary.insert(2, "Premium", df["Premium"].to_numpy())
+    summary_path = os.path.join(export_dir, f"{base_name}_scenario_summary.csv")
+    summary.to_csv(summary_path, index=False, encoding='utf-8-sig')
+
+    grid_path = os.path.join(export_dir, f"{base_name}_scenario_grid.parquet")
+    if export_roi_parquet(roi, df["产品"].to_numpy(), spot_shocks, iv_shocks, grid_path):
+        print(f"情景网格 ({len(df)} × {len(spot_shocks)} × {len(iv_shocks)}) 已导出: {grid_path}")
+    print(f"情景汇总已导出: {summary_path}")
+    return summary
+
+
+def process_single_file(file_path, settings=None, renderer=None):
+    """
+    处理单个CSV文件
+    settings: 分析参数（见 DEFAULT_SETTINGS，缺省项取默认值）；renderer: 共享的图表渲染器
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
     print(f"\n{'='*60}")
     print(f"正在处理文件: {os.path.basename(file_path)}")
     print(f"{'='*60}")
     
     try:
-        # 读取 CSV
-        df = pd.read_csv(file_path)
+        # 1-3. 读取 CSV 并清洗：看涨期权、行权价、数值列（命中列式缓存时跳过清洗）
+        df = load_chain(file_path, prepare_chain, tag="call")
         
         # 从文件名提取基础名称（去掉扩展名）
         base_name = os.path.splitext(os.path.basename(file_path))[0]
@@ -95,202 +566,43 @@ def process_single_file(file_path):
         export_dir = "export"
         os.makedirs(export_dir, exist_ok=True)
         
-        # 1. 只保留看涨期权（C 结尾）
-        df = df[df["产品"].str.endswith("-C")].copy()
-        
         if len(df) == 0:
             print(f"警告: {os.path.basename(file_path)} 中没有找到看涨期权数据")
             return None
+        raw_count = len(df)
         
-        # 2. 从 "产品" 字段解析出行权价
-        # 格式类似：ETH-26DEC25-1200-C
-        df["Strike"] = df["产品"].apply(lambda x: int(re.findall(r"-(\d+)-C$", x)[0]))
+        # 4. 计算性价比指标、Leverage 与 ROI@S+10%
+        df, spot_price = build_feature_frame(df)
         
-        # 3. 转换关键列为数值型（避免有 "-" 字符）
-        # 使用 Δ|增量 列作为 Delta 值
-        for col in ["Δ|增量", "Theta", "Gamma", "Vega"]:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
+        # 5. 定义OTM筛选条件：Delta范围筛选（原规则）
+        delta_min, delta_max = OTM_DELTA_RANGE
+        otm_condition = otm_mask(df)
         
-        # 去掉缺失值
-        df = df.dropna(subset=["Δ|增量", "Theta", "Vega"])
-        
-        # 添加Theta过滤条件：剔除Theta绝对值太小的点
-        df = df[df["Theta"].abs() >= 1e-3].copy()
-        
-        # 4. 计算性价比指标
-        df["Delta/Theta"] = df["Δ|增量"] / df["Theta"].abs()
-        df["Gamma/Theta"] = df["Gamma"] / df["Theta"].abs()
-        df["Vega/Theta"] = df["Vega"] / df["Theta"].abs()
-
-        # 4.1 推断权利金与现货价，计算 Leverage 与复合评分
-        premium_series, premium_name = _infer_premium_columns(df)
-        spot_price, spot_src = _infer_spot_price(df)
-        if premium_series is not None:
-            df["Premium"] = premium_series
-        else:
-            df["Premium"] = np.nan
-        df["Spot"] = spot_price if spot_price is not None else np.nan
-
-        # Leverage = Delta * S / Premium（仅当 Premium 与 S 都可用且 >0）
-        def _calc_leverage(row):
-            try:
-                if pd.notna(row["Premium"]) and row["Premium"] > 0 and pd.notna(row["Spot"]) and row["Spot"] > 0:
-                    return (abs(row["Δ|增量"])) * row["Spot"] / row["Premium"]
-            except Exception:
-                return np.nan
-            return np.nan
-        df["Leverage"] = df.apply(_calc_leverage, axis=1)
-
-        # 复合评分：默认权重均等，可通过环境变量调整（例如强势看涨提升 w2、w4）
-        w1 = float(os.getenv("W_GAMMA_THETA", "0.25"))
-        w2 = float(os.getenv("W_DELTA_THETA", "0.25"))
-        w3 = float(os.getenv("W_VEGA_THETA", "0.25"))
-        w4 = float(os.getenv("W_LEVERAGE", "0.25"))
-        # 可选归一化，避免单一尺度主导导致权重失效（默认启用）
-        def _min_max_clip(s: pd.Series):
-            s = pd.to_numeric(s, errors="coerce").replace([np.inf, -np.inf], np.nan)
-            if s.notna().sum() == 0:
-                return pd.Series(0.0, index=s.index)
-            lo = np.nanpercentile(s, 5)
-            hi = np.nanpercentile(s, 95)
-            s = s.clip(lower=lo, upper=hi)
-            mn = np.nanmin(s.values)
-            mx = np.nanmax(s.values)
-            if not np.isfinite(mn) or not np.isfinite(mx) or mx == mn:
-                return pd.Series(0.0, index=s.index)
-            return (s - mn) / (mx - mn)
-
-        use_norm = os.getenv("NORMALIZE_FOR_SCORE", "1") == "1"
-        if use_norm:
-            g_norm = _min_max_clip(df["Gamma/Theta"]).fillna(0.0)
-            d_norm = _min_max_clip(df["Delta/Theta"]).fillna(0.0)
-            v_norm = _min_max_clip(df["Vega/Theta"]).fillna(0.0)
-            l_norm = _min_max_clip(df["Leverage"]).fillna(0.0)
-            df["Score"] = w1 * g_norm + w2 * d_norm + w3 * v_norm + w4 * l_norm
-        else:
-            df["Score"] = (
-                w1 * df["Gamma/Theta"].fillna(0.0)
-                + w2 * df["Delta/Theta"].fillna(0.0)
-                + w3 * df["Vega/Theta"].fillna(0.0)
-                + w4 * df["Leverage"].fillna(0.0)
-            )
-
-        # 4.2 风险调整场景：S 上涨 10% 的近似 PnL 与 ROI（泰勒展开，假设 dIV=0）
-        def _scenario_roi(row):
-            try:
-                if pd.isna(row.get("Premium", np.nan)) or row["Premium"] <= 0 or pd.isna(row.get("Spot", np.nan)):
-                    return np.nan
-                dS = 0.10 * row["Spot"]
-                delta = float(row["Δ|增量"]) if pd.notna(row["Δ|增量"]) else 0.0
-                gamma = float(row["Gamma"]) if pd.notna(row["Gamma"]) else 0.0
-                dP = delta * dS + 0.5 * gamma * (dS ** 2)
-                return dP / row["Premium"] if row["Premium"] > 0 else np.nan
-            except Exception:
-                return np.nan
-        df["ROI@S+10%"] = df.apply(_scenario_roi, axis=1)
-        
-        # 5. 初始化推荐列
-        df["Recommendation"] = "Normal"
-        
-        # 保留一个基础特征副本，供多情景复算使用
-        base_features_df = df.copy()
-
-        # 6. 定义OTM筛选条件：Delta范围筛选（原规则）
-        delta_min = 0.15 # 最小Delta值
-        delta_max = 0.45   # 最大Delta值
-        otm_condition = (df["Δ|增量"].abs() >= delta_min) & (df["Δ|增量"].abs() <= delta_max)
-
-        # 6.1 初筛阶段：希腊效率阈值 + ATM~轻度OTM (K ∈ [S, 1.1S])
-        vega_theta_threshold = float(os.getenv("THRESH_VEGA_THETA", "1.2"))
-        gamma_theta_threshold = float(os.getenv("THRESH_GAMMA_THETA", "0.0015"))
-        delta_theta_threshold = float(os.getenv("THRESH_DELTA_THETA", "0.03"))
-
-        base_screen = (
-            (df["Vega/Theta"] > vega_theta_threshold)
-            & (df["Gamma/Theta"] > gamma_theta_threshold)
-            & (df["Delta/Theta"] > delta_theta_threshold)
-        )
-        if pd.notna(spot_price):
-            atm_light_otm = (df["Strike"] >= spot_price) & (df["Strike"] <= 1.1 * spot_price)
-        else:
-            atm_light_otm = pd.Series([True] * len(df), index=df.index)  # 无 S 时不加此限制
-        initial_screen = base_screen & atm_light_otm
-        df["InitialScreen"] = initial_screen
-
-        # 6.2 优化阶段：引入 Leverage（优先 8~15 区间）
-        leverage_off = os.getenv("THRESH_LEVERAGE_OFF", "0") == "1"
-        leverage_min = float(os.getenv("THRESH_LEVERAGE_MIN", "8"))
-        leverage_max = float(os.getenv("THRESH_LEVERAGE_MAX", "15"))
-        if leverage_off:
-            leverage_mask = pd.Series([True] * len(df), index=df.index)
-        else:
-            leverage_mask = df["Leverage"].between(leverage_min, leverage_max, inclusive="both")
-        df["OptimizedScreen"] = initial_screen & leverage_mask
+        # 6. 评分、初筛（希腊效率阈值 + ATM~轻度OTM）与优化筛选（Leverage 区间）、推荐标签与综合Top排名
+        features, tops = rank_features(df, spot_price, settings, np.flatnonzero(otm_condition.to_numpy()))
         
         print(f"OTM筛选条件: {delta_min} ≤ |Delta| ≤ {delta_max}")
         print(f"符合OTM条件的合约数量: {otm_condition.sum()}")
         print(f"不符合OTM条件的合约数量: {(~otm_condition).sum()}")
         
-        # 标记前 3 名 (Delta/Theta) - 仅在OTM范围内筛选
+        # 各推荐标签的入选合约（Delta/Theta、Vega/Theta 仅在OTM范围内筛选，Score 在优化筛选集合内）
         otm_df = df[otm_condition].copy()
-        screened_df = df[df["OptimizedScreen"]].copy()
-        if len(otm_df) >= 3:
-            top3_delta = otm_df["Delta/Theta"].nlargest(3).index
-            for rank, idx in enumerate(top3_delta, start=1):
-                df.loc[idx, "Recommendation"] = f"Top{rank} (Delta/Theta)"
+        top3_delta, top3_gamma, top3_vega, top3_score = (
+            df.index[tops[col]] if col in tops else []
+            for col in ("Delta/Theta", "Gamma/Theta", "Vega/Theta", "Score"))
+        if len(top3_delta) > 0:
             print(f"\n前3名Delta/Theta (OTM范围): {len(top3_delta)}个")
         else:
-            top3_delta = []
             print(f"\n警告: OTM范围内合约数量不足3个 ({len(otm_df)}个)")
-        
-        # 标记前 3 名 (Gamma/Theta) - 不限制OTM条件
-        top3_gamma = df["Gamma/Theta"].nlargest(3).index
-        for rank, idx in enumerate(top3_gamma, start=1):
-            if df.loc[idx, "Recommendation"] == "Normal":
-                df.loc[idx, "Recommendation"] = f"Top{rank} (Gamma/Theta)"
-            else:
-                df.loc[idx, "Recommendation"] += f" + Top{rank} (Gamma/Theta)"
-        
-        # 标记前 3 名 (Vega/Theta) - 仅在OTM范围内筛选
-        if len(otm_df) >= 3:
-            top3_vega = otm_df["Vega/Theta"].nlargest(3).index
-            for rank, idx in enumerate(top3_vega, start=1):
-                if df.loc[idx, "Recommendation"] == "Normal":
-                    df.loc[idx, "Recommendation"] = f"Top{rank} (Vega/Theta)"
-                else:
-                    df.loc[idx, "Recommendation"] += f" + Top{rank} (Vega/Theta)"
+        if len(top3_vega) > 0:
             print(f"\n前3名Vega/Theta (OTM范围): {len(top3_vega)}个")
         else:
-            top3_vega = []
             print(f"\n警告: OTM范围内合约数量不足3个，无法筛选Vega/Theta")
-
-        # 标记前 3 名 (Score) - 在优化筛选集合内
-        if len(screened_df) >= 3:
-            top3_score = screened_df["Score"].nlargest(3).index
-            for rank, idx in enumerate(top3_score, start=1):
-                if df.loc[idx, "Recommendation"] == "Normal":
-                    df.loc[idx, "Recommendation"] = f"Top{rank} (Score)"
-                else:
-                    df.loc[idx, "Recommendation"] += f" + Top{rank} (Score)"
+        if len(top3_score) > 0:
             print(f"\n前3名综合评分 (优化筛选内): {len(top3_score)}个")
         else:
-            top3_score = []
-            print(f"\n警告: 优化筛选集合内数量不足3个 ({len(screened_df)}个)")
-
-        # 6.3 综合Top排名：在 OptimizedScreen 内按 Score 降序，其次 ROI@S+10%、Leverage
-        df["TopRank"] = ""
-        rank_pool = df[df["OptimizedScreen"]].copy()
-        if len(rank_pool) < 3:
-            # 退化：使用 InitialScreen；再退化：使用全量
-            rank_pool = df[df["InitialScreen"]].copy() if df["InitialScreen"].sum() >= 3 else df.copy()
-        try:
-            rank_pool_sorted = rank_pool.sort_values(["Score", "ROI@S+10%", "Leverage"], ascending=[False, False, False])
-            top_idx = list(rank_pool_sorted.head(3).index)
-            for i, idx in enumerate(top_idx, start=1):
-                df.loc[idx, "TopRank"] = f"Top{i}"
-            print(f"综合排名 Top1-Top3 已生成（优先 OptimizedScreen，按 Score→ROI→Leverage）。")
-        except Exception:
-            print("警告：综合排名计算失败。")
+            print(f"\n警告: 优化筛选集合内数量不足3个 ({int(df['OptimizedScreen'].sum())}个)")
+        print(f"综合排名 Top1-Top3 已生成（优先 OptimizedScreen，按 Score→ROI→Leverage）。")
         
         # 7. 打印推荐结果
         if len(top3_delta) > 0:
@@ -309,143 +621,35 @@ def process_single_file(file_path):
             print("\n前 3 名 Vega/Theta 行权价 (OTM范围): 无符合条件的数据")
         
         # 8. 生成图表
-        generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name, export_dir)
+        if settings["charts"]:
+            generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name, export_dir,
+                            renderer)
         
         # 9. 生成Excel和CSV文件
-        generate_output_files(df, top3_delta, top3_gamma, top3_vega, base_name, export_dir)
+        generate_output_files(df, base_name, export_dir, excel=settings["excel"],
+                              excel_engine=settings["excel_engine"], parquet=settings["parquet"])
         
-        # 9.1 三种预设情景复算并汇总到一个CSV
-        def run_scenario(preset_name, w_gamma, w_delta, w_vega, w_lev,
-                         lev_off=None, lev_min=None, lev_max=None,
-                         vega_th=None, gamma_th=None, delta_th=None):
-            s_df = base_features_df.copy()
-            # 重算 Score（按需归一化）
-            use_norm_local = os.getenv("NORMALIZE_FOR_SCORE", "1") == "1"
-            if use_norm_local:
-                def _mm(s: pd.Series):
-                    s = pd.to_numeric(s, errors="coerce").replace([np.inf, -np.inf], np.nan)
-                    if s.notna().sum() == 0:
-                        return pd.Series(0.0, index=s.index)
-                    lo = np.nanpercentile(s, 5)
-                    hi = np.nanpercentile(s, 95)
-                    s = s.clip(lower=lo, upper=hi)
-                    mn = np.nanmin(s.values)
-                    mx = np.nanmax(s.values)
-                    if not np.isfinite(mn) or not np.isfinite(mx) or mx == mn:
-                        return pd.Series(0.0, index=s.index)
-                    return (s - mn) / (mx - mn)
-                g = _mm(s_df["Gamma/Theta"]).fillna(0.0)
-                d = _mm(s_df["Delta/Theta"]).fillna(0.0)
-                v = _mm(s_df["Vega/Theta"]).fillna(0.0)
-                l = _mm(s_df["Leverage"]).fillna(0.0)
-                s_df["Score"] = (
-                    float(w_gamma) * g + float(w_delta) * d + float(w_vega) * v + float(w_lev) * l
-                )
-            else:
-                s_df["Score"] = (
-                    float(w_gamma) * s_df["Gamma/Theta"].fillna(0.0)
-                    + float(w_delta) * s_df["Delta/Theta"].fillna(0.0)
-                    + float(w_vega) * s_df["Vega/Theta"].fillna(0.0)
-                    + float(w_lev) * s_df["Leverage"].fillna(0.0)
-                )
-            # 记录权重以便排查
-            s_df["W_GammaTheta"] = float(w_gamma)
-            s_df["W_DeltaTheta"] = float(w_delta)
-            s_df["W_VegaTheta"] = float(w_vega)
-            s_df["W_Leverage"] = float(w_lev)
-
-            # 阈值与筛选
-            vega_thr = float(vega_th if vega_th is not None else os.getenv("THRESH_VEGA_THETA", "1.2"))
-            gamma_thr = float(gamma_th if gamma_th is not None else os.getenv("THRESH_GAMMA_THETA", "0.0015"))
-            delta_thr = float(delta_th if delta_th is not None else os.getenv("THRESH_DELTA_THETA", "0.03"))
-
-            base_scr = (
-                (s_df["Vega/Theta"] > vega_thr)
-                & (s_df["Gamma/Theta"] > gamma_thr)
-                & (s_df["Delta/Theta"] > delta_thr)
-            )
-            if pd.notna(spot_price):
-                atm_otm = (s_df["Strike"] >= spot_price) & (s_df["Strike"] <= 1.1 * spot_price)
-            else:
-                atm_otm = pd.Series([True] * len(s_df), index=s_df.index)
-            s_df["InitialScreen"] = base_scr & atm_otm
-
-            # 杠杆筛选
-            lev_off_flag = (str(lev_off) == "1") if lev_off is not None else (os.getenv("THRESH_LEVERAGE_OFF", "0") == "1")
-            lmin = float(lev_min if lev_min is not None else os.getenv("THRESH_LEVERAGE_MIN", "8"))
-            lmax = float(lev_max if lev_max is not None else os.getenv("THRESH_LEVERAGE_MAX", "15"))
-            if lev_off_flag:
-                lev_mask = pd.Series([True] * len(s_df), index=s_df.index)
-            else:
-                lev_mask = s_df["Leverage"].between(lmin, lmax, inclusive="both")
-            s_df["OptimizedScreen"] = s_df["InitialScreen"] & lev_mask
-
-            # OTM 条件
-            otm_mask = (s_df["Δ|增量"].abs() >= delta_min) & (s_df["Δ|增量"].abs() <= delta_max)
-
-            # 生成 Recommendation（复用现有策略）
-            s_df["Recommendation"] = "Normal"
-
-            otm_df_local = s_df[otm_mask].copy()
-            if len(otm_df_local) >= 3:
-                for r, idx in enumerate(otm_df_local["Delta/Theta"].nlargest(3).index, start=1):
-                    s_df.loc[idx, "Recommendation"] = f"Top{r} (Delta/Theta)" if s_df.loc[idx, "Recommendation"] == "Normal" else s_df.loc[idx, "Recommendation"] + f" + Top{r} (Delta/Theta)"
-
-            for r, idx in enumerate(s_df["Gamma/Theta"].nlargest(3).index, start=1):
-                s_df.loc[idx, "Recommendation"] = f"Top{r} (Gamma/Theta)" if s_df.loc[idx, "Recommendation"] == "Normal" else s_df.loc[idx, "Recommendation"] + f" + Top{r} (Gamma/Theta)"
-
-            if len(otm_df_local) >= 3:
-                for r, idx in enumerate(otm_df_local["Vega/Theta"].nlargest(3).index, start=1):
-                    s_df.loc[idx, "Recommendation"] = f"Top{r} (Vega/Theta)" if s_df.loc[idx, "Recommendation"] == "Normal" else s_df.loc[idx, "Recommendation"] + f" + Top{r} (Vega/Theta)"
-
-            # 综合 TopRank
-            s_df["TopRank"] = ""
-            pool = s_df[s_df["OptimizedScreen"]]
-            if len(pool) < 3:
-                pool = s_df[s_df["InitialScreen"]] if s_df["InitialScreen"].sum() >= 3 else s_df
-            pool_sorted = pool.sort_values(["Score", "ROI@S+10%", "Leverage"], ascending=[False, False, False])
-            for i, idx in enumerate(list(pool_sorted.head(3).index), start=1):
-                s_df.loc[idx, "TopRank"] = f"Top{i}"
-
-            # 全局得分名次（便于比较三种情景是否改变排序）
-            s_df["RankByScore"] = s_df["Score"].rank(ascending=False, method="dense")
-
-            s_df["Scenario"] = preset_name
-            # 打印调试信息：前5名得分
-            try:
-                head5 = pool_sorted[["产品", "Strike", "Score"]].head(5)
-                print(f"[调试] 预设={preset_name} Top5 by Score:\n{head5.to_string(index=False)}")
-            except Exception:
-                pass
-            return s_df
-
-        scenario_defs = [
-            ("均衡", 0.25, 0.25, 0.25, 0.25),
-            ("强势看涨", 0.1, 0.4, 0.1, 0.4),
-            ("波动驱动", 0.3, 0.1, 0.5, 0.1),
-        ]
-
-        summary_frames = []
-        for name, wg, wd, wv, wl in scenario_defs:
-            s_df = run_scenario(name, wg, wd, wv, wl)
-            # 仅保留推荐集合
-            rec_mask = (s_df["TopRank"].isin(["Top1", "Top2", "Top3"])) | (s_df["Recommendation"] != "Normal")
-            keep_cols = [c for c in [
-                "Scenario", "TopRank", "Recommendation", "产品", "Strike",
-                "Leverage", "Score", "RankByScore", "ROI@S+10%",
-                "Delta/Theta", "Gamma/Theta", "Vega/Theta",
-                "W_GammaTheta", "W_DeltaTheta", "W_VegaTheta", "W_Leverage",
-            ] if c in s_df.columns]
-            summary_frames.append(s_df.loc[rec_mask, keep_cols])
-
-        if len(summary_frames) > 0:
-            summary_df = pd.concat(summary_frames, axis=0, ignore_index=True)
+        # 9.1 预设情景一次性评分并汇总到一个CSV（权重矩阵 × 特征矩阵）
+        summary_df = score_presets(df, features, SCENARIO_PRESETS, otm_condition)
+        if len(summary_df) > 0:
             summary_path = os.path.join(export_dir, f"{base_name}_summary_presets.csv")
             summary_df.to_csv(summary_path, index=False, encoding='utf-8-sig')
-            print(f"\n三种预设汇总已导出: {summary_path}")
+            print(f"\n{len(SCENARIO_PRESETS)}种预设汇总已导出: {summary_path}")
+
+        # 9.2 现货 × IV 情景网格
+        if SCENARIO_GRID_CONFIG.get("enabled", False):
+            export_scenario_grid(df, base_name, export_dir)
+
+        # 9.3 机器可读结果（Arrow IPC / JSON Lines）
+        if settings["results"]:
+            results = analysis_results(df, spot_price, features)
+            results_path = os.path.join(export_dir, f"{base_name}_results.{settings['results']}")
+            results.write(results_path, settings["results"])
+            print(f"分析结果已导出: {results_path}")
 
         # 10. 打印统计信息
-        print_statistics(file_path, df, otm_condition, delta_min, delta_max, base_name, export_dir)
+        print_statistics(file_path, raw_count, df, otm_condition, delta_min, delta_max, base_name, export_dir,
+                         excel=settings["excel"], charts=settings["charts"])
         
         return df
         
@@ -453,11 +657,22 @@ def process_single_file(file_path):
         print(f"处理文件 {os.path.basename(file_path)} 时出错: {str(e)}")
         return None
 
-def generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name, export_dir):
-    """生成图表"""
-    # 设置中文字体
-    plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'DejaVu Sans']
-    plt.rcParams['axes.unicode_minus'] = False
+def generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name, export_dir, renderer=None):
+    """提交图表渲染（进程池中执行，数据未变化时复用缓存）"""
+    own_renderer = renderer is None
+    if own_renderer:
+        renderer = ChartRenderer(RENDER_CONFIG)
+    image_file = renderer.output_path(export_dir, f"{base_name}_options_analysis")
+    renderer.submit(render_options_chart, image_file, df, otm_df, top3_delta, top3_gamma, top3_vega,
+                    otm_condition, base_name, label=f"{base_name}_options_analysis", title="\n图片")
+    if own_renderer:
+        renderer.close()
+
+def render_options_chart(image_file, dpi, df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name):
+    """绘制三联分析图并保存到 image_file"""
+    # matplotlib 只在绘图时导入，并设置中文字体
+    plt = pyplot(['Arial Unicode MS', 'SimHei', 'DejaVu Sans'])
+    from matplotlib.patches import FancyArrowPatch
     
     # 画图 - 现在有3个子图
     fig = plt.figure(figsize=(24, 10))
@@ -684,121 +899,26 @@ def generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition
              bbox=dict(boxstyle="round,pad=0.5", facecolor="lightyellow", alpha=0.9))
     
     plt.tight_layout()
-    
-    # 根据输入文件名生成输出文件名，保存到 export 文件夹
-    image_file = os.path.join(export_dir, f"{base_name}_options_analysis.png")
-    plt.savefig(image_file, dpi=300, bbox_inches='tight', facecolor='white')
-    print(f"\n图片已保存为: {image_file}")
-    
-    plt.show()
+    plt.savefig(image_file, dpi=dpi, bbox_inches='tight', facecolor='white')
 
-def generate_output_files(df, top3_delta, top3_gamma, top3_vega, base_name, export_dir):
-    """生成Excel和CSV输出文件"""
+def generate_output_files(df, base_name, export_dir, excel=True, excel_engine=None, parquet=False):
+    """生成Excel和CSV输出文件（excel=False 时跳过Excel，parquet=True 时额外输出Parquet）"""
     # 调整列顺序：将 TopRank 与 Recommendation 放前面，便于快速识别
     preferred_cols = [
         c for c in [
             "TopRank", "Recommendation", "InitialScreen", "OptimizedScreen",
             "产品", "Strike", "Δ|增量", "Gamma", "Vega", "Theta",
-            "Delta/Theta", "Gamma/Theta", "Vega/Theta", "Premium", "Spot",
+            BID_IV_COLUMN, MID_IV_COLUMN, ASK_IV_COLUMN, "Delta/Theta", "Gamma/Theta", "Vega/Theta", "Premium", "Spot",
             "Leverage", "Score", "ROI@S+10%"
         ] if c in df.columns
     ]
     other_cols = [c for c in df.columns if c not in preferred_cols]
     df = df[preferred_cols + other_cols]
 
-    # 创建带不同颜色标记的Excel文件
+    # 创建带不同颜色标记的Excel文件（整行格式 + TopRank 条件格式，--no-excel 时跳过）
     output_file = os.path.join(export_dir, f"{base_name}_options_with_recommendation.xlsx")
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        # 写入数据
-        df.to_excel(writer, sheet_name='期权分析', index=False)
-        
-        # 获取工作表
-        worksheet = writer.sheets['期权分析']
-        
-        # 导入样式
-        from openpyxl.styles import PatternFill, Font, Border, Side
-        
-        # 定义不同颜色背景
-        delta_fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")  # 浅绿色 - Delta/Theta
-        gamma_fill = PatternFill(start_color="87CEEB", end_color="87CEEB", fill_type="solid")  # 天蓝色 - Gamma/Theta
-        vega_fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")   # 粉色 - Vega/Theta
-        both_fill = PatternFill(start_color="DDA0DD", end_color="DDA0DD", fill_type="solid")   # 紫色 - 两者都有
-        triple_fill = PatternFill(start_color="FFD700", end_color="FFD700", fill_type="solid")  # 金色 - 三者都有
-        # Top 排名颜色（仅用于 TopRank 列单元格）
-        gold_fill = PatternFill(start_color="FFD700", end_color="FFD700", fill_type="solid")    # Top1 金
-        silver_fill = PatternFill(start_color="C0C0C0", end_color="C0C0C0", fill_type="solid")  # Top2 银
-        bronze_fill = PatternFill(start_color="CD7F32", end_color="CD7F32", fill_type="solid")  # Top3 铜
-        bold_font = Font(bold=True)
-        
-        # 定义边框
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # 为前3名Delta/Theta添加浅绿色背景
-        for idx in top3_delta:
-            row_num = df.index.get_loc(idx) + 2  # +2 因为Excel从1开始，还有标题行
-            for col_num in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row_num, column=col_num)
-                cell.fill = delta_fill
-                cell.font = bold_font
-                cell.border = thin_border
-        
-        # 为前3名Gamma/Theta添加天蓝色背景
-        for idx in top3_gamma:
-            row_num = df.index.get_loc(idx) + 2  # +2 因为Excel从1开始，还有标题行
-            for col_num in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row_num, column=col_num)
-                # 检查是否已经有其他标记
-                if "Delta/Theta" in df.loc[idx, "Recommendation"] and "Vega/Theta" in df.loc[idx, "Recommendation"]:
-                    cell.fill = triple_fill  # 金色 - 三者都有
-                elif "Delta/Theta" in df.loc[idx, "Recommendation"] or "Vega/Theta" in df.loc[idx, "Recommendation"]:
-                    cell.fill = both_fill  # 紫色 - 两者都有
-                else:
-                    cell.fill = gamma_fill  # 天蓝色 - 只有Gamma/Theta
-                cell.font = bold_font
-                cell.border = thin_border
-        
-        # 为前3名Vega/Theta添加粉色背景
-        for idx in top3_vega:
-            row_num = df.index.get_loc(idx) + 2  # +2 因为Excel从1开始，还有标题行
-            for col_num in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row_num, column=col_num)
-                # 检查是否已经有其他标记
-                if "Delta/Theta" in df.loc[idx, "Recommendation"] and "Gamma/Theta" in df.loc[idx, "Recommendation"]:
-                    cell.fill = triple_fill  # 金色 - 三者都有
-                elif "Delta/Theta" in df.loc[idx, "Recommendation"] or "Vega/Theta" in df.loc[idx, "Recommendation"]:
-                    cell.fill = both_fill  # 紫色 - 两者都有
-                else:
-                    cell.fill = vega_fill  # 粉色 - 只有Vega/Theta
-                cell.font = bold_font
-                cell.border = thin_border
-        
-        # 为 TopRank 列添加金/银/铜高亮，仅着色该列，避免覆盖整行配色
-        if "TopRank" in df.columns:
-            top_col_idx = list(df.columns).index("TopRank") + 1
-            for row_i in range(2, len(df) + 2):
-                cell = worksheet.cell(row=row_i, column=top_col_idx)
-                if cell.value == "Top1":
-                    cell.fill = gold_fill
-                    cell.font = bold_font
-                elif cell.value == "Top2":
-                    cell.fill = silver_fill
-                    cell.font = bold_font
-                elif cell.value == "Top3":
-                    cell.fill = bronze_fill
-                    cell.font = bold_font
-                cell.border = thin_border
-
-        # 为所有单元格添加边框
-        for row in range(1, len(df) + 2):  # +2 因为包含标题行
-            for col in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row, column=col)
-                if not cell.border.left:  # 如果还没有边框
-                    cell.border = thin_border
+    if excel:
+        write_highlighted_excel(df, output_file, sheet_name='期权分析', engine=excel_engine)
     
     # 创建增强版CSV文件（添加颜色标记说明）
     csv_file = os.path.join(export_dir, f"{base_name}_options_with_recommendation.csv")
@@ -807,31 +927,13 @@ def generate_output_files(df, top3_delta, top3_gamma, top3_vega, base_name, expo
     csv_df = df.copy()
     
     # 添加颜色标记列
-    def get_color_mark(recommendation):
-        if "Delta/Theta" in recommendation and "Gamma/Theta" in recommendation and "Vega/Theta" in recommendation:
-            return "🟡 金色标记 (Delta+Gamma+Vega三优)"
-        elif "Delta/Theta" in recommendation and "Gamma/Theta" in recommendation:
-            return "🟣 紫色标记 (Delta+Gamma双优)"
-        elif "Delta/Theta" in recommendation and "Vega/Theta" in recommendation:
-            return "🟣 紫色标记 (Delta+Vega双优)"
-        elif "Gamma/Theta" in recommendation and "Vega/Theta" in recommendation:
-            return "🟣 紫色标记 (Gamma+Vega双优)"
-        elif "Delta/Theta" in recommendation:
-            return "🟢 绿色标记 (Delta/Theta优)"
-        elif "Gamma/Theta" in recommendation:
-            return "🔵 蓝色标记 (Gamma/Theta优)"
-        elif "Vega/Theta" in recommendation:
-            return "🩷 粉色标记 (Vega/Theta优)"
-        else:
-            return "⚪ 普通"
-    
-    csv_df["颜色标记"] = csv_df["Recommendation"].apply(get_color_mark)
+    csv_df["颜色标记"] = color_marks(csv_df["Recommendation"])
     
     # 重新排列列，把 TopRank 与颜色标记放在前面
     csv_cols = [c for c in [
         "TopRank", "颜色标记", "Recommendation", "InitialScreen", "OptimizedScreen",
         "产品", "Strike", "Δ|增量", "Gamma", "Vega", "Theta",
-        "Delta/Theta", "Gamma/Theta", "Vega/Theta", "Premium", "Spot",
+        BID_IV_COLUMN, MID_IV_COLUMN, ASK_IV_COLUMN, "Delta/Theta", "Gamma/Theta", "Vega/Theta", "Premium", "Spot",
         "Leverage", "Score", "ROI@S+10%"
     ] if c in csv_df.columns]
     other_csv_cols = [c for c in csv_df.columns if c not in csv_cols]
@@ -840,12 +942,19 @@ def generate_output_files(df, top3_delta, top3_gamma, top3_vega, base_name, expo
     # 保存CSV
     csv_df.to_csv(csv_file, index=False, encoding='utf-8-sig')
     
-    print(f"\n结果已写入 {output_file} (带颜色标记)")
+    if parquet:
+        parquet_file = os.path.splitext(csv_file)[0] + ".parquet"
+        csv_df.to_parquet(parquet_file, index=False)
+        print(f"\n结果已写入 {parquet_file}")
+    
+    if excel:
+        print(f"\n结果已写入 {output_file} (带颜色标记)")
     print(f"结果已写入 {csv_file} (带颜色说明)")
 
-def print_statistics(file_path, df, otm_condition, delta_min, delta_max, base_name, export_dir):
+def print_statistics(file_path, raw_count, df, otm_condition, delta_min, delta_max, base_name, export_dir, excel=True,
+                     charts=True):
     """打印统计信息"""
-    print(f"\n过滤前数据点数量: {len(pd.read_csv(file_path)[pd.read_csv(file_path)['产品'].str.endswith('-C')])}")
+    print(f"\n过滤前数据点数量: {raw_count}")
     print(f"过滤后数据点数量: {len(df)}")
     print(f"Theta过滤条件: |Theta| >= 1e-3")
     print(f"OTM筛选条件: {delta_min} ≤ |Delta| ≤ {delta_max}")
@@ -863,131 +972,346 @@ def print_statistics(file_path, df, otm_condition, delta_min, delta_max, base_na
     # 打印文件命名信息
     print(f"\n=== 文件命名规则 ===")
     print(f"输入文件: {os.path.basename(file_path)}")
-    print(f"输出图片: {export_dir}/{base_name}_options_analysis.png")
-    print(f"输出Excel: {export_dir}/{base_name}_options_with_recommendation.xlsx")
+    if charts:
+        print(f"输出图片: {export_dir}/{base_name}_options_analysis.{RENDER_CONFIG['format']}")
+    if excel:
+        print(f"输出Excel: {export_dir}/{base_name}_options_with_recommendation.xlsx")
     print(f"输出CSV: {export_dir}/{base_name}_options_with_recommendation.csv")
     print(f"基础名称: {base_name}")
     print(f"输出目录: {export_dir}")
 
+def _coerce(key, value):
+    """按 DEFAULT_SETTINGS 中默认值的类型转换配置值（来自环境变量、配置文件或命令行的字符串）"""
+    default = DEFAULT_SETTINGS[key]
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    if isinstance(default, bool):
+        if text.lower() in ("1", "true", "yes", "y", "on"):
+            return True
+        if text.lower() in ("0", "false", "no", "n", "off"):
+            return False
+        raise ValueError(f"配置项 {key} 需要布尔值，收到: {value}")
+    if isinstance(default, float):
+        return float(text)
+    if default is None:
+        return None if text.lower() in ("", "none", "auto") else text
+    return text
+
+
+def apply_preset(settings, name):
+    """按 SCENARIO_PRESETS 中的名称设置四个评分权重"""
+    presets = dict(SCENARIO_PRESETS)
+    if name not in presets:
+        raise ValueError(f"未知预设: {name}（可选: {', '.join(presets)}）")
+    for key, w in zip(["w_gamma_theta", "w_delta_theta", "w_vega_theta", "w_leverage"], presets[name]):
+        settings[key] = w
+    return settings
+
+
+def resolve_settings(config_file=None, overrides=None, use_env=True):
+    """
+    合并分析参数：默认值 < 环境变量（同名大写） < JSON 配置文件 < overrides（命令行）
+    配置文件可包含 "preset": "强势看涨" 等预设名称，其中单独给出的权重优先于预设
+    """
+    settings = dict(DEFAULT_SETTINGS)
+    if use_env:
+        for key in DEFAULT_SETTINGS:
+            if key.upper() in os.environ:
+                settings[key] = _coerce(key, os.environ[key.upper()])
+
+    layers = []
+    if config_file:
+        with open(config_file, "r", encoding="utf-8") as f:
+            layers.append(json.load(f))
+    if overrides:
+        layers.append(dict(overrides))
+
+    for layer in layers:
+        layer = {str(k).lower(): v for k, v in layer.items()}
+        if layer.get("preset"):
+            apply_preset(settings, layer.pop("preset"))
+        layer.pop("preset", None)
+        for key, value in layer.items():
+            if key not in DEFAULT_SETTINGS:
+                raise ValueError(f"未知配置项: {key}（可选: {', '.join(DEFAULT_SETTINGS)}）")
+            settings[key] = _coerce(key, value)
+    return settings
+
+
+def _snapshot_key(file_path, settings):
+    """
+    增量模式的快照指纹与元数据：清洗后期权链逐行哈希 + 影响结果的参数
+    （分析参数、希腊字母补全、情景网格与运行日期；任一变化都视为需要重新处理）
+    """
+    df = load_chain(file_path, prepare_chain, tag="call")
+    fingerprints = row_fingerprints(df, "产品", df.columns)
+    meta = {
+        "settings": settings,
+        "greeks": GREEKS_CONFIG,
+        "roi_shocks": ROI_SHOCKS,
+        "scenario_grid": SCENARIO_GRID_CONFIG,
+        "date": str(date.today()),
+    }
+    return fingerprints, meta
+
+
+def _state_name(file_path):
+    return "call_" + os.path.splitext(os.path.basename(file_path))[0]
+
+
+def is_unchanged(file_path, settings, export_dir="export"):
+    """
+    与上一次运行的快照比对：期权链没有新增 / 删除 / 变化的合约、参数一致且输出文件仍在时返回 True
+    评分经过全链截尾归一化与排名，任一合约变化都会影响其他合约的结果，因此只能整文件跳过
+    """
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    if not os.path.exists(os.path.join(export_dir, f"{base_name}_options_with_recommendation.csv")):
+        return False
+    fingerprints, meta = _snapshot_key(file_path, settings)
+    previous = load_state(INCREMENTAL_CONFIG["state_dir"], _state_name(file_path), meta)
+    if previous is None:
+        return False
+    snapshot = previous["snapshot"]
+    diff = diff_snapshots(pd.Series(snapshot["fingerprint"].to_numpy(), index=snapshot["产品"]), fingerprints)
+    print(f"{os.path.basename(file_path)} 与上次运行相比: {diff.summary()}")
+    return diff.is_empty
+
+
+def save_snapshot(file_path, settings):
+    """记录本次处理的期权链快照，供下一次 --incremental 运行比对"""
+    fingerprints, meta = _snapshot_key(file_path, settings)
+    snapshot = pd.DataFrame({"产品": fingerprints.index, "fingerprint": fingerprints.to_numpy()})
+    save_state(INCREMENTAL_CONFIG["state_dir"], _state_name(file_path), meta, {"snapshot": snapshot})
+
+
+def archive_snapshot(file_path, df, config=SNAPSHOT_STORE_CONFIG):
+    """把单个文件的分析结果追加到历史快照库（查询见 src/put2/history.py --symbol-col 产品）"""
+    root = config["root"] or os.path.join(os.path.dirname(os.path.abspath(file_path)), ".call_snapshot_store")
+    try:
+        append_snapshot(df, root, datetime.fromtimestamp(os.path.getmtime(file_path)), symbol_col="产品")
+    except Exception as e:
+        print(f"警告: 历史快照写入失败: {str(e)}")
+
+
+def _process_file(file_path, settings, renderer, incremental=False):
+    """
+    处理单个文件并返回汇总行；incremental=True 时跳过期权链与参数均未变化的文件
+    """
+    start = time.perf_counter()
+    if incremental and is_unchanged(file_path, settings):
+        print(f"跳过 {os.path.basename(file_path)}：期权链与参数均未变化，沿用上次输出")
+        row = _run_summary_row(file_path, None, time.perf_counter() - start)
+        row["状态"] = "未变化"
+        return row
+    df = process_single_file(file_path, settings, renderer)
+    if df is not None and SNAPSHOT_STORE_CONFIG["enabled"]:
+        archive_snapshot(file_path, df)
+    if incremental and df is not None:
+        save_snapshot(file_path, settings)
+    return _run_summary_row(file_path, df, time.perf_counter() - start)
+
+
+def _process_file_job(file_path, settings, incremental=False):
+    """
+    进程池中处理单个文件：输出捕获为日志文本，图表在本进程内渲染，
+    返回 (汇总行, 日志文本)
+    """
+    buffer = io.StringIO()
+    with redirect_stdout(buffer):
+        with ChartRenderer({**RENDER_CONFIG, "parallel": False}) as renderer:
+            row = _process_file(file_path, settings, renderer, incremental)
+    return row, buffer.getvalue()
+
+
+def _run_summary_row(file_path, df, elapsed):
+    """单个文件的运行汇总：状态、合约数、Top1 合约与耗时"""
+    top1 = ""
+    if df is not None and "TopRank" in df.columns:
+        hit = df.loc[df["TopRank"] == "Top1", "产品"]
+        top1 = str(hit.iloc[0]) if len(hit) > 0 else ""
+    return {
+        "文件": os.path.basename(file_path),
+        "状态": "成功" if df is not None else "失败",
+        "合约数": len(df) if df is not None else 0,
+        "Top1": top1,
+        "耗时(秒)": round(elapsed, 2),
+    }
+
+
+def _select_files_interactive(csv_files):
+    """交互式选择要处理的文件"""
+    print("\n数据文件列表：")
+    for i, file_path in enumerate(csv_files, 1):
+        print(f"  {i}. {os.path.basename(file_path)}")
+
+    print("\n请选择要处理的文件：")
+    print("  a) 全部文件")
+    print("  b) 按序号选择（如：1,3-5）")
+    choice = input("输入选项 (a/b，默认 a): ").strip().lower() or "a"
+    if choice != "b":
+        return csv_files
+
+    sel = input("请输入序号，逗号分隔，支持区间（示例：1,3-5）: ").strip()
+    indices = set()
+    for part in sel.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            try:
+                l, r = part.split('-')
+                l = int(l)
+                r = int(r)
+                for k in range(min(l, r), max(l, r) + 1):
+                    indices.add(k)
+            except Exception:
+                pass
+        else:
+            try:
+                indices.add(int(part))
+            except Exception:
+                pass
+    selected_files = [csv_files[i - 1] for i in sorted(indices) if 1 <= i <= len(csv_files)]
+    if not selected_files:
+        print("未选择有效文件，默认处理全部。")
+        selected_files = csv_files
+    return selected_files
+
+
+def _configure_interactive(settings):
+    """交互式选择参数预设、自定义权重/阈值与杠杆筛选开关，直接修改 settings"""
+    print("\n请选择参数预设：")
+    print("  1) 均衡 (默认)")
+    print("  2) 强势看涨（提升 Delta/Theta 与 Leverage 权重）")
+    print("  3) 波动驱动（提升 Vega/Theta 与 Gamma/Theta 权重）")
+    print("  4) 自定义权重与阈值")
+    preset = input("输入编号 (1/2/3/4，默认 1): ").strip() or "1"
+
+    if preset == "2":
+        apply_preset(settings, "强势看涨")
+    elif preset == "3":
+        apply_preset(settings, "波动驱动")
+    elif preset == "4":
+        # 自定义权重与阈值
+        for title, keys in [
+            ("权重", ["w_gamma_theta", "w_delta_theta", "w_vega_theta", "w_leverage"]),
+            ("阈值", ["thresh_vega_theta", "thresh_gamma_theta", "thresh_delta_theta",
+                      "thresh_leverage_min", "thresh_leverage_max"]),
+        ]:
+            print(f"\n请输入{title}（回车使用当前/默认值）：")
+            for key in keys:
+                val = input(f"{key.upper()} = [{settings[key]}]: ").strip()
+                if val:
+                    settings[key] = _coerce(key, val)
+
+    # 杠杆筛选开关
+    lev_on = input("\n是否启用杠杆筛选区间(默认是，输入 n 关闭)? ").strip().lower()
+    settings["thresh_leverage_off"] = lev_on == 'n'
+    return settings
+
+
+def _parse_set_option(text):
+    """解析 --set KEY=VALUE"""
+    if "=" not in text:
+        raise argparse.ArgumentTypeError(f"格式应为 KEY=VALUE: {text}")
+    key, value = text.split("=", 1)
+    return key.strip().lower(), value
+
+
+def _print_run_summary(rows, wall_time):
+    """打印批量运行汇总表与总耗时"""
+    print(f"\n{'='*60}")
+    print("运行汇总")
+    print(f"{'='*60}")
+    summary = pd.DataFrame(rows)
+    print(summary.to_string(index=False))
+    ok = int((summary["状态"] == "成功").sum())
+    cpu_time = summary["耗时(秒)"].sum()
+    skipped = int((summary["状态"] == "未变化").sum())
+    print(f"\n处理完成！成功处理 {ok}/{len(rows)} 个文件" + (f"，{skipped} 个未变化已跳过" if skipped else ""))
+    print(f"总耗时: {wall_time:.2f} 秒（各文件耗时合计 {cpu_time:.2f} 秒）")
+    print(f"{'='*60}")
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(
+        description="期权分析工具",
+        epilog="参数优先级：默认值 < 环境变量 < --config 配置文件 < --preset/--set 等命令行参数")
+    parser.add_argument("--config", help="JSON 配置文件（键同 DEFAULT_SETTINGS，可含 \"preset\"）")
+    parser.add_argument("--preset", choices=[name for name, _ in SCENARIO_PRESETS], help="评分权重预设")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], type=_parse_set_option,
+                        metavar="KEY=VALUE", help="覆盖单个参数，可重复，例如 --set thresh_leverage_max=20")
+    parser.add_argument("--no-excel", action="store_true", help="跳过Excel导出，仅输出CSV/Parquet（快速模式）")
+    parser.add_argument("--no-charts", action="store_true", help="跳过图表渲染（不导入 matplotlib）")
+    parser.add_argument("--no-leverage-filter", action="store_true", help="关闭 Leverage 区间筛选")
+    parser.add_argument("--data-dir", default="data", help="数据目录（默认 data）")
+    parser.add_argument("--files", nargs="+", help="只处理指定的CSV文件（默认处理数据目录下全部文件）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="并行处理文件的进程数（默认 CPU 核数，1 为串行）")
+    parser.add_argument("--batch", action="store_true", help="非交互模式：不弹出菜单，直接按参数处理")
+    parser.add_argument("--incremental", action="store_true",
+                        help="增量模式：跳过期权链与参数均与上次运行相同的文件")
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.preset:
+        overrides["preset"] = args.preset
+    overrides.update(dict(args.overrides))
+    if args.no_excel:
+        overrides.update(excel=False, parquet=True)
+    if args.no_charts:
+        overrides["charts"] = False
+    if args.no_leverage_filter:
+        overrides["thresh_leverage_off"] = True
+    try:
+        settings = resolve_settings(args.config, overrides)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
     print("期权分析工具 - 优化版")
     print("=" * 50)
 
     # 查找CSV文件
-    csv_files = find_csv_files("data")
+    csv_files = args.files or find_csv_files(args.data_dir)
     if not csv_files:
         print("没有找到CSV文件，程序退出")
         return
 
-    # 如果是交互式终端，提供菜单
-    is_tty = sys.stdin.isatty()
+    # 交互式终端且未指定 --batch 时提供菜单
     selected_files = csv_files
-
-    if is_tty:
-        print("\n数据文件列表：")
-        for i, file_path in enumerate(csv_files, 1):
-            print(f"  {i}. {os.path.basename(file_path)}")
-
-        print("\n请选择要处理的文件：")
-        print("  a) 全部文件")
-        print("  b) 按序号选择（如：1,3-5）")
-        choice = input("输入选项 (a/b，默认 a): ").strip().lower() or "a"
-
-        if choice == "b":
-            sel = input("请输入序号，逗号分隔，支持区间（示例：1,3-5）: ").strip()
-            indices = set()
-            for part in sel.split(','):
-                part = part.strip()
-                if not part:
-                    continue
-                if '-' in part:
-                    try:
-                        l, r = part.split('-')
-                        l = int(l)
-                        r = int(r)
-                        for k in range(min(l, r), max(l, r) + 1):
-                            indices.add(k)
-                    except Exception:
-                        pass
-                else:
-                    try:
-                        indices.add(int(part))
-                    except Exception:
-                        pass
-            selected_files = [csv_files[i - 1] for i in sorted(indices) if 1 <= i <= len(csv_files)]
-            if not selected_files:
-                print("未选择有效文件，默认处理全部。")
-                selected_files = csv_files
-        else:
-            selected_files = csv_files
-
-        # 预设策略
-        print("\n请选择参数预设：")
-        print("  1) 均衡 (默认)")
-        print("  2) 强势看涨（提升 Delta/Theta 与 Leverage 权重）")
-        print("  3) 波动驱动（提升 Vega/Theta 与 Gamma/Theta 权重）")
-        print("  4) 自定义权重与阈值")
-        preset = input("输入编号 (1/2/3/4，默认 1): ").strip() or "1"
-
-        def _set_env(k, v):
-            if v is not None:
-                os.environ[k] = str(v)
-
-        if preset == "2":
-            _set_env("W_DELTA_THETA", 0.4)
-            _set_env("W_LEVERAGE", 0.4)
-            _set_env("W_GAMMA_THETA", 0.1)
-            _set_env("W_VEGA_THETA", 0.1)
-        elif preset == "3":
-            _set_env("W_VEGA_THETA", 0.5)
-            _set_env("W_GAMMA_THETA", 0.3)
-            _set_env("W_DELTA_THETA", 0.1)
-            _set_env("W_LEVERAGE", 0.1)
-        elif preset == "4":
-            # 自定义权重
-            print("\n请输入权重（回车使用当前/默认值）：")
-            for key, default in [
-                ("W_GAMMA_THETA", os.getenv("W_GAMMA_THETA", "0.25")),
-                ("W_DELTA_THETA", os.getenv("W_DELTA_THETA", "0.25")),
-                ("W_VEGA_THETA", os.getenv("W_VEGA_THETA", "0.25")),
-                ("W_LEVERAGE", os.getenv("W_LEVERAGE", "0.25")),
-            ]:
-                val = input(f"{key} = [{default}]: ").strip()
-                if val:
-                    _set_env(key, val)
-
-            print("\n请输入阈值（回车使用当前/默认值）：")
-            for key, default in [
-                ("THRESH_VEGA_THETA", os.getenv("THRESH_VEGA_THETA", "1.2")),
-                ("THRESH_GAMMA_THETA", os.getenv("THRESH_GAMMA_THETA", "0.0015")),
-                ("THRESH_DELTA_THETA", os.getenv("THRESH_DELTA_THETA", "0.03")),
-                ("THRESH_LEVERAGE_MIN", os.getenv("THRESH_LEVERAGE_MIN", "8")),
-                ("THRESH_LEVERAGE_MAX", os.getenv("THRESH_LEVERAGE_MAX", "15")),
-            ]:
-                val = input(f"{key} = [{default}]: ").strip()
-                if val:
-                    _set_env(key, val)
-
-        # 杠杆筛选开关
-        lev_on = input("\n是否启用杠杆筛选区间(默认是，输入 n 关闭)? ").strip().lower()
-        if lev_on == 'n':
-            _set_env("THRESH_LEVERAGE_OFF", 1)
-        else:
-            _set_env("THRESH_LEVERAGE_OFF", 0)
-
+    if sys.stdin.isatty() and not args.batch:
+        selected_files = _select_files_interactive(csv_files)
+        _configure_interactive(settings)
         print("\n开始处理...\n")
 
-    # 处理选定文件
-    processed_count = 0
-    for file_path in selected_files:
-        result = process_single_file(file_path)
-        if result is not None:
-            processed_count += 1
+    start = time.perf_counter()
+    rows = []
+    workers = max(1, min(args.workers, len(selected_files)))
+    if workers == 1:
+        # 串行：图表在后台进程池中渲染，分析下一个文件时不必等待
+        with ChartRenderer(RENDER_CONFIG) as renderer:
+            for file_path in selected_files:
+                rows.append(_process_file(file_path, settings, renderer, args.incremental))
+    else:
+        # 并行：每个文件一个任务，日志按完成顺序整体输出，避免交错
+        print(f"使用 {workers} 个进程并行处理 {len(selected_files)} 个文件")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_process_file_job, f, settings, args.incremental): f for f in selected_files}
+            for future in as_completed(futures):
+                try:
+                    row, log = future.result()
+                except Exception as e:
+                    file_path = futures[future]
+                    row = _run_summary_row(file_path, None, 0.0)
+                    log = f"处理文件 {os.path.basename(file_path)} 时出错: {str(e)}\n"
+                print(log, end="")
+                rows.append(row)
+        order = {os.path.basename(f): i for i, f in enumerate(selected_files)}
+        rows.sort(key=lambda r: order[r["文件"]])
 
-    print(f"\n{'='*60}")
-    print(f"处理完成！成功处理 {processed_count}/{len(selected_files)} 个文件")
-    print(f"{'='*60}")
+    _print_run_summary(rows, time.perf_counter() - start)
 
 if __name__ == "__main__":
     main()
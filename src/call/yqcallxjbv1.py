@@ -6,6 +6,28 @@ from matplotlib.patches import FancyArrowPatch
 import os
 import glob
 import sys
+import argparse
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.excel_export import color_marks, write_highlighted_excel
+from common.render import ChartRenderer
+from common.features import greek_theta_ratios
+
+# 图表渲染：进程池中渲染，dpi/格式（png/svg/webp）可调，数据未变化时复用 .render_cache/ 中的图表
+RENDER_CONFIG = {
+    "dpi": 150,
+    "format": "png",
+    "max_workers": 2,
+    "use_cache": True,
+}
+
+# 输出文件：--no-excel 时跳过 Excel，只写 CSV 与 Parquet（快速模式）
+EXPORT_CONFIG = {
+    "excel": True,
+    "excel_engine": None,   # None 自动选择（优先 xlsxwriter），也可指定 "openpyxl"
+    "parquet": False,
+}
 
 def find_csv_files(data_dir="data"):
     """查找data目录下的所有CSV文件"""
@@ -20,8 +42,8 @@ def find_csv_files(data_dir="data"):
     
     return csv_files
 
-def process_single_file(file_path):
-    """处理单个CSV文件"""
+def process_single_file(file_path, renderer=None):
+    """处理单个CSV文件；renderer 为共享的图表渲染器，图表在后台渲染"""
     print(f"\n{'='*60}")
     print(f"正在处理文件: {os.path.basename(file_path)}")
     print(f"{'='*60}")
@@ -60,9 +82,9 @@ def process_single_file(file_path):
         df = df[df["Theta"].abs() >= 1e-3].copy()
         
         # 4. 计算性价比指标
-        df["Delta/Theta"] = df["Δ|增量"] / df["Theta"].abs()
-        df["Gamma/Theta"] = df["Gamma"] / df["Theta"].abs()
-        df["Vega/Theta"] = df["Vega"] / df["Theta"].abs()
+        ratios = greek_theta_ratios(df["Δ|增量"], df["Gamma"], df["Vega"], df["Theta"])
+        for col, values in ratios.items():
+            df[col] = values
         
         # 5. 初始化推荐列
         df["Recommendation"] = "Normal"
@@ -125,10 +147,10 @@ def process_single_file(file_path):
             print("\n前 3 名 Vega/Theta 行权价 (OTM范围): 无符合条件的数据")
         
         # 8. 生成图表
-        generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name, export_dir)
+        generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name, export_dir, renderer)
         
         # 9. 生成Excel和CSV文件
-        generate_output_files(df, top3_delta, top3_gamma, top3_vega, base_name, export_dir)
+        generate_output_files(df, base_name, export_dir)
         
         # 10. 打印统计信息
         print_statistics(file_path, df, otm_condition, delta_min, delta_max, base_name, export_dir)
@@ -139,8 +161,19 @@ def process_single_file(file_path):
         print(f"处理文件 {os.path.basename(file_path)} 时出错: {str(e)}")
         return None
 
-def generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name, export_dir):
-    """生成图表"""
+def generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name, export_dir, renderer=None):
+    """提交图表渲染（进程池中执行，数据未变化时复用缓存）"""
+    own_renderer = renderer is None
+    if own_renderer:
+        renderer = ChartRenderer(RENDER_CONFIG)
+    image_file = renderer.output_path(export_dir, f"{base_name}_options_analysis")
+    renderer.submit(render_options_chart, image_file, df, otm_df, top3_delta, top3_gamma, top3_vega,
+                    otm_condition, base_name, label=f"{base_name}_options_analysis", title="\n图片")
+    if own_renderer:
+        renderer.close()
+
+def render_options_chart(image_file, dpi, df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition, base_name):
+    """绘制三联分析图并保存到 image_file"""
     # 设置中文字体
     plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'SimHei', 'DejaVu Sans']
     plt.rcParams['axes.unicode_minus'] = False
@@ -370,89 +403,14 @@ def generate_charts(df, otm_df, top3_delta, top3_gamma, top3_vega, otm_condition
              bbox=dict(boxstyle="round,pad=0.5", facecolor="lightyellow", alpha=0.9))
     
     plt.tight_layout()
-    
-    # 根据输入文件名生成输出文件名，保存到 export 文件夹
-    image_file = os.path.join(export_dir, f"{base_name}_options_analysis.png")
-    plt.savefig(image_file, dpi=300, bbox_inches='tight', facecolor='white')
-    print(f"\n图片已保存为: {image_file}")
-    
-    plt.show()
+    plt.savefig(image_file, dpi=dpi, bbox_inches='tight', facecolor='white')
 
-def generate_output_files(df, top3_delta, top3_gamma, top3_vega, base_name, export_dir):
+def generate_output_files(df, base_name, export_dir):
     """生成Excel和CSV输出文件"""
-    # 创建带不同颜色标记的Excel文件
+    # 创建带不同颜色标记的Excel文件（整行格式 + TopRank 条件格式，--no-excel 时跳过）
     output_file = os.path.join(export_dir, f"{base_name}_options_with_recommendation.xlsx")
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        # 写入数据
-        df.to_excel(writer, sheet_name='期权分析', index=False)
-        
-        # 获取工作表
-        worksheet = writer.sheets['期权分析']
-        
-        # 导入样式
-        from openpyxl.styles import PatternFill, Font, Border, Side
-        
-        # 定义不同颜色背景
-        delta_fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")  # 浅绿色 - Delta/Theta
-        gamma_fill = PatternFill(start_color="87CEEB", end_color="87CEEB", fill_type="solid")  # 天蓝色 - Gamma/Theta
-        vega_fill = PatternFill(start_color="FFB6C1", end_color="FFB6C1", fill_type="solid")   # 粉色 - Vega/Theta
-        both_fill = PatternFill(start_color="DDA0DD", end_color="DDA0DD", fill_type="solid")   # 紫色 - 两者都有
-        triple_fill = PatternFill(start_color="FFD700", end_color="FFD700", fill_type="solid")  # 金色 - 三者都有
-        bold_font = Font(bold=True)
-        
-        # 定义边框
-        thin_border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # 为前3名Delta/Theta添加浅绿色背景
-        for idx in top3_delta:
-            row_num = df.index.get_loc(idx) + 2  # +2 因为Excel从1开始，还有标题行
-            for col_num in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row_num, column=col_num)
-                cell.fill = delta_fill
-                cell.font = bold_font
-                cell.border = thin_border
-        
-        # 为前3名Gamma/Theta添加天蓝色背景
-        for idx in top3_gamma:
-            row_num = df.index.get_loc(idx) + 2  # +2 因为Excel从1开始，还有标题行
-            for col_num in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row_num, column=col_num)
-                # 检查是否已经有其他标记
-                if "Delta/Theta" in df.loc[idx, "Recommendation"] and "Vega/Theta" in df.loc[idx, "Recommendation"]:
-                    cell.fill = triple_fill  # 金色 - 三者都有
-                elif "Delta/Theta" in df.loc[idx, "Recommendation"] or "Vega/Theta" in df.loc[idx, "Recommendation"]:
-                    cell.fill = both_fill  # 紫色 - 两者都有
-                else:
-                    cell.fill = gamma_fill  # 天蓝色 - 只有Gamma/Theta
-                cell.font = bold_font
-                cell.border = thin_border
-        
-        # 为前3名Vega/Theta添加粉色背景
-        for idx in top3_vega:
-            row_num = df.index.get_loc(idx) + 2  # +2 因为Excel从1开始，还有标题行
-            for col_num in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row_num, column=col_num)
-                # 检查是否已经有其他标记
-                if "Delta/Theta" in df.loc[idx, "Recommendation"] and "Gamma/Theta" in df.loc[idx, "Recommendation"]:
-                    cell.fill = triple_fill  # 金色 - 三者都有
-                elif "Delta/Theta" in df.loc[idx, "Recommendation"] or "Vega/Theta" in df.loc[idx, "Recommendation"]:
-                    cell.fill = both_fill  # 紫色 - 两者都有
-                else:
-                    cell.fill = vega_fill  # 粉色 - 只有Vega/Theta
-                cell.font = bold_font
-                cell.border = thin_border
-        
-        # 为所有单元格添加边框
-        for row in range(1, len(df) + 2):  # +2 因为包含标题行
-            for col in range(1, len(df.columns) + 1):
-                cell = worksheet.cell(row=row, column=col)
-                if not cell.border.left:  # 如果还没有边框
-                    cell.border = thin_border
+    if EXPORT_CONFIG["excel"]:
+        write_highlighted_excel(df, output_file, sheet_name='期权分析', engine=EXPORT_CONFIG["excel_engine"])
     
     # 创建增强版CSV文件（添加颜色标记说明）
     csv_file = os.path.join(export_dir, f"{base_name}_options_with_recommendation.csv")
@@ -461,25 +419,7 @@ def generate_output_files(df, top3_delta, top3_gamma, top3_vega, base_name, expo
     csv_df = df.copy()
     
     # 添加颜色标记列
-    def get_color_mark(recommendation):
-        if "Delta/Theta" in recommendation and "Gamma/Theta" in recommendation and "Vega/Theta" in recommendation:
-            return "🟡 金色标记 (Delta+Gamma+Vega三优)"
-        elif "Delta/Theta" in recommendation and "Gamma/Theta" in recommendation:
-            return "🟣 紫色标记 (Delta+Gamma双优)"
-        elif "Delta/Theta" in recommendation and "Vega/Theta" in recommendation:
-            return "🟣 紫色标记 (Delta+Vega双优)"
-        elif "Gamma/Theta" in recommendation and "Vega/Theta" in recommendation:
-            return "🟣 紫色标记 (Gamma+Vega双优)"
-        elif "Delta/Theta" in recommendation:
-            return "🟢 绿色标记 (Delta/Theta优)"
-        elif "Gamma/Theta" in recommendation:
-            return "🔵 蓝色标记 (Gamma/Theta优)"
-        elif "Vega/Theta" in recommendation:
-            return "🩷 粉色标记 (Vega/Theta优)"
-        else:
-            return "⚪ 普通"
-    
-    csv_df["颜色标记"] = csv_df["Recommendation"].apply(get_color_mark)
+    csv_df["颜色标记"] = color_marks(csv_df["Recommendation"])
     
     # 重新排列列，把颜色标记放在前面
     cols = ["颜色标记", "产品", "Strike", "Δ|增量", "Gamma", "Vega", "Theta", 
@@ -489,7 +429,13 @@ def generate_output_files(df, top3_delta, top3_gamma, top3_vega, base_name, expo
     # 保存CSV
     csv_df.to_csv(csv_file, index=False, encoding='utf-8-sig')
     
-    print(f"\n结果已写入 {output_file} (带颜色标记)")
+    if EXPORT_CONFIG["parquet"]:
+        parquet_file = os.path.splitext(csv_file)[0] + ".parquet"
+        csv_df.to_parquet(parquet_file, index=False)
+        print(f"\n结果已写入 {parquet_file}")
+    
+    if EXPORT_CONFIG["excel"]:
+        print(f"\n结果已写入 {output_file} (带颜色标记)")
     print(f"结果已写入 {csv_file} (带颜色说明)")
 
 def print_statistics(file_path, df, otm_condition, delta_min, delta_max, base_name, export_dir):
@@ -512,14 +458,22 @@ def print_statistics(file_path, df, otm_condition, delta_min, delta_max, base_na
     # 打印文件命名信息
     print(f"\n=== 文件命名规则 ===")
     print(f"输入文件: {os.path.basename(file_path)}")
-    print(f"输出图片: {export_dir}/{base_name}_options_analysis.png")
-    print(f"输出Excel: {export_dir}/{base_name}_options_with_recommendation.xlsx")
+    print(f"输出图片: {export_dir}/{base_name}_options_analysis.{RENDER_CONFIG['format']}")
+    if EXPORT_CONFIG["excel"]:
+        print(f"输出Excel: {export_dir}/{base_name}_options_with_recommendation.xlsx")
     print(f"输出CSV: {export_dir}/{base_name}_options_with_recommendation.csv")
     print(f"基础名称: {base_name}")
     print(f"输出目录: {export_dir}")
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="期权分析工具")
+    parser.add_argument("--no-excel", action="store_true", help="跳过Excel导出，仅输出CSV/Parquet（快速模式）")
+    args = parser.parse_args()
+    if args.no_excel:
+        EXPORT_CONFIG["excel"] = False
+        EXPORT_CONFIG["parquet"] = True
+
     print("期权分析工具 - 优化版")
     print("=" * 50)
     
@@ -535,11 +489,13 @@ def main():
         print(f"  {i}. {os.path.basename(file_path)}")
     
     # 处理每个文件
+    # 图表在后台进程池中渲染，分析下一个文件时不必等待
     processed_count = 0
-    for file_path in csv_files:
-        result = process_single_file(file_path)
-        if result is not None:
-            processed_count += 1
+    with ChartRenderer(RENDER_CONFIG) as renderer:
+        for file_path in csv_files:
+            result = process_single_file(file_path, renderer)
+            if result is not None:
+                processed_count += 1
     
     print(f"\n{'='*60}")
     print(f"处理完成！成功处理 {processed_count}/{len(csv_files)} 个文件")
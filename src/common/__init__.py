@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+期权分析脚本（put2、call）共享的数据处理模块
+"""
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+区间索引（Delta / 行权价 / 价值状态等数值列）
+每个期权链快照按列排序一次（O(n log n)），之后任意 [lo, hi] 区间查询只需两次 searchsorted
+（O(log n + m)，m 为命中行数），交互式工具可对同一快照反复查询大量自定义区间：
+
+- 可按组（到期日、标的）分段排序，组内查询只在该组的有序段上 searchsorted
+- NaN 值与缺失组标签不进入索引，查询结果与布尔掩码 (x >= lo) & (x <= hi) 一致
+- positions() 返回按行号升序的行位置（与布尔掩码筛选的行顺序相同），mask() 返回等价的布尔掩码
+"""
+
+import numpy as np
+import pandas as pd
+
+ALL_GROUPS = object()
+
+
+class BandIndex:
+    """
+    单列的有序区间索引
+    values: (n,) 数值；groups: (n,) 分组标签（如到期日），缺省为不分组
+    """
+
+    __slots__ = ('n', 'order', 'sorted_values', 'segments')
+
+    def __init__(self, values, groups=None):
+        values = np.asarray(values, dtype=float)
+        self.n = len(values)
+        rows = np.flatnonzero(~np.isnan(values))
+        if groups is None:
+            self.order = rows[np.argsort(values[rows], kind='stable')]
+            self.segments = {None: (0, len(self.order))}
+        else:
+            codes, labels = pd.factorize(np.asarray(groups), sort=True)
+            rows = rows[codes[rows] >= 0]
+            self.order = rows[np.lexsort((values[rows], codes[rows]))]
+            bounds = np.searchsorted(codes[self.order], np.arange(len(labels) + 1))
+            self.segments = {label: (int(bounds[i]), int(bounds[i + 1])) for i, label in enumerate(labels)}
+        self.sorted_values = values[self.order]
+
+    def __len__(self):
+        return self.n
+
+    @property
+    def groups(self):
+        """分组标签（升序）；不分组时为 [None]"""
+        return list(self.segments)
+
+    def _spans(self, lo, hi, group):
+        """命中区间在 order 中的 (起点, 终点) 列表"""
+        if group is ALL_GROUPS:
+            segments = self.segments.values()
+        elif group in self.segments:
+            segments = [self.segments[group]]
+        else:
+            return []
+        spans = []
+        for start, end in segments:
+            block = self.sorted_values[start:end]
+            a = start + int(np.searchsorted(block, lo, side='left'))
+            b = start + int(np.searchsorted(block, hi, side='right'))
+            if b > a:
+                spans.append((a, b))
+        return spans
+
+    def _mask(self, spans):
+        mask = np.zeros(self.n, dtype=bool)
+        for a, b in spans:
+            mask[self.order[a:b]] = True
+        return mask
+
+    def positions(self, lo, hi, group=ALL_GROUPS):
+        """lo <= x <= hi 的行位置（升序）；group 为分组标签时只查询该组"""
+        spans = self._spans(lo, hi, group)
+        if not spans:
+            return np.array([], dtype=np.intp)
+        if sum(b - a for a, b in spans) * 16 > self.n:
+            # 命中行较多时置位后取非零位置（O(n)）比排序命中行（O(m log m)）快
+            return np.flatnonzero(self._mask(spans))
+        return np.sort(np.concatenate([self.order[a:b] for a, b in spans]))
+
+    def mask(self, lo, hi, group=ALL_GROUPS):
+        """与 positions() 等价的 (n,) 布尔掩码"""
+        return self._mask(self._spans(lo, hi, group))
+
+    def count(self, lo, hi, group=ALL_GROUPS):
+        """区间内的行数（不取出行位置）"""
+        return sum(b - a for a, b in self._spans(lo, hi, group))
+
+
+def band_positions(index, bands, group=ALL_GROUPS):
+    """
+    批量查询：bands 为 {名称: (下限, 上限)}（上下限顺序不限），返回 {名称: 行位置}
+    """
+    return {name: index.positions(min(band), max(band), group) for name, band in bands.items()}
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+期权链CSV的列式缓存
+每个CSV只在首次读取（或文件变化）时执行清洗，结果以未压缩 Feather (Arrow IPC) 文件
+保存在CSV同目录的 .chain_cache/ 下；之后的运行通过内存映射直接读取已清洗的数据。
+缓存键由 文件路径 + 修改时间 + 文件大小 + 清洗标签 组成，任何一项变化都会重新生成。
+"""
+
+import hashlib
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow 为可选依赖，缺失时每次都从CSV清洗
+    feather = None
+
+CACHE_DIR_NAME = '.chain_cache'
+
+# 缓存格式版本，清洗逻辑不兼容变更时递增即可让旧缓存失效
+CACHE_VERSION = 1
+
+
+def cache_key(csv_path, tag):
+    """
+    计算CSV文件的缓存键
+    """
+    stat = os.stat(csv_path)
+    raw = f"{os.path.abspath(csv_path)}|{stat.st_mtime_ns}|{stat.st_size}|{tag}|{CACHE_VERSION}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def cache_path(csv_path, tag, cache_dir=None):
+    """
+    返回CSV文件对应的缓存文件路径
+    """
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_path)), CACHE_DIR_NAME)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{stem}.{tag}.{cache_key(csv_path, tag)}.feather")
+
+
+def _remove_stale(path):
+    """
+    删除同一CSV、同一标签的旧缓存文件
+    """
+    cache_dir = os.path.dirname(path)
+    prefix = os.path.basename(path).rsplit('.', 2)[0] + '.'
+    for name in os.listdir(cache_dir):
+        if name.startswith(prefix) and name.endswith('.feather') and name != os.path.basename(path):
+            try:
+                os.remove(os.path.join(cache_dir, name))
+            except OSError:
+                pass
+
+
+def _write_cache(df, path):
+    """
+    原子写入缓存文件；数据无法序列化时放弃缓存并返回False
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        # 不压缩，读取时才能直接内存映射而无需解压
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        print(f"警告: 无法写入缓存 {os.path.basename(path)}: {str(e)}")
+        return False
+    _remove_stale(path)
+    return True
+
+
+def load_chain(csv_path, prepare, tag, cache_dir=None, use_cache=True):
+    """
+    读取期权链CSV并返回清洗后的DataFrame
+    prepare: 清洗函数，接收原始DataFrame返回清洗结果（仅在缓存未命中时调用）
+    tag: 清洗逻辑标识，不同脚本/不同清洗方式使用不同标签，互不覆盖
+    """
+    if feather is None or not use_cache:
+        return prepare(pd.read_csv(csv_path)).reset_index(drop=True)
+
+    path = cache_path(csv_path, tag, cache_dir)
+    if os.path.exists(path):
+        try:
+            return feather.read_table(path, memory_map=True).to_pandas()
+        except Exception as e:
+            print(f"警告: 缓存 {os.path.basename(path)} 读取失败，重新生成: {str(e)}")
+
+    df = prepare(pd.read_csv(csv_path)).reset_index(drop=True)
+    _write_cache(df, path)
+    return df
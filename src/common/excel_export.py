@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+带颜色标记的 Excel 批量导出
+- 优先使用 xlsxwriter（constant_memory 流式写入）：每行一次 write_row，整行使用预建的行格式
+- 未安装 xlsxwriter 时退回 openpyxl write-only 模式：普通行直接 append，仅高亮行创建带样式的单元格
+- TopRank 列的金/银/铜高亮以条件格式规则表达，不逐单元格判断
+行的高亮类别由 Recommendation 列一次向量化计算，与 CSV 中的「颜色标记」说明一致。
+"""
+
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+
+# xlsxwriter 为可选依赖，只在写 Excel 时导入（只输出 CSV 的运行不付出导入开销）
+HAS_XLSXWRITER = find_spec("xlsxwriter") is not None
+
+# 行高亮类别 → 背景色
+HIGHLIGHT_COLORS = {
+    "delta": "#90EE90",    # 浅绿色 - Delta/Theta
+    "gamma": "#87CEEB",    # 天蓝色 - Gamma/Theta
+    "vega": "#FFB6C1",     # 粉色 - Vega/Theta
+    "double": "#DDA0DD",   # 紫色 - 两种推荐
+    "triple": "#FFD700",   # 金色 - 三种推荐
+}
+
+# TopRank 列条件格式（仅着色该列，避免覆盖整行配色）
+TOP_RANK_COLORS = {
+    "Top1": "#FFD700",     # 金
+    "Top2": "#C0C0C0",     # 银
+    "Top3": "#CD7F32",     # 铜
+}
+
+COLOR_MARKS = {
+    "triple": "🟡 金色标记 (Delta+Gamma+Vega三优)",
+    "delta+gamma": "🟣 紫色标记 (Delta+Gamma双优)",
+    "delta+vega": "🟣 紫色标记 (Delta+Vega双优)",
+    "gamma+vega": "🟣 紫色标记 (Gamma+Vega双优)",
+    "delta": "🟢 绿色标记 (Delta/Theta优)",
+    "gamma": "🔵 蓝色标记 (Gamma/Theta优)",
+    "vega": "🩷 粉色标记 (Vega/Theta优)",
+    "": "⚪ 普通",
+}
+
+
+def _flags(recommendation):
+    rec = pd.Series(recommendation).astype(str)
+    return (rec.str.contains("Delta/Theta", regex=False).to_numpy(),
+            rec.str.contains("Gamma/Theta", regex=False).to_numpy(),
+            rec.str.contains("Vega/Theta", regex=False).to_numpy())
+
+
+def row_highlight(recommendation):
+    """
+    每行的高亮类别：triple / double / delta / gamma / vega，未推荐为空字符串
+    """
+    d, g, v = _flags(recommendation)
+    hits = d.astype(int) + g + v
+    return np.select(
+        [hits >= 3, hits == 2, d, g, v],
+        ["triple", "double", "delta", "gamma", "vega"],
+        default="",
+    ).astype(object)
+
+
+def color_marks(recommendation):
+    """
+    CSV 中的「颜色标记」说明文字
+    """
+    d, g, v = _flags(recommendation)
+    key = np.select(
+        [d & g & v, d & g, d & v, g & v, d, g, v],
+        ["triple", "delta+gamma", "delta+vega", "gamma+vega", "delta", "gamma", "vega"],
+        default="",
+    )
+    return pd.Series(key).map(COLOR_MARKS).to_numpy()
+
+
+def excel_engine(preferred=None):
+    """
+    选择导出引擎：preferred 为 'xlsxwriter' 或 'openpyxl'，None 时自动选择
+    """
+    if preferred == "openpyxl" or (preferred is None and not HAS_XLSXWRITER):
+        return "openpyxl"
+    if not HAS_XLSXWRITER:
+        raise ImportError("未安装 xlsxwriter，请 pip install xlsxwriter 或改用 openpyxl")
+    return "xlsxwriter"
+
+
+def _cell_values(df):
+    """
+    转换为可直接写入的 Python 对象：NaN/NaT → None，±inf → 'inf'/'-inf'（与 DataFrame.to_excel 一致）
+    """
+    values = df.astype(object).to_numpy()
+    values[pd.isna(df).to_numpy()] = None
+    for j, dtype in enumerate(df.dtypes):
+        if pd.api.types.is_float_dtype(dtype):
+            col = df.iloc[:, j].to_numpy(dtype=float)
+            inf = np.isinf(col)
+            if inf.any():
+                values[inf, j] = np.where(col[inf] > 0, "inf", "-inf")
+    return values
+
+
+def _write_xlsxwriter(df, path, sheet_name, highlight, top_rank_col):
+    import xlsxwriter
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    worksheet = workbook.add_worksheet(sheet_name)
+
+    base = {"border": 1}
+    date_cols = [j for j, dtype in enumerate(df.dtypes) if pd.api.types.is_datetime64_any_dtype(dtype)]
+    formats = {}
+    for key in [""] + list(HIGHLIGHT_COLORS):
+        props = dict(base)
+        if key:
+            props.update(bold=True, bg_color=HIGHLIGHT_COLORS[key], pattern=1)
+        formats[key] = workbook.add_format(props)
+        formats[key, "date"] = workbook.add_format(dict(props, num_format="yyyy-mm-dd hh:mm:ss"))
+    header_fmt = workbook.add_format({"bold": True, "border": 1, "align": "center"})
+
+    worksheet.write_row(0, 0, [str(c) for c in df.columns], header_fmt)
+    values = _cell_values(df)
+    for i, (row, key) in enumerate(zip(values, highlight), start=1):
+        worksheet.write_row(i, 0, row.tolist(), formats[key])
+        for j in date_cols:
+            if row[j] is not None:
+                worksheet.write_datetime(i, j, row[j].to_pydatetime(), formats[key, "date"])
+
+    if top_rank_col in df.columns and len(df) > 0:
+        col = df.columns.get_loc(top_rank_col)
+        for label, color in TOP_RANK_COLORS.items():
+            worksheet.conditional_format(1, col, len(df), col, {
+                "type": "cell", "criteria": "==", "value": f'"{label}"',
+                "format": workbook.add_format({"bold": True, "bg_color": color, "pattern": 1}),
+            })
+    workbook.close()
+
+
+def _write_openpyxl(df, path, sheet_name, highlight, top_rank_col):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.formatting.rule import CellIsRule, FormulaRule
+    from openpyxl.styles import Border, Font, PatternFill, Side
+    from openpyxl.utils import get_column_letter
+
+    thin = Side(style="thin")
+    thin_border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    bold_font = Font(bold=True)
+    fills = {key: PatternFill(start_color=c[1:], end_color=c[1:], fill_type="solid")
+             for key, c in HIGHLIGHT_COLORS.items()}
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_name)
+
+    def _styled(value, fill=None):
+        cell = WriteOnlyCell(worksheet, value=value)
+        cell.font = bold_font
+        cell.border = thin_border
+        if fill is not None:
+            cell.fill = fill
+        return cell
+
+    worksheet.append([_styled(str(c)) for c in df.columns])
+    values = _cell_values(df)
+    for row, key in zip(values, highlight):
+        row = [v.to_pydatetime() if isinstance(v, pd.Timestamp) else v for v in row.tolist()]
+        if key:
+            worksheet.append([_styled(v, fills[key]) for v in row])
+        else:
+            worksheet.append(row)
+
+    if len(df) > 0 and len(df.columns) > 0:
+        last = f"{get_column_letter(len(df.columns))}{len(df) + 1}"
+        # 所有单元格边框（条件格式，无需逐单元格设置）
+        worksheet.conditional_formatting.add(
+            f"A2:{last}", FormulaRule(formula=["TRUE"], border=thin_border))
+        if top_rank_col in df.columns:
+            letter = get_column_letter(df.columns.get_loc(top_rank_col) + 1)
+            for label, color in TOP_RANK_COLORS.items():
+                fill = PatternFill(start_color=color[1:], end_color=color[1:], fill_type="solid")
+                worksheet.conditional_formatting.add(
+                    f"{letter}2:{letter}{len(df) + 1}",
+                    CellIsRule(operator="equal", formula=[f'"{label}"'], fill=fill, font=bold_font))
+    workbook.save(path)
+
+
+def write_highlighted_excel(df, path, sheet_name="期权分析", highlight=None, top_rank_col="TopRank", engine=None):
+    """
+    导出带整行高亮与 TopRank 条件格式的 Excel，返回实际使用的引擎名
+    highlight: 每行的高亮类别（见 row_highlight），None 时由 Recommendation 列计算
+    """
+    if highlight is None:
+        highlight = row_highlight(df["Recommendation"]) if "Recommendation" in df.columns else np.full(len(df), "", dtype=object)
+    engine = excel_engine(engine)
+    if engine == "xlsxwriter":
+        _write_xlsxwriter(df, path, sheet_name, highlight, top_rank_col)
+    else:
+        _write_openpyxl(df, path, sheet_name, highlight, top_rank_col)
+    return engine
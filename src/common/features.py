@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+期权特征计算内核
+Greek/Theta 比率、Leverage、任意现货冲击下的泰勒近似 ROI，全部为 NumPy 数组表达式，
+无效输入通过显式掩码置为 NaN，不再逐行 apply + try/except。
+输入可以是 Series、数组或标量（标量会广播），返回 float64 数组。
+"""
+
+import numpy as np
+
+
+def _as_float(x):
+    return np.asarray(x, dtype=float)
+
+
+def greek_theta_ratios(delta, gamma, vega, theta):
+    """
+    计算 Delta/Theta、Gamma/Theta、Vega/Theta（分母取 |Theta|）
+    Theta 缺失或为 0 时比率为 NaN
+    """
+    abs_theta = np.abs(_as_float(theta))
+    valid = np.isfinite(abs_theta) & (abs_theta > 0)
+    denom = np.where(valid, abs_theta, np.nan)
+    return {
+        "Delta/Theta": _as_float(delta) / denom,
+        "Gamma/Theta": _as_float(gamma) / denom,
+        "Vega/Theta": _as_float(vega) / denom,
+    }
+
+
+def leverage(delta, spot, premium):
+    """
+    Leverage = |Delta| × S / Premium，仅当 Premium 与 S 都有效且 > 0
+    """
+    delta, spot, premium = np.broadcast_arrays(_as_float(delta), _as_float(spot), _as_float(premium))
+    valid = (premium > 0) & (spot > 0)   # NaN 比较结果为 False
+    out = np.full(delta.shape, np.nan)
+    out[valid] = np.abs(delta[valid]) * spot[valid] / premium[valid]
+    return out
+
+
+def taylor_roi(delta, gamma, spot, premium, shocks=0.10):
+    """
+    现货变动 shocks（相对比例，如 0.10 表示 +10%）时的二阶泰勒近似 ROI（假设 dIV=0）：
+        ROI = (Delta·dS + 0.5·Gamma·dS²) / Premium，dS = shock × S
+    Delta/Gamma 缺失按 0 处理；Premium ≤ 0 或缺失、S 缺失时为 NaN
+    shocks 为标量时返回 (n,)，为序列时返回 (n, 冲击数)
+    """
+    delta, gamma, spot, premium = np.broadcast_arrays(
+        np.nan_to_num(np.atleast_1d(_as_float(delta)), nan=0.0),
+        np.nan_to_num(np.atleast_1d(_as_float(gamma)), nan=0.0),
+        _as_float(spot), _as_float(premium))
+    shocks_arr = _as_float(shocks)
+    scalar = shocks_arr.ndim == 0
+
+    valid = (premium > 0) & np.isfinite(spot)
+    d_s = spot[:, None] * np.atleast_1d(shocks_arr)[None, :]
+    pnl = delta[:, None] * d_s + 0.5 * gamma[:, None] * d_s ** 2
+    roi = np.full(pnl.shape, np.nan)
+    roi[valid] = pnl[valid] / premium[valid, None]
+    return roi[:, 0] if scalar else roi
+
+
+def roi_column_name(shock):
+    """冲击比例对应的列名，例如 0.10 → 'ROI@S+10%'，-0.05 → 'ROI@S-5%'"""
+    return f"ROI@S{shock * 100:+g}%"
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+向量化隐含波动率求解（Black-76 反解）
+整条期权链的买价 / 卖价 / 标记价一次求解：
+- 初值取 Brenner-Subrahmanyam 近似 σ ≈ √(2π/T) · 价格 / F
+- 实值期权按平价关系换成虚值期权，只对时间价值求解
+- 每行维护 [下界, 上界] 区间，Newton 步长越界或 Vega 过小时退回二分
+- 已收敛的行移出活动集，后续迭代只计算未收敛的行
+价格违反无套利边界（低于内在价值或高于上限）、到期时间 ≤ 0 的行结果为 NaN。
+"""
+
+import numpy as np
+import pandas as pd
+
+from common.pricing import EXPIRY_HOUR_UTC, is_call_mask, norm_cdf, norm_pdf, year_fraction
+
+SOLVER_DEFAULTS = {
+    'tol': 1e-8,            # 时间价值的相对误差容限
+    'max_iter': 50,
+    'vol_bounds': (1e-4, 5.0),
+}
+
+
+def _price_vega(forward, strike, t, vol, sign):
+    """未贴现 Black-76 价格与 Vega（波动率变动 1.0 的价格变化）"""
+    sqrt_t = np.sqrt(t)
+    sig_sqrt_t = vol * sqrt_t
+    d1 = (np.log(forward / strike) + 0.5 * sig_sqrt_t * sig_sqrt_t) / sig_sqrt_t
+    d2 = d1 - sig_sqrt_t
+    price = sign * (forward * norm_cdf(sign * d1) - strike * norm_cdf(sign * d2))
+    return price, forward * norm_pdf(d1) * sqrt_t
+
+
+def implied_vol(price, forward, strike, t, is_call, rate=0.0, tol=None, max_iter=None, vol_bounds=None):
+    """
+    由期权价格反解隐含波动率（小数形式），全部输入可广播
+    返回 (iv, converged)：converged 为每行是否收敛；未收敛或无解的行 iv 为 NaN
+    """
+    tol = SOLVER_DEFAULTS['tol'] if tol is None else tol
+    max_iter = SOLVER_DEFAULTS['max_iter'] if max_iter is None else max_iter
+    vol_lo, vol_hi = SOLVER_DEFAULTS['vol_bounds'] if vol_bounds is None else vol_bounds
+
+    price, forward, strike, t, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(forward, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(t, dtype=float), np.asarray(is_call, dtype=bool))
+    shape = price.shape
+    price, forward, strike, t, is_call = (a.ravel() for a in (price, forward, strike, t, is_call))
+
+    sign = np.where(is_call, 1.0, -1.0)
+    with np.errstate(invalid='ignore', over='ignore'):
+        undiscounted = price * np.exp(rate * t)
+    intrinsic = np.maximum(sign * (forward - strike), 0.0)
+    upper = np.where(is_call, forward, strike)
+    # 实值期权按平价关系换成对应的虚值期权（只剩时间价值），避免 Vega 过小导致的病态
+    time_value = undiscounted - intrinsic
+    sign = np.where(intrinsic > 0, -sign, sign)
+    # NaN 比较结果为 False，缺失输入自动排除；时间价值低于浮点精度的行无法确定波动率
+    valid = ((forward > 0) & (strike > 0) & (t > 0) & (undiscounted < upper)
+             & (time_value > 1e-12 * np.maximum(forward, strike)))
+
+    iv = np.full(price.shape, np.nan)
+    converged = np.zeros(price.shape, dtype=bool)
+    idx = np.flatnonzero(valid)
+    f, k, tt, target, sg = forward[idx], strike[idx], t[idx], time_value[idx], sign[idx]
+    lo = np.full(len(idx), vol_lo)
+    hi = np.full(len(idx), vol_hi)
+    sig = np.clip(np.sqrt(2.0 * np.pi / tt) * target / f, vol_lo * 2, vol_hi / 2)
+
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        for _ in range(max_iter):
+            if len(idx) == 0:
+                break
+            model, vega = _price_vega(f, k, tt, sig, sg)
+            diff = model - target
+            done = np.abs(diff) <= tol * target
+
+            # 价格随波动率单调递增：按误差符号收缩区间
+            hi = np.where(diff > 0, sig, hi)
+            lo = np.where(diff < 0, sig, lo)
+            # 区间已缩至数值精度：位于边界内视为收敛，贴住 vol_bounds 说明目标价格超出可达范围
+            collapsed = (hi - lo) <= 1e-12 * hi
+            done |= collapsed & (lo > vol_lo) & (hi < vol_hi)
+            iv[idx[done]] = sig[done]
+            converged[idx[done]] = True
+
+            newton = sig - diff / vega
+            use_bisect = ~np.isfinite(newton) | (newton <= lo) | (newton >= hi)
+            sig = np.where(use_bisect, 0.5 * (lo + hi), newton)
+
+            keep = ~done & ~collapsed
+            idx, f, k, tt, target, sg, lo, hi, sig = (
+                a[keep] for a in (idx, f, k, tt, target, sg, lo, hi, sig))
+
+    return iv.reshape(shape), converged.reshape(shape)
+
+
+def chain_implied_vols(prices, strike, expiry, option_type, spot, coin=True, valuation_time=None,
+                       expiry_hour=EXPIRY_HOUR_UTC, **solver_kwargs):
+    """
+    整条期权链多个价格列的隐含波动率
+    prices: 名称 → 价格序列（例如 {'bid': 买价, 'ask': 卖价, 'mark': 标记}）；
+    coin=True 表示价格为币本位，按现货价换算为美元后求解
+    返回 DataFrame：每个名称一列 '<名称>_iv'（小数形式），以及 'mid_iv' = 买卖 IV 均值（二者都有时）
+    """
+    t = year_fraction(expiry, valuation_time, expiry_hour)
+    is_call = is_call_mask(option_type)
+    spot = np.asarray(spot, dtype=float)
+    out = {}
+    for name, values in prices.items():
+        values = pd.to_numeric(pd.Series(np.asarray(values)), errors='coerce').to_numpy(dtype=float)
+        usd = values * spot if coin else values
+        out[f'{name}_iv'], _ = implied_vol(usd, spot, strike, t, is_call, **solver_kwargs)
+    out = pd.DataFrame(out)
+    if {'bid_iv', 'ask_iv'} <= set(out.columns):
+        out['mid_iv'] = (out['bid_iv'] + out['ask_iv']) / 2
+    return out
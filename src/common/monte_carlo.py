@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""
+蒙特卡洛对冲效果模拟
+在同一组标的价格路径上评估多个期权策略（common/payoff.py 表示）到期时的盈亏，
+并与"只持有现货"对比尾部损失：
+
+- 路径模型：gbm（几何布朗运动）、jump（Merton 跳跃扩散）、bootstrap（历史日对数收益有放回重抽样）
+- 路径只在各策略的到期日（按天数）取值；相邻到期日之间的波动率由 ATM 隐含波动率的总方差
+  差分得到（期限结构），同一条路径依次经过全部到期日，所有策略共用同一批路径
+- 路径按 chunk_size 分块生成与评估，每块只返回汇总量（和、平方和、计数、最差的 k 个值），
+  内存与路径总数无关；块较多时在进程池中并行
+- 每块的随机数由 SeedSequence(seed, spawn_key=(块序号,)) 派生，结果与进程数、执行顺序无关，
+  固定 seed 可完全复现
+
+指标（每份策略对冲 hedge_units 个现货）：
+- expected_pnl / pnl_std：策略到期盈亏的均值与标准差
+- hit_rate：策略盈亏 > 0 的比例；itm_rate：策略到期有正的赔付（内在价值）的比例
+- unhedged_cvar / hedged_cvar：只持有现货、现货 + 策略在 tail_quantile 尾部的平均损失（正数）
+- tail_loss_reduction = 1 - hedged_cvar / unhedged_cvar
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from common.payoff import expiry_pnl
+from common.pricing import DAYS_PER_YEAR
+
+SIMULATION_DEFAULTS = {
+    'model': 'gbm',              # gbm / jump / bootstrap
+    'n_paths': 100_000,          # 路径总数
+    'chunk_size': 20_000,        # 每块路径数
+    'seed': 42,                  # 随机种子（固定则结果可复现）
+    'drift': 0.0,                # 年化漂移 μ（0 为风险中性、零利率）
+    'jump_intensity': 2.0,       # jump：每年平均跳跃次数
+    'jump_mean': -0.05,          # jump：单次跳跃对数幅度的均值
+    'jump_std': 0.10,            # jump：单次跳跃对数幅度的标准差
+    'tail_quantile': 0.05,       # CVaR 尾部比例
+    'hedge_units': 1.0,          # 每份策略对冲的现货数量
+    'max_workers': None,         # 进程池大小（None为CPU核数，1为不启用进程池）
+    'parallel_min_paths': 500_000,   # 路径总数达到该值时才启用进程池
+}
+
+SIMULATION_COLUMNS = [
+    'expected_pnl', 'pnl_std', 'hit_rate', 'itm_rate',
+    'unhedged_cvar', 'hedged_cvar', 'tail_loss_reduction',
+]
+
+MODELS = ('gbm', 'jump', 'bootstrap')
+
+
+def interval_vols(days, vols):
+    """
+    各到期日（天数升序）之间的远期波动率：总方差 σ²·t 的差分，倒挂时按 0 处理
+    """
+    t = np.asarray(days, dtype=float) / DAYS_PER_YEAR
+    total = np.maximum.accumulate(np.asarray(vols, dtype=float) ** 2 * t)
+    dt = np.diff(np.r_[0.0, t])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(np.where(dt > 0, np.diff(np.r_[0.0, total]) / dt, 0.0))
+
+
+def simulate_prices(spot, days, vols, n_paths, rng, config, returns=None):
+    """
+    生成 n_paths 条路径在各到期日（days 升序）的标的价格，形状 (n_paths, len(days))
+    returns 为 bootstrap 模型使用的历史日对数收益
+    """
+    model = config['model']
+    mu = config['drift']
+    log_s = np.full(n_paths, np.log(spot))
+    out = np.empty((n_paths, len(days)))
+    prev = 0
+    if model == 'bootstrap':
+        returns = np.asarray(returns, dtype=float)
+        # 去掉历史均值，改用配置的漂移（与 gbm/jump 的期望一致）
+        daily = returns - returns.mean()
+        daily_drift = mu / DAYS_PER_YEAR - 0.5 * daily.var()
+    for h, (d, sigma) in enumerate(zip(days, vols)):
+        n_days = int(d) - prev
+        dt = n_days / DAYS_PER_YEAR
+        if model == 'bootstrap':
+            for _ in range(n_days):
+                log_s += daily[rng.integers(len(daily), size=n_paths)]
+            log_s += daily_drift * n_days
+        else:
+            log_s += (mu - 0.5 * sigma * sigma) * dt + sigma * np.sqrt(dt) * rng.standard_normal(n_paths)
+            if model == 'jump':
+                lam, jm, js = config['jump_intensity'], config['jump_mean'], config['jump_std']
+                # 跳跃补偿项保证 E[S_T] 不受跳跃影响
+                kappa = np.exp(jm + 0.5 * js * js) - 1
+                n_jumps = rng.poisson(lam * dt, size=n_paths)
+                log_s += n_jumps * jm + np.sqrt(n_jumps) * js * rng.standard_normal(n_paths) - lam * kappa * dt
+        out[:, h] = np.exp(log_s)
+        prev = int(d)
+    return out
+
+
+def _worst(values, k):
+    """每行最小的 k 个值（不排序），形状 (n, min(k, 列数))"""
+    if values.shape[1] <= k:
+        return values
+    return np.partition(values, k - 1, axis=1)[:, :k]
+
+
+def _simulate_chunk(chunk_id, n_paths, spot, days, vols, legs, horizon, k_tail, config, returns):
+    """
+    一块路径的汇总量（进程池工作函数）
+    horizon: 每个策略对应的到期日在 days 中的位置
+    """
+    rng = np.random.default_rng(np.random.SeedSequence(config['seed'], spawn_key=(chunk_id,)))
+    prices = simulate_prices(spot, days, vols, n_paths, rng, config, returns)
+    spot_pnl = config['hedge_units'] * (prices - spot)          # (n_paths, H)
+
+    pnl = np.empty((len(horizon), n_paths))
+    for h in np.unique(horizon):
+        rows = np.flatnonzero(horizon == h)
+        pnl[rows] = expiry_pnl({key: legs[key][rows] for key in ('strike', 'is_call', 'qty', 'premium',
+                                                                  'stock', 'spot')}, prices[:, h])
+    hedged = pnl + spot_pnl[:, horizon].T
+    premium = legs['premium'][:, None]
+    return {
+        'count': n_paths,
+        'sum': pnl.sum(axis=1),
+        'sumsq': (pnl * pnl).sum(axis=1),
+        'hits': (pnl > 0).sum(axis=1),
+        'itm': (pnl + premium > 1e-12).sum(axis=1),
+        'hedged_tail': _worst(hedged, k_tail),
+        'spot_tail': _worst(spot_pnl.T, k_tail),
+    }
+
+
+def _merge(total, part, k_tail):
+    if total is None:
+        return part
+    merged = {key: total[key] + part[key] for key in ('count', 'sum', 'sumsq', 'hits', 'itm')}
+    for key in ('hedged_tail', 'spot_tail'):
+        merged[key] = _worst(np.concatenate([total[key], part[key]], axis=1), k_tail)
+    return merged
+
+
+def resolve_config(config=None):
+    config = {**SIMULATION_DEFAULTS, **(config or {})}
+    if config['model'] not in MODELS:
+        raise ValueError(f"不支持的路径模型: {config['model']}（可选: {', '.join(MODELS)}）")
+    return config
+
+
+def simulate_hedges(legs, spot, atm_vols, config=None, returns=None):
+    """
+    在同一批路径上评估全部策略
+    legs: common.payoff.stack_strategies 的结果（需含 days 到期天数）
+    atm_vols: {到期天数: ATM 隐含波动率（小数）}，用于生成各到期日之间的波动率
+    returns: bootstrap 模型的历史日对数收益数组
+    返回与策略顺序一致的 DataFrame（SIMULATION_COLUMNS）
+    """
+    config = resolve_config(config)
+    if config['model'] == 'bootstrap' and (returns is None or len(returns) < 2):
+        raise ValueError("bootstrap 模型需要历史日收益数据")
+    n = len(legs['premium'])
+    if n == 0:
+        return pd.DataFrame(columns=SIMULATION_COLUMNS)
+
+    days = np.unique(legs['days'].astype(int))
+    vol_days = np.array(sorted(atm_vols), dtype=float)
+    vol_values = np.array([atm_vols[d] for d in sorted(atm_vols)], dtype=float)
+    if days[0] <= 0:
+        raise ValueError("策略到期天数必须大于 0")
+    # 缺少某到期日的 ATM 波动率时按总方差线性插值，两端按平坦波动率外推
+    total_var = np.interp(days, vol_days, vol_values ** 2 * vol_days / DAYS_PER_YEAR)
+    vols = np.sqrt(total_var / (days / DAYS_PER_YEAR))
+    vols = np.where(days < vol_days[0], vol_values[0], np.where(days > vol_days[-1], vol_values[-1], vols))
+    vols = interval_vols(days, vols)
+    horizon = np.searchsorted(days, legs['days'].astype(int))
+
+    n_paths, chunk_size = int(config['n_paths']), int(config['chunk_size'])
+    k_tail = max(1, int(np.ceil(config['tail_quantile'] * n_paths)))
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    tasks = [(i, size, spot, days, vols, legs, horizon, k_tail, config, returns) for i, size in enumerate(sizes)]
+
+    total = None
+    use_pool = len(tasks) > 1 and config['max_workers'] != 1 and n_paths >= config['parallel_min_paths']
+    if use_pool:
+        with ProcessPoolExecutor(max_workers=config['max_workers']) as executor:
+            futures = [executor.submit(_simulate_chunk, *task) for task in tasks]
+            for future in futures:
+                total = _merge(total, future.result(), k_tail)
+    else:
+        for task in tasks:
+            total = _merge(total, _simulate_chunk(*task), k_tail)
+
+    count = total['count']
+    mean = total['sum'] / count
+    hedged_cvar = -total['hedged_tail'].mean(axis=1)
+    unhedged_cvar = -total['spot_tail'].mean(axis=1)[horizon]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reduction = np.where(unhedged_cvar > 0, 1 - hedged_cvar / unhedged_cvar, np.nan)
+    return pd.DataFrame({
+        'expected_pnl': mean,
+        'pnl_std': np.sqrt(np.maximum(total['sumsq'] / count - mean * mean, 0.0)),
+        'hit_rate': total['hits'] / count,
+        'itm_rate': total['itm'] / count,
+        'unhedged_cvar': unhedged_cvar,
+        'hedged_cvar': hedged_cvar,
+        'tail_loss_reduction': reduction,
+    })
+
+
+def log_returns(prices):
+    """价格序列（按时间升序）的对数收益"""
+    prices = np.asarray(prices, dtype=float)
+    prices = prices[np.isfinite(prices) & (prices > 0)]
+    return np.diff(np.log(prices))
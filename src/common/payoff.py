@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""
+策略盈亏曲线（向量化）
+任意期权策略表示为等长数组：行权价、期权类型（C/P）、带方向的数量（+买 / -卖），
+外加现货持仓数量与净权利金（支出为正）。多个策略按最大腿数补齐（数量为 0 的空腿）
+堆叠为 (策略数, 腿数) 矩阵，在价格网格上一次广播得到 (策略数, 价格点数) 的盈亏：
+
+- 到期盈亏：各腿内在价值 × 数量之和 + 现货盈亏 - 净权利金
+- 到期前盈亏：各腿按 Black-76（common/pricing.py）以剩余期限与各腿IV重新定价
+
+盈亏平衡点与最大盈亏由求值后的曲线数值求得（相邻价格点之间线性插值求零点），
+适用于任意结构，不需要为每种策略单独推导公式。
+"""
+
+import numpy as np
+
+from common.pricing import DAYS_PER_YEAR, black76
+
+
+def make_strategy(strikes, option_types, quantities, premium, stock=0.0, spot=None,
+                  ivs=None, days_to_expiration=None, label=None):
+    """
+    单个策略
+    strikes / option_types / quantities: 每条腿一个元素；ivs 为小数形式的各腿隐含波动率
+    premium: 净权利金（支出为正、收入为负）；stock: 持有现货数量，spot 为其建仓价格
+    ivs 与 days_to_expiration 只在计算到期前盈亏时需要
+    """
+    strikes = np.atleast_1d(np.asarray(strikes, dtype=float))
+    n_legs = len(strikes)
+    return {
+        'strike': strikes,
+        'is_call': np.array([str(t).upper() == 'C' for t in np.atleast_1d(option_types)], dtype=bool),
+        'qty': np.atleast_1d(np.asarray(quantities, dtype=float)),
+        'iv': np.full(n_legs, np.nan) if ivs is None else np.atleast_1d(np.asarray(ivs, dtype=float)),
+        'days': np.nan if days_to_expiration is None else float(days_to_expiration),
+        'premium': float(premium),
+        'stock': float(stock),
+        'spot': np.nan if spot is None else float(spot),
+        'label': label,
+    }
+
+
+def stack_strategies(strategies):
+    """
+    多个策略补齐到相同腿数并堆叠：strike / is_call / qty / iv 为 (n, L)，其余为 (n,)
+    空腿的数量为 0，不影响盈亏
+    """
+    n = len(strategies)
+    n_legs = max((len(s['strike']) for s in strategies), default=0)
+    stacked = {
+        'strike': np.zeros((n, n_legs)),
+        'is_call': np.zeros((n, n_legs), dtype=bool),
+        'qty': np.zeros((n, n_legs)),
+        'iv': np.full((n, n_legs), np.nan),
+    }
+    for i, strategy in enumerate(strategies):
+        m = len(strategy['strike'])
+        for key in ('strike', 'is_call', 'qty', 'iv'):
+            stacked[key][i, :m] = strategy[key]
+    for key in ('days', 'premium', 'stock', 'spot'):
+        stacked[key] = np.array([s[key] for s in strategies], dtype=float)
+    stacked['label'] = [s['label'] for s in strategies]
+    return stacked
+
+
+def price_grid(legs, spot, points=1001, padding=0.2):
+    """
+    覆盖全部行权价与现货价的价格网格，两端各留出 padding 比例
+    """
+    strikes = np.asarray(legs['strike'], dtype=float)[np.asarray(legs['qty']) != 0]
+    lo = min(np.min(strikes, initial=spot), spot) * (1 - padding)
+    hi = max(np.max(strikes, initial=spot), spot) * (1 + padding)
+    return np.linspace(max(lo, 0.0), hi, points)
+
+
+def _column(values):
+    """标量或 (n,) 数组转为 (n, 1)，与 (n, m) 盈亏矩阵广播"""
+    return np.reshape(np.asarray(values, dtype=float), (-1, 1))
+
+
+def _grid(prices):
+    prices = np.asarray(prices, dtype=float)
+    return prices[None, :] if prices.ndim == 1 else prices
+
+
+def expiry_pnl(legs, prices):
+    """
+    到期盈亏矩阵 (n, m)
+    legs: stack_strategies 的结果（或同样键的 (n, L) 数组字典）
+    prices: 共用的 (m,) 价格网格，或每个策略各自的 (n, m) 价格点
+    """
+    grid = _grid(prices)
+    strike = np.asarray(legs['strike'], dtype=float)[:, None, :]
+    sign = np.where(legs['is_call'], 1.0, -1.0)[:, None, :]
+    qty = np.asarray(legs['qty'], dtype=float)[:, None, :]
+    intrinsic = np.maximum(sign * (grid[..., None] - strike), 0.0)
+    pnl = (qty * intrinsic).sum(axis=-1) - _column(legs['premium'])
+    stock = _column(legs['stock'])
+    if np.any(stock != 0):
+        pnl = pnl + stock * (grid - np.nan_to_num(_column(legs['spot'])))
+    return pnl
+
+
+def pre_expiry_pnl(legs, prices, elapsed_days=0.0, iv_shift=0.0):
+    """
+    到期前盈亏矩阵 (n, m)：经过 elapsed_days 天后、标的价格为网格价格时按 Black-76 重新定价
+    iv_shift 为各腿IV的平移量（小数，如 0.05 表示上升 5 个百分点）；剩余期限 ≤ 0 的策略按到期盈亏计算
+    """
+    grid = _grid(prices)
+    t_left = (np.asarray(legs['days'], dtype=float) - elapsed_days) / DAYS_PER_YEAR
+    qty = np.asarray(legs['qty'], dtype=float)[:, None, :]
+    model = black76(grid[..., None], np.asarray(legs['strike'], dtype=float)[:, None, :],
+                    t_left[:, None, None], np.asarray(legs['iv'], dtype=float)[:, None, :] + iv_shift,
+                    np.asarray(legs['is_call'], dtype=bool)[:, None, :])
+    value = np.where(qty != 0, qty * model['price'], 0.0).sum(axis=-1)
+    pnl = value - _column(legs['premium'])
+    stock = _column(legs['stock'])
+    if np.any(stock != 0):
+        pnl = pnl + stock * (grid - np.nan_to_num(_column(legs['spot'])))
+    expired = _column(t_left) <= 0
+    if expired.any():
+        pnl = np.where(expired, expiry_pnl(legs, prices), pnl)
+    return pnl
+
+
+def breakevens(prices, pnl):
+    """
+    每条盈亏曲线的盈亏平衡点（盈亏由 ≤0 变为 >0 或反之的位置，线性插值），返回数组列表
+    """
+    pnl = np.atleast_2d(pnl)
+    grid = np.broadcast_to(_grid(prices), pnl.shape)
+    y0, y1 = pnl[:, :-1], pnl[:, 1:]
+    rows, cols = np.nonzero((y0 > 0) != (y1 > 0))
+    x0, x1 = grid[rows, cols], grid[rows, cols + 1]
+    a, b = y0[rows, cols], y1[rows, cols]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = np.where(a == b, x0, x0 + (x1 - x0) * a / (a - b))
+    keep = ~np.isnan(root)   # 曲线缺失（NaN）处不算穿越
+    rows, root = rows[keep], root[keep]
+    return np.split(root, np.searchsorted(rows, np.arange(1, len(pnl))))
+
+
+def curve_extremes(prices, pnl):
+    """
+    每条曲线在网格范围内的最大利润 / 最大亏损（正数）及对应价格，整条曲线缺失时为 NaN
+    返回 dict: max_profit / max_profit_price / max_loss / max_loss_price，均为 (n,)
+    """
+    pnl = np.atleast_2d(pnl)
+    grid = np.broadcast_to(_grid(prices), pnl.shape)
+    rows = np.arange(len(pnl))
+    missing = np.isnan(pnl)
+    valid = ~missing.all(axis=1)
+    hi = np.where(missing, -np.inf, pnl).argmax(axis=1)
+    lo = np.where(missing, np.inf, pnl).argmin(axis=1)
+    return {
+        'max_profit': np.where(valid, pnl[rows, hi], np.nan),
+        'max_profit_price': np.where(valid, grid[rows, hi], np.nan),
+        'max_loss': np.where(valid, -pnl[rows, lo], np.nan),
+        'max_loss_price': np.where(valid, grid[rows, lo], np.nan),
+    }
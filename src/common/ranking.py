@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+多键 Top-K 选择（不做全量排序）
+先用 argpartition 按主排序键找出候选行（第 k 名及与其并列的行全部保留），
+再只对候选行做一次多键 lexsort，结果与 DataFrame.sort_values(...).head(k) 一致：
+- 多个排序键按字典序比较，NaN 排在最后
+- 完全相同的行保持原行顺序（稳定）
+按组取 Top-K（每个到期日、每个策略区间）时，组编码排序为整数基数排序，
+每组的 argpartition 只处理本组的行，最后所有候选行一起做一次 lexsort。
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _as_keys(keys, ascending):
+    """排序键转为升序比较的 float 数组列表（降序键取负值）"""
+    if isinstance(keys, pd.Series) or (isinstance(keys, np.ndarray) and keys.ndim == 1):
+        keys = [keys]
+    keys = [np.asarray(key, dtype=float) for key in keys]
+    if isinstance(ascending, bool):
+        ascending = [ascending] * len(keys)
+    if len(ascending) != len(keys):
+        raise ValueError(f"ascending 长度 ({len(ascending)}) 与排序键数量 ({len(keys)}) 不一致")
+    return [key if asc else -key for key, asc in zip(keys, ascending)]
+
+
+def _candidates(primary, k):
+    """
+    主键（已转为升序比较，NaN 视为 +inf）前 k 名的候选位置：
+    不超过第 k 名取值的全部行，保证并列行都参与最终排序
+    """
+    if len(primary) <= k:
+        return np.arange(len(primary))
+    kth = np.partition(primary, k - 1)[k - 1]
+    return np.flatnonzero(primary <= kth)
+
+
+def top_k(keys, k, ascending=False, mask=None, groups=None, dropna=False):
+    """
+    多键 Top-K，返回行位置数组
+    keys: 一个或多个 (n,) 数组（主键在前）；ascending: 布尔值或与 keys 等长的列表，默认全部降序
+    mask: (n,) 布尔掩码，只在掩码内选择；dropna: 主键为 NaN 的行不参与（默认排在最后，与 nlargest 一致）
+    groups: (n,) 分组标签时每组各取 k 个，结果按组标签升序、组内按名次排列；标签缺失的行不参与
+    """
+    sort_keys = _as_keys(keys, ascending)
+    n = len(sort_keys[0])
+    rows = np.arange(n)
+    if mask is not None:
+        rows = rows[np.asarray(mask, dtype=bool)]
+    if dropna:
+        rows = rows[~np.isnan(sort_keys[0][rows])]
+    if k <= 0 or len(rows) == 0:
+        return np.array([], dtype=np.intp)
+
+    primary = sort_keys[0][rows]
+    primary = np.where(np.isnan(primary), np.inf, primary)
+
+    if groups is None:
+        rows = rows[_candidates(primary, k)]
+        order = np.lexsort([key[rows] for key in reversed(sort_keys)])
+        return rows[order[:k]]
+
+    codes, _ = pd.factorize(np.asarray(groups)[rows], sort=True)
+    valid = codes >= 0
+    rows, primary, codes = rows[valid], primary[valid], codes[valid]
+    # 组编码为小整数，稳定排序为线性时间的基数排序
+    by_group = np.argsort(codes, kind='stable')
+    bounds = np.flatnonzero(np.diff(codes[by_group])) + 1
+    cand = []
+    for seg in np.split(by_group, bounds):
+        if len(seg) > k:
+            seg = seg[_candidates(primary[seg], k)]
+        cand.append(seg)
+    cand = np.sort(np.concatenate(cand))   # 恢复原行顺序，保证并列时稳定
+    rows, codes = rows[cand], codes[cand]
+
+    order = np.lexsort([key[rows] for key in reversed(sort_keys)] + [codes])
+    rows, codes = rows[order], codes[order]
+    first = np.r_[0, np.flatnonzero(np.diff(codes)) + 1]
+    rank = np.arange(len(rows)) - np.repeat(first, np.diff(np.r_[first, len(rows)]))
+    return rows[rank < k]
+
+
+def top_k_frame(df, by, k, ascending=False, mask=None, group_col=None, dropna=False):
+    """
+    DataFrame 版本：等价于（按组）sort_values(by, ascending).head(k)，保留原索引
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    keys = [pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float) for col in by]
+    groups = None if group_col is None else df[group_col].to_numpy()
+    pos = top_k(keys, k, ascending=ascending,
+                mask=None if mask is None else np.asarray(mask, dtype=bool),
+                groups=groups, dropna=dropna)
+    return df.iloc[pos]
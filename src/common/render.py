@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+图表渲染子系统
+- 批处理模式（非交互终端、无显示环境或 OPTION_BATCH=1）强制使用 Agg 后端，不调用 plt.show()
+- 图表在进程池中渲染，主流程提交后立即继续分析，退出前统一等待
+- dpi 与输出格式（png / svg / webp）可配置
+- 以输入数据哈希为键缓存已渲染的图表：数据未变化时直接复制缓存文件，跳过重新渲染
+- matplotlib 只在真正渲染时导入（图表函数内调用 pyplot()），不绘图的运行不付出导入开销
+
+图表函数需定义在模块顶层（可被进程池序列化），签名为 func(output_file, dpi, *args, **kwargs)，
+只负责绘制并保存到 output_file。
+"""
+
+import hashlib
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+RENDER_DEFAULTS = {
+    'dpi': 150,                 # 输出分辨率
+    'format': 'png',            # png / svg / webp
+    'parallel': True,           # 是否在进程池中渲染
+    'max_workers': 2,           # 渲染进程数
+    'use_cache': True,          # 数据未变化时复用已渲染的图表
+    'cache_dir': '.render_cache',
+    'show': False,              # 交互模式下是否在主进程渲染并弹出窗口（批处理模式忽略）
+}
+
+SUPPORTED_FORMATS = ('png', 'svg', 'webp')
+
+
+def is_batch_mode():
+    """
+    判断是否为批处理模式：OPTION_BATCH=1、标准输出不是终端，或 Linux 下没有显示环境
+    """
+    if os.environ.get('OPTION_BATCH') == '1':
+        return True
+    if not sys.stdout.isatty():
+        return True
+    if sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        return True
+    return False
+
+
+def use_batch_backend(force=False):
+    """
+    批处理模式下切换到 Agg 后端，返回是否已切换
+    """
+    if force or is_batch_mode():
+        import matplotlib
+        matplotlib.use('Agg', force=True)
+        return True
+    return False
+
+
+def pyplot(fonts=None):
+    """
+    延迟导入 matplotlib.pyplot，fonts 为中文字体候选列表（设置 font.sans-serif 并关闭 unicode 负号）
+    """
+    import matplotlib.pyplot as plt
+    if fonts:
+        plt.rcParams['font.sans-serif'] = list(fonts)
+        plt.rcParams['axes.unicode_minus'] = False
+    return plt
+
+
+def _update_digest(h, obj):
+    """把图表输入逐项写入哈希"""
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        h.update(type(obj).__name__.encode())
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(obj.columns)).encode())
+        elif isinstance(obj, pd.Series):
+            h.update(repr(obj.name).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=not isinstance(obj, pd.Index)).to_numpy().tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"{obj.dtype}{obj.shape}".encode())
+        h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else repr(obj.tolist()).encode())
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _update_digest(h, item)
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=repr):
+            h.update(repr(key).encode())
+            _update_digest(h, obj[key])
+    else:
+        h.update(repr(obj).encode())
+
+
+def _update_code_digest(h, code):
+    """哈希函数字节码与常量（嵌套的代码对象递归处理，避免 repr 中的内存地址）"""
+    h.update(code.co_code)
+    for const in code.co_consts:
+        if hasattr(const, 'co_code'):
+            _update_code_digest(h, const)
+        else:
+            h.update(repr(const).encode())
+
+
+def chart_key(func, dpi, fmt, args, kwargs):
+    """
+    图表缓存键：图表函数（含代码）+ dpi + 格式 + 全部输入数据
+    """
+    h = hashlib.sha1()
+    h.update(f"{func.__module__}.{func.__qualname__}|{dpi}|{fmt}".encode())
+    code = getattr(func, '__code__', None)
+    if code is not None:
+        _update_code_digest(h, code)
+    _update_digest(h, args)
+    _update_digest(h, kwargs)
+    return h.hexdigest()[:16]
+
+
+def _render_job(func, output_file, dpi, args, kwargs):
+    """进程池中执行的渲染任务"""
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+    import matplotlib.pyplot as plt
+    try:
+        func(output_file, dpi, *args, **kwargs)
+    finally:
+        plt.close('all')
+    return output_file
+
+
+class ChartRenderer:
+    """
+    图表渲染器：submit() 提交图表（命中缓存时直接复制），close() 等待全部渲染完成
+    """
+
+    def __init__(self, config=None):
+        self.config = {**RENDER_DEFAULTS, **(config or {})}
+        self.format = str(self.config['format']).lower()
+        if self.format not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支持的图表格式: {self.format}（可选: {', '.join(SUPPORTED_FORMATS)}）")
+        self.batch = is_batch_mode()
+        self.show = bool(self.config['show']) and not self.batch
+        self._pool = None
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def output_path(self, export_dir, stem):
+        """按配置的格式生成输出文件路径"""
+        return os.path.join(export_dir, f"{stem}.{self.format}")
+
+    def _cache_file(self, label, key):
+        return os.path.join(self.config['cache_dir'], f"{label}.{key}.{self.format}")
+
+    def _store(self, output_file, cache_file):
+        """把新渲染的图表写入缓存，并删除同一图表的旧缓存"""
+        if not self.config['use_cache']:
+            return
+        cache_dir = os.path.dirname(cache_file)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            prefix = os.path.basename(cache_file).rsplit('.', 2)[0] + '.'
+            for name in os.listdir(cache_dir):
+                if name.startswith(prefix) and name != os.path.basename(cache_file):
+                    os.remove(os.path.join(cache_dir, name))
+            shutil.copyfile(output_file, cache_file)
+        except OSError as e:
+            print(f"警告: 无法写入图表缓存 {os.path.basename(cache_file)}: {str(e)}")
+
+    def submit(self, func, output_file, *args, label=None, title="图表", **kwargs):
+        """
+        提交一个图表
+        label: 缓存槽位名称（同一图表跨运行保持不变，例如 'iv_smile'），默认使用函数名
+        title: 完成时打印的图表名称
+        """
+        dpi = self.config['dpi']
+        label = label or func.__name__
+        cache_file = self._cache_file(label, chart_key(func, dpi, self.format, args, kwargs))
+
+        if self.config['use_cache'] and os.path.exists(cache_file):
+            shutil.copyfile(cache_file, output_file)
+            print(f"{title}数据未变化，复用缓存: {output_file}")
+            return output_file
+
+        if self.show or not self.config['parallel']:
+            use_batch_backend(self.batch)
+            plt = pyplot()
+            func(output_file, dpi, *args, **kwargs)
+            if self.show:
+                plt.show()
+            plt.close('all')
+            self._store(output_file, cache_file)
+            print(f"{title}已保存至: {output_file}")
+            return output_file
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.config['max_workers'])
+        future = self._pool.submit(_render_job, func, output_file, dpi, args, kwargs)
+        self._pending.append((future, output_file, cache_file, title))
+        return output_file
+
+    def wait(self):
+        """等待已提交的图表渲染完成"""
+        pending, self._pending = self._pending, []
+        for future, output_file, cache_file, title in pending:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"警告: {title}渲染失败 ({os.path.basename(output_file)}): {str(e)}")
+                continue
+            self._store(output_file, cache_file)
+            print(f"{title}已保存至: {output_file}")
+
+    def close(self):
+        """等待全部渲染完成并关闭进程池"""
+        self.wait()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
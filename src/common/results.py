@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+机器可读的分析结果
+put2 与 call 的分析结果统一表示为带类型的对象，供其他程序在进程内直接使用，
+也可一次调用序列化为 Arrow IPC 文件或 JSON Lines（每个策略一行）：
+
+- Leg：一条期权腿（合约、类型、行权价、带方向的数量、价格、IV、希腊字母）
+- Score：一个评分指标（名称、数值）
+- Strategy：一个候选策略（结构、到期日、各腿、现货持仓、净权利金、最大盈亏、盈亏平衡点、
+  盈利概率、名次、评分指标、标签）
+- AnalysisResult：一次分析的全部策略（分析类型、现货价、生成时间）
+
+Arrow 使用固定的 schema（legs / scores 为 list<struct> 嵌套列），JSON Lines 中 NaN 写为 null、
+日期为 ISO 格式；read_results() 可从两种格式还原 AnalysisResult。
+"""
+
+import json
+import math
+import os
+from dataclasses import dataclass, field
+from datetime import date, datetime
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+except ImportError:  # pyarrow 为可选依赖，缺失时只能输出 JSON Lines
+    pa = None
+    ipc = None
+
+NAN = float('nan')
+
+RESULT_FORMATS = {'.arrow': 'arrow', '.ipc': 'arrow', '.feather': 'arrow', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+@dataclass(slots=True)
+class Leg:
+    """一条期权腿；quantity 为带方向的数量（+买 / -卖），价格与权利金同单位"""
+    symbol: str
+    option_type: str
+    strike: float
+    quantity: float
+    price: float = NAN
+    iv: float = NAN
+    delta: float = NAN
+    gamma: float = NAN
+    theta: float = NAN
+    vega: float = NAN
+
+
+@dataclass(slots=True)
+class Score:
+    """一个评分指标"""
+    name: str
+    value: float
+
+
+@dataclass(slots=True)
+class Strategy:
+    """
+    一个候选策略
+    rank: 在同一结构中的名次（从 1 开始，0 为未排名）；stock: 持有现货数量（领口等结构）
+    net_premium: 净权利金（支出为正、收入为负）；max_risk / max_profit 为正数
+    """
+    structure: str
+    name: str
+    expiration_date: date | None
+    legs: list[Leg]
+    net_premium: float
+    rank: int = 0
+    stock: float = 0.0
+    max_profit: float = NAN
+    max_risk: float = NAN
+    breakevens: list[float] = field(default_factory=list)
+    success_prob: float = NAN
+    scores: list[Score] = field(default_factory=list)
+    tags: list[str] = field(default_factory=list)
+
+    def score(self, name, default=NAN):
+        """按名称取评分指标"""
+        return next((s.value for s in self.scores if s.name == name), default)
+
+
+@dataclass(slots=True)
+class AnalysisResult:
+    """一次分析的全部候选策略"""
+    analysis: str
+    spot_price: float
+    created_at: datetime
+    strategies: list[Strategy] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.strategies)
+
+    def __iter__(self):
+        return iter(self.strategies)
+
+    def by_structure(self, structure):
+        return [s for s in self.strategies if s.structure == structure]
+
+    def to_records(self):
+        """每个策略一条 dict 记录（legs / scores 为 dict 列表）"""
+        head = {'analysis': self.analysis, 'spot_price': self.spot_price, 'created_at': self.created_at}
+        return [{**head, **_strategy_record(s)} for s in self.strategies]
+
+    def to_frame(self):
+        """每个策略一行的 DataFrame（嵌套列保持为列表）"""
+        return pd.DataFrame(self.to_records())
+
+    def to_arrow(self):
+        """pyarrow.Table（固定 schema）"""
+        if pa is None:
+            raise ImportError("输出 Arrow 需要安装 pyarrow")
+        return pa.Table.from_pylist(self.to_records(), schema=_schema())
+
+    def to_json_records(self):
+        """可直接 json.dumps 的记录（NaN 为 None，日期为 ISO 字符串）"""
+        return [_json_safe(record) for record in self.to_records()]
+
+    def to_jsonl(self):
+        """JSON Lines 文本，每个策略一行"""
+        return ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in self.to_json_records())
+
+    def write(self, path, format=None):
+        """
+        写入 Arrow IPC 文件或 JSON Lines；format 为 'arrow' / 'jsonl'，缺省时按扩展名判断
+        返回写入的路径
+        """
+        format = format or RESULT_FORMATS.get(os.path.splitext(path)[1].lower())
+        if format == 'arrow':
+            table = self.to_arrow()
+            with ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table)
+        elif format == 'jsonl':
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self.to_jsonl())
+        else:
+            raise ValueError(f"不支持的结果格式: {path}（可选: arrow / jsonl）")
+        return path
+
+
+def _strategy_record(s):
+    return {
+        'structure': s.structure,
+        'name': s.name,
+        'expiration_date': s.expiration_date,
+        'rank': s.rank,
+        'legs': [{name: getattr(leg, name) for name in Leg.__slots__} for leg in s.legs],
+        'stock': s.stock,
+        'net_premium': s.net_premium,
+        'max_profit': s.max_profit,
+        'max_risk': s.max_risk,
+        'breakevens': list(s.breakevens),
+        'success_prob': s.success_prob,
+        'scores': [{'name': sc.name, 'value': sc.value} for sc in s.scores],
+        'tags': list(s.tags),
+    }
+
+
+def _schema():
+    leg = pa.struct([
+        ('symbol', pa.string()), ('option_type', pa.string()), ('strike', pa.float64()),
+        ('quantity', pa.float64()), ('price', pa.float64()), ('iv', pa.float64()), ('delta', pa.float64()),
+        ('gamma', pa.float64()), ('theta', pa.float64()), ('vega', pa.float64()),
+    ])
+    score = pa.struct([('name', pa.string()), ('value', pa.float64())])
+    return pa.schema([
+        ('analysis', pa.string()),
+        ('spot_price', pa.float64()),
+        ('created_at', pa.timestamp('us')),
+        ('structure', pa.string()),
+        ('name', pa.string()),
+        ('expiration_date', pa.date32()),
+        ('rank', pa.int32()),
+        ('legs', pa.list_(leg)),
+        ('stock', pa.float64()),
+        ('net_premium', pa.float64()),
+        ('max_profit', pa.float64()),
+        ('max_risk', pa.float64()),
+        ('breakevens', pa.list_(pa.float64())),
+        ('success_prob', pa.float64()),
+        ('scores', pa.list_(score)),
+        ('tags', pa.list_(pa.string())),
+    ])
+
+
+def _json_safe(value):
+    """NaN/inf → null，日期 → ISO 字符串"""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {k: _json_safe(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_json_safe(v) for v in value]
+    return value
+
+
+def _float(value):
+    return NAN if value is None else float(value)
+
+
+def _from_record(record):
+    expiry = record['expiration_date']
+    if isinstance(expiry, str):
+        expiry = date.fromisoformat(expiry)
+    return Strategy(
+        structure=record['structure'],
+        name=record['name'],
+        expiration_date=expiry,
+        legs=[Leg(leg['symbol'], leg['option_type'], _float(leg['strike']), _float(leg['quantity']),
+                  *(_float(leg[name]) for name in Leg.__slots__[4:])) for leg in record['legs']],
+        net_premium=_float(record['net_premium']),
+        rank=int(record['rank']),
+        stock=_float(record['stock']),
+        max_profit=_float(record['max_profit']),
+        max_risk=_float(record['max_risk']),
+        breakevens=[_float(x) for x in record['breakevens']],
+        success_prob=_float(record['success_prob']),
+        scores=[Score(sc['name'], _float(sc['value'])) for sc in record['scores']],
+        tags=list(record['tags']),
+    )
+
+
+def from_records(records, analysis='', spot_price=NAN, created_at=None):
+    """由 to_records() 格式的记录还原 AnalysisResult（分析类型等取第一条记录）"""
+    if records:
+        analysis, spot_price, created_at = (records[0]['analysis'], _float(records[0]['spot_price']),
+                                            records[0]['created_at'])
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return AnalysisResult(analysis, spot_price, created_at, [_from_record(r) for r in records])
+
+
+def read_results(path, format=None):
+    """读取 AnalysisResult.write() 写出的 Arrow IPC 文件或 JSON Lines"""
+    format = format or RESULT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if format == 'arrow':
+        if pa is None:
+            raise ImportError("读取 Arrow 需要安装 pyarrow")
+        with pa.memory_map(path) as source:
+            records = ipc.open_file(source).read_all().to_pylist()
+    elif format == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    else:
+        raise ValueError(f"不支持的结果格式: {path}（可选: arrow / jsonl）")
+    return from_records(records)
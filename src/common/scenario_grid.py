@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+现货 × 隐含波动率 情景网格
+由 Delta/Gamma/Vega 一次广播得到 (合约数 × 现货冲击数 × IV冲击数) 的 ROI 张量：
+    PnL = Delta·dS + 0.5·Gamma·dS² + Vega·dIV，ROI = PnL / Premium
+dS = 现货冲击比例 × S；dIV 以波动率百分点计（Vega 为 IV 变动 1 个百分点的价格变化）。
+提供长表导出（Parquet）与每个合约的最好/最差/期望 ROI 汇总。
+"""
+
+import numpy as np
+import pandas as pd
+
+from common.features import taylor_roi
+
+
+def shock_range(start, stop, step):
+    """生成包含端点的冲击序列，例如 shock_range(-0.3, 0.5, 0.01)"""
+    n = int(round((stop - start) / step)) + 1
+    return np.round(start + step * np.arange(n), 10)
+
+
+def roi_tensor(delta, gamma, vega, spot, premium, spot_shocks, iv_shocks, dtype=np.float64):
+    """
+    计算 ROI 张量，形状 (合约数, len(spot_shocks), len(iv_shocks))
+    Premium ≤ 0 或缺失、S 缺失的合约整行为 NaN；Delta/Gamma/Vega 缺失按 0 处理
+    """
+    spot_shocks = np.atleast_1d(np.asarray(spot_shocks, dtype=float))
+    iv_shocks = np.atleast_1d(np.asarray(iv_shocks, dtype=float))
+
+    # 现货部分 (n, m) 与 IV 部分 (n, k) 可分离，最后一次广播相加
+    spot_roi = taylor_roi(delta, gamma, spot, premium, shocks=spot_shocks)
+    premium = np.broadcast_to(np.asarray(premium, dtype=float), spot_roi.shape[:1])
+    vega = np.nan_to_num(np.broadcast_to(np.asarray(vega, dtype=float), spot_roi.shape[:1]), nan=0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vega_roi = np.where(premium > 0, vega / premium, np.nan)[:, None] * iv_shocks[None, :]
+
+    out = np.empty((spot_roi.shape[0], len(spot_shocks), len(iv_shocks)), dtype=dtype)
+    np.add(spot_roi[:, :, None], vega_roi[:, None, :], out=out, casting='same_kind')
+    return out
+
+
+def grid_weights(spot_shocks, iv_shocks, spot_sigma=None, iv_sigma=None):
+    """
+    期望 ROI 使用的网格权重 (m, k)，总和为 1
+    sigma 为 None 时该维度等权；否则按零均值正态密度加权（单位与冲击相同）
+    """
+    def _axis(shocks, sigma):
+        shocks = np.asarray(shocks, dtype=float)
+        if sigma is None or sigma <= 0:
+            w = np.ones_like(shocks)
+        else:
+            w = np.exp(-0.5 * (shocks / sigma) ** 2)
+        return w / w.sum()
+    return np.outer(_axis(spot_shocks, spot_sigma), _axis(iv_shocks, iv_sigma))
+
+
+def summarize_roi(roi, spot_shocks, iv_shocks, weights=None):
+    """
+    每个合约的 ROI 汇总：最好/最差 ROI 及对应冲击、网格加权期望 ROI
+    weights 为 (m, k) 权重，默认等权
+    """
+    n, m, k = roi.shape
+    flat = roi.reshape(n, m * k).astype(float, copy=False)
+    valid = ~np.isnan(flat).all(axis=1)
+    if weights is None:
+        weights = np.full((m, k), 1.0 / (m * k))
+    w = np.asarray(weights, dtype=float).reshape(m * k)
+
+    filled_hi = np.where(np.isnan(flat), -np.inf, flat)
+    filled_lo = np.where(np.isnan(flat), np.inf, flat)
+    best_idx = filled_hi.argmax(axis=1)
+    worst_idx = filled_lo.argmin(axis=1)
+    rows = np.arange(n)
+
+    spot_grid = np.repeat(np.asarray(spot_shocks, dtype=float), k)
+    iv_grid = np.tile(np.asarray(iv_shocks, dtype=float), m)
+
+    summary = pd.DataFrame({
+        "BestROI": np.where(valid, flat[rows, best_idx], np.nan),
+        "Best_dS": np.where(valid, spot_grid[best_idx], np.nan),
+        "Best_dIV": np.where(valid, iv_grid[best_idx], np.nan),
+        "WorstROI": np.where(valid, flat[rows, worst_idx], np.nan),
+        "Worst_dS": np.where(valid, spot_grid[worst_idx], np.nan),
+        "Worst_dIV": np.where(valid, iv_grid[worst_idx], np.nan),
+        "ExpectedROI": np.where(valid, np.nan_to_num(flat, nan=0.0) @ w, np.nan),
+    })
+    return summary
+
+
+def roi_long_frame(roi, contracts, spot_shocks, iv_shocks):
+    """
+    将 ROI 张量展开为长表：合约 / dS / dIV / ROI（合约为分类类型，数值为 float32）
+    """
+    n, m, k = roi.shape
+    codes = pd.Categorical(contracts)
+    return pd.DataFrame({
+        "产品": pd.Categorical.from_codes(np.repeat(codes.codes, m * k), codes.categories),
+        "dS": np.tile(np.repeat(np.asarray(spot_shocks, dtype=np.float32), k), n),
+        "dIV": np.tile(np.asarray(iv_shocks, dtype=np.float32), n * m),
+        "ROI": roi.reshape(-1).astype(np.float32, copy=False),
+    })
+
+
+def export_roi_parquet(roi, contracts, spot_shocks, iv_shocks, path, compression="zstd"):
+    """
+    导出长表 Parquet；缺少 pyarrow 时给出警告并返回 False
+    """
+    long_df = roi_long_frame(roi, contracts, spot_shocks, iv_shocks)
+    try:
+        long_df.to_parquet(path, index=False, compression=compression)
+    except ImportError as e:
+        print(f"警告: 无法导出 Parquet（需要 pyarrow）: {str(e)}")
+        return False
+    return True
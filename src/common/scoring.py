@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+多情景综合评分引擎
+每个指标只归一化一次，得到特征矩阵 X (n×k)；各情景权重堆叠为矩阵 W (s×k)，
+一次矩阵乘法 X @ W.T 得到全部情景的得分 (n×s)。
+每个情景的 Top-K 与稠密名次均按列向量化计算，情景数量增加到数百组时开销依然很小。
+"""
+
+import numpy as np
+import pandas as pd
+
+# 综合评分使用的指标，顺序与权重向量一致
+SCORE_METRICS = ["Gamma/Theta", "Delta/Theta", "Vega/Theta", "Leverage"]
+
+
+def min_max_clip(values, lower_pct=5, upper_pct=95):
+    """
+    按列做分位数截尾后的 min-max 归一化
+    values: (n,) 或 (n, k) 数组；NaN/inf 视为缺失，结果中缺失值与常数列均为 0
+    """
+    arr = np.asarray(values, dtype=float)
+    squeeze = arr.ndim == 1
+    if squeeze:
+        arr = arr[:, None]
+    arr = np.where(np.isfinite(arr), arr, np.nan)
+
+    out = np.zeros_like(arr)
+    valid = ~np.isnan(arr).all(axis=0)
+    if valid.any():
+        cols = arr[:, valid]
+        lo, hi = np.nanpercentile(cols, [lower_pct, upper_pct], axis=0)
+        span = hi - lo
+        with np.errstate(invalid='ignore', divide='ignore'):
+            norm = (np.clip(cols, lo, hi) - lo) / span
+        norm[:, ~(span > 0)] = 0.0
+        out[:, valid] = np.nan_to_num(norm, nan=0.0)
+    return out[:, 0] if squeeze else out
+
+
+def feature_matrix(df, columns=SCORE_METRICS, normalize=True):
+    """
+    提取评分特征矩阵 (n, k)
+    normalize=True 时按列截尾归一化；否则使用原始值（缺失值补 0）
+    """
+    raw = df[list(columns)].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    if normalize:
+        return min_max_clip(raw)
+    return np.nan_to_num(raw, nan=0.0, posinf=np.inf, neginf=-np.inf)
+
+
+def weight_matrix(scenarios):
+    """
+    将 [(名称, (w1, w2, ...)), ...] 转为 (名称列表, 权重矩阵 s×k)
+    """
+    names = [name for name, _ in scenarios]
+    weights = np.array([list(w) for _, w in scenarios], dtype=float).reshape(len(names), -1)
+    return names, weights
+
+
+def score_scenarios(features, weights):
+    """
+    一次矩阵乘法计算所有情景得分，返回 (n, s)
+    """
+    return np.asarray(features, dtype=float) @ np.atleast_2d(weights).T
+
+
+def top_k_by_scenario(scores, pool=None, tiebreak=(), k=3):
+    """
+    每个情景在候选池内按得分降序取前 k 名，得分相同时依次按 tiebreak 指标降序
+    （NaN 排在最后，完全相同时保持原行顺序，与 DataFrame.sort_values 一致）。
+    scores: (n, s)；pool: None、(n,) 或 (n, s) 布尔掩码；tiebreak: 若干 (n,) 数组
+    返回 (s, k) 行位置数组，候选不足 k 个时以 -1 填充
+    """
+    scores = np.asarray(scores, dtype=float)
+    n, s = scores.shape
+    out = np.full((s, k), -1, dtype=np.intp)
+    if n == 0 or k <= 0:
+        return out
+
+    in_pool = np.ones((n, s), dtype=bool) if pool is None else \
+        np.broadcast_to(np.asarray(pool, dtype=bool).reshape(n, -1), (n, s))
+    # 池外与 NaN 得分记为 -inf，排在最后
+    masked = np.where(in_pool & ~np.isnan(scores), scores, -np.inf)
+    kk = min(k, n)
+
+    # 候选集合：不低于第 kk 名得分的所有行（包含并列），各情景取最大候选数后统一 argpartition
+    kth = np.partition(masked, n - kk, axis=0)[n - kk]
+    n_cand = int(max(kk, (masked >= kth).sum(axis=0).max()))
+    if n_cand < n:
+        cand = np.argpartition(-masked, n_cand - 1, axis=0)[:n_cand].T
+    else:
+        cand = np.broadcast_to(np.arange(n), (s, n))
+    cand = np.sort(cand, axis=1)   # 恢复原行顺序，保证并列时稳定
+
+    cols = np.arange(s)[:, None]
+    keys = [np.asarray(t, dtype=float)[cand] for t in reversed(tiebreak)]
+    cand_scores = masked[cand, cols]
+    order = np.lexsort([-key for key in keys] + [-cand_scores], axis=1)[:, :kk]
+    picked = np.take_along_axis(cand, order, axis=1)
+
+    out[:, :kk] = np.where(in_pool[picked, cols], picked, -1)
+    return out
+
+
+def dense_rank_desc(scores):
+    """
+    按列计算降序稠密名次（等价于 Series.rank(ascending=False, method="dense")），NaN 名次为 NaN
+    """
+    scores = np.asarray(scores, dtype=float)
+    squeeze = scores.ndim == 1
+    if squeeze:
+        scores = scores[:, None]
+    n, s = scores.shape
+    ranks = np.full((n, s), np.nan)
+    if n == 0:
+        return ranks[:, 0] if squeeze else ranks
+
+    order = np.argsort(-scores, axis=0, kind='stable')   # NaN 排在最后
+    sorted_vals = np.take_along_axis(scores, order, axis=0)
+    new_value = np.ones((n, s), dtype=bool)
+    new_value[1:] = sorted_vals[1:] != sorted_vals[:-1]
+    dense = np.cumsum(new_value, axis=0).astype(float)
+    dense[np.isnan(sorted_vals)] = np.nan
+    np.put_along_axis(ranks, order, dense, axis=0)
+    return ranks[:, 0] if squeeze else ranks
+
+
+def rank_pool_mask(optimized, initial, k=3):
+    """
+    综合排名候选池：优先 OptimizedScreen；不足 k 个时退化为 InitialScreen；再不足则使用全量
+    支持 (n,) 或 (n, s) 掩码，按列分别退化
+    """
+    optimized = np.asarray(optimized, dtype=bool)
+    initial = np.broadcast_to(np.asarray(initial, dtype=bool), optimized.shape)
+    use_opt = optimized.sum(axis=0) >= k
+    use_init = initial.sum(axis=0) >= k
+    return np.where(use_opt, optimized, np.where(use_init, initial, True))
+
+
+def top_k_labels(positions, n, prefix="Top"):
+    """
+    将 (s, k) 行位置转为 (n, s) 标签矩阵，例如 "Top1"；未入选为空字符串
+    """
+    positions = np.asarray(positions)
+    s, k = positions.shape
+    labels = np.full((n, s), "", dtype=object)
+    rows, cols = np.nonzero(positions.T >= 0)
+    labels[positions.T[rows, cols], cols] = np.array([f"{prefix}{r + 1}" for r in range(k)], dtype=object)[rows]
+    return labels
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+期权链快照增量比对
+- 以合约代码为键，对每行参与计算的列求哈希指纹，与上一次运行保存的快照比对，
+  得到新增 / 删除 / 变化 / 未变化的合约
+- 上一次运行的快照与中间结果以 Feather 文件保存在状态目录，附带一个 JSON 元数据
+  （现货价、策略配置、运行日期等）；元数据不一致时调用方应退回全量计算
+"""
+
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.feather  # noqa: F401  DataFrame.to_feather / read_feather 依赖 pyarrow
+    HAS_FEATHER = True
+except ImportError:  # pyarrow 为可选依赖，缺失时不保存状态，每次全量计算
+    HAS_FEATHER = False
+
+# 状态格式版本，保存内容不兼容变更时递增即可让旧状态失效
+STATE_VERSION = 1
+
+
+def row_fingerprints(df, key, columns):
+    """
+    每行的哈希指纹（uint64），以 key 列为索引；缺失的列按缺失值处理
+    """
+    values = df.reindex(columns=list(columns))
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    return pd.Series(hashes, index=pd.Index(df[key].astype(str).to_numpy(), name=key))
+
+
+class SnapshotDiff:
+    """
+    两个快照的比对结果：added / removed / changed / unchanged 均为合约代码的 Index
+    """
+
+    def __init__(self, added, removed, changed, unchanged):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.unchanged = unchanged
+
+    @property
+    def dirty(self):
+        """需要重新计算的合约（新增 + 变化）"""
+        return self.added.append(self.changed)
+
+    @property
+    def is_empty(self):
+        return len(self.added) == 0 and len(self.removed) == 0 and len(self.changed) == 0
+
+    def summary(self):
+        return (f"新增 {len(self.added)}，删除 {len(self.removed)}，变化 {len(self.changed)}，"
+                f"未变化 {len(self.unchanged)}")
+
+
+def diff_snapshots(old_fingerprints, new_fingerprints):
+    """
+    比对两组行指纹（row_fingerprints 的结果）
+    """
+    old = old_fingerprints[~old_fingerprints.index.duplicated(keep='last')]
+    new = new_fingerprints[~new_fingerprints.index.duplicated(keep='last')]
+    common = new.index.intersection(old.index, sort=False)
+    same = new.loc[common].to_numpy() == old.loc[common].to_numpy()
+    return SnapshotDiff(
+        added=new.index.difference(old.index, sort=False),
+        removed=old.index.difference(new.index, sort=False),
+        changed=common[~same],
+        unchanged=common[same],
+    )
+
+
+def touched_groups(old_df, new_df, key, group_col, keys):
+    """
+    给定合约集合在新旧快照中所属的分组（例如到期日），删除与变化的合约两边都要计入
+    """
+    keys = pd.Index(keys).astype(str)
+    groups = set()
+    for frame in (old_df, new_df):
+        if frame is None or len(frame) == 0:
+            continue
+        hit = frame[key].astype(str).isin(keys).to_numpy()
+        groups.update(frame.loc[hit, group_col].dropna().tolist())
+    return groups
+
+
+def _state_paths(state_dir, name):
+    return os.path.join(state_dir, f"{name}.meta.json"), os.path.join(state_dir, name)
+
+
+def load_state(state_dir, name, meta):
+    """
+    读取上一次运行保存的状态，返回 {帧名称: DataFrame}
+    状态不存在、读取失败或元数据与 meta 不一致时返回 None
+    """
+    if not HAS_FEATHER:
+        return None
+    meta_path, frame_dir = _state_paths(state_dir, name)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        if saved.get('version') != STATE_VERSION or saved.get('meta') != _jsonable(meta):
+            return None
+        return {frame: pd.read_feather(os.path.join(frame_dir, f"{frame}.feather"))
+                for frame in saved.get('frames', [])}
+    except Exception as e:
+        print(f"警告: 增量状态 {name} 读取失败，执行全量计算: {str(e)}")
+        return None
+
+
+def save_state(state_dir, name, meta, frames):
+    """
+    保存本次运行的状态（frames: {帧名称: DataFrame}）；元数据最后写入，中途失败不会留下不一致的状态
+    """
+    if not HAS_FEATHER:
+        return False
+    meta_path, frame_dir = _state_paths(state_dir, name)
+    try:
+        os.makedirs(frame_dir, exist_ok=True)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for frame, df in frames.items():
+            df.reset_index(drop=True).to_feather(os.path.join(frame_dir, f"{frame}.feather"))
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION, 'meta': _jsonable(meta), 'frames': list(frames)},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, meta_path)
+    except Exception as e:
+        print(f"警告: 无法保存增量状态 {name}: {str(e)}")
+        return False
+    return True
+
+
+def _jsonable(obj):
+    """把元数据规范化为可 JSON 比较的结构"""
+    return json.loads(json.dumps(obj, sort_keys=True, default=str))
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+历史期权链快照的列式存储
+每次分析的期权链（含 calculate_metrics 等计算出的指标列）追加写入一个按
+date / asset / expiry 分区的 Parquet 数据集（Hive 目录布局）：
+
+    <root>/date=2025-10-17/asset=BTC/expiry=2025-12-26/part-20251017T080000000000-0.parquet
+
+- 只追加不修改；文件名由快照时刻决定，同一快照重复写入会覆盖自身而不会产生重复行
+- 查询时分区条件（日期区间、标的、到期日）只打开命中的目录，合约代码与时刻条件
+  下推到 Parquet 行组统计信息（写入前按合约代码排序），例如
+  "BTC-26DEC25-65000-P 最近 30 天的 Vega/Theta" 只读取该到期日目录下的少量行组
+"""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from common.symbols import parse_option_symbols
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # pyarrow 为可选依赖，缺失时不写入历史快照，查询返回空结果
+    pa = None
+    ds = None
+
+SNAPSHOT_TIME_COLUMN = 'snapshot_time'
+PARTITION_COLUMNS = ['date', 'asset', 'expiry']
+
+
+def _partitioning():
+    return ds.partitioning(
+        pa.schema([('date', pa.date32()), ('asset', pa.string()), ('expiry', pa.date32())]),
+        flavor='hive',
+    )
+
+
+def _to_date(value):
+    if value is None:
+        return None
+    return pd.Timestamp(value).date()
+
+
+def append_snapshot(df, root, snapshot_time=None, symbol_col='symbol'):
+    """
+    把一个期权链快照追加到数据集
+    asset / expiry 分区由合约代码解析得到，snapshot_time 默认为当前时间
+    返回写入的行数（pyarrow 缺失或没有可解析的合约时为 0）
+    """
+    if ds is None or len(df) == 0:
+        return 0
+    snapshot_time = pd.Timestamp(snapshot_time if snapshot_time is not None else datetime.now())
+    parsed = parse_option_symbols(df[symbol_col].reset_index(drop=True))
+    valid = (parsed['asset'].notna() & parsed['expiry'].notna()).to_numpy()
+    if not valid.any():
+        return 0
+
+    frame = df.reset_index(drop=True)[valid].copy()
+    # 类别列转为普通字符串，保证不同快照的文件结构一致
+    for col in frame.columns[frame.dtypes == 'category']:
+        frame[col] = frame[col].astype(object).where(frame[col].notna(), None)
+    frame = frame.drop(columns=[c for c in PARTITION_COLUMNS + [SNAPSHOT_TIME_COLUMN] if c in frame.columns])
+    frame[SNAPSHOT_TIME_COLUMN] = snapshot_time
+    frame['date'] = snapshot_time.date()
+    frame['asset'] = parsed['asset'].astype(str).to_numpy()[valid]
+    frame['expiry'] = pd.to_datetime(parsed['expiry'].to_numpy()[valid]).date
+    frame = frame.sort_values(['expiry', symbol_col], kind='stable')
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    ds.write_dataset(
+        table, root, format='parquet', partitioning=_partitioning(),
+        basename_template=f"part-{snapshot_time:%Y%m%dT%H%M%S%f}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    return len(frame)
+
+
+def _unified_schema(dataset):
+    """
+    全部快照文件结构的并集（ds.dataset 默认只取第一个文件的结构）：
+    早期快照中全为空的列（Arrow null 类型）提升为后续快照中的类型，后续快照新增的列也可查询
+    """
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()]
+    if not schemas:
+        return dataset.schema
+    schema = pa.unify_schemas(schemas, promote_options='permissive').remove_metadata()
+    for field in _partitioning().schema:
+        if field.name not in schema.names:
+            schema = schema.append(field)
+    return schema
+
+
+def open_store(root):
+    """
+    打开数据集（结构为全部快照文件结构的并集）；目录不存在或 pyarrow 缺失时返回 None
+    """
+    if ds is None:
+        return None
+    try:
+        dataset = ds.dataset(root, format='parquet', partitioning=_partitioning())
+        # 按统一结构重新打开，读取时每个文件转换为统一结构（null → 实际类型，int64 → double）
+        return ds.dataset(dataset.files, format='parquet', partitioning=_partitioning(),
+                          partition_base_dir=root, schema=_unified_schema(dataset))
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return None
+
+
+def build_filter(symbols=None, asset=None, expiry=None, start=None, end=None, symbol_col='symbol'):
+    """
+    组合查询条件：start / end 为快照时刻区间（含端点），日期部分同时用于分区裁剪
+    """
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        conditions += [ds.field('date') >= start.date(), ds.field(SNAPSHOT_TIME_COLUMN) >= start]
+    if end is not None:
+        end = pd.Timestamp(end)
+        conditions += [ds.field('date') <= end.date(), ds.field(SNAPSHOT_TIME_COLUMN) <= end]
+    if asset is not None:
+        conditions.append(ds.field('asset') == str(asset))
+    if expiry is not None:
+        conditions.append(ds.field('expiry') == _to_date(expiry))
+    if symbols is not None:
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        conditions.append(ds.field(symbol_col).isin(symbols))
+    if not conditions:
+        return None
+    expr = conditions[0]
+    for cond in conditions[1:]:
+        expr = expr & cond
+    return expr
+
+
+def query_snapshots(root, columns=None, symbols=None, asset=None, expiry=None, start=None, end=None,
+                    symbol_col='symbol'):
+    """
+    按条件读取历史快照，返回按 snapshot_time、合约代码排序的 DataFrame
+    columns 为 None 时读取全部列；指定时自动附带 snapshot_time 与合约代码
+    """
+    dataset = open_store(root)
+    if dataset is None:
+        return pd.DataFrame(columns=[SNAPSHOT_TIME_COLUMN, symbol_col] + list(columns or []))
+    if columns is not None:
+        wanted = [SNAPSHOT_TIME_COLUMN, symbol_col] + [c for c in columns if c not in (SNAPSHOT_TIME_COLUMN, symbol_col)]
+        columns = [c for c in wanted if c in dataset.schema.names]
+    table = dataset.to_table(columns=columns,
+                             filter=build_filter(symbols, asset, expiry, start, end, symbol_col))
+    result = table.to_pandas()
+    return result.sort_values([SNAPSHOT_TIME_COLUMN, symbol_col], kind='stable').reset_index(drop=True)
+
+
+def symbol_history(root, symbol, column, days=30, end=None, symbol_col='symbol'):
+    """
+    单个合约最近 days 天的历史：column 为列名时返回 Series，为列表时返回 DataFrame，
+    均以 snapshot_time 为索引；标的与到期日由合约代码解析，只扫描对应分区
+    """
+    columns = [column] if isinstance(column, str) else list(column)
+    end = pd.Timestamp(end if end is not None else datetime.now())
+    start = end - timedelta(days=days)
+    parsed = parse_option_symbols(pd.Series([symbol])).iloc[0]
+    asset = None if pd.isna(parsed['asset']) else parsed['asset']
+    expiry = None if pd.isna(parsed['expiry']) else parsed['expiry']
+    history = query_snapshots(root, columns=columns, symbols=[symbol], asset=asset, expiry=expiry,
+                              start=start, end=end, symbol_col=symbol_col)
+    history = history.set_index(SNAPSHOT_TIME_COLUMN).reindex(columns=columns)
+    return history[column] if isinstance(column, str) else history
+
+
+def snapshot_times(root, asset=None, start=None, end=None):
+    """
+    数据集中已有的快照时刻（去重、升序）
+    """
+    times = query_snapshots(root, columns=[], asset=asset, start=start, end=end)[SNAPSHOT_TIME_COLUMN]
+    return pd.DatetimeIndex(times.drop_duplicates().sort_values())
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+模拟期权链（性能测试与校验脚本共用）
+- synthetic_chain: 按期限结构逐渐变平的 SVI 微笑与 Black-76 生成清洗后的期权链（put2 列名），
+  可选 IV / 价格噪声与缺失的希腊字母
+- export_frame: 把模拟期权链还原为交易所导出的 CSV 格式（币本位价格、百分数 IV，缺失值为 "-"）
+同一组参数与随机种子总是生成相同的期权链。
+"""
+
+import numpy as np
+import pandas as pd
+
+from common.pricing import black76
+from common.vol_surface import svi_variance
+
+VALUATION_TIME = pd.Timestamp('2025-10-17 08:00')
+
+GREEK_NAMES = ['delta', 'gamma', 'theta', 'vega']
+
+# 清洗后列名 → 交易所导出列名（与 put2.prepare_chain 的列名映射互逆）
+EXPORT_COLUMNS = {
+    'symbol': '产品',
+    'bid_price': '买价',
+    'ask_price': '卖价',
+    'mark_price': '标记',
+    'delta': 'Δ|增量',
+    'gamma': 'Gamma',
+    'theta': 'Theta',
+    'vega': 'Vega',
+    'bid_iv': 'IV 报价',
+    'ask_iv': 'IV 询价',
+}
+
+
+def expiry_days(n_expiries):
+    """到期天数：前 8 个为周度，之后为月度"""
+    return [7 * (i + 1) if i < 8 else 30 * (i - 6) for i in range(n_expiries)]
+
+
+def synthetic_chain(n_expiries=12, n_strikes=200, spot=65000.0, asset='BTC', option_types=('P',),
+                    valuation_time=VALUATION_TIME, iv_noise=0.0, price_noise=0.0, missing_greeks=0.0,
+                    spread=0.02, seed=0):
+    """
+    生成模拟期权链，每个到期日 n_strikes 个行权价（按 √T 放宽的对数在值程度网格）
+    iv_noise: mid_iv 的加性噪声标准差；price_noise: mid_price 的相对噪声标准差
+    missing_greeks: 希腊字母缺失（交易所 "-"）的行比例；spread: 买卖价相对中间价的价差
+    返回 DataFrame：symbol / asset / option_type / strike_price / expiration_date / days_to_expiration /
+    mid_price（美元）/ bid_price / ask_price / mark_price（币本位）/ mid_iv / bid_iv / ask_iv（百分数）/
+    delta / gamma / theta / vega
+    """
+    rng = np.random.default_rng(seed)
+    frames = []
+    for days in expiry_days(n_expiries):
+        expiry = (valuation_time + pd.Timedelta(days=days)).normalize()
+        t = days / 365
+        width = 0.25 * np.sqrt(t) + 0.1
+        strikes = np.round(spot * np.exp(np.linspace(-3 * width, 2 * width, n_strikes)))
+        iv = np.sqrt(svi_variance(np.log(strikes / spot), 0.25, 0.4 / np.sqrt(t + 0.05), -0.35, 0.02, 0.2))
+        code = f"{asset}-{expiry.day}{expiry:%b%y}".upper()
+        for option_type in option_types:
+            model = black76(spot, strikes, t, iv, option_type == 'C')
+            mark = model['price'] / spot
+            frames.append(pd.DataFrame({
+                'symbol': [f"{code}-{k:.0f}-{option_type}" for k in strikes],
+                'asset': asset,
+                'option_type': option_type,
+                'strike_price': strikes,
+                'expiration_date': expiry,
+                'days_to_expiration': days,
+                'mid_price': model['price'] * (1 + rng.normal(0, price_noise, n_strikes)),
+                'bid_price': mark * (1 - spread / 2),
+                'ask_price': mark * (1 + spread / 2),
+                'mark_price': mark,
+                'mid_iv': iv + rng.normal(0, iv_noise, n_strikes),
+                'bid_iv': iv * 100 * (1 - spread / 2),
+                'ask_iv': iv * 100 * (1 + spread / 2),
+                **{name: model[name] for name in GREEK_NAMES},
+            }))
+    chain = pd.concat(frames, ignore_index=True)
+    if missing_greeks > 0:
+        missing = rng.random(len(chain)) < missing_greeks
+        chain.loc[missing, GREEK_NAMES] = np.nan
+    return chain
+
+
+def export_frame(chain):
+    """
+    模拟期权链 → 交易所导出格式（put2 / call 读取的原始 CSV），缺失值写为 "-"
+    """
+    out = chain[list(EXPORT_COLUMNS)].rename(columns=EXPORT_COLUMNS)
+    return out.astype(object).where(out.notna(), '-')
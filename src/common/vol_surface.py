@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+隐含波动率曲面
+- 每个到期日用 SVI 拟合隐含方差随对数在值程度 k = ln(K/F) 的微笑：
+      v(k) = a + b·(ρ·(k − m) + √((k − m)² + σ²))
+  采用 quasi-explicit 方法：对 (m, σ) 网格批量求解 (a, bσρ, bσ) 的线性最小二乘，再在最优点附近逐轮细化，
+  不依赖 scipy
+- 到期日之间按总方差 w = v·T 在相同 k 上线性插值，首个到期日之前与最后一个到期日之后按平坦波动率外推
+- 各到期日的拟合互相独立，到期日较多时在进程池中并行
+- 拟合参数与到期剩余时间无关，按快照内容（行权价、到期日、IV、远期价）哈希缓存为 JSON，
+  同一快照的后续查询只需对每个点求一次闭式公式
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from common.pricing import EXPIRY_HOUR_UTC, year_fraction
+
+SURFACE_DEFAULTS = {
+    'min_points': 5,               # 少于该点数的到期日拟合为平坦微笑
+    'grid_size': 25,               # (m, σ) 每轮网格边长
+    'rounds': 4,                   # 网格细化轮数
+    'max_workers': None,           # 进程池大小（None为CPU核数，1为不启用进程池）
+    'parallel_min_expiries': 8,    # 到期日数量达到该值时才启用进程池
+    'use_cache': True,
+    'cache_dir': '.surface_cache',
+}
+
+SVI_PARAMS = ['a', 'b', 'rho', 'm', 'sigma']
+
+# 缓存格式版本，拟合方法不兼容变更时递增即可让旧缓存失效
+CACHE_VERSION = 1
+
+
+def svi_variance(k, a, b, rho, m, sigma):
+    """SVI 隐含方差 v(k)，全部输入可广播"""
+    x = np.asarray(k, dtype=float) - m
+    return a + b * (rho * x + np.sqrt(x * x + sigma * sigma))
+
+
+def _solve_grid(k, v, w, m_grid, s_grid):
+    """
+    对 (m, σ) 网格上的每一点求解加权最小二乘 v ≈ a + d·y + c·√(y²+1)，y = (k − m)/σ
+    正规方程的各项加权和由矩阵-向量乘积一次求出；返回每个网格点的 (a, d, c)
+    与加权残差平方和（违反 SVI 约束的点为 inf）
+    """
+    y = (k[None, :] - m_grid[:, None]) / s_grid[:, None]
+    yy = y * y
+    r = np.sqrt(yy + 1.0)
+    wv = w * v
+    s1 = w.sum()
+    sy, syy, sr, syr = y @ w, yy @ w, r @ w, (y * r) @ w
+    xtx = np.empty((len(m_grid), 3, 3))
+    xtx[:, 0, 0] = s1
+    xtx[:, 0, 1] = xtx[:, 1, 0] = sy
+    xtx[:, 0, 2] = xtx[:, 2, 0] = sr
+    xtx[:, 1, 1] = syy
+    xtx[:, 1, 2] = xtx[:, 2, 1] = syr
+    xtx[:, 2, 2] = syy + s1
+    xty = np.stack([np.full(len(m_grid), wv.sum()), y @ wv, r @ wv], axis=1)
+    # 按矩阵尺度轻微正则化，避免点数较少或 σ 很小时 y 与 √(y²+1) 共线导致奇异
+    xtx += (1e-10 * np.trace(xtx, axis1=1, axis2=2) + 1e-300)[:, None, None] * np.eye(3)
+    coef = np.linalg.solve(xtx, xty[..., None])[..., 0]
+    # SSE = vᵀWv − 2·coefᵀXᵀWv + coefᵀXᵀWX·coef
+    sse = (wv @ v - 2 * np.einsum('gi,gi->g', coef, xty)
+           + np.einsum('gi,gij,gj->g', coef, xtx, coef))
+
+    a, d, c = coef.T
+    # b ≥ 0、|ρ| ≤ 1、最小方差 a + bσ√(1−ρ²) ≥ 0
+    feasible = (c >= 0) & (np.abs(d) <= c) & (a + np.sqrt(np.maximum(c * c - d * d, 0.0)) >= 0)
+    return coef, np.where(feasible, np.maximum(sse, 0.0), np.inf)
+
+
+def fit_svi(k, iv, weights=None, grid_size=None, rounds=None):
+    """
+    拟合单个到期日的 SVI 微笑
+    k: 对数在值程度 ln(K/F)；iv: 隐含波动率（小数）；weights: 可选的拟合权重（如 Vega）
+    返回 dict: a / b / rho / m / sigma / rmse（IV 误差）/ n
+    """
+    grid_size = grid_size or SURFACE_DEFAULTS['grid_size']
+    rounds = rounds or SURFACE_DEFAULTS['rounds']
+    k = np.asarray(k, dtype=float)
+    iv = np.asarray(iv, dtype=float)
+    w = np.ones_like(k) if weights is None else np.asarray(weights, dtype=float)
+    ok = np.isfinite(k) & np.isfinite(iv) & (iv > 0) & np.isfinite(w) & (w > 0)
+    k, v, w = k[ok], iv[ok] ** 2, w[ok]
+    n = len(k)
+
+    # 点数不足：平坦微笑
+    flat = {'a': float(np.average(v, weights=w)) if n else np.nan, 'b': 0.0, 'rho': 0.0, 'm': 0.0, 'sigma': 0.1}
+    if n < SURFACE_DEFAULTS['min_points']:
+        return _with_error(flat, k, iv[ok], n)
+
+    w = w / w.mean()
+    span = max(k.max() - k.min(), 1e-3)
+    m_lo, m_hi = k.min() - 0.5 * span, k.max() + 0.5 * span
+    s_lo, s_hi = np.log(1e-3), np.log(max(2.0 * span, 1e-2))
+    best = None
+    for _ in range(rounds):
+        mg, sg = np.meshgrid(np.linspace(m_lo, m_hi, grid_size), np.exp(np.linspace(s_lo, s_hi, grid_size)))
+        coef, sse = _solve_grid(k, v, w, mg.ravel(), sg.ravel())
+        i = int(np.argmin(sse))
+        if not np.isfinite(sse[i]):
+            break
+        best = (mg.ravel()[i], sg.ravel()[i], coef[i])
+        # 围绕最优点缩小网格
+        dm = (m_hi - m_lo) / (grid_size - 1) * 2
+        ds = (s_hi - s_lo) / (grid_size - 1) * 2
+        m_lo, m_hi = best[0] - dm, best[0] + dm
+        s_lo, s_hi = np.log(best[1]) - ds, np.log(best[1]) + ds
+
+    if best is None:
+        return _with_error(flat, k, iv[ok], n)
+    m, sigma, (a, d, c) = best
+    b = c / sigma
+    rho = d / c if c > 0 else 0.0
+    params = {'a': float(a), 'b': float(b), 'rho': float(np.clip(rho, -1.0, 1.0)), 'm': float(m), 'sigma': float(sigma)}
+    return _with_error(params, k, iv[ok], n)
+
+
+def _with_error(params, k, iv, n):
+    fitted = np.sqrt(np.maximum(svi_variance(k, **params), 0.0)) if n else np.array([])
+    params['rmse'] = float(np.sqrt(np.mean((fitted - iv) ** 2))) if n else np.nan
+    params['n'] = int(n)
+    return params
+
+
+def _fit_slices(jobs):
+    """进程池任务：拟合一组到期日"""
+    return [fit_svi(k, iv, w) for k, iv, w in jobs]
+
+
+class VolSurface:
+    """
+    波动率曲面：每个到期日一组 SVI 参数 + 远期价
+    查询时按估值时刻计算各到期日剩余时间，在总方差上线性插值
+    """
+
+    def __init__(self, forward, expiries, params):
+        self.forward = float(forward)
+        self.expiries = pd.to_datetime(pd.Series(expiries)).to_numpy(dtype='datetime64[ns]')
+        self.params = pd.DataFrame(params, columns=SVI_PARAMS + ['rmse', 'n']).reset_index(drop=True)
+        self._svi = self.params[SVI_PARAMS].to_numpy(dtype=float)
+
+    def __len__(self):
+        return len(self.expiries)
+
+    def to_dict(self):
+        return {
+            'forward': self.forward,
+            'expiries': [str(pd.Timestamp(e).date()) for e in self.expiries],
+            'params': self.params.to_dict(orient='records'),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['forward'], data['expiries'], data['params'])
+
+    def params_frame(self):
+        """各到期日的拟合参数与 IV 拟合误差"""
+        out = self.params.copy()
+        out.insert(0, 'expiration_date', pd.to_datetime(self.expiries).date)
+        return out
+
+    def log_moneyness(self, strike):
+        return np.log(np.asarray(strike, dtype=float) / self.forward)
+
+    def slice_iv(self, i, strike):
+        """第 i 个到期日拟合的隐含波动率（与剩余时间无关）"""
+        v = svi_variance(self.log_moneyness(strike), *self._svi[i])
+        return np.sqrt(np.maximum(v, 0.0))
+
+    def smile_iv(self, strike, expiry):
+        """每个点所在到期日的拟合微笑 IV；到期日不在曲面中的点为 NaN"""
+        expiry = pd.to_datetime(pd.Series(np.asarray(expiry))).to_numpy(dtype='datetime64[ns]')
+        if len(self) == 0:
+            return np.full(len(expiry), np.nan)
+        i = np.clip(np.searchsorted(self.expiries, expiry), 0, len(self) - 1)
+        v = svi_variance(self.log_moneyness(strike), *self._svi[i].T)
+        return np.where(self.expiries[i] == expiry, np.sqrt(np.maximum(v, 0.0)), np.nan)
+
+    def total_variance(self, k, t, valuation_time=None, expiry_hour=EXPIRY_HOUR_UTC):
+        """
+        总方差 w(k, t)：k 为对数在值程度，t 为到期剩余时间（年），可广播
+        相邻到期日之间在相同 k 上按 t 线性插值，两端按平坦波动率外推
+        """
+        k, t = np.broadcast_arrays(np.asarray(k, dtype=float), np.asarray(t, dtype=float))
+        ts = year_fraction(self.expiries, valuation_time, expiry_hour)
+        live = np.flatnonzero(ts > 0)
+        if len(live) == 0:
+            return np.full(k.shape, np.nan)
+        ts, svi = ts[live], self._svi[live]
+
+        hi = np.clip(np.searchsorted(ts, t), 1, len(ts) - 1) if len(ts) > 1 else np.zeros(t.shape, dtype=int)
+        lo = np.maximum(hi - 1, 0)
+        v_lo = np.maximum(svi_variance(k, *svi[lo].T), 0.0)
+        v_hi = np.maximum(svi_variance(k, *svi[hi].T), 0.0)
+        t_lo, t_hi = ts[lo], ts[hi]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.where(t_hi > t_lo, (t - t_lo) / (t_hi - t_lo), 0.0)
+        w = v_lo * t_lo + frac * (v_hi * t_hi - v_lo * t_lo)
+        # 外推：t 在首个到期日之前用首个微笑，在最后一个之后用最后一个微笑，波动率不变
+        w = np.where(t <= ts[0], v_lo * t, w)
+        w = np.where(t >= ts[-1], v_hi * t, w)
+        return np.where(t > 0, w, np.nan)
+
+    def iv(self, strike, t, valuation_time=None):
+        """任意行权价与剩余时间（年）的隐含波动率"""
+        t = np.asarray(t, dtype=float)
+        w = self.total_variance(self.log_moneyness(strike), t, valuation_time)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(w / t)
+
+    def iv_for_expiry(self, strike, expiry, valuation_time=None):
+        """按到期日查询隐含波动率"""
+        t = year_fraction(expiry, valuation_time)
+        return self.iv(strike, t, valuation_time)
+
+
+def surface_key(strike, expiry, iv, forward):
+    """快照内容哈希：行权价、到期日、IV、远期价"""
+    h = hashlib.sha1(f"{CACHE_VERSION}|{float(forward)!r}".encode())
+    frame = pd.DataFrame({'strike': np.asarray(strike, dtype=float),
+                          'expiry': pd.to_datetime(pd.Series(np.asarray(expiry))).to_numpy(),
+                          'iv': np.asarray(iv, dtype=float)})
+    h.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def fit_surface(strike, expiry, iv, forward, weights=None, config=None):
+    """
+    按到期日分组拟合曲面（iv 为小数），返回 VolSurface
+    """
+    config = {**SURFACE_DEFAULTS, **(config or {})}
+    frame = pd.DataFrame({
+        'expiry': pd.to_datetime(pd.Series(np.asarray(expiry))).to_numpy(),
+        'k': np.log(np.asarray(strike, dtype=float) / float(forward)),
+        'iv': np.asarray(iv, dtype=float),
+        'w': np.ones(len(np.asarray(strike))) if weights is None else np.asarray(weights, dtype=float),
+    }).dropna(subset=['expiry'])
+    groups = [(exp, g) for exp, g in frame.groupby('expiry', sort=True)]
+    jobs = [(g['k'].to_numpy(), g['iv'].to_numpy(), g['w'].to_numpy()) for _, g in groups]
+
+    max_workers = config['max_workers'] or os.cpu_count() or 1
+    if max_workers > 1 and len(jobs) >= config['parallel_min_expiries']:
+        # 每个进程一批到期日，减少任务调度开销
+        chunks = [jobs[i::max_workers] for i in range(max_workers)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunk_results = list(executor.map(_fit_slices, chunks))
+        results = [None] * len(jobs)
+        for i, chunk in enumerate(chunk_results):
+            results[i::max_workers] = chunk
+    else:
+        results = _fit_slices(jobs)
+    return VolSurface(forward, [exp for exp, _ in groups], results)
+
+
+def load_or_fit_surface(strike, expiry, iv, forward, weights=None, config=None, tag='surface'):
+    """
+    命中缓存时直接读取拟合参数，否则拟合并写入 <cache_dir>/<tag>.<key>.json
+    """
+    config = {**SURFACE_DEFAULTS, **(config or {})}
+    if not config['use_cache']:
+        return fit_surface(strike, expiry, iv, forward, weights, config)
+
+    key = surface_key(strike, expiry, iv, forward)
+    if weights is not None:
+        key = hashlib.sha1(f"{key}|".encode() + np.asarray(weights, dtype=float).tobytes()).hexdigest()[:16]
+    path = os.path.join(config['cache_dir'], f"{tag}.{key}.json")
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return VolSurface.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"警告: 曲面缓存 {os.path.basename(path)} 读取失败，重新拟合: {str(e)}")
+
+    surface = fit_surface(strike, expiry, iv, forward, weights, config)
+    try:
+        os.makedirs(config['cache_dir'], exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(surface.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        # 同一标签只保留最新快照的参数
+        for name in os.listdir(config['cache_dir']):
+            if name.startswith(f"{tag}.") and name.endswith('.json') and name != os.path.basename(path):
+                os.remove(os.path.join(config['cache_dir'], name))
+    except OSError as e:
+        print(f"警告: 无法写入曲面缓存 {os.path.basename(path)}: {str(e)}")
+    return surface
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Delta / 行权价区间查询性能对比
+在模拟的多标的期权链上，对比布尔掩码全表扫描与 common/band_index.py 有序索引
+（searchsorted 切片）的区间查询耗时与结果一致性：
+- Delta 区间：全链一个索引
+- 行权价区间：按 (标的, 到期日) 分组的索引，每次查询只在一个到期日内
+
+用法: python bench_band_index.py [期权数量 ...] [--bands 区间数量]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.band_index import BandIndex
+from common.synthetic import synthetic_chain
+
+ASSETS = {'BTC': 65000.0, 'ETH': 3500.0, 'SOL': 150.0}
+
+
+def make_chain(n_rows, n_expiries=12, seed=0):
+    """
+    多标的模拟看跌期权链（common.synthetic），约 1% 的希腊字母缺失
+    """
+    n_strikes = max(1, n_rows // (len(ASSETS) * n_expiries))
+    return pd.concat([synthetic_chain(n_expiries, n_strikes, spot=spot, asset=asset, missing_greeks=0.01,
+                                      seed=seed + i)
+                      for i, (asset, spot) in enumerate(ASSETS.items())], ignore_index=True)
+
+
+def timed(func, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - t0) / repeat, result
+
+
+def bench(n_rows, n_bands, repeat=3):
+    df = make_chain(n_rows)
+    rng = np.random.default_rng(1)
+    lo = rng.uniform(-0.95, -0.05, n_bands)
+    delta_bands = list(zip(lo, lo + rng.uniform(0.02, 0.3, n_bands)))
+    keys = list(df.groupby(['asset', 'expiration_date']).groups)
+    strike_bands = []
+    for j in rng.integers(len(keys), size=n_bands):
+        asset, expiry = keys[j]
+        k = ASSETS[asset] * rng.uniform(0.5, 1.2)
+        strike_bands.append(((asset, expiry), k, k * 1.1))
+
+    # 布尔掩码：每个区间扫描整张表
+    delta = df['delta']
+    t_mask, mask_pos = timed(lambda: [np.flatnonzero((delta >= a) & (delta <= b)) for a, b in delta_bands], repeat)
+
+    # 有序索引：构建一次，每个区间两次 searchsorted
+    t_build, index = timed(lambda: BandIndex(df['delta']), repeat)
+    t_index, index_pos = timed(lambda: [index.positions(a, b) for a, b in delta_bands], repeat)
+    assert all(np.array_equal(x, y) for x, y in zip(mask_pos, index_pos)), "Delta 区间结果不一致"
+
+    # 行权价区间（按标的 + 到期日分组）
+    strike, asset_col, expiry_col = df['strike_price'], df['asset'], df['expiration_date']
+    t_strike_mask, strike_mask_pos = timed(lambda: [
+        np.flatnonzero((asset_col == g[0]) & (expiry_col == g[1]) & (strike >= a) & (strike <= b))
+        for g, a, b in strike_bands], repeat)
+    group_labels = pd.Series(list(zip(asset_col, expiry_col)), dtype=object).to_numpy()
+    t_strike_build, strike_index = timed(lambda: BandIndex(strike, groups=group_labels), repeat)
+    t_strike_index, strike_index_pos = timed(lambda: [strike_index.positions(a, b, g) for g, a, b in strike_bands],
+                                             repeat)
+    assert all(np.array_equal(x, y) for x, y in zip(strike_mask_pos, strike_index_pos)), "行权价区间结果不一致"
+
+    print(f"期权数量 {len(df):>7}，{n_bands} 个区间：")
+    print(f"  Delta 区间    掩码扫描 {t_mask * 1000:8.2f} ms | 索引构建 {t_build * 1000:6.2f} ms + "
+          f"查询 {t_index * 1000:6.2f} ms（{n_bands / t_index:,.0f} 区间/秒）")
+    print(f"  行权价区间    掩码扫描 {t_strike_mask * 1000:8.2f} ms | 索引构建 {t_strike_build * 1000:6.2f} ms + "
+          f"查询 {t_strike_index * 1000:6.2f} ms（{n_bands / t_strike_index:,.0f} 区间/秒）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delta / 行权价区间查询性能对比")
+    parser.add_argument('sizes', nargs='*', type=int, default=[5_000, 50_000, 200_000], help="期权数量")
+    parser.add_argument('--bands', type=int, default=50, help="每轮查询的区间数量")
+    args = parser.parse_args()
+    for n_rows in args.sizes:
+        bench(n_rows, args.bands)
+
+
+if __name__ == '__main__':
+    main()
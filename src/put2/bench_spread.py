@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+熊市看跌价差构建性能对比
+对比逐行循环版本与NumPy广播版本 analyze_bear_put_spread 的耗时与结果一致性
+（另用等间距行权价、权利金取整的期权链校验盈亏比并列时与循环版本选出相同的组合）
+
+用法: python bench_spread.py [每个到期日的期权数量 ...]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.synthetic import synthetic_chain
+from put2 import STRATEGY_CONFIG, analyze_bear_put_spread
+
+
+def loop_bear_put_spread(df, config):
+    """
+    原逐行循环实现（仅保留同到期日组合，便于与广播版本对比结果）
+    """
+    long_legs = df[(df['delta'] >= config['long_leg_min_delta']) &
+                   (df['delta'] <= config['long_leg_max_delta'])]
+    short_legs = df[(df['delta'] >= config['short_leg_min_delta']) &
+                    (df['delta'] <= config['short_leg_max_delta'])]
+
+    spreads = []
+    for _, long_leg in long_legs.iterrows():
+        for _, short_leg in short_legs.iterrows():
+            if long_leg['expiration_date'] != short_leg['expiration_date']:
+                continue
+            if long_leg['strike_price'] > short_leg['strike_price']:
+                net_premium = long_leg['mid_price'] - short_leg['mid_price']
+                max_profit = (long_leg['strike_price'] - short_leg['strike_price']) - net_premium
+                success_prob = abs(long_leg['delta'])
+                spreads.append({
+                    'long_strike': long_leg['strike_price'],
+                    'short_strike': short_leg['strike_price'],
+                    'net_premium': net_premium,
+                    'max_profit': max_profit,
+                    'reward_risk_ratio': max_profit / net_premium if net_premium > 0 else 0,
+                    'success_prob': success_prob,
+                })
+
+    if not spreads:
+        return pd.DataFrame()
+    spreads_df = pd.DataFrame(spreads)
+    return spreads_df.sort_values('reward_risk_ratio', ascending=False, kind='stable').head(5)
+
+
+def tied_chain(legs_per_expiry):
+    """
+    等间距行权价、权利金取整到 100 美元：大量组合的盈亏比完全相同
+    """
+    df = synthetic_chain(n_expiries=1, n_strikes=legs_per_expiry)
+    df['strike_price'] = 30000.0 + 100.0 * np.arange(legs_per_expiry)
+    df['mid_price'] = np.round(df['mid_price'], -2).clip(lower=100)
+    return df
+
+
+def bench(legs_per_expiry, run_loop=True, ties=False):
+    if ties:
+        df = tied_chain(legs_per_expiry)
+    else:
+        df = synthetic_chain(n_expiries=1, n_strikes=legs_per_expiry, price_noise=0.01)
+    config = STRATEGY_CONFIG['bear_put_spread']
+
+    t0 = time.perf_counter()
+    fast = analyze_bear_put_spread(df, config)
+    t_fast = time.perf_counter() - t0
+
+    line = f"期权数量 {legs_per_expiry:>6}{'（并列）' if ties else ''}: 广播版本 {t_fast * 1000:9.1f} ms"
+    if run_loop:
+        t0 = time.perf_counter()
+        slow = loop_bear_put_spread(df, config)
+        t_slow = time.perf_counter() - t0
+        for col in ('long_strike', 'short_strike', 'reward_risk_ratio'):
+            assert np.allclose(fast[col].to_numpy(dtype=float), slow[col].to_numpy(dtype=float)), \
+                f"期权数量 {legs_per_expiry}: {col} 与循环版本不一致"
+        line += f" | 循环版本 {t_slow * 1000:9.1f} ms | 加速 {t_slow / t_fast:7.1f}x | 结果一致"
+    print(line)
+
+
+if __name__ == "__main__":
+    sizes = [int(x) for x in sys.argv[1:]] or [200, 500, 1000]
+    for n in sizes:
+        bench(n)
+        bench(n, ties=True)
+    # 大规模链只运行广播版本（循环版本耗时过长）
+    for n in (10000, 40000):
+        bench(n, run_loop=False)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多腿策略搜索性能测试
+在模拟的完整 BTC 期权链（看涨 + 看跌，多个到期日 × 每个到期日若干行权价）上运行
+search_strategies，输出各结构的组合数、耗时与内存峰值；
+不同 block_size 的结果应完全一致，内存峰值只随 block_size 变化而与组合总数无关；
+入选组合的最大收益 / 最大亏损与 common/payoff.py 逐腿计算的到期盈亏（在 0 与各行权价处求值）一致，
+净权利金为各腿可成交价格（买入腿卖价、卖出腿买价）之和，且最大亏损不低于 min_risk_pct 下限
+
+用法: python bench_strategy_search.py [到期日数量] [每个到期日的行权价数量]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.payoff import expiry_pnl, stack_strategies
+from common.synthetic import synthetic_chain
+from strategy_search import SEARCH_DEFAULTS, STRUCTURES, count_combinations, search_strategies, to_payoff_strategy
+
+SPOT = 65000.0
+
+
+def check_payoff(results):
+    """
+    参考实现：逐腿到期盈亏是行权价处的折线，在 0、各腿行权价与远端价格处求值即可得到最大收益 / 最大亏损
+    """
+    for key, res in results.items():
+        if len(res) == 0:
+            continue
+        legs = stack_strategies([to_payoff_strategy(row, SPOT) for _, row in res.iterrows()])
+        far = legs['strike'].max(axis=1, keepdims=True) * 4
+        prices = np.hstack([np.zeros_like(far), legs['strike'], far])
+        pnl = expiry_pnl(legs, prices)
+        assert np.allclose(-pnl.min(axis=1), res['max_risk'], rtol=1e-9), f"{key} 最大亏损与逐腿盈亏不一致"
+        bounded = np.isfinite(res['max_profit'].to_numpy())
+        assert np.allclose(pnl.max(axis=1)[bounded], res['max_profit'][bounded], rtol=1e-9), \
+            f"{key} 最大收益与逐腿盈亏不一致"
+
+
+def check_quotes(results, chain):
+    """
+    参考实现：按合约代码逐腿查买价 / 卖价（币本位 × 现货价）重算净权利金
+    """
+    quotes = chain.set_index('symbol')[['bid_price', 'ask_price']] * SPOT
+    min_risk = SEARCH_DEFAULTS['min_risk_pct'] * SPOT
+    for key, res in results.items():
+        spec = STRUCTURES[key]
+        for _, row in res.iterrows():
+            debit = sum(side * ratio * quotes.loc[row[f'leg{n}_symbol'], 'ask_price' if side > 0 else 'bid_price']
+                        for n, (_, side, ratio) in enumerate(spec['legs'], start=1))
+            assert np.isclose(row['net_premium'], debit, rtol=1e-12), f"{key} 净权利金不是可成交价格"
+        assert (res['max_risk'] >= min_risk).all(), f"{key} 最大亏损低于下限"
+
+
+def run(chain, block_size):
+    config = {'block_size': block_size, 'max_workers': 1}
+    tracemalloc.start()
+    start = time.perf_counter()
+    results = search_strategies(chain, SPOT, config)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return results, elapsed, peak
+
+
+def main():
+    n_expiries = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    n_strikes = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    chain = synthetic_chain(n_expiries, n_strikes, spot=SPOT, option_types=('P', 'C'), price_noise=0.002)
+    print(f"模拟期权链: {n_expiries} 个到期日 × {n_strikes} 个行权价 × 看涨/看跌 = {len(chain)} 个合约")
+
+    counts = count_combinations(chain)
+    for key, total in counts.items():
+        print(f"  {STRUCTURES[key]['name']:<24} Delta 区间筛选后 {total:>14,} 个组合")
+    print(f"  合计 {sum(counts.values()):,} 个组合")
+
+    baseline = None
+    for block_size in (1 << 14, 1 << 16, 1 << 18):
+        results, elapsed, peak = run(chain, block_size)
+        line = (f"block_size {block_size:>7}: 耗时 {elapsed:7.2f} s, "
+                f"{sum(counts.values()) / elapsed / 1e6:6.1f} M 组合/秒, 内存峰值 {peak / 2**20:7.1f} MiB")
+        if baseline is None:
+            baseline = results
+            check_payoff(baseline)
+            check_quotes(baseline, chain)
+        else:
+            assert all(results[key].equals(baseline[key]) for key in baseline), \
+                f"block_size {block_size} 的结果与 block_size {1 << 14} 不一致"
+            line += " | 结果一致"
+        print(line)
+
+    best = {key: res.iloc[0] for key, res in baseline.items() if len(res) > 0}
+    print("\n各结构最优组合:")
+    for key, row in best.items():
+        print(f"  {STRUCTURES[key]['name']}: {row['legs']}（{row['expiration_date']:%Y-%m-%d}），"
+              f"盈亏比 {row['reward_risk_ratio']:.2f}，盈利概率 {row['success_prob']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+波动率曲面拟合性能测试
+在模拟的完整 BTC 期权链（多个到期日 × 每个到期日若干行权价）上对比：
+串行拟合、进程池并行拟合、命中缓存读取参数，以及曲面批量查询的耗时；
+并行拟合与缓存读取的参数应与串行拟合完全一致，曲面在各合约上的 IV 应还原生成期权链的微笑
+
+用法: python bench_surface.py [到期日数量] [每个到期日的行权价数量]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.synthetic import VALUATION_TIME, synthetic_chain
+from common.vol_surface import fit_surface, load_or_fit_surface
+
+SPOT = 65000.0
+IV_NOISE = 0.003
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    n_expiries = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    n_strikes = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    exact = synthetic_chain(n_expiries, n_strikes, spot=SPOT)
+    df = synthetic_chain(n_expiries, n_strikes, spot=SPOT, iv_noise=IV_NOISE)
+    args = (df['strike_price'], df['expiration_date'], df['mid_iv'], SPOT)
+    print(f"模拟期权链: {n_expiries} 个到期日 × {n_strikes} 个行权价 = {len(df)} 个合约")
+
+    fit_surface(*args, config={'max_workers': 1})   # 预热
+    surface, t_serial = timed(lambda: fit_surface(*args, config={'max_workers': 1}))
+    parallel, t_parallel = timed(lambda: fit_surface(*args, config={'max_workers': None,
+                                                                    'parallel_min_expiries': 1}))
+    assert parallel.params.equals(surface.params), "进程池拟合参数与串行拟合不一致"
+    print(f"串行拟合:     {t_serial * 1000:8.1f} ms")
+    print(f"进程池拟合:   {t_parallel * 1000:8.1f} ms（{os.cpu_count()} 核，含进程启动开销）")
+    print(f"最大 IV 拟合误差 (RMSE): {surface.params['rmse'].max():.4f}")
+    assert surface.params['rmse'].max() < 2 * IV_NOISE, "拟合误差超过 IV 噪声水平"
+
+    # 曲面在各合约上的 IV 与无噪声的生成微笑对比
+    fitted = surface.iv_for_expiry(df['strike_price'], df['expiration_date'], valuation_time=VALUATION_TIME)
+    error = np.abs(fitted - exact['mid_iv'].to_numpy())
+    print(f"相对生成微笑的最大 IV 误差: {error.max():.4f}")
+    assert error.max() < 3 * IV_NOISE, "曲面未能还原生成期权链的微笑"
+
+    cache_dir = tempfile.mkdtemp(prefix='surface_bench_')
+    try:
+        config = {'max_workers': 1, 'cache_dir': cache_dir}
+        missed, t_miss = timed(lambda: load_or_fit_surface(*args, config=config, tag='bench'))
+        cached, t_hit = timed(lambda: load_or_fit_surface(*args, config=config, tag='bench'))
+        for result in (missed, cached):
+            assert np.allclose(result.params.to_numpy(dtype=float), surface.params.to_numpy(dtype=float),
+                               rtol=0, atol=1e-12), "缓存读取的参数与串行拟合不一致"
+        print(f"缓存未命中:   {t_miss * 1000:8.1f} ms（拟合 + 写入）")
+        print(f"缓存命中:     {t_hit * 1000:8.1f} ms（哈希快照 + 读取参数）")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    n_query = 1_000_000
+    rng = np.random.default_rng(1)
+    strikes = SPOT * np.exp(rng.uniform(-1, 0.7, n_query))
+    t = rng.uniform(1 / 365, 1.5, n_query)
+    iv, t_query = timed(lambda: surface.iv(strikes, t, valuation_time=VALUATION_TIME))
+    print(f"曲面查询:     {t_query * 1000:8.1f} ms / {n_query:,} 点"
+          f"（{t_query / n_query * 1e9:.0f} ns/点，有效 {np.isfinite(iv).mean():.1%}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史快照存储结构演变校验（common/snapshot_store.py）
+依次追加三个快照：
+- 第一个快照中 mark_iv 全为空（Arrow null 类型），之后的快照为浮点数
+- 第二个快照新增 bid_iv 列，第三个快照的 contracts 由整数变为浮点数
+全部快照都应可查询：早期快照中缺失或全为空的值为 NaN，新增列可见
+
+用法: python check_history.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.snapshot_store import append_snapshot, query_snapshots, snapshot_times, symbol_history
+from common.synthetic import synthetic_chain
+
+SYMBOL_COLUMNS = ['symbol', 'vega', 'theta']
+
+
+def main():
+    chain = synthetic_chain(n_expiries=3, n_strikes=10)[SYMBOL_COLUMNS]
+    times = pd.date_range('2025-10-15 08:00', periods=3, freq='D')
+    snapshots = [
+        chain.assign(mark_iv=pd.Series([None] * len(chain), dtype=object), contracts=1),
+        chain.assign(mark_iv=0.5, bid_iv=0.45, contracts=2),
+        chain.assign(mark_iv=0.6, bid_iv=0.55, contracts=2.5),
+    ]
+    root = tempfile.mkdtemp(prefix='put2_history_')
+    try:
+        for when, snapshot in zip(times, snapshots):
+            append_snapshot(snapshot, root, when)
+
+        everything = query_snapshots(root)
+        print(f"全部快照: {len(everything)} 行，列 {', '.join(everything.columns)}")
+        assert len(everything) == 3 * len(chain)
+        assert list(snapshot_times(root)) == list(times)
+
+        symbol = chain['symbol'].iloc[5]
+        history = symbol_history(root, symbol, ['mark_iv', 'bid_iv', 'contracts'], days=10, end=times[-1])
+        print(f"{symbol} 的历史:\n{history}")
+        expected = pd.DataFrame({'mark_iv': [np.nan, 0.5, 0.6], 'bid_iv': [np.nan, 0.45, 0.55],
+                                 'contracts': [1.0, 2.0, 2.5]}, index=times)
+        assert np.allclose(history.to_numpy(dtype=float), expected.to_numpy(), equal_nan=True), \
+            "结构变化后的快照查询结果不正确"
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("历史快照结构演变校验通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+隐含波动率求解回归校验（common/implied_vol.py）
+- 往返：Black-76 价格反解的 IV 与输入波动率一致（深度虚值到深度实值、一周到一年、看涨/看跌）
+- 深度实值：按平价关系换成虚值期权求解，与同行权价虚值期权的 IV 相同
+- 无解：价格低于内在价值、不低于上限（看涨 F / 看跌 K）、到期时间 ≤ 0、缺失值 → NaN 且未收敛
+- 整条链：common.synthetic 模拟链的币本位标记价经 chain_implied_vols 反解回生成时的微笑
+
+用法: python check_implied_vol.py
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.implied_vol import chain_implied_vols, implied_vol
+from common.pricing import DAYS_PER_YEAR, black76
+from common.synthetic import VALUATION_TIME, synthetic_chain
+
+SPOT = 65000.0
+
+
+def check_round_trip():
+    strikes = SPOT * np.exp(np.linspace(-1.2, 0.8, 41))
+    t = np.array([7, 30, 90, 365]) / DAYS_PER_YEAR
+    vol = np.array([0.05, 0.3, 0.8, 2.0])
+    k, tt, sig = (a.ravel() for a in np.meshgrid(strikes, t, vol, indexing='ij'))
+    for is_call in (True, False):
+        price = black76(SPOT, k, tt, sig, is_call)['price']
+        iv, converged = implied_vol(price, SPOT, k, tt, is_call)
+        # 时间价值低于浮点精度（约 1e-12 · max(F, K)）的深度实值/虚值无法确定波动率，不要求收敛
+        intrinsic = np.maximum((SPOT - k) if is_call else (k - SPOT), 0)
+        resolvable = price - intrinsic > 1e-9 * np.maximum(SPOT, k)
+        label = '看涨' if is_call else '看跌'
+        err = np.max(np.abs(iv[resolvable] - sig[resolvable]) / sig[resolvable])
+        print(f"{label} 往返: {int(resolvable.sum())}/{len(k)} 行可解，最大相对误差 {err:.2e}")
+        assert converged[resolvable].all(), f"{label} 有可解的行未收敛"
+        assert err < 1e-6, f"{label} IV 往返误差过大"
+        assert np.array_equal(np.isnan(iv), ~converged), "未收敛的行应为 NaN"
+        # 接近精度下限仍收敛的行，IV 也不能偏离输入
+        assert np.max(np.abs(iv[converged] - sig[converged]) / sig[converged]) < 1e-5, \
+            f"{label} 接近精度下限的行收敛到错误的 IV"
+
+
+def check_deep_itm():
+    strikes = np.array([0.3, 0.5, 1.5, 2.0]) * SPOT
+    t, sig = 30 / DAYS_PER_YEAR, 0.7
+    is_call = strikes < SPOT                     # 全部为深度实值
+    itm = black76(SPOT, strikes, t, sig, is_call)['price']
+    otm = black76(SPOT, strikes, t, sig, ~is_call)['price']
+    iv_itm, conv_itm = implied_vol(itm, SPOT, strikes, t, is_call)
+    iv_otm, conv_otm = implied_vol(otm, SPOT, strikes, t, ~is_call)
+    print(f"深度实值 IV: {np.round(iv_itm, 6)}（虚值 {np.round(iv_otm, 6)}）")
+    assert conv_itm.all() and conv_otm.all(), "深度实值/虚值应当收敛"
+    assert np.allclose(iv_itm, sig, rtol=1e-6) and np.allclose(iv_itm, iv_otm, rtol=1e-6), \
+        "深度实值与虚值期权的 IV 应一致"
+
+
+def check_no_solution():
+    k = 60000.0
+    cases = {
+        '看跌低于内在价值': (k - SPOT - 1.0, k * 1.1, False, 0.1),
+        '看涨低于内在价值': (SPOT - k - 1.0, k, True, 0.1),
+        '看涨不低于远期价': (SPOT, k, True, 0.1),
+        '看跌不低于行权价': (k, k, False, 0.1),
+        '价格为零': (0.0, k, False, 0.1),
+        '到期时间为零': (1000.0, k, False, 0.0),
+        '到期时间为负': (1000.0, k, False, -0.1),
+        '价格缺失': (np.nan, k, False, 0.1),
+    }
+    for name, (price, strike, is_call, t) in cases.items():
+        iv, converged = implied_vol(price, SPOT, strike, t, is_call)
+        assert np.isnan(iv) and not converged, f"{name}: 应无解，得到 {iv}"
+    print(f"无解的 {len(cases)} 种情形均为 NaN 且未收敛")
+
+
+def check_chain():
+    chain = synthetic_chain(n_expiries=12, n_strikes=100, spot=SPOT, option_types=('P', 'C'))
+    ivs = chain_implied_vols({'mark': chain['mark_price']}, chain['strike_price'], chain['expiration_date'],
+                             chain['option_type'], SPOT, valuation_time=VALUATION_TIME)
+    err = np.abs(ivs['mark_iv'].to_numpy() - chain['mid_iv'].to_numpy())
+    solved = ~np.isnan(err)
+    print(f"模拟链 {len(chain)} 个合约: {int(solved.sum())} 个可解，标记价 IV 最大误差 {np.nanmax(err):.2e}")
+    assert solved.mean() > 0.99, "模拟链大部分合约应当可解"
+    assert np.nanmax(err) < 1e-6, "标记价 IV 与生成时的微笑不一致"
+
+
+def main():
+    check_round_trip()
+    check_deep_itm()
+    check_no_solution()
+    check_chain()
+    print("隐含波动率求解校验通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量模式快照比对校验
+用模拟期权链（common.synthetic，部分合约缺失希腊字母与IV，需由 Black-76 补全）写出交易所格式的CSV，
+按 put2 的流程加载三次：
+- 估值时刻不同、CSV 未变化的两次加载：模型补全值随估值时刻变化，但快照比对结果应为空
+- 修改一个合约的报价后：只有该合约被判定为变化
+
+用法: python check_incremental.py
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import put2
+from common.snapshot_diff import diff_snapshots
+from common.synthetic import export_frame, synthetic_chain
+
+SPOT = 65000.0
+
+
+def load(valuation_time):
+    """按 put2 的流程加载数据文件夹，返回 (看跌期权链, 快照指纹)"""
+    put2.GREEKS_CONFIG['valuation_time'] = valuation_time
+    fingerprints = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = put2.load_and_clean_data(('P',), fingerprints)
+    return df, pd.concat(fingerprints)
+
+
+def main():
+    today = pd.Timestamp.now().normalize()
+    chain = synthetic_chain(n_expiries=6, n_strikes=40, spot=SPOT, option_types=('P', 'C'),
+                            valuation_time=today + pd.Timedelta(hours=8), missing_greeks=0.1)
+    rng = np.random.default_rng(1)
+    chain.loc[rng.random(len(chain)) < 0.1, ['bid_iv', 'ask_iv']] = np.nan
+
+    data_dir = tempfile.mkdtemp(prefix='put2_incremental_')
+    csv_path = os.path.join(data_dir, 'BTC-export.csv')
+    put2.DATA_FOLDER, put2.SPOT_PRICE, put2.UNDERLYING_ASSET = data_dir, SPOT, 'BTC'
+    try:
+        export_frame(chain).to_csv(csv_path, index=False)
+        first, fp_first = load(today + pd.Timedelta(hours=1))
+        second, fp_second = load(today + pd.Timedelta(hours=3))
+
+        filled = first['delta'].to_numpy() != second['delta'].to_numpy()
+        print(f"两次加载之间模型补全的 delta 不同的合约: {int(filled.sum())} 个")
+        assert filled.any(), "估值时刻不同，模型补全的希腊字母应当不同"
+        diff = diff_snapshots(fp_first, fp_second)
+        print(f"CSV 未变化: {diff.summary()}")
+        assert diff.is_empty, "CSV 未变化时快照比对结果应为空"
+
+        symbol = first['symbol'].iloc[len(first) // 2]
+        chain.loc[chain['symbol'] == symbol, 'bid_price'] *= 1.1
+        export_frame(chain).to_csv(csv_path, index=False)
+        _, fp_third = load(today + pd.Timedelta(hours=3))
+        diff = diff_snapshots(fp_second, fp_third)
+        print(f"修改 {symbol} 的买价后: {diff.summary()}")
+        assert list(diff.changed) == [symbol] and len(diff.added) == 0 and len(diff.removed) == 0, \
+            "只有被修改的合约应判定为变化"
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print("增量快照比对校验通过")
+
+
+if __name__ == '__main__':
+    main()
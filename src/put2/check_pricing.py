@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Black-76 定价与希腊字母回归校验（common/pricing.py）
+在覆盖深度虚值到深度实值、一周到一年的网格上校验：
+- 正态分布函数：Hart 近似（未安装 scipy 时使用）与 math.erf 一致
+- 看涨 - 看跌 = F - K（零利率平价关系），价格不低于内在价值
+- Delta / Gamma / Vega / Theta 与价格的中心差分一致（Vega 按 1 个百分点，Theta 按每日）
+- 无效输入（到期时间 ≤ 0、波动率 ≤ 0、缺失值）结果为 NaN
+
+用法: python check_pricing.py
+"""
+
+import math
+import os
+import sys
+
+import numpy as np
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.pricing import DAYS_PER_YEAR, _hart_ndtr, black76
+
+SPOT = 65000.0
+
+
+def grid():
+    """(行权价, 到期时间, 波动率) 网格，展平为一维"""
+    strikes = SPOT * np.exp(np.linspace(-1.5, 1.0, 41))
+    t = np.array([7, 30, 90, 365]) / DAYS_PER_YEAR
+    vol = np.array([0.2, 0.6, 1.2])
+    k, tt, sig = np.meshgrid(strikes, t, vol, indexing='ij')
+    return k.ravel(), tt.ravel(), sig.ravel()
+
+
+def check_norm_cdf():
+    x = np.linspace(-40, 40, 8001)
+    reference = np.array([0.5 * math.erfc(-v / math.sqrt(2)) for v in x])
+    err = np.max(np.abs(_hart_ndtr(x) - reference))
+    # 左尾（深度虚值的价格）看相对误差；x < -37 时 Hart 近似取 0
+    tail = (x < 0) & (x > -37)
+    rel = np.max(np.abs(_hart_ndtr(x[tail]) / reference[tail] - 1))
+    print(f"Hart 正态分布函数最大绝对误差: {err:.2e}，左尾最大相对误差: {rel:.2e}")
+    assert err < 1e-13, "Hart 近似与 math.erfc 不一致"
+    assert rel < 1e-7, "Hart 近似左尾相对误差过大"
+
+
+def check_parity(k, t, sig):
+    call = black76(SPOT, k, t, sig, True)
+    put = black76(SPOT, k, t, sig, False)
+    err = np.max(np.abs(call['price'] - put['price'] - (SPOT - k)))
+    print(f"平价关系最大误差: {err:.2e} 美元")
+    assert err < 1e-7 * SPOT, "看涨 - 看跌 ≠ F - K"
+    assert np.all(call['price'] >= np.maximum(SPOT - k, 0) - 1e-8 * SPOT), "看涨价格低于内在价值"
+    assert np.all(put['price'] >= np.maximum(k - SPOT, 0) - 1e-8 * SPOT), "看跌价格低于内在价值"
+    assert np.allclose(call['delta'] - put['delta'], 1.0), "看涨 Delta - 看跌 Delta ≠ 1"
+    for name in ('gamma', 'vega', 'theta'):
+        assert np.allclose(call[name], put[name], rtol=1e-10, atol=1e-12), f"看涨与看跌的 {name} 不同"
+
+
+def check_finite_differences(k, t, sig):
+    for is_call in (True, False):
+        model = black76(SPOT, k, t, sig, is_call)
+        price = lambda f=SPOT, tt=t, v=sig: black76(f, k, tt, v, is_call)['price']
+        h_f, h_v, h_t = SPOT * 1e-4, 1e-5, 1e-6
+        numeric = {
+            'delta': (price(f=SPOT + h_f) - price(f=SPOT - h_f)) / (2 * h_f),
+            'gamma': (price(f=SPOT + h_f) - 2 * model['price'] + price(f=SPOT - h_f)) / h_f ** 2,
+            # Vega 为波动率变动 1 个百分点的价格变化
+            'vega': (price(v=sig + h_v) - price(v=sig - h_v)) / (2 * h_v) / 100,
+            # Theta 为每日时间价值损耗（剩余时间减少）
+            'theta': -(price(tt=t + h_t) - price(tt=t - h_t)) / (2 * h_t) / DAYS_PER_YEAR,
+        }
+        label = '看涨' if is_call else '看跌'
+        for name, values in numeric.items():
+            scale = np.max(np.abs(model[name]))
+            err = np.max(np.abs(values - model[name])) / scale
+            print(f"{label} {name:<5} 中心差分最大相对误差（相对全网格最大值）: {err:.2e}")
+            assert err < 1e-4, f"{label} {name} 与中心差分不一致"
+
+
+def check_invalid():
+    out = black76(SPOT, [60000, 60000, 60000, np.nan, 60000], [0.1, 0.0, -0.1, 0.1, 0.1],
+                  [0.5, 0.5, 0.5, 0.5, 0.0], False)
+    for name, values in out.items():
+        assert np.isfinite(values[0]) and np.all(np.isnan(values[1:])), f"无效输入的 {name} 应为 NaN"
+    print("无效输入（到期时间 ≤ 0、波动率 ≤ 0、缺失值）结果为 NaN")
+
+
+def main():
+    k, t, sig = grid()
+    check_norm_cdf()
+    check_parity(k, t, sig)
+    check_finite_differences(k, t, sig)
+    check_invalid()
+    print("Black-76 定价校验通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合约代码解析一致性校验（common/symbols.py）
+- pyarrow extract_regex 路径与 pandas str.extract 回退路径对同一批代码（含格式错误的代码）结果相同
+- pandas str 类型（pyarrow 存储）拼接后的多块字符串列与 object 列结果相同
+- 与原来逐行解析的版本一致：put2 的 re.match + strptime（BTC、两位日期、整数行权价），
+  call 的 "-(\\d+)-C$" 行权价提取
+- 原逐行版本不支持或误判的写法（一位日期、小数行权价、其他标的、尾部多余字符）按新格式解析
+
+用法: python check_symbols.py
+"""
+
+import os
+import re
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import symbols
+from common.synthetic import synthetic_chain
+
+MALFORMED = [
+    'btc-26DEC25-65000-P',          # 小写标的
+    'BTC-26dec25-65000-P',          # 小写月份
+    'BTC-26DEC25-65000',            # 缺少看涨/看跌
+    'BTC-26DEC25--P',               # 缺少行权价
+    'BTC-26DEC25-65000-X',          # 未知类型
+    'BTC-26DEC25-65000-PX',         # 尾部多余字符
+    ' BTC-26DEC25-65000-P',         # 前导空格
+    'BTC-31FEB25-65000-P',          # 日期不存在
+    'BTC-260DEC25-65000-P',         # 三位日期
+    'BTC-26DEC25-65,000-P',         # 千分位
+    'BTC-26DEC25-6d-P',             # d 后缺少数字
+    'BTC-26DEC25-d5-P',             # 小数点前缺少数字
+    'BTC-26DEC25-65000.-P',         # 小数点后缺少数字
+    'BTC',
+    '',
+    None,
+    np.nan,
+]
+
+EDGE_CASES = [
+    'BTC-5JAN26-65000-P',           # 一位日期
+    'ETH-26DEC25-1200-C',
+    'XRP_USDC-27DEC25-2d5-C',       # 小数行权价
+    'SOL-26DEC25-150.5-P',
+]
+
+
+def legacy_put2(symbol):
+    """原 put2.extract_option_info 的逐行解析"""
+    match = re.match(r'BTC-(\d{2}[A-Z]{3}\d{2})-(\d+)-([CP])', symbol)
+    if not match:
+        return None
+    date_str, strike_str, option_type = match.groups()
+    try:
+        exp_date = datetime.strptime(date_str, '%d%b%y').date()
+    except ValueError:
+        exp_date = None
+    return exp_date, float(strike_str), option_type
+
+
+def legacy_call_strike(symbol):
+    """原 yqcallxjb 的看涨期权行权价提取"""
+    found = re.findall(r"-(\d+)-C$", symbol)
+    return int(found[0]) if found else None
+
+
+def parse_fallback(values):
+    """强制走 pandas str.extract 回退路径"""
+    saved = symbols.pa, symbols.pc
+    symbols.pa, symbols.pc = None, None
+    try:
+        return symbols.parse_option_symbols(values)
+    finally:
+        symbols.pa, symbols.pc = saved
+
+
+def as_rows(parsed):
+    """解析结果 → 可直接比较的 (asset, expiry, strike, option_type) 元组列表，缺失值统一为 None"""
+    frame = parsed.astype(object).where(parsed.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+
+def check_paths(values):
+    if symbols.pc is None:
+        print("未安装 pyarrow，只能校验回退路径")
+        return parse_fallback(values)
+    fast = symbols.parse_option_symbols(values)
+    slow = parse_fallback(values)
+    assert fast.index.equals(slow.index)
+    assert str(fast['expiry'].dtype) == str(slow['expiry'].dtype) == 'datetime64[ns]'
+    assert fast['strike'].dtype == slow['strike'].dtype == np.float64
+    mismatched = [(s, a, b) for s, a, b in zip(values, as_rows(fast), as_rows(slow)) if a != b]
+    assert not mismatched, f"pyarrow 路径与 str.extract 回退路径不一致: {mismatched[:5]}"
+    print(f"pyarrow 路径与回退路径一致: {len(values)} 个代码（其中 {len(MALFORMED)} 个格式错误）")
+    return fast
+
+
+def check_chunked(values, parsed):
+    """多个 CSV 拼接后的 str 列在 pyarrow 中为多块数组"""
+    half = len(values) // 2
+    chunked = pd.concat([values[:half].astype('str'), values[half:].astype('str')])
+    assert as_rows(symbols.parse_option_symbols(chunked)) == as_rows(parsed), "拼接后的 str 列解析结果不一致"
+    print(f"拼接后的 str 列（{chunked.dtype}）与 object 列结果一致")
+
+
+def check_legacy(values, parsed):
+    compared = 0
+    for symbol, (asset, expiry, strike, option_type) in zip(values, as_rows(parsed)):
+        if not isinstance(symbol, str) or not re.fullmatch(r'BTC-\d{2}[A-Z]{3}\d{2}-\d+-[CP]', symbol):
+            continue
+        exp_date, old_strike, old_type = legacy_put2(symbol)
+        assert (None if expiry is None else expiry.date()) == exp_date, symbol
+        assert strike == old_strike and option_type == old_type, symbol
+        if option_type == 'C':
+            assert strike == legacy_call_strike(symbol), symbol
+        compared += 1
+    print(f"与原逐行解析一致: {compared} 个 BTC 代码")
+
+
+def check_edge_cases():
+    parsed = symbols.parse_option_symbols(pd.Series(EDGE_CASES + MALFORMED, dtype=object))
+    rows = dict(zip(EDGE_CASES, as_rows(parsed)))
+    assert rows['BTC-5JAN26-65000-P'] == ('BTC', pd.Timestamp('2026-01-05'), 65000.0, 'P')
+    assert rows['XRP_USDC-27DEC25-2d5-C'][2] == 2.5
+    assert rows['SOL-26DEC25-150.5-P'][2] == 150.5
+    assert legacy_put2('BTC-5JAN26-65000-P') is None, "原解析不支持一位日期"
+    assert legacy_put2('BTC-26DEC25-65000-PX') is not None, "原解析不检查尾部字符"
+
+    malformed = parsed.iloc[len(EDGE_CASES):].reset_index(drop=True)
+    valid_only_expiry = {'BTC-31FEB25-65000-P'}   # 格式正确，日期不存在：只有到期日为 NaT
+    for symbol, row in zip(MALFORMED, as_rows(malformed)):
+        if symbol in valid_only_expiry:
+            assert row == ('BTC', None, 65000.0, 'P'), (symbol, row)
+        else:
+            assert row == (None, None, None, None), (symbol, row)
+    print(f"边界写法 {len(EDGE_CASES)} 个、格式错误 {len(MALFORMED)} 个均按预期解析")
+
+
+def main():
+    chain = synthetic_chain(n_expiries=12, n_strikes=50, option_types=('P', 'C'))
+    values = pd.Series(list(chain['symbol']) + EDGE_CASES + MALFORMED, dtype=object)
+    values = values.sample(frac=1, random_state=0).reset_index(drop=True)
+    parsed = check_paths(values)
+    check_chunked(values, parsed)
+    check_legacy(values, parsed)
+    check_edge_cases()
+    print("合约代码解析校验通过")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+历史快照查询
+从 put2.py 写入的历史快照库（SNAPSHOT_STORE_CONFIG）中读取某个合约一段时间内的指标，
+分区裁剪 + 谓词下推，只读取命中的到期日目录
+
+用法: python history.py 合约代码 [指标列 ...] [--days 30] [--root data/.snapshot_store]
+示例: python history.py BTC-26DEC25-65000-P vega_to_theta_ratio gamma_to_theta_ratio --days 30
+      python history.py BTC-27MAR26-70000-C Vega/Theta Score --root ../call/data/.call_snapshot_store --symbol-col 产品
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.snapshot_store import symbol_history
+
+DEFAULT_ROOT = os.path.join('data', '.snapshot_store')
+DEFAULT_COLUMNS = ['mid_price', 'mid_iv', 'delta', 'vega_to_theta_ratio', 'gamma_to_theta_ratio']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询合约的历史指标")
+    parser.add_argument("symbol", help="合约代码，如 BTC-26DEC25-65000-P")
+    parser.add_argument("columns", nargs="*", default=DEFAULT_COLUMNS, help="指标列（默认: %(default)s）")
+    parser.add_argument("--days", type=float, default=30, help="回看天数（默认 30）")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help=f"快照库目录（默认 {DEFAULT_ROOT}）")
+    parser.add_argument("--symbol-col", default="symbol",
+                        help="合约代码列名（默认 symbol；查询看涨分析的快照库时为 产品）")
+    parser.add_argument("--csv", help="结果另存为CSV文件")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    history = symbol_history(args.root, args.symbol, args.columns, days=args.days, symbol_col=args.symbol_col)
+    elapsed = time.perf_counter() - start
+
+    if history.empty:
+        print(f"{args.root} 中没有 {args.symbol} 最近 {args.days:g} 天的快照")
+        return
+    print(f"{args.symbol} 最近 {args.days:g} 天: {len(history)} 个快照（查询耗时 {elapsed * 1000:.1f} ms）")
+    print(history.to_string())
+    if args.csv:
+        history.to_csv(args.csv, encoding='utf-8-sig')
+        print(f"\n结果已保存至: {args.csv}")
+
+
+if __name__ == '__main__':
+    main()
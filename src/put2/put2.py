@@ -8,17 +8,35 @@
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
-import re
+import sys
+import heapq
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置中文字体支持
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
+# 共享模块位于 src/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.band_index import ALL_GROUPS, BandIndex
+from common.chain_cache import load_chain
+from common.implied_vol import chain_implied_vols
+from common.monte_carlo import SIMULATION_COLUMNS, log_returns, simulate_hedges
+from common.payoff import (breakevens, curve_extremes, expiry_pnl, make_strategy, pre_expiry_pnl,
+                           price_grid, stack_strategies)
+from common.pricing import chain_greeks, fill_missing_greeks, greek_deviation
+from common.ranking import top_k, top_k_frame
+from common.results import AnalysisResult, Leg, Score, Strategy
+from common.render import ChartRenderer, pyplot
+from common.snapshot_diff import diff_snapshots, load_state, row_fingerprints, save_state, touched_groups
+from common.snapshot_store import append_snapshot
+from common.vol_surface import load_or_fit_surface
+from common.symbols import parse_option_symbols
+from report import ReportContext, iter_expiry_groups, make_renderers, render_report
+from strategy_search import STRUCTURES, search_strategies, to_payoff_strategy
+
+# 中文字体支持（matplotlib 只在绘图时导入，见 common.render.pyplot）
+CHART_FONTS = ['SimHei', 'Arial Unicode MS', 'DejaVu Sans']
 
 # =============================================================================
 # 用户配置区域
@@ -30,6 +48,9 @@ DATA_FOLDER = 'data'
 # 现货价格 (设为None时将在运行时提示用户输入)
 SPOT_PRICE = None
 
+# 标的资产（按合约代码前缀筛选，如 'BTC'、'ETH'；设为None时不筛选）
+UNDERLYING_ASSET = 'BTC'
+
 # 策略配置
 STRATEGY_CONFIG = {
     'full_protection_put': {'min_delta': -0.55, 'max_delta': -0.45},
@@ -43,9 +64,109 @@ STRATEGY_CONFIG = {
     }
 }
 
+# 价差搜索配置
+SPREAD_SEARCH_CONFIG = {
+    'top_n_per_expiry': 5,            # 每个到期日保留的最优价差组合数量
+    'max_workers': None,              # 进程池大小（None为CPU核数，1为不启用进程池）
+    'parallel_min_pairs': 2_000_000,  # 组合总数达到该值时才启用进程池
+}
+
+# 多腿策略搜索（strategy_search.py）：垂直价差、比例价差、蝶式、领口，按每腿 Delta 区间与权利金预算剪枝；
+# structures 中可覆盖某结构的 delta_bands，或设为 None 跳过该结构（默认区间见 strategy_search.SEARCH_DEFAULTS）
+STRATEGY_SEARCH_CONFIG = {
+    'enabled': True,
+    'top_k': 10,                      # 每种结构保留的组合数
+    'rank_by': 'reward_risk_ratio',   # 排序指标：reward_risk_ratio / expected_value / success_prob
+    'max_debit_pct': 0.05,            # 净权利金支出上限（现货价的比例）
+    'min_risk_pct': 0.002,            # 最大亏损下限（现货价的比例），过滤净支出接近 0、盈亏比虚高的组合
+    'pricing': 'quote',               # 净权利金计价：quote（买入腿卖价、卖出腿买价）/ mid（中间价）
+    'min_success_prob': 0.25,         # 盈利概率下限（对数正态估计）
+    'structures': {},
+}
+
+# 蒙特卡洛对冲效果模拟（common/monte_carlo.py）：在同一批价格路径上评估全部单腿与价差候选，
+# 输出期望盈亏、盈利概率，以及持有 1 个现货时相对不对冲的尾部损失（CVaR）降低
+MONTE_CARLO_CONFIG = {
+    'enabled': True,
+    'model': 'gbm',            # 路径模型：gbm / jump（Merton 跳跃扩散）/ bootstrap（历史日收益重抽样）
+    'n_paths': 100_000,        # 路径总数
+    'chunk_size': 20_000,      # 每块路径数（控制内存占用）
+    'seed': 42,                # 随机种子（固定则结果可复现）
+    'tail_quantile': 0.05,     # CVaR 尾部比例
+    'history_file': None,      # bootstrap 使用的历史价格CSV（按时间升序，取 close 列）
+    'max_workers': None,       # 进程池大小（None为CPU核数，1为不启用进程池）
+}
+
+# Black-76 模型配置：隐含波动率反解与希腊字母重算（现货价 + 中间隐含波动率）
+GREEKS_CONFIG = {
+    'solve_missing_iv': True,   # 交易所未提供 IV 报价/询价时由买价/卖价反解，并输出标记价格隐含的 mark_iv
+    'fill_missing': True,       # 补全交易所缺失（"-"）的 delta/gamma/theta/vega，避免流动性差的行权价被丢弃
+    'check_tolerance': 0.05,    # 与交易所数值相对偏差超过该比例时打印提示，None 为不校验
+    'valuation_time': None,     # 估值时刻（如 '2025-10-17 08:00'），None 为当前 UTC 时间
+}
+
+# 波动率曲面配置（每个到期日 SVI 拟合，到期日之间按总方差插值；同一快照复用缓存的拟合参数）
+VOL_SURFACE_CONFIG = {
+    'enabled': True,
+    'max_workers': None,              # 进程池大小（None为CPU核数，1为不启用进程池）
+    'parallel_min_expiries': 8,       # 到期日数量达到该值时才并行拟合
+    'use_cache': True,
+    'cache_dir': os.path.join(DATA_FOLDER, '.surface_cache'),
+}
+
+# 增量模式：与上一次运行的快照比对，只为变化的合约重算指标、只重新搜索受影响到期日的价差
+# （现货价、标的、策略配置或运行日期变化时自动全量计算）
+INCREMENTAL_CONFIG = {
+    'enabled': True,
+    'state_dir': os.path.join(DATA_FOLDER, '.snapshot_state'),
+}
+
+# 历史快照库：每次运行的期权链与指标追加到按 日期/标的/到期日 分区的 Parquet 数据集，
+# 供 history.py 查询某合约一段时间内的指标变化（快照时刻取数据CSV的修改时间，重复运行不会重复写入）
+SNAPSHOT_STORE_CONFIG = {
+    'enabled': True,
+    'root': os.path.join(DATA_FOLDER, '.snapshot_store'),
+}
+
 # 输出文件夹
 OUTPUT_FOLDER = 'export'
 
+# 报告配置（report.py）：期权数据与各策略结果只按到期日分组一次，逐个到期日流式交给各渲染器
+REPORT_CONFIG = {
+    'formats': ['console', 'markdown'],   # 可选：console / markdown / html / json
+    'top_n': 3,                           # 每个到期日每种策略列出的组合数（json 输出全部结果行）
+}
+
+# 机器可读结果（common/results.py）：每次运行额外导出全部候选策略，format 为 'arrow'（Arrow IPC）/ 'jsonl'，None 为不导出
+RESULT_EXPORT_CONFIG = {
+    'format': None,
+}
+
+# 进程内调用 run_analysis(chain, config) 的默认参数（不清空/写入 export 文件夹，不生成报告与图表）
+ANALYSIS_DEFAULTS = {
+    'spot_price': None,          # 现货价格，None 时使用 SPOT_PRICE
+    'strategy_search': True,     # 是否运行多腿策略搜索
+    'monte_carlo': True,         # 是否运行蒙特卡洛对冲模拟
+    'strategy_config': None,     # 覆盖 STRATEGY_CONFIG 的单腿/价差 Delta 区间，None 时使用 STRATEGY_CONFIG
+}
+
+# 图表渲染配置（进程池渲染；数据未变化时复用 .render_cache/ 中的图表）
+RENDER_CONFIG = {
+    'dpi': 150,            # 输出分辨率
+    'format': 'png',       # 输出格式：png / svg / webp
+    'max_workers': 2,      # 渲染进程数
+    'use_cache': True,     # 数据未变化时跳过重新渲染
+}
+
+# 盈亏图配置（common/payoff.py）：同一张图叠加多个策略的到期盈亏（实线）与到期前盈亏（虚线，Black-76 按各腿当前IV定价）
+PAYOFF_CONFIG = {
+    'top_n': 3,            # 熊市看跌价差盈亏图叠加的组合数量（多腿策略图叠加每种结构的最优组合）
+    'points': 1001,        # 价格网格点数
+    'padding': 0.2,        # 价格网格在行权价/现货价两侧的延伸比例
+    'pre_expiry': True,    # 是否叠加到期前盈亏曲线
+    'elapsed_days': 0,     # 到期前盈亏的估值时点（距今天数）
+}
+
 # =============================================================================
 # 核心功能函数
 # =============================================================================
@@ -95,9 +216,12 @@ def get_spot_price():
     print(f"使用现货价格: ${SPOT_PRICE:,.2f}")
     return SPOT_PRICE
 
-def load_and_clean_data():
+def load_and_clean_data(option_types=('P',), fingerprints=None):
     """
     加载并清洗期权数据
+    option_types: 保留的期权类型，默认只保留看跌期权；多腿策略搜索需要同时加载看涨期权
+    fingerprints: 传入列表时追加每个文件看跌期权的逐行指纹（增量模式用），
+                  在模型补全 IV / 希腊字母之前计算，只反映 CSV 中的报价
     """
     print("正在加载期权数据...")
     
@@ -118,38 +242,21 @@ def load_and_clean_data():
         file_path = os.path.join(DATA_FOLDER, file)
         print(f"正在处理文件: {file}")
         
-        # 读取CSV文件
-        df = pd.read_csv(file_path)
+        # 读取CSV文件（命中列式缓存时跳过列名映射、代码解析与类型转换）
+        df = load_chain(file_path, prepare_chain, tag='put2')
         
-        # 列名映射
-        column_mapping = {
-            '产品': 'symbol',
-            '买价': 'bid_price',
-            '卖价': 'ask_price',
-            'Δ|增量': 'delta',
-            'Gamma': 'gamma',
-            'Theta': 'theta',
-            'Vega': 'vega',
-            'IV 报价': 'bid_iv',
-            'IV 询价': 'ask_iv',
-            '标记': 'mark_price'
-        }
-        
-        # 重命名列
-        df = df.rename(columns=column_mapping)
-        
-        # 提取期权信息
-        df = extract_option_info(df)
-        
-        # 只保留看跌期权
-        df = df[df['option_type'] == 'P'].copy()
+        # 只保留指定标的、指定类型的期权
+        mask = df['option_type'].isin(option_types)
+        if UNDERLYING_ASSET is not None:
+            mask &= df['asset'] == UNDERLYING_ASSET
+        df = df[mask].copy()
         
-        if len(df) == 0:
+        if not (df['option_type'] == 'P').any():
             print(f"警告: 文件 {file} 中没有找到看跌期权数据")
             continue
         
-        # 数据类型转换
-        df = convert_data_types(df)
+        if fingerprints is not None:
+            fingerprints.append(row_fingerprints(df[df['option_type'] == 'P'], 'symbol', SNAPSHOT_COLUMNS))
         
         # 计算辅助列
         df = calculate_auxiliary_columns(df)
@@ -162,44 +269,51 @@ def load_and_clean_data():
     # 合并所有数据
     combined_df = pd.concat(all_data, ignore_index=True)
     
-    print(f"成功加载 {len(combined_df)} 条看跌期权数据")
+    n_calls = int((combined_df['option_type'] == 'C').sum())
+    print(f"成功加载 {len(combined_df) - n_calls} 条看跌期权数据" +
+          (f"（另有 {n_calls} 条看涨期权用于多腿策略搜索）" if n_calls else ""))
     return combined_df
 
-def extract_option_info(df):
+def prepare_chain(df):
     """
-    从symbol列提取期权信息
+    清洗原始CSV数据：列名映射、提取期权信息、数据类型转换
+    结果与现货价格无关，由 load_chain 缓存
     """
-    def parse_symbol(symbol):
-        # 匹配格式: BTC-26DEC25-65000-P
-        pattern = r'BTC-(\d{2}[A-Z]{3}\d{2})-(\d+)-([CP])'
-        match = re.match(pattern, symbol)
-        
-        if match:
-            date_str, strike_str, option_type = match.groups()
-            # 解析日期
-            try:
-                exp_date = datetime.strptime(date_str, '%d%b%y').date()
-            except:
-                exp_date = None
-            
-            return {
-                'expiration_date': exp_date,
-                'strike_price': float(strike_str),
-                'option_type': option_type
-            }
-        else:
-            return {
-                'expiration_date': None,
-                'strike_price': None,
-                'option_type': None
-            }
+    # 列名映射
+    column_mapping = {
+        '产品': 'symbol',
+        '买价': 'bid_price',
+        '卖价': 'ask_price',
+        'Δ|增量': 'delta',
+        'Gamma': 'gamma',
+        'Theta': 'theta',
+        'Vega': 'vega',
+        'IV 报价': 'bid_iv',
+        'IV 询价': 'ask_iv',
+        '标记': 'mark_price'
+    }
+    
+    # 重命名列
+    df = df.rename(columns=column_mapping)
+    
+    # 提取期权信息
+    df = extract_option_info(df)
     
-    # 应用解析函数
-    option_info = df['symbol'].apply(parse_symbol)
-    option_df = pd.DataFrame(option_info.tolist())
+    # 数据类型转换
+    df = convert_data_types(df)
+    
+    return df
+
+def extract_option_info(df):
+    """
+    从symbol列提取期权信息（标的、到期日、行权价、期权类型）
+    """
+    parsed = parse_option_symbols(df['symbol'])
     
-    # 合并到原DataFrame
-    df = pd.concat([df, option_df], axis=1)
+    df['asset'] = parsed['asset']
+    df['expiration_date'] = parsed['expiry'].dt.date
+    df['strike_price'] = parsed['strike']
+    df['option_type'] = parsed['option_type']
     
     return df
 
@@ -231,15 +345,70 @@ def calculate_auxiliary_columns(df):
     # 中间价格（币本位统计，需要乘以标的价格）
     df['mid_price'] = (df['bid_price'] + df['ask_price']) / 2 * SPOT_PRICE
     
+    # 由买价/卖价/标记价格反解隐含波动率，补全交易所缺失的IV
+    if GREEKS_CONFIG['solve_missing_iv']:
+        df = solve_implied_vols(df)
+    
     # 中间隐含波动率（除以100，因为原始数据被扩大了100倍）
     df['mid_iv'] = (df['bid_iv'] + df['ask_iv']) / 2 / 100
     
     # 计算到期天数
-    today = date.today()
-    df['days_to_expiration'] = df['expiration_date'].apply(
-        lambda x: (x - today).days if pd.notna(x) else np.nan
-    )
+    today = pd.Timestamp(date.today())
+    df['days_to_expiration'] = (pd.to_datetime(df['expiration_date']) - today).dt.days
     
+    # Black-76 重算希腊字母：交叉校验并补全缺失值
+    if GREEKS_CONFIG['fill_missing'] or GREEKS_CONFIG['check_tolerance'] is not None:
+        df = recompute_greeks(df)
+    
+    return df
+
+def solve_implied_vols(df):
+    """
+    Black-76 反解买价/卖价/标记价格（币本位，按现货价换算）的隐含波动率
+    只补全 bid_iv / ask_iv 的缺失值（百分数，与交易所一致），标记价格的IV写入 mark_iv
+    """
+    prices = {side: df[f'{side}_price'] for side in ('bid', 'ask', 'mark') if f'{side}_price' in df.columns}
+    solved = chain_implied_vols(prices, df['strike_price'], df['expiration_date'], df['option_type'],
+                                SPOT_PRICE, coin=True, valuation_time=GREEKS_CONFIG['valuation_time'])
+    filled = {}
+    for side in ('bid', 'ask'):
+        col = f'{side}_iv'
+        if col not in solved.columns:
+            continue
+        if col not in df.columns:
+            df[col] = np.nan
+        values = df[col].to_numpy(dtype=float)
+        gap = np.isnan(values) & solved[col].notna().to_numpy()
+        df[col] = np.where(gap, solved[col].to_numpy() * 100, values)
+        filled[col] = int(gap.sum())
+    if 'mark_iv' in solved.columns:
+        df['mark_iv'] = solved['mark_iv'].to_numpy() * 100
+    if any(filled.values()):
+        print("已由价格反解补全缺失的隐含波动率: " + ", ".join(f"{c} {n}" for c, n in filled.items() if n))
+    return df
+
+def recompute_greeks(df):
+    """
+    用 Black-76 重算整条期权链的价格与希腊字母
+    与交易所数值（币本位标记价格按现货价换算）交叉校验，并补全缺失的希腊字母
+    """
+    # 只有一侧 IV 报价时用该侧代替中间值
+    iv = df['mid_iv'].fillna(df[['bid_iv', 'ask_iv']].mean(axis=1) / 100)
+    model = chain_greeks(df['strike_price'], df['expiration_date'], df['option_type'],
+                         SPOT_PRICE, iv, valuation_time=GREEKS_CONFIG['valuation_time'])
+    greek_columns = {col: col for col in ('delta', 'gamma', 'theta', 'vega')}
+
+    tolerance = GREEKS_CONFIG['check_tolerance']
+    if tolerance is not None:
+        _, flagged = greek_deviation(df, model, {**greek_columns, 'mark_price': 'price_coin'}, tolerance=tolerance)
+        if flagged.any():
+            print(f"提示: {flagged.sum()} 个合约的交易所希腊字母/标记价格与 Black-76 模型偏差超过 {tolerance:.0%}")
+
+    if GREEKS_CONFIG['fill_missing']:
+        filled = fill_missing_greeks(df, model, greek_columns)
+        if any(filled.values()):
+            detail = ', '.join(f"{col} {n}" for col, n in filled.items() if n)
+            print(f"已用 Black-76 补全缺失的希腊字母: {detail}")
     return df
 
 def calculate_metrics(df):
@@ -285,286 +454,551 @@ def calculate_metrics(df):
     
     return df
 
-def analyze_single_put(df, strategy_name, config):
+# calculate_metrics 输出的逐行指标列，以及参与快照比对的输入列
+# 快照比对只看清洗后的 CSV 报价：模型补全的 IV / 希腊字母随估值时间变化，中间价、到期天数由这些列
+# 与现货价、运行日期（均在元数据中）决定
+METRIC_COLUMNS = [
+    'expected_move', 'vega_to_theta_ratio', 'gamma_to_theta_ratio', 'vega_per_premium', 'delta_per_premium'
+]
+SNAPSHOT_COLUMNS = [
+    'expiration_date', 'strike_price', 'bid_price', 'ask_price', 'mark_price', 'delta', 'gamma', 'theta', 'vega',
+    'bid_iv', 'ask_iv'
+]
+
+def _incremental_meta():
     """
-    分析单腿看跌期权策略
+    影响计算结果的运行参数；与上次运行不一致时增量状态作废
     """
-    # 筛选符合delta区间的期权
-    mask = (
-        (df['delta'] >= config['min_delta']) & 
-        (df['delta'] <= config['max_delta'])
-    )
-    
-    filtered_df = df[mask].copy()
+    return {
+        'spot_price': SPOT_PRICE,
+        'asset': UNDERLYING_ASSET,
+        'strategy': STRATEGY_CONFIG,
+        'top_n_per_expiry': SPREAD_SEARCH_CONFIG['top_n_per_expiry'],
+        'greeks': GREEKS_CONFIG,
+        'date': str(date.today()),
+        'snapshot_columns': SNAPSHOT_COLUMNS,
+    }
+
+def _state_name():
+    return f'put2_{UNDERLYING_ASSET or "all"}'
+
+def calculate_metrics_incremental(df, previous, fingerprints):
+    """
+    与上一次运行的快照比对，只为新增与变化的合约计算指标，其余合约沿用上次结果
+    fingerprints: 本次快照的逐行指纹（load_and_clean_data 在模型补全前计算）
+    返回 (df, 比对结果)
+    """
+    old_snapshot = previous['snapshot']
+    old_fp = pd.Series(old_snapshot['fingerprint'].to_numpy(), index=old_snapshot['symbol'].astype(str))
+    diff = diff_snapshots(old_fp, fingerprints)
+    print(f"增量模式: {diff.summary()}")
+    
+    dirty = df['symbol'].astype(str).isin(diff.dirty).to_numpy()
+    if dirty.any():
+        computed = calculate_metrics(df[dirty].copy())
+    reused = previous['metrics'].drop_duplicates('symbol', keep='last').set_index('symbol')
+    reused = reused.reindex(df['symbol'].astype(str).to_numpy())
+    for col in METRIC_COLUMNS:
+        values = reused[col].to_numpy(dtype=float, copy=True)
+        if dirty.any():
+            values[dirty] = computed[col].to_numpy(dtype=float)
+        df[col] = values
+    return df, diff
+
+def save_incremental_state(df, bear_put_spread_results, fingerprints):
+    """
+    保存本次运行的快照指纹、逐行指标与价差结果，供下一次增量运行使用
+    """
+    symbols = df['symbol'].astype(str).to_numpy()
+    fingerprints = fingerprints[~fingerprints.index.duplicated(keep='last')]
+    snapshot = pd.DataFrame({
+        'symbol': symbols,
+        'fingerprint': fingerprints.reindex(symbols).to_numpy(),
+        'delta': df['delta'].to_numpy(dtype=float),
+        'expiration_date': df['expiration_date'].to_numpy(),
+    })
+    metrics = df[['symbol'] + METRIC_COLUMNS].assign(symbol=lambda d: d['symbol'].astype(str))
+    spreads = bear_put_spread_results.get('bear_put_spread', pd.DataFrame(columns=SPREAD_COLUMNS))
+    if len(spreads) == 0:
+        spreads = pd.DataFrame(columns=SPREAD_COLUMNS)
+    save_state(INCREMENTAL_CONFIG['state_dir'], _state_name(), _incremental_meta(),
+               {'snapshot': snapshot, 'metrics': metrics, 'bear_put_spread': spreads})
+
+def run_strategy_analysis(df, previous=None, diff=None, strategy_config=None, delta_index=None):
+    """
+    单腿与价差策略分析
+    previous/diff 来自增量模式：单腿策略在 delta 区间内没有合约变化时沿用上次入选的合约，
+    价差只重新搜索有合约变化的到期日
+    strategy_config: 覆盖 STRATEGY_CONFIG（结构相同），缺省使用 STRATEGY_CONFIG
+    delta_index: df['delta'] 的 BandIndex（同一快照可复用），缺省时构建一次供全部 Delta 区间共用
+    """
+    strategy_config = strategy_config or STRATEGY_CONFIG
+    if delta_index is None:
+        delta_index = BandIndex(df['delta'])
+    single_put_results = {}
+    touched = pd.Index([])
+    if diff is not None:
+        touched = diff.dirty.append(diff.removed)
+    for strategy_name, config in strategy_config.items():
+        if strategy_name == 'bear_put_spread':
+            continue
+        single_put_results[strategy_name] = analyze_single_put(df, strategy_name, config, delta_index)
+    
+    reuse = None
+    if previous is not None:
+        touched_expiries = touched_groups(previous['snapshot'], df, 'symbol', 'expiration_date', touched)
+        reuse = {
+            exp_date: list(group.itertuples(index=False, name=None))
+            for exp_date, group in previous['bear_put_spread'].groupby('expiration_date', sort=False)
+            if exp_date not in touched_expiries
+        }
+        print(f"增量模式: 价差重新搜索 {len(touched_expiries)} 个到期日，沿用 {len(reuse)} 个到期日的上次结果")
     
-    if len(filtered_df) == 0:
+    bear_put_spread_results = {
+        'bear_put_spread': analyze_bear_put_spread(df, strategy_config['bear_put_spread'], reuse=reuse,
+                                                   delta_index=delta_index)
+    }
+    return single_put_results, bear_put_spread_results
+
+def archive_snapshot(df):
+    """
+    把本次的期权链与指标追加到历史快照库
+    """
+    csv_files = [os.path.join(DATA_FOLDER, f) for f in os.listdir(DATA_FOLDER) if f.endswith('.csv')]
+    snapshot_time = datetime.fromtimestamp(max(os.path.getmtime(f) for f in csv_files))
+    try:
+        rows = append_snapshot(df, SNAPSHOT_STORE_CONFIG['root'], snapshot_time)
+    except Exception as e:
+        print(f"警告: 历史快照写入失败: {str(e)}")
+        return
+    if rows:
+        print(f"历史快照已写入 {SNAPSHOT_STORE_CONFIG['root']}（{snapshot_time:%Y-%m-%d %H:%M:%S}，{rows} 个合约）")
+
+def run_multi_leg_search(chain):
+    """
+    多腿策略搜索（看涨 + 看跌整条期权链），返回 {结构键: DataFrame}
+    """
+    config = {k: v for k, v in STRATEGY_SEARCH_CONFIG.items() if k != 'enabled'}
+    results = search_strategies(chain, SPOT_PRICE, config)
+    found = ', '.join(f"{STRUCTURES[key]['name']} {len(res)}" for key, res in results.items() if len(res) > 0)
+    print(f"多腿策略搜索完成: {found or '无符合条件的组合'}")
+    return results
+
+def _atm_vols(df):
+    """
+    各到期天数的 ATM 隐含波动率（小数）：按行权价对现货价线性插值
+    """
+    atm = {}
+    for days, group in df.dropna(subset=['mid_iv', 'strike_price']).groupby('days_to_expiration'):
+        if days <= 0:
+            continue
+        group = group.sort_values('strike_price')
+        atm[int(days)] = float(np.interp(SPOT_PRICE, group['strike_price'], group['mid_iv']))
+    return atm
+
+def _history_returns(path):
+    """
+    读取历史价格CSV（按时间升序）的日对数收益：优先使用 close / 收盘价 列，否则取最后一个数值列
+    """
+    history = pd.read_csv(path)
+    column = next((c for c in history.columns if str(c).lower() in ('close', '收盘价')), None)
+    if column is None:
+        column = history.select_dtypes('number').columns[-1]
+    return log_returns(pd.to_numeric(history[column], errors='coerce'))
+
+def hedge_candidates(df, single_put_results, bear_put_spread_results):
+    """
+    单腿与价差候选转为盈亏曲线的策略表示，返回 (候选信息 DataFrame, 策略列表)
+    """
+    days = df.groupby('expiration_date')['days_to_expiration'].first()
+    info, strategies = [], []
+    for strategy_name, strategy_df in single_put_results.items():
+        for rank, (_, row) in enumerate(strategy_df.iterrows()):
+            info.append((strategy_name, rank, row['expiration_date'], row['days_to_expiration'],
+                         f"P {row['strike_price']:,.0f}", row['mid_price']))
+            strategies.append(make_strategy([row['strike_price']], ['P'], [1], row['mid_price'],
+                                            days_to_expiration=row['days_to_expiration']))
+    spread_df = bear_put_spread_results.get('bear_put_spread', pd.DataFrame())
+    for rank, (_, row) in enumerate(spread_df.iterrows()):
+        exp_days = days.get(row['expiration_date'])
+        info.append(('bear_put_spread', rank, row['expiration_date'], exp_days,
+                     f"+P {row['long_strike']:,.0f} / -P {row['short_strike']:,.0f}", row['net_premium']))
+        strategies.append(make_strategy([row['long_strike'], row['short_strike']], ['P', 'P'], [1, -1],
+                                        row['net_premium'], days_to_expiration=exp_days))
+    info = pd.DataFrame(info, columns=['strategy', 'rank', 'expiration_date', 'days_to_expiration',
+                                       'description', 'premium'])
+    return info, strategies
+
+def run_hedge_simulation(df, single_put_results, bear_put_spread_results):
+    """
+    蒙特卡洛对冲效果模拟：全部单腿与价差候选共用同一批路径
+    返回候选信息 + 模拟指标的 DataFrame（没有候选时为空）
+    """
+    info, strategies = hedge_candidates(df, single_put_results, bear_put_spread_results)
+    keep = (info['days_to_expiration'] > 0).to_numpy()
+    info = info[keep].reset_index(drop=True)
+    strategies = [s for s, k in zip(strategies, keep) if k]
+    atm_vols = _atm_vols(df)
+    if len(strategies) == 0 or not atm_vols:
         return pd.DataFrame()
     
-    # 按性价比指标排序
-    filtered_df = filtered_df.sort_values(
-        ['vega_to_theta_ratio', 'vega_per_premium'], 
-        ascending=[False, False]
-    )
+    config = {k: v for k, v in MONTE_CARLO_CONFIG.items() if k not in ('enabled', 'history_file')}
+    returns = None
+    if config['model'] == 'bootstrap':
+        history_file = MONTE_CARLO_CONFIG['history_file']
+        if history_file and os.path.exists(history_file):
+            returns = _history_returns(history_file)
+        else:
+            print(f"警告: 未找到历史价格文件 {history_file}，蒙特卡洛模拟改用 gbm 模型")
+            config['model'] = 'gbm'
+    
+    start = datetime.now()
+    simulated = simulate_hedges(stack_strategies(strategies), SPOT_PRICE, atm_vols, config, returns)
+    elapsed = (datetime.now() - start).total_seconds()
+    print(f"蒙特卡洛模拟完成: {len(strategies)} 个候选 × {config['n_paths']:,} 条路径"
+          f"（模型 {config['model']}，用时 {elapsed:.1f} 秒）")
+    return pd.concat([info, simulated], axis=1)
+
+def build_vol_surface(df):
+    """
+    拟合隐含波动率曲面，添加 surface_iv 列（所在到期日的拟合微笑IV）并导出各到期日参数
+    """
+    print("正在拟合波动率曲面...")
+    surface = load_or_fit_surface(df['strike_price'], df['expiration_date'], df['mid_iv'], SPOT_PRICE,
+                                  config=VOL_SURFACE_CONFIG, tag=f'put2_{UNDERLYING_ASSET or "all"}')
+    df['surface_iv'] = surface.smile_iv(df['strike_price'], df['expiration_date'])
     
-    return filtered_df.head(5)
+    params = surface.params_frame()
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    params_file = os.path.join(OUTPUT_FOLDER, f'vol_surface_{timestamp}.csv')
+    params.to_csv(params_file, index=False, encoding='utf-8-sig')
+    print(f"波动率曲面: {len(surface)} 个到期日，最大IV拟合误差 {params['rmse'].max():.2%}，参数已保存至: {params_file}")
+    return surface
 
-def analyze_bear_put_spread(df, config):
+def analyze_single_put(df, strategy_name, config, delta_index=None):
     """
-    分析熊市看跌价差策略
+    分析单腿看跌期权策略
+    delta_index: df['delta'] 的 BandIndex，缺省时临时构建
     """
-    # 筛选长腿和短腿候选
-    long_leg_mask = (
-        (df['delta'] >= config['long_leg_min_delta']) & 
-        (df['delta'] <= config['long_leg_max_delta'])
-    )
+    # 筛选符合delta区间的期权（有序索引上 searchsorted，不扫描整张表）
+    if delta_index is None:
+        delta_index = BandIndex(df['delta'])
+    pos = delta_index.positions(config['min_delta'], config['max_delta'])
     
-    short_leg_mask = (
-        (df['delta'] >= config['short_leg_min_delta']) & 
-        (df['delta'] <= config['short_leg_max_delta'])
-    )
+    if len(pos) == 0:
+        return pd.DataFrame()
+    
+    # 按性价比指标取前5（argpartition 选出候选后只对候选排序，等价于全量排序后取前5）
+    return top_k_frame(df.iloc[pos], ['vega_to_theta_ratio', 'vega_per_premium'], 5).copy()
+
+def strike_band_index(df):
+    """
+    行权价的有序区间索引，按到期日分组（同一指标表的行权价 / 价值状态区间查询共用）
+    """
+    return BandIndex(df['strike_price'], groups=df['expiration_date'])
+
+# query_bands 支持的区间条件
+BAND_KEYS = ('delta', 'strike', 'moneyness', 'expiration_date')
+
+def query_bands(df, bands, delta_index=None, strike_index=None):
+    """
+    自定义区间查询（交互式工具对同一快照反复查询），bands 为 {名称: 条件}，条件可含：
+      delta / strike: (下限, 上限)；moneyness: (下限, 上限)，K/S，按 SPOT_PRICE 换算为行权价区间；
+      expiration_date: 只查询该到期日，行权价区间只在该到期日的有序段上 searchsorted
+    各条件取交集，返回 {名称: 命中合约的行位置（升序，df.iloc 取行）}
+    delta_index / strike_index: BandIndex(df['delta']) 与 strike_band_index(df)（可缓存复用），缺省时临时构建
+    """
+    results = {}
+    for name, band in bands.items():
+        unknown = set(band) - set(BAND_KEYS)
+        if unknown:
+            raise ValueError(f"区间 {name} 的未知条件: {', '.join(sorted(unknown))}（可选: {', '.join(BAND_KEYS)}）")
+        parts = []
+        if 'delta' in band:
+            if delta_index is None:
+                delta_index = BandIndex(df['delta'])
+            parts.append(delta_index.positions(min(band['delta']), max(band['delta'])))
+        strike_bands = [band['strike']] if 'strike' in band else []
+        if 'moneyness' in band:
+            strike_bands.append([m * SPOT_PRICE for m in band['moneyness']])
+        if 'expiration_date' in band and not strike_bands:
+            strike_bands.append((-np.inf, np.inf))
+        if strike_bands:
+            if strike_index is None:
+                strike_index = strike_band_index(df)
+            group = ALL_GROUPS
+            if 'expiration_date' in band:
+                labels = {pd.Timestamp(label): label for label in strike_index.groups}
+                group = labels.get(pd.Timestamp(band['expiration_date']))
+            for lo, hi in strike_bands:
+                parts.append(strike_index.positions(min(lo, hi), max(lo, hi), group))
+        pos = parts[0] if parts else np.arange(len(df))
+        for part in parts[1:]:
+            pos = np.intersect1d(pos, part, assume_unique=True)
+        results[name] = pos
+    return results
+
+# 价差组合输出列（与逐行循环版本保持一致）
+SPREAD_COLUMNS = [
+    'long_strike', 'short_strike', 'long_delta', 'short_delta',
+    'long_price', 'short_price', 'net_premium', 'max_risk', 'max_profit',
+    'breakeven', 'reward_risk_ratio', 'success_prob', 'failure_prob', 'odds',
+    'expiration_date'
+]
+
+# 广播计算时每块 (长腿 × 短腿) 中间数组的元素上限，控制内存占用（约32MB/数组）
+SPREAD_BLOCK_ELEMENTS = 1 << 22
+
+def _leg_arrays(legs):
+    """
+    提取价差计算所需的腿数据为NumPy数组
+    """
+    return {
+        'strike': legs['strike_price'].to_numpy(dtype=float),
+        'delta': legs['delta'].to_numpy(dtype=float),
+        'price': legs['mid_price'].to_numpy(dtype=float),
+    }
+
+def _spread_block_metrics(long_arr, short_arr, rows):
+    """
+    对一块长腿与全部短腿做广播，计算价差指标矩阵
+    """
+    long_strike = long_arr['strike'][rows, None]
+    long_price = long_arr['price'][rows, None]
+    short_strike = short_arr['strike'][None, :]
+    short_price = short_arr['price'][None, :]
+
+    # 长腿行权价 > 短腿行权价（NaN比较结果为False，自动剔除）
+    valid = long_strike > short_strike
+
+    net_premium = long_price - short_price
+    max_profit = (long_strike - short_strike) - net_premium
+    with np.errstate(divide='ignore', invalid='ignore'):
+        reward_risk_ratio = np.where(net_premium > 0, max_profit / net_premium, 0.0)
+
+    return valid, net_premium, max_profit, reward_risk_ratio
+
+def _top_n_pairs(long_arr, short_arr, top_n, block_elements=SPREAD_BLOCK_ELEMENTS):
+    """
+    分块广播计算全部 长腿×短腿 组合，每块用 top_k 保留盈亏比最高的top_n个（并列时保留组合顺序靠前的）
+    返回 (长腿位置, 短腿位置, 盈亏比)，按盈亏比降序、组合顺序升序排列
+    """
+    n_long = len(long_arr['strike'])
+    n_short = len(short_arr['strike'])
+    block_size = max(1, block_elements // max(n_short, 1))
+
+    cand_long, cand_short, cand_rr = [], [], []
+    for start in range(0, n_long, block_size):
+        rows = np.arange(start, min(start + block_size, n_long))
+        valid, _, _, rr = _spread_block_metrics(long_arr, short_arr, rows)
+
+        flat_idx = np.flatnonzero(valid)
+        if len(flat_idx) == 0:
+            continue
+        flat_rr = rr.ravel()[flat_idx]
+        if len(flat_idx) > top_n:
+            # 与第 top_n 名并列的组合全部参与稳定排序，不会被 argpartition 任意截掉
+            keep = top_k(flat_rr, top_n)
+            flat_idx, flat_rr = flat_idx[keep], flat_rr[keep]
+
+        cand_long.append(rows[flat_idx // n_short])
+        cand_short.append(flat_idx % n_short)
+        cand_rr.append(flat_rr)
+
+    if not cand_rr:
+        empty = np.array([], dtype=int)
+        return empty, empty, np.array([], dtype=float)
+
+    long_pos = np.concatenate(cand_long)
+    short_pos = np.concatenate(cand_short)
+    rr = np.concatenate(cand_rr)
+
+    # 盈亏比降序；并列时按原始组合顺序（长腿优先）排列，与逐行循环结果一致
+    order = np.lexsort((short_pos, long_pos, -rr))[:top_n]
+    return long_pos[order], short_pos[order], rr[order]
+
+def _search_expiry_spreads(exp_date, long_arr, short_arr, top_n):
+    """
+    在单个到期日分区内搜索最优价差组合（进程池工作函数）
+    返回按盈亏比降序排列的记录列表
+    """
+    long_pos, short_pos, reward_risk_ratio = _top_n_pairs(long_arr, short_arr, top_n)
+    
+    # 仅对入选组合计算完整指标
+    long_strike = long_arr['strike'][long_pos]
+    short_strike = short_arr['strike'][short_pos]
+    long_price = long_arr['price'][long_pos]
+    short_price = short_arr['price'][short_pos]
+    net_premium = long_price - short_price
+    
+    # 计算赔率 (基于Delta值估算成功概率)
+    # 长腿Delta的绝对值表示期权在到期时处于实值状态的概率，简化作为价差成功概率
+    success_prob = np.abs(long_arr['delta'][long_pos])
+    failure_prob = 1 - success_prob
+    with np.errstate(divide='ignore', invalid='ignore'):
+        odds = np.where(success_prob > 0, failure_prob / success_prob, 0.0)
+    
+    columns = [
+        long_strike, short_strike,
+        long_arr['delta'][long_pos], short_arr['delta'][short_pos],
+        long_price, short_price, net_premium, net_premium,
+        (long_strike - short_strike) - net_premium, long_strike - net_premium,
+        reward_risk_ratio, success_prob, failure_prob, odds,
+    ]
+    return [row + (exp_date,) for row in zip(*(c.tolist() for c in columns))]
+
+def _expiry_partitions(long_legs, short_legs):
+    """
+    按到期日切分长腿与短腿，返回 [(到期日, 长腿数组, 短腿数组), ...]
+    """
+    long_groups = long_legs.groupby('expiration_date', sort=True).indices
+    short_groups = short_legs.groupby('expiration_date', sort=True).indices
     
-    long_legs = df[long_leg_mask].copy()
-    short_legs = df[short_leg_mask].copy()
+    partitions = []
+    for exp_date, long_idx in long_groups.items():
+        short_idx = short_groups.get(exp_date)
+        if short_idx is None:
+            continue
+        partitions.append((
+            exp_date,
+            _leg_arrays(long_legs.iloc[long_idx]),
+            _leg_arrays(short_legs.iloc[short_idx]),
+        ))
+    return partitions
+
+def analyze_bear_put_spread(df, config, top_n=None, max_workers=None, reuse=None, delta_index=None):
+    """
+    分析熊市看跌价差策略
+    按到期日分区搜索（同到期日的长腿×短腿广播计算），大规模链使用进程池并行，
+    各到期日的Top-N结果经堆归并后按盈亏比降序输出
+    reuse: {到期日: 记录列表}，增量模式下这些到期日沿用上次结果，不再搜索
+    delta_index: df['delta'] 的 BandIndex，缺省时临时构建
+    """
+    reuse = reuse or {}
+    search_config = SPREAD_SEARCH_CONFIG
+    if top_n is None:
+        top_n = search_config['top_n_per_expiry']
+    if max_workers is None:
+        max_workers = search_config['max_workers']
+    
+    # 筛选长腿和短腿候选（行顺序与布尔掩码筛选一致）
+    if delta_index is None:
+        delta_index = BandIndex(df['delta'])
+    long_legs = df.iloc[delta_index.positions(config['long_leg_min_delta'], config['long_leg_max_delta'])]
+    short_legs = df.iloc[delta_index.positions(config['short_leg_min_delta'], config['short_leg_max_delta'])]
     
     if len(long_legs) == 0 or len(short_legs) == 0:
         return pd.DataFrame()
     
-    # 构建价差组合
-    spreads = []
-    
-    for _, long_leg in long_legs.iterrows():
-        for _, short_leg in short_legs.iterrows():
-            # 确保长腿行权价 > 短腿行权价
-            if long_leg['strike_price'] > short_leg['strike_price']:
-                # 计算价差指标
-                net_premium = long_leg['mid_price'] - short_leg['mid_price']
-                max_risk = net_premium
-                max_profit = (long_leg['strike_price'] - short_leg['strike_price']) - net_premium
-                breakeven = long_leg['strike_price'] - net_premium
-                reward_risk_ratio = max_profit / max_risk if max_risk > 0 else 0
-                
-                # 计算赔率 (基于Delta值估算成功概率)
-                # 长腿Delta的绝对值表示期权在到期时处于实值状态的概率
-                long_leg_prob = abs(long_leg['delta'])
-                short_leg_prob = abs(short_leg['delta'])
-                
-                # 价差策略成功概率：长腿实值且短腿虚值的概率
-                # 简化计算：使用长腿Delta作为基础成功概率
-                success_prob = long_leg_prob
-                failure_prob = 1 - success_prob
-                
-                # 赔率 = 失败概率 / 成功概率
-                odds = failure_prob / success_prob if success_prob > 0 else 0
-                
-                spread_data = {
-                    'long_strike': long_leg['strike_price'],
-                    'short_strike': short_leg['strike_price'],
-                    'long_delta': long_leg['delta'],
-                    'short_delta': short_leg['delta'],
-                    'long_price': long_leg['mid_price'],
-                    'short_price': short_leg['mid_price'],
-                    'net_premium': net_premium,
-                    'max_risk': max_risk,
-                    'max_profit': max_profit,
-                    'breakeven': breakeven,
-                    'reward_risk_ratio': reward_risk_ratio,
-                    'success_prob': success_prob,
-                    'failure_prob': failure_prob,
-                    'odds': odds,
-                    'expiration_date': long_leg['expiration_date']
-                }
-                
-                spreads.append(spread_data)
-    
-    if not spreads:
+    partitions = _expiry_partitions(long_legs, short_legs)
+    if not partitions:
         return pd.DataFrame()
+    all_expiries = [exp_date for exp_date, _, _ in partitions]
+    partitions = [p for p in partitions if p[0] not in reuse]
+    
+    # 组合总数较小时进程启动开销大于收益，直接在主进程计算
+    total_pairs = sum(len(l['strike']) * len(s['strike']) for _, l, s in partitions)
+    use_pool = (
+        len(partitions) > 1 and max_workers != 1 and
+        total_pairs >= search_config['parallel_min_pairs']
+    )
+    
+    if use_pool:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_search_expiry_spreads, exp_date, long_arr, short_arr, top_n)
+                for exp_date, long_arr, short_arr in partitions
+            ]
+            searched = [future.result() for future in futures]
+    else:
+        searched = [
+            _search_expiry_spreads(exp_date, long_arr, short_arr, top_n)
+            for exp_date, long_arr, short_arr in partitions
+        ]
+    searched = dict(zip((exp_date for exp_date, _, _ in partitions), searched))
+    expiry_results = [searched[e] if e in searched else reuse[e] for e in all_expiries]
     
-    spreads_df = pd.DataFrame(spreads)
-    spreads_df = spreads_df.sort_values('reward_risk_ratio', ascending=False)
+    # 各分区结果已按盈亏比降序，堆归并得到全局排序
+    rr_col = SPREAD_COLUMNS.index('reward_risk_ratio')
+    merged = heapq.merge(*expiry_results, key=lambda row: row[rr_col], reverse=True)
     
-    return spreads_df.head(5)
+    return pd.DataFrame(list(merged), columns=SPREAD_COLUMNS)
 
-def generate_report(df, single_put_results, bear_put_spread_results):
+def _report_context(df, single_put_results, bear_put_spread_results, hedge_results):
+    """报告上下文（最优策略推荐在渲染器首次使用时才计算）"""
+    now = datetime.now()
+    return ReportContext(
+        df, SPOT_PRICE, now, now.strftime('%Y%m%d_%H%M%S'), OUTPUT_FOLDER,
+        {key: spec['name'] for key, spec in STRUCTURES.items()},
+        hedge_results=hedge_results,
+        hedge_names=HEDGE_STRATEGY_NAMES,
+        monte_carlo_config=MONTE_CARLO_CONFIG,
+        recommend=lambda: analyze_best_strategies(df, single_put_results, bear_put_spread_results, hedge_results),
+        format_breakevens=_format_breakevens,
+        top_n=REPORT_CONFIG['top_n'],
+    )
+
+def _render(df, single_put_results, bear_put_spread_results, multi_leg_results, hedge_results, formats):
+    """按到期日分组一次，逐个到期日交给各渲染器（report.py）"""
+    ctx = _report_context(df, single_put_results, bear_put_spread_results, hedge_results)
+    groups = iter_expiry_groups(df, single_put_results, bear_put_spread_results, multi_leg_results)
+    return render_report(ctx, groups, make_renderers(formats))
+
+def generate_report(df, single_put_results, bear_put_spread_results, multi_leg_results=None,
+                    hedge_results=None):
     """
-    生成分析报告
+    生成分析报告（控制台报告与 REPORT_CONFIG 中配置的报告文件一次生成）
     """
-    print("\n" + "="*80)
-    print("BTC期权防御策略量化分析报告")
-    print("="*80)
-    print(f"分析日期: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"标的现货价格: ${SPOT_PRICE:,.2f}")
-    print(f"分析期权数量: {len(df)} 个")
-    
-    # 按到期日分组分析
-    expiration_dates = df['expiration_date'].dropna().unique()
-    
-    for exp_date in sorted(expiration_dates):
-        print(f"\n{'='*60}")
-        print(f"到期日: {exp_date}")
-        print(f"{'='*60}")
-        
-        exp_df = df[df['expiration_date'] == exp_date]
-        
-        # 单腿策略分析
-        print("\n【单腿看跌期权策略】")
-        
-        strategies = [
-            ('全面保护', 'full_protection_put'),
-            ('部分保护', 'partial_protection_put'),
-            ('尾部对冲', 'tail_hedge_put')
-        ]
-        
-        for strategy_name, strategy_key in strategies:
-            if strategy_key in single_put_results:
-                strategy_df = single_put_results[strategy_key]
-                strategy_exp_df = strategy_df[strategy_df['expiration_date'] == exp_date]
-                
-                if len(strategy_exp_df) > 0:
-                    print(f"\n{strategy_name}策略 (Top 3):")
-                    for i, (_, row) in enumerate(strategy_exp_df.head(3).iterrows(), 1):
-                        print(f"  {i}. 行权价: ${row['strike_price']:,.0f}, "
-                              f"Delta: {row['delta']:.3f}, "
-                              f"权利金: ${row['mid_price']:.4f}, "
-                              f"Vega/Theta: {row['vega_to_theta_ratio']:.2f}")
-        
-        # 价差策略分析
-        print(f"\n【熊市看跌价差策略】")
-        if 'bear_put_spread' in bear_put_spread_results:
-            spread_df = bear_put_spread_results['bear_put_spread']
-            spread_exp_df = spread_df[spread_df['expiration_date'] == exp_date]
-            
-            if len(spread_exp_df) > 0:
-                print("最优组合 (Top 3):")
-                for i, (_, row) in enumerate(spread_exp_df.head(3).iterrows(), 1):
-                    print(f"  {i}. 长腿: ${row['long_strike']:,.0f}, "
-                          f"短腿: ${row['short_strike']:,.0f}, "
-                          f"净权利金: ${row['net_premium']:.4f}, "
-                          f"盈亏比: {row['reward_risk_ratio']:.2f}, "
-                          f"赔率: {row['odds']:.2f}:1 (成功概率: {row['success_prob']:.1%})")
-    
-    # 生成综合报告文档
-    generate_comprehensive_report(df, single_put_results, bear_put_spread_results)
+    _render(df, single_put_results, bear_put_spread_results, multi_leg_results, hedge_results,
+            REPORT_CONFIG['formats'])
     
     # 保存详细数据到CSV
-    save_detailed_data(df, single_put_results, bear_put_spread_results)
+    save_detailed_data(df, single_put_results, bear_put_spread_results, multi_leg_results, hedge_results)
 
-def generate_comprehensive_report(df, single_put_results, bear_put_spread_results):
+def generate_comprehensive_report(df, single_put_results, bear_put_spread_results, multi_leg_results=None,
+                                  hedge_results=None):
     """
-    生成综合报告文档
+    生成综合报告文档（REPORT_CONFIG 中除控制台外的格式）
     """
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    report_file = os.path.join(OUTPUT_FOLDER, f'comprehensive_report_{timestamp}.md')
-    
-    with open(report_file, 'w', encoding='utf-8') as f:
-        f.write("# BTC期权防御策略量化分析综合报告\n\n")
-        f.write(f"**分析日期**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        f.write(f"**标的现货价格**: ${SPOT_PRICE:,.2f}\n")
-        f.write(f"**分析期权数量**: {len(df)} 个\n\n")
-        
-        # 市场概况
-        f.write("## 市场概况\n\n")
-        expiration_dates = df['expiration_date'].dropna().unique()
-        f.write(f"**到期日数量**: {len(expiration_dates)} 个\n")
-        f.write(f"**到期日范围**: {min(expiration_dates)} 至 {max(expiration_dates)}\n\n")
-        
-        # 按到期日分析
-        f.write("## 策略分析结果\n\n")
-        
-        for exp_date in sorted(expiration_dates):
-            f.write(f"### 到期日: {exp_date}\n\n")
-            
-            exp_df = df[df['expiration_date'] == exp_date]
-            days_to_exp = (exp_date - date.today()).days
-            
-            f.write(f"**到期天数**: {days_to_exp} 天\n")
-            f.write(f"**该到期日期权数量**: {len(exp_df)} 个\n\n")
-            
-            # 单腿策略分析
-            f.write("#### 【单腿看跌期权策略】\n\n")
-            
-            strategies = [
-                ('全面保护策略', 'full_protection_put', 'Delta: -0.55 至 -0.45', '适合大幅下跌保护'),
-                ('部分保护策略', 'partial_protection_put', 'Delta: -0.35 至 -0.25', '适合中等下跌保护'),
-                ('尾部对冲策略', 'tail_hedge_put', 'Delta: -0.15 至 -0.05', '适合尾部风险对冲')
-            ]
-            
-            for strategy_name, strategy_key, delta_range, description in strategies:
-                if strategy_key in single_put_results:
-                    strategy_df = single_put_results[strategy_key]
-                    strategy_exp_df = strategy_df[strategy_df['expiration_date'] == exp_date]
-                    
-                    if len(strategy_exp_df) > 0:
-                        f.write(f"**{strategy_name}** ({delta_range})\n")
-                        f.write(f"*{description}*\n\n")
-                        
-                        for i, (_, row) in enumerate(strategy_exp_df.head(3).iterrows(), 1):
-                            f.write(f"{i}. **行权价**: ${row['strike_price']:,.0f}\n")
-                            f.write(f"   - Delta: {row['delta']:.3f}\n")
-                            f.write(f"   - 权利金: ${row['mid_price']:.4f}\n")
-                            f.write(f"   - Vega/Theta比率: {row['vega_to_theta_ratio']:.2f}\n")
-                            f.write(f"   - 隐含波动率: {row['mid_iv']:.1%}\n")
-                            f.write(f"   - 到期天数: {row['days_to_expiration']:.0f}天\n\n")
-                    else:
-                        f.write(f"**{strategy_name}**: 无符合条件的期权\n\n")
-            
-            # 价差策略分析
-            f.write("#### 【熊市看跌价差策略】\n\n")
-            f.write("*通过买入高行权价看跌期权，卖出低行权价看跌期权，降低权利金成本*\n\n")
-            
-            if 'bear_put_spread' in bear_put_spread_results:
-                spread_df = bear_put_spread_results['bear_put_spread']
-                spread_exp_df = spread_df[spread_df['expiration_date'] == exp_date]
-                
-                if len(spread_exp_df) > 0:
-                    for i, (_, row) in enumerate(spread_exp_df.head(3).iterrows(), 1):
-                        f.write(f"{i}. **长腿**: ${row['long_strike']:,.0f} (Delta: {row['long_delta']:.3f})\n")
-                        f.write(f"   **短腿**: ${row['short_strike']:,.0f} (Delta: {row['short_delta']:.3f})\n")
-                        f.write(f"   - 净权利金: ${row['net_premium']:.4f}\n")
-                        f.write(f"   - 最大风险: ${row['max_risk']:.4f}\n")
-                        f.write(f"   - 最大利润: ${row['max_profit']:.4f}\n")
-                        f.write(f"   - 盈亏平衡点: ${row['breakeven']:.0f}\n")
-                        f.write(f"   - 盈亏比: {row['reward_risk_ratio']:.2f}\n\n")
-                else:
-                    f.write("无符合条件的价差组合\n\n")
-            else:
-                f.write("无符合条件的价差组合\n\n")
-            
-            f.write("---\n\n")
-        
-        # 最优策略推荐
-        f.write("## 最优策略推荐与分析\n\n")
-        
-        # 分析最优策略
-        best_strategies = analyze_best_strategies(df, single_put_results, bear_put_spread_results)
-        
-        for category, analysis in best_strategies.items():
-            f.write(f"### {category}\n\n")
-            f.write(f"{analysis}\n\n")
-        
-        # 风险提示
-        f.write("## 风险提示\n\n")
-        f.write("1. **时间价值衰减**: 期权时间价值会随时间衰减，临近到期时衰减加速\n")
-        f.write("2. **隐含波动率风险**: 隐含波动率下降会导致期权价格下跌\n")
-        f.write("3. **流动性风险**: 深度价外期权可能存在流动性不足的问题\n")
-        f.write("4. **方向性风险**: 看跌期权在价格上涨时会亏损\n")
-        f.write("5. **保证金要求**: 价差策略需要满足保证金要求\n\n")
-        
-        # 使用建议
-        f.write("## 使用建议\n\n")
-        f.write("1. **全面保护策略**: 适合预期大幅下跌的投资者，提供强保护但成本较高\n")
-        f.write("2. **部分保护策略**: 适合预期中等下跌的投资者，平衡保护效果与成本\n")
-        f.write("3. **尾部对冲策略**: 适合长期持有者，提供极端情况下的保护\n")
-        f.write("4. **熊市价差策略**: 适合预期下跌但希望降低成本的投资者\n")
-        f.write("5. **组合使用**: 可考虑将不同策略组合使用，构建多层次保护体系\n\n")
-        
-        f.write("---\n")
-        f.write(f"*报告生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n")
-    
-    print(f"综合报告已保存至: {report_file}")
+    formats = [fmt for fmt in REPORT_CONFIG['formats'] if fmt != 'console']
+    _render(df, single_put_results, bear_put_spread_results, multi_leg_results, hedge_results, formats)
+
+def _format_breakevens(row):
+    """多腿组合的盈亏平衡点（最多两个）"""
+    points = [f"${row[col]:,.0f}" for col in ('breakeven_low', 'breakeven_high') if pd.notna(row[col])]
+    return ' / '.join(dict.fromkeys(points)) or '无'
 
-def analyze_best_strategies(df, single_put_results, bear_put_spread_results):
+# 蒙特卡洛结果中的策略名称
+HEDGE_STRATEGY_NAMES = {
+    'full_protection_put': '全面保护策略',
+    'partial_protection_put': '部分保护策略',
+    'tail_hedge_put': '尾部对冲策略',
+    'bear_put_spread': '熊市看跌价差',
+}
+
+def _simulated(hedge_results, strategy_name, rank=0):
+    """蒙特卡洛结果中某策略第 rank 个候选的行，没有时返回 None"""
+    if hedge_results is None or len(hedge_results) == 0:
+        return None
+    match = hedge_results[(hedge_results['strategy'] == strategy_name) & (hedge_results['rank'] == rank)]
+    return match.iloc[0] if len(match) > 0 else None
+
+def _simulation_lines(sim):
+    """最优策略推荐中的蒙特卡洛模拟小节"""
+    if sim is None:
+        return ""
+    return f"""
+### 🎲 蒙特卡洛模拟（{MONTE_CARLO_CONFIG['n_paths']:,} 条路径，模型 {MONTE_CARLO_CONFIG['model']}）
+- **期望盈亏**: ${sim['expected_pnl']:,.2f}（标准差 ${sim['pnl_std']:,.2f}）
+- **模拟盈利概率**: {sim['hit_rate']:.1%}（到期实值概率 {sim['itm_rate']:.1%}）
+- **尾部损失降低**: {sim['tail_loss_reduction']:.1%}（持有 1 个现货的 CVaR ${sim['unhedged_cvar']:,.0f} → ${sim['hedged_cvar']:,.0f}）
+"""
+
+def analyze_best_strategies(df, single_put_results, bear_put_spread_results, hedge_results=None):
     """
     分析最优策略并给出推荐理由
+    hedge_results: 蒙特卡洛对冲效果，提供时在推荐中附上最优候选的模拟结果
     """
     analysis = {}
     
@@ -631,7 +1065,7 @@ def analyze_best_strategies(df, single_put_results, bear_put_spread_results):
 - 最大损失: 权利金${best_option['mid_price']:.4f}
 - 时间价值衰减风险: {'低' if best_option['days_to_expiration'] > 60 else '中等' if best_option['days_to_expiration'] > 30 else '高'}
 - 波动率风险: {'有利' if avg_iv < 0.7 else '不利'}
-"""
+""" + _simulation_lines(_simulated(hedge_results, best_single_put))
     
     # 分析价差策略 - 增强版
     if 'bear_put_spread' in bear_put_spread_results:
@@ -682,7 +1116,7 @@ def analyze_best_strategies(df, single_put_results, bear_put_spread_results):
 - **最佳情况**: BTC跌至${best_spread['short_strike']:,.0f}以下，获得最大收益${max_profit:.4f}
 - **盈亏平衡**: BTC跌至${best_spread['long_strike'] - best_spread['net_premium']:,.0f}时实现盈亏平衡
 - **最坏情况**: BTC上涨，损失全部净权利金${best_spread['net_premium']:.4f}
-"""
+""" + _simulation_lines(_simulated(hedge_results, 'bear_put_spread'))
     
     # 市场环境分析 - 增强版
     iv_percentile = (df['mid_iv'] > avg_iv).mean() * 100
@@ -728,7 +1162,8 @@ def analyze_best_strategies(df, single_put_results, bear_put_spread_results):
     
     return analysis
 
-def save_detailed_data(df, single_put_results, bear_put_spread_results):
+def save_detailed_data(df, single_put_results, bear_put_spread_results, multi_leg_results=None,
+                       hedge_results=None):
     """
     保存详细数据到CSV文件
     """
@@ -757,10 +1192,133 @@ def save_detailed_data(df, single_put_results, bear_put_spread_results):
             spread_file = os.path.join(OUTPUT_FOLDER, f'bear_put_spread_{timestamp}.csv')
             spread_df.to_csv(spread_file, index=False, encoding='utf-8-sig')
             print(f"熊市看跌价差策略结果已保存至: {spread_file}")
+    
+    # 保存多腿策略搜索结果
+    found = [result_df for result_df in (multi_leg_results or {}).values() if len(result_df) > 0]
+    if found:
+        search_file = os.path.join(OUTPUT_FOLDER, f'strategy_search_{timestamp}.csv')
+        pd.concat(found, ignore_index=True).to_csv(search_file, index=False, encoding='utf-8-sig')
+        print(f"多腿策略搜索结果已保存至: {search_file}")
+    
+    # 保存蒙特卡洛对冲效果
+    if hedge_results is not None and len(hedge_results) > 0:
+        hedge_file = os.path.join(OUTPUT_FOLDER, f'hedge_simulation_{timestamp}.csv')
+        hedge_results.to_csv(hedge_file, index=False, encoding='utf-8-sig')
+        print(f"蒙特卡洛对冲效果已保存至: {hedge_file}")
 
-def generate_visualizations(df, bear_put_spread_results):
+def _float(value):
+    return float(value) if pd.notna(value) else float('nan')
+
+def _option_leg(row, quantity):
+    """期权链中的一行（含 symbol/option_type/strike_price/mid_price/mid_iv/希腊字母）转为 Leg"""
+    return Leg(str(row['symbol']), str(row['option_type']), _float(row['strike_price']), float(quantity),
+               *(_float(row[col]) for col in ('mid_price', 'mid_iv', 'delta', 'gamma', 'theta', 'vega')))
+
+def analysis_results(df, single_put_results, bear_put_spread_results, multi_leg_results=None,
+                     hedge_results=None, chain=None):
+    """
+    全部候选策略转为 common.results.AnalysisResult
+    单腿与熊市看跌价差的名次为结果表中的位置；有蒙特卡洛结果时附加 mc_* 评分指标
+    chain: 含看涨期权的完整期权链，用于查找多腿组合各腿的价格与希腊字母（缺省为 df）
+    """
+    chain = df if chain is None else chain
+    leg_columns = ['symbol', 'option_type', 'strike_price', 'mid_price', 'mid_iv', 'delta', 'gamma', 'theta', 'vega']
+    contracts = {row['symbol']: row for row in chain[leg_columns].assign(
+        symbol=chain['symbol'].astype(str)).to_dict('records')}
+    puts = {(row['expiration_date'], row['strike_price']): row['symbol']
+            for row in df[['expiration_date', 'strike_price']].assign(
+                symbol=df['symbol'].astype(str)).to_dict('records')}
+    strategies = {}
+    
+    for strategy_name, strategy_df in single_put_results.items():
+        for rank, row in enumerate(strategy_df.to_dict('records')):
+            premium = _float(row['mid_price'])
+            strategies[(strategy_name, rank)] = Strategy(
+                strategy_name, HEDGE_STRATEGY_NAMES[strategy_name], row['expiration_date'],
+                [_option_leg(row, 1)], premium, rank=rank + 1,
+                max_profit=row['strike_price'] - premium, max_risk=premium,
+                breakevens=[row['strike_price'] - premium],
+                scores=[Score(col, _float(row[col])) for col in METRIC_COLUMNS],
+            )
+    
+    spread_df = bear_put_spread_results.get('bear_put_spread', pd.DataFrame())
+    for rank, row in enumerate(spread_df.to_dict('records')):
+        legs = [_option_leg(contracts[puts[(row['expiration_date'], row[f'{side}_strike'])]], qty)
+                for side, qty in (('long', 1), ('short', -1))]
+        strategies[('bear_put_spread', rank)] = Strategy(
+            'bear_put_spread', HEDGE_STRATEGY_NAMES['bear_put_spread'], row['expiration_date'], legs,
+            _float(row['net_premium']), rank=rank + 1,
+            max_profit=_float(row['max_profit']), max_risk=_float(row['max_risk']),
+            breakevens=[_float(row['breakeven'])], success_prob=_float(row['success_prob']),
+            scores=[Score(col, _float(row[col])) for col in ('reward_risk_ratio', 'odds')],
+        )
+    
+    # 蒙特卡洛指标按 (策略, 名次) 对应到单腿与价差候选
+    if hedge_results is not None and len(hedge_results) > 0:
+        for row in hedge_results.to_dict('records'):
+            strategy = strategies.get((row['strategy'], row['rank']))
+            if strategy is not None:
+                strategy.scores.extend(Score(f'mc_{col}', _float(row[col])) for col in SIMULATION_COLUMNS)
+    
+    items = list(strategies.values())
+    for key, result_df in (multi_leg_results or {}).items():
+        spec = STRUCTURES[key]
+        for rank, row in enumerate(result_df.to_dict('records')):
+            legs = [_option_leg(contracts[row[f'leg{n}_symbol']], side * ratio)
+                    for n, (_, side, ratio) in enumerate(spec['legs'], start=1)]
+            items.append(Strategy(
+                key, spec['name'], row['expiration_date'], legs, _float(row['net_premium']), rank=rank + 1,
+                stock=float(spec['stock']), max_profit=_float(row['max_profit']), max_risk=_float(row['max_risk']),
+                breakevens=list(dict.fromkeys(float(row[col]) for col in ('breakeven_low', 'breakeven_high')
+                                              if pd.notna(row[col]))),
+                success_prob=_float(row['success_prob']),
+                scores=[Score(col, _float(row[col])) for col in ('reward_risk_ratio', 'expected_value', 'odds',
+                                                                 'net_delta', 'net_gamma', 'net_theta', 'net_vega')],
+            ))
+    return AnalysisResult('put2', float(SPOT_PRICE), datetime.now(), items)
+
+def export_results(results):
     """
-    生成可视化图表
+    按 RESULT_EXPORT_CONFIG 导出机器可读结果
+    """
+    fmt = RESULT_EXPORT_CONFIG['format']
+    if not fmt:
+        return None
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(OUTPUT_FOLDER, f"analysis_results_{timestamp}.{fmt}")
+    try:
+        results.write(path, fmt)
+    except Exception as e:
+        print(f"警告: 分析结果导出失败: {str(e)}")
+        return None
+    print(f"分析结果（{len(results)} 个候选策略）已导出至: {path}")
+    return path
+
+def spread_payoff_strategies(spread_df, df, top_n):
+    """
+    熊市看跌价差的前 top_n 个组合转为盈亏曲线的策略表示（各腿IV由同到期日、同行权价的看跌期权查得）
+    """
+    iv = df.groupby(['expiration_date', 'strike_price'])['mid_iv'].first()
+    days = df.groupby('expiration_date')['days_to_expiration'].first()
+    strategies = []
+    for _, row in spread_df.head(top_n).iterrows():
+        exp_date = row['expiration_date']
+        strikes = [row['long_strike'], row['short_strike']]
+        strategies.append(make_strategy(
+            strikes, ['P', 'P'], [1, -1], row['net_premium'],
+            ivs=[iv.get((exp_date, k), np.nan) for k in strikes],
+            days_to_expiration=days.get(exp_date),
+            label=f"{pd.Timestamp(exp_date):%Y-%m-%d} +P {strikes[0]:,.0f} / -P {strikes[1]:,.0f}"
+                  f"（盈亏比 {row['reward_risk_ratio']:.2f}）",
+        ))
+    return strategies
+
+def generate_visualizations(df, bear_put_spread_results, renderer=None, surface=None,
+                            multi_leg_results=None, chain=None):
+    """
+    生成可视化图表（进程池中渲染，数据未变化时复用缓存）
+    surface: 波动率曲面，提供时在IV微笑图上叠加各到期日的拟合曲线
+    multi_leg_results / chain: 多腿策略搜索结果与其所用的完整期权链，提供时绘制多腿策略盈亏对比图
     """
     print("\n正在生成可视化图表...")
     
@@ -768,129 +1326,188 @@ def generate_visualizations(df, bear_put_spread_results):
     os.makedirs(OUTPUT_FOLDER, exist_ok=True)
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    own_renderer = renderer is None
+    if own_renderer:
+        renderer = ChartRenderer(RENDER_CONFIG)
+    
+    # 只传递绘图用到的列，减少进程间传输与哈希计算
+    chart_df = df[['expiration_date', 'strike_price', 'mid_iv', 'vega_to_theta_ratio']]
+    
+    # 1. 隐含波动率微笑（叠加曲面拟合曲线）
+    curves = None
+    if surface is not None and len(surface) > 0:
+        strikes = np.linspace(df['strike_price'].min(), df['strike_price'].max(), 200)
+        curves = pd.DataFrame({
+            'expiration_date': np.repeat(pd.to_datetime(surface.expiries).date, len(strikes)),
+            'strike_price': np.tile(strikes, len(surface)),
+            'surface_iv': np.concatenate([surface.slice_iv(i, strikes) for i in range(len(surface))]),
+        })
+    renderer.submit(plot_iv_smile, renderer.output_path(OUTPUT_FOLDER, f'iv_smile_{timestamp}'),
+                    chart_df, SPOT_PRICE, curves, label='iv_smile', title='隐含波动率微笑图')
+    
+    # 2. Vega/Theta性价比曲线
+    renderer.submit(plot_vega_theta_ratio, renderer.output_path(OUTPUT_FOLDER, f'vega_theta_ratio_{timestamp}'),
+                    chart_df, SPOT_PRICE, label='vega_theta_ratio', title='Vega/Theta性价比曲线图')
     
-    # 1. 隐含波动率微笑
+    # 3. 价差策略盈亏图（叠加前 top_n 个组合）
+    if 'bear_put_spread' in bear_put_spread_results:
+        spread_df = bear_put_spread_results['bear_put_spread']
+        if len(spread_df) > 0:
+            strategies = spread_payoff_strategies(spread_df, df, PAYOFF_CONFIG['top_n'])
+            renderer.submit(plot_payoff_diagram, renderer.output_path(OUTPUT_FOLDER, f'payoff_diagram_{timestamp}'),
+                            strategies, SPOT_PRICE, f'熊市看跌价差策略盈亏图（Top {len(strategies)}）', PAYOFF_CONFIG,
+                            label='payoff_diagram', title='盈亏图')
+    
+    # 4. 多腿策略盈亏对比图（每种结构的最优组合）
+    best = [result_df.iloc[0] for result_df in (multi_leg_results or {}).values() if len(result_df) > 0]
+    if best:
+        source = chain if chain is not None else df
+        iv_by_symbol = source.groupby(source['symbol'].astype(str))['mid_iv'].first().to_dict()
+        strategies = [to_payoff_strategy(row, SPOT_PRICE, iv_by_symbol) for row in best]
+        renderer.submit(plot_payoff_diagram, renderer.output_path(OUTPUT_FOLDER, f'strategy_payoff_{timestamp}'),
+                        strategies, SPOT_PRICE, '多腿策略盈亏对比（各结构最优组合）', PAYOFF_CONFIG,
+                        label='strategy_payoff', title='多腿策略盈亏图')
+    
+    if own_renderer:
+        renderer.close()
+
+def _scatter_by_expiry(df, column, spot_price):
+    """按到期日分组绘制散点，并标记现货价格"""
+    plt = pyplot(CHART_FONTS)
     plt.figure(figsize=(12, 8))
     
     expiration_dates = df['expiration_date'].dropna().unique()
     colors = plt.cm.Set1(np.linspace(0, 1, len(expiration_dates)))
     
+    color_map = {}
     for i, exp_date in enumerate(sorted(expiration_dates)):
         exp_df = df[df['expiration_date'] == exp_date]
-        plt.scatter(exp_df['strike_price'], exp_df['mid_iv'], 
+        plt.scatter(exp_df['strike_price'], exp_df[column], 
                    label=f'{exp_date}', color=colors[i], alpha=0.7, s=50)
+        color_map[exp_date] = colors[i]
     
-    plt.axvline(x=SPOT_PRICE, color='red', linestyle='--', alpha=0.7, 
-                label=f'现货价格 ${SPOT_PRICE:,.0f}')
+    plt.axvline(x=spot_price, color='red', linestyle='--', alpha=0.7, 
+                label=f'现货价格 ${spot_price:,.0f}')
+    return color_map
+
+def plot_iv_smile(output_file, dpi, df, spot_price, curves=None):
+    """
+    绘制隐含波动率微笑图（curves 为各到期日的曲面拟合曲线）
+    """
+    plt = pyplot(CHART_FONTS)
+    color_map = _scatter_by_expiry(df, 'mid_iv', spot_price)
+    if curves is not None:
+        for exp_date, curve in curves.groupby('expiration_date', sort=True):
+            if exp_date in color_map:
+                plt.plot(curve['strike_price'], curve['surface_iv'], color=color_map[exp_date], linewidth=1.5)
     plt.xlabel('行权价 ($)')
     plt.ylabel('隐含波动率 (%)')
     plt.title('BTC期权隐含波动率微笑')
     plt.legend()
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
-    
-    iv_file = os.path.join(OUTPUT_FOLDER, f'iv_smile_{timestamp}.png')
-    plt.savefig(iv_file, dpi=300, bbox_inches='tight')
-    print(f"隐含波动率微笑图已保存至: {iv_file}")
-    plt.show()
-    
-    # 2. Vega/Theta性价比曲线
-    plt.figure(figsize=(12, 8))
-    
-    for i, exp_date in enumerate(sorted(expiration_dates)):
-        exp_df = df[df['expiration_date'] == exp_date]
-        plt.scatter(exp_df['strike_price'], exp_df['vega_to_theta_ratio'], 
-                   label=f'{exp_date}', color=colors[i], alpha=0.7, s=50)
-    
-    plt.axvline(x=SPOT_PRICE, color='red', linestyle='--', alpha=0.7, 
-                label=f'现货价格 ${SPOT_PRICE:,.0f}')
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+
+def plot_vega_theta_ratio(output_file, dpi, df, spot_price):
+    """
+    绘制Vega/Theta性价比曲线
+    """
+    plt = pyplot(CHART_FONTS)
+    _scatter_by_expiry(df, 'vega_to_theta_ratio', spot_price)
     plt.xlabel('行权价 ($)')
     plt.ylabel('Vega/Theta 比率')
     plt.title('Vega/Theta 性价比曲线')
     plt.legend()
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+
+def plot_payoff_diagram(output_file, dpi, strategies, spot_price, title, config=PAYOFF_CONFIG):
+    """
+    绘制策略盈亏图：多个策略（common.payoff 表示）的到期盈亏曲线叠加在同一张图上，
+    到期前盈亏为同色虚线，盈亏平衡点标记在零轴上；第一个（最优）策略标注最大利润与最大亏损
+    """
+    plt = pyplot(CHART_FONTS)
+    legs = stack_strategies(strategies)
+    prices = price_grid(legs, spot_price, config['points'], config['padding'])
+    pnl = expiry_pnl(legs, prices)
+    pre = pre_expiry_pnl(legs, prices, config['elapsed_days']) if config['pre_expiry'] else None
+    crossings = breakevens(prices, pnl)
+    extremes = curve_extremes(prices, pnl)
+    colors = plt.cm.tab10(np.arange(len(strategies)) % 10)
     
-    vega_theta_file = os.path.join(OUTPUT_FOLDER, f'vega_theta_ratio_{timestamp}.png')
-    plt.savefig(vega_theta_file, dpi=300, bbox_inches='tight')
-    print(f"Vega/Theta性价比曲线图已保存至: {vega_theta_file}")
-    plt.show()
-    
-    # 3. 最优价差策略盈亏图
-    if 'bear_put_spread' in bear_put_spread_results:
-        spread_df = bear_put_spread_results['bear_put_spread']
-        if len(spread_df) > 0:
-            best_spread = spread_df.iloc[0]
-            plot_payoff_diagram(best_spread, timestamp)
-
-def plot_payoff_diagram(spread_data, timestamp):
-    """
-    绘制价差策略盈亏图
-    """
-    long_strike = spread_data['long_strike']
-    short_strike = spread_data['short_strike']
-    net_premium = spread_data['net_premium']
-    max_profit = spread_data['max_profit']
-    max_risk = spread_data['max_risk']
-    breakeven = spread_data['breakeven']
-    
-    # 生成价格范围
-    price_range = np.linspace(short_strike * 0.8, long_strike * 1.2, 1000)
-    
-    # 计算盈亏
-    payoffs = []
-    for price in price_range:
-        if price <= short_strike:
-            # 两个期权都到期价内
-            payoff = (long_strike - price) - (short_strike - price) - net_premium
-        elif price <= long_strike:
-            # 只有长腿到期价内
-            payoff = (long_strike - price) - net_premium
-        else:
-            # 两个期权都到期价外
-            payoff = -net_premium
-        
-        payoffs.append(payoff)
-    
-    # 绘制盈亏图
     plt.figure(figsize=(12, 8))
-    plt.plot(price_range, payoffs, 'b-', linewidth=2, label='策略盈亏')
+    for i, label in enumerate(legs['label']):
+        plt.plot(prices, pnl[i], color=colors[i], linewidth=2, label=label)
+        if pre is not None and not np.isnan(pre[i]).all():
+            plt.plot(prices, pre[i], color=colors[i], linestyle='--', linewidth=1, alpha=0.8)
+        if len(crossings[i]) > 0:
+            plt.scatter(crossings[i], np.zeros(len(crossings[i])), color=colors[i], marker='x', s=80, zorder=5)
+    if pre is not None:
+        plt.plot([], [], color='gray', linestyle='--', label=f"到期前盈亏（Black-76，{config['elapsed_days']} 天后）")
+    plt.scatter([], [], color='gray', marker='x', label='盈亏平衡点')
     
     # 标记关键点
     plt.axhline(y=0, color='black', linestyle='-', alpha=0.3)
-    plt.axvline(x=breakeven, color='green', linestyle='--', alpha=0.7, 
-                label=f'盈亏平衡点 ${breakeven:.0f}')
-    plt.axvline(x=long_strike, color='red', linestyle='--', alpha=0.7, 
-                label=f'长腿行权价 ${long_strike:.0f}')
-    plt.axvline(x=short_strike, color='orange', linestyle='--', alpha=0.7, 
-                label=f'短腿行权价 ${short_strike:.0f}')
-    plt.axvline(x=SPOT_PRICE, color='purple', linestyle='--', alpha=0.7, 
-                label=f'现货价格 ${SPOT_PRICE:.0f}')
-    
-    # 标记最大利润和最大亏损
-    plt.scatter([short_strike], [max_profit], color='green', s=100, zorder=5)
-    plt.annotate(f'最大利润\n${max_profit:.2f}', 
-                xy=(short_strike, max_profit), 
+    plt.axvline(x=spot_price, color='purple', linestyle='--', alpha=0.7, 
+                label=f'现货价格 ${spot_price:.0f}')
+    
+    # 标记最优策略的最大利润和最大亏损
+    max_profit, max_loss = extremes['max_profit'][0], extremes['max_loss'][0]
+    plt.scatter([extremes['max_profit_price'][0]], [max_profit], color='green', s=100, zorder=5)
+    plt.annotate(f'最大利润\n${max_profit:,.2f}', 
+                xy=(extremes['max_profit_price'][0], max_profit), 
                 xytext=(10, 10), textcoords='offset points',
                 bbox=dict(boxstyle='round,pad=0.3', facecolor='lightgreen', alpha=0.7))
-    
-    plt.scatter([long_strike], [-max_risk], color='red', s=100, zorder=5)
-    plt.annotate(f'最大亏损\n${max_risk:.2f}', 
-                xy=(long_strike, -max_risk), 
+    plt.scatter([extremes['max_loss_price'][0]], [-max_loss], color='red', s=100, zorder=5)
+    plt.annotate(f'最大亏损\n${max_loss:,.2f}', 
+                xy=(extremes['max_loss_price'][0], -max_loss), 
                 xytext=(10, -20), textcoords='offset points',
                 bbox=dict(boxstyle='round,pad=0.3', facecolor='lightcoral', alpha=0.7))
     
     plt.xlabel('到期时标的价格 ($)')
     plt.ylabel('策略盈亏 ($)')
-    plt.title(f'熊市看跌价差策略盈亏图\n长腿: ${long_strike:.0f}, 短腿: ${short_strike:.0f}')
-    plt.legend()
+    plt.title(title)
+    plt.legend(fontsize=9)
     plt.grid(True, alpha=0.3)
     plt.tight_layout()
     
-    payoff_file = os.path.join(OUTPUT_FOLDER, f'payoff_diagram_{timestamp}.png')
-    plt.savefig(payoff_file, dpi=300, bbox_inches='tight')
-    print(f"盈亏图已保存至: {payoff_file}")
-    plt.show()
+    plt.savefig(output_file, dpi=dpi, bbox_inches='tight')
+
+def analysis_chain(chain, option_types=('P',)):
+    """
+    按当前 SPOT_PRICE 为清洗后的期权链计算辅助列（IV、希腊字母、到期天数）与性价比指标
+    返回 (指定类型的期权链, 看跌期权 df)；结果只与现货价有关，可按现货价缓存复用
+    """
+    mask = chain['option_type'].isin(option_types)
+    if UNDERLYING_ASSET is not None:
+        mask &= chain['asset'] == UNDERLYING_ASSET
+    chain = calculate_auxiliary_columns(chain[mask].copy()).reset_index(drop=True)
+    df = calculate_metrics(chain[chain['option_type'] == 'P'].reset_index(drop=True))
+    return chain, df
+
+def run_analysis(chain, config=None):
+    """
+    进程内分析入口：不提示输入、不读写 export 文件夹，返回 common.results.AnalysisResult
+    chain: prepare_chain 清洗后的期权链（如 load_chain(path, prepare_chain, tag='put2') 的结果，可含看涨期权）
+    config: 见 ANALYSIS_DEFAULTS
+    """
+    global SPOT_PRICE
+    config = {**ANALYSIS_DEFAULTS, **(config or {})}
+    if config['spot_price'] is not None:
+        SPOT_PRICE = float(config['spot_price'])
+    if SPOT_PRICE is None:
+        raise ValueError("run_analysis 需要现货价格（config['spot_price'] 或 SPOT_PRICE）")
+    
+    chain, df = analysis_chain(chain, ('P', 'C') if config['strategy_search'] else ('P',))
+    single_put_results, bear_put_spread_results = run_strategy_analysis(
+        df, strategy_config=config['strategy_config'])
+    multi_leg_results = run_multi_leg_search(chain) if config['strategy_search'] else {}
+    hedge_results = None
+    if config['monte_carlo']:
+        hedge_results = run_hedge_simulation(df, single_put_results, bear_put_spread_results)
+    return analysis_results(df, single_put_results, bear_put_spread_results, multi_leg_results,
+                            hedge_results, chain)
 
 def main():
     """
@@ -907,31 +1524,47 @@ def main():
         # 1. 获取现货价格
         get_spot_price()
         
-        # 2. 加载和清洗数据
-        df = load_and_clean_data()
+        # 2. 加载和清洗数据（多腿策略搜索需要同时加载看涨期权）
+        fingerprints = [] if INCREMENTAL_CONFIG['enabled'] else None
+        chain = load_and_clean_data(('P', 'C') if STRATEGY_SEARCH_CONFIG['enabled'] else ('P',), fingerprints)
+        df = chain[chain['option_type'] == 'P'].reset_index(drop=True)
+        
+        # 3. 计算指标（增量模式下只计算变化的合约）
+        previous, diff = None, None
+        if INCREMENTAL_CONFIG['enabled']:
+            fingerprints = pd.concat(fingerprints)
+            previous = load_state(INCREMENTAL_CONFIG['state_dir'], _state_name(), _incremental_meta())
+        if previous is not None:
+            df, diff = calculate_metrics_incremental(df, previous, fingerprints)
+        else:
+            df = calculate_metrics(df)
         
-        # 3. 计算指标
-        df = calculate_metrics(df)
+        # 3.1 拟合波动率曲面
+        surface = build_vol_surface(df) if VOL_SURFACE_CONFIG['enabled'] else None
+        if SNAPSHOT_STORE_CONFIG['enabled']:
+            archive_snapshot(df)
         
         # 4. 策略分析
         print("\n正在进行策略分析...")
-        
-        single_put_results = {}
-        for strategy_name, config in STRATEGY_CONFIG.items():
-            if strategy_name != 'bear_put_spread':
-                result = analyze_single_put(df, strategy_name, config)
-                single_put_results[strategy_name] = result
-        
-        bear_put_spread_results = {}
-        bear_put_spread_results['bear_put_spread'] = analyze_bear_put_spread(
-            df, STRATEGY_CONFIG['bear_put_spread']
-        )
+        single_put_results, bear_put_spread_results = run_strategy_analysis(df, previous, diff)
+        if INCREMENTAL_CONFIG['enabled']:
+            save_incremental_state(df, bear_put_spread_results, fingerprints)
+        multi_leg_results = run_multi_leg_search(chain) if STRATEGY_SEARCH_CONFIG['enabled'] else {}
+        hedge_results = None
+        if MONTE_CARLO_CONFIG['enabled']:
+            hedge_results = run_hedge_simulation(df, single_put_results, bear_put_spread_results)
         
         # 5. 生成报告
-        generate_report(df, single_put_results, bear_put_spread_results)
+        generate_report(df, single_put_results, bear_put_spread_results, multi_leg_results, hedge_results)
+        
+        # 5.1 导出机器可读结果
+        if RESULT_EXPORT_CONFIG['format']:
+            export_results(analysis_results(df, single_put_results, bear_put_spread_results, multi_leg_results,
+                                            hedge_results, chain))
         
         # 6. 生成可视化
-        generate_visualizations(df, bear_put_spread_results)
+        generate_visualizations(df, bear_put_spread_results, surface=surface,
+                                multi_leg_results=multi_leg_results, chain=chain)
         
         print("\n" + "="*80)
         print("分析完成！所有结果已保存到export文件夹。")
@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+"""
+分析报告流水线
+期权数据与各策略结果表只按到期日分组一次（groupby().indices 得到各到期日的行位置），
+按到期日升序依次生成每个到期日的视图（ExpiryGroup），交给各渲染器：
+
+- ConsoleRenderer：控制台报告
+- MarkdownRenderer：comprehensive_report_<时间戳>.md
+- HTMLRenderer：comprehensive_report_<时间戳>.html
+- JSONRenderer：report_<时间戳>.json（各到期日各策略的全部结果行）
+
+每个到期日的视图只生成一次，各渲染器写完即丢弃（文件边生成边写入），
+报告耗时与期权链规模成线性关系，而不是 到期日数 × 结果行数。
+
+渲染器实现 begin(ctx) / expiry(group, ctx) / end(ctx) 三个钩子，ctx 为 ReportContext。
+"""
+
+import html
+import json
+import os
+from datetime import datetime
+
+# 单腿策略：(结果键, 控制台名称, 报告名称, Delta 区间, 说明)
+SINGLE_STRATEGIES = [
+    ('full_protection_put', '全面保护', '全面保护策略', 'Delta: -0.55 至 -0.45', '适合大幅下跌保护'),
+    ('partial_protection_put', '部分保护', '部分保护策略', 'Delta: -0.35 至 -0.25', '适合中等下跌保护'),
+    ('tail_hedge_put', '尾部对冲', '尾部对冲策略', 'Delta: -0.15 至 -0.05', '适合尾部风险对冲'),
+]
+
+REPORT_FORMATS = ('console', 'markdown', 'html', 'json')
+
+# HTML 报告各表格的列
+SINGLE_COLUMNS = ['symbol', 'strike_price', 'delta', 'mid_price', 'vega_to_theta_ratio', 'mid_iv',
+                  'days_to_expiration']
+SPREAD_COLUMNS = ['long_strike', 'short_strike', 'long_delta', 'short_delta', 'net_premium', 'max_risk',
+                  'max_profit', 'breakeven', 'reward_risk_ratio', 'success_prob']
+MULTI_LEG_COLUMNS = ['legs', 'net_premium', 'max_risk', 'max_profit', 'breakeven_low', 'breakeven_high',
+                     'reward_risk_ratio', 'success_prob', 'net_delta']
+
+
+def _positions(frame):
+    """各到期日在结果表中的行位置 {到期日: 位置数组}（保持原有行顺序）"""
+    if frame is None or len(frame) == 0 or 'expiration_date' not in frame.columns:
+        return {}
+    return frame.groupby('expiration_date', sort=False).indices
+
+
+def _rows(frame, positions, exp_date):
+    rows = positions.get(exp_date)
+    return frame.iloc[rows] if rows is not None else frame.iloc[:0]
+
+
+class ExpiryGroup:
+    """
+    一个到期日的视图
+    singles: {单腿策略键: 结果行}，只含结果中存在的策略（可能为空表）
+    spread: 熊市看跌价差结果行，未运行价差分析时为 None
+    multi_leg: {结构键: 结果行}，只含该到期日有结果的结构
+    """
+
+    def __init__(self, exp_date, n_options, singles, spread, multi_leg):
+        self.exp_date = exp_date
+        self.n_options = n_options
+        self.singles = singles
+        self.spread = spread
+        self.multi_leg = multi_leg
+
+
+def iter_expiry_groups(df, single_results, spread_results, multi_leg_results=None):
+    """按到期日升序生成 ExpiryGroup；每个结果表只分组一次"""
+    option_positions = _positions(df)
+    singles = {key: (frame, _positions(frame)) for key, frame in single_results.items()}
+    spread = spread_results.get('bear_put_spread')
+    spread_positions = _positions(spread)
+    multi_leg = {key: (frame, _positions(frame)) for key, frame in (multi_leg_results or {}).items()}
+
+    for exp_date in sorted(option_positions):
+        yield ExpiryGroup(
+            exp_date,
+            len(option_positions[exp_date]),
+            {key: _rows(frame, positions, exp_date) for key, (frame, positions) in singles.items()},
+            None if spread is None else _rows(spread, spread_positions, exp_date),
+            {key: _rows(frame, positions, exp_date) for key, (frame, positions) in multi_leg.items()
+             if exp_date in positions},
+        )
+
+
+class ReportContext:
+    """
+    报告上下文：整体数据与配置，供各渲染器读取
+    recommend: 无参函数，返回 {标题: Markdown 文本} 的最优策略推荐，首次使用时才计算
+    """
+
+    def __init__(self, df, spot, analysis_time, timestamp, output_folder, structure_names,
+                 hedge_results=None, hedge_names=None, monte_carlo_config=None, recommend=None,
+                 format_breakevens=None, top_n=3):
+        self.df = df
+        self.spot = spot
+        self.n_options = len(df)
+        self.expiration_dates = sorted(df['expiration_date'].dropna().unique())
+        self.analysis_time = analysis_time
+        self.timestamp = timestamp
+        self.output_folder = output_folder
+        self.structure_names = structure_names
+        self.hedge_results = hedge_results if hedge_results is not None and len(hedge_results) > 0 else None
+        self.hedge_names = hedge_names or {}
+        self.monte_carlo_config = monte_carlo_config or {}
+        self.format_breakevens = format_breakevens
+        self.top_n = top_n
+        self._recommend = recommend
+        self._recommendations = None
+
+    @property
+    def recommendations(self):
+        if self._recommendations is None:
+            self._recommendations = self._recommend() if self._recommend is not None else {}
+        return self._recommendations
+
+    def hedge_groups(self):
+        """蒙特卡洛结果按策略分组 [(显示名称, 结果行)]"""
+        if self.hedge_results is None:
+            return []
+        return [(self.hedge_names.get(name, name), group)
+                for name, group in self.hedge_results.groupby('strategy', sort=False)]
+
+    def output_path(self, prefix, extension):
+        return os.path.join(self.output_folder, f'{prefix}_{self.timestamp}.{extension}')
+
+
+class ReportRenderer:
+    """渲染器基类"""
+
+    def begin(self, ctx):
+        pass
+
+    def expiry(self, group, ctx):
+        pass
+
+    def end(self, ctx):
+        pass
+
+
+class FileRenderer(ReportRenderer):
+    """写入单个文件的渲染器：begin 打开文件，end 写完后关闭"""
+
+    prefix = 'report'
+    extension = 'txt'
+    title = '报告'
+
+    def __init__(self):
+        self.path = None
+        self._file = None
+
+    def begin(self, ctx):
+        os.makedirs(ctx.output_folder, exist_ok=True)
+        self.path = ctx.output_path(self.prefix, self.extension)
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self.write_header(ctx)
+
+    def end(self, ctx):
+        try:
+            self.write_footer(ctx)
+        finally:
+            self._file.close()
+        print(f"{self.title}已保存至: {self.path}")
+
+    def write(self, text):
+        self._file.write(text)
+
+    def write_header(self, ctx):
+        pass
+
+    def write_footer(self, ctx):
+        pass
+
+
+class ConsoleRenderer(ReportRenderer):
+    """控制台报告"""
+
+    def begin(self, ctx):
+        print("\n" + "="*80)
+        print("BTC期权防御策略量化分析报告")
+        print("="*80)
+        print(f"分析日期: {ctx.analysis_time:%Y-%m-%d %H:%M:%S}")
+        print(f"标的现货价格: ${ctx.spot:,.2f}")
+        print(f"分析期权数量: {ctx.n_options} 个")
+
+    def expiry(self, group, ctx):
+        top_n = ctx.top_n
+        print(f"\n{'='*60}")
+        print(f"到期日: {group.exp_date}")
+        print(f"{'='*60}")
+
+        print("\n【单腿看跌期权策略】")
+        for key, name, _, _, _ in SINGLE_STRATEGIES:
+            rows = group.singles.get(key)
+            if rows is not None and len(rows) > 0:
+                print(f"\n{name}策略 (Top {top_n}):")
+                for i, row in enumerate(rows.head(top_n).itertuples(index=False), 1):
+                    print(f"  {i}. 行权价: ${row.strike_price:,.0f}, "
+                          f"Delta: {row.delta:.3f}, "
+                          f"权利金: ${row.mid_price:.4f}, "
+                          f"Vega/Theta: {row.vega_to_theta_ratio:.2f}")
+
+        print("\n【熊市看跌价差策略】")
+        if group.spread is not None and len(group.spread) > 0:
+            print(f"最优组合 (Top {top_n}):")
+            for i, row in enumerate(group.spread.head(top_n).itertuples(index=False), 1):
+                print(f"  {i}. 长腿: ${row.long_strike:,.0f}, "
+                      f"短腿: ${row.short_strike:,.0f}, "
+                      f"净权利金: ${row.net_premium:.4f}, "
+                      f"盈亏比: {row.reward_risk_ratio:.2f}, "
+                      f"赔率: {row.odds:.2f}:1 (成功概率: {row.success_prob:.1%})")
+
+        for key, rows in group.multi_leg.items():
+            print(f"\n【{ctx.structure_names[key]}】(Top {top_n}):")
+            for i, row in enumerate(rows.head(top_n).itertuples(index=False), 1):
+                print(f"  {i}. {row.legs}, "
+                      f"净权利金: ${row.net_premium:,.2f}, "
+                      f"盈亏比: {row.reward_risk_ratio:.2f}, "
+                      f"盈利概率: {row.success_prob:.1%}, "
+                      f"净Delta: {row.net_delta:.3f}")
+
+    def end(self, ctx):
+        # 蒙特卡洛对冲效果（按尾部损失降低排序）
+        groups = ctx.hedge_groups()
+        if not groups:
+            return
+        config = ctx.monte_carlo_config
+        print(f"\n{'='*60}")
+        print(f"蒙特卡洛对冲效果（{config['n_paths']:,} 条路径，持有 1 个现货，"
+              f"尾部 {config['tail_quantile']:.0%} CVaR）")
+        print(f"{'='*60}")
+        for name, rows in groups:
+            print(f"\n【{name}】(Top {ctx.top_n}):")
+            best = rows.sort_values('tail_loss_reduction', ascending=False, kind='stable').head(ctx.top_n)
+            for i, row in enumerate(best.itertuples(index=False), 1):
+                print(f"  {i}. {row.expiration_date} {row.description}, "
+                      f"期望盈亏: ${row.expected_pnl:,.2f}, "
+                      f"盈利概率: {row.hit_rate:.1%}, "
+                      f"尾部损失降低: {row.tail_loss_reduction:.1%} "
+                      f"(${row.unhedged_cvar:,.0f} → ${row.hedged_cvar:,.0f})")
+
+
+class MarkdownRenderer(FileRenderer):
+    """综合报告文档（Markdown）"""
+
+    prefix = 'comprehensive_report'
+    extension = 'md'
+    title = '综合报告'
+
+    def write_header(self, ctx):
+        self.write("# BTC期权防御策略量化分析综合报告\n\n")
+        self.write(f"**分析日期**: {ctx.analysis_time:%Y-%m-%d %H:%M:%S}\n")
+        self.write(f"**标的现货价格**: ${ctx.spot:,.2f}\n")
+        self.write(f"**分析期权数量**: {ctx.n_options} 个\n\n")
+
+        self.write("## 市场概况\n\n")
+        self.write(f"**到期日数量**: {len(ctx.expiration_dates)} 个\n")
+        if ctx.expiration_dates:
+            self.write(f"**到期日范围**: {ctx.expiration_dates[0]} 至 {ctx.expiration_dates[-1]}\n\n")
+
+        self.write("## 策略分析结果\n\n")
+
+    def expiry(self, group, ctx):
+        write = self.write
+        top_n = ctx.top_n
+        days_to_exp = (group.exp_date - ctx.analysis_time.date()).days
+        write(f"### 到期日: {group.exp_date}\n\n")
+        write(f"**到期天数**: {days_to_exp} 天\n")
+        write(f"**该到期日期权数量**: {group.n_options} 个\n\n")
+
+        write("#### 【单腿看跌期权策略】\n\n")
+        for key, _, name, delta_range, description in SINGLE_STRATEGIES:
+            rows = group.singles.get(key)
+            if rows is None:
+                continue
+            if len(rows) == 0:
+                write(f"**{name}**: 无符合条件的期权\n\n")
+                continue
+            write(f"**{name}** ({delta_range})\n")
+            write(f"*{description}*\n\n")
+            for i, row in enumerate(rows.head(top_n).itertuples(index=False), 1):
+                write(f"{i}. **行权价**: ${row.strike_price:,.0f}\n")
+                write(f"   - Delta: {row.delta:.3f}\n")
+                write(f"   - 权利金: ${row.mid_price:.4f}\n")
+                write(f"   - Vega/Theta比率: {row.vega_to_theta_ratio:.2f}\n")
+                write(f"   - 隐含波动率: {row.mid_iv:.1%}\n")
+                write(f"   - 到期天数: {row.days_to_expiration:.0f}天\n\n")
+
+        write("#### 【熊市看跌价差策略】\n\n")
+        write("*通过买入高行权价看跌期权，卖出低行权价看跌期权，降低权利金成本*\n\n")
+        if group.spread is not None and len(group.spread) > 0:
+            for i, row in enumerate(group.spread.head(top_n).itertuples(index=False), 1):
+                write(f"{i}. **长腿**: ${row.long_strike:,.0f} (Delta: {row.long_delta:.3f})\n")
+                write(f"   **短腿**: ${row.short_strike:,.0f} (Delta: {row.short_delta:.3f})\n")
+                write(f"   - 净权利金: ${row.net_premium:.4f}\n")
+                write(f"   - 最大风险: ${row.max_risk:.4f}\n")
+                write(f"   - 最大利润: ${row.max_profit:.4f}\n")
+                write(f"   - 盈亏平衡点: ${row.breakeven:.0f}\n")
+                write(f"   - 盈亏比: {row.reward_risk_ratio:.2f}\n\n")
+        else:
+            write("无符合条件的价差组合\n\n")
+
+        for key, rows in group.multi_leg.items():
+            write(f"#### 【{ctx.structure_names[key]}】\n\n")
+            for i, (_, row) in enumerate(rows.head(top_n).iterrows(), 1):
+                write(f"{i}. **组合**: {row['legs']}\n")
+                write(f"   - 净权利金: ${row['net_premium']:,.2f}{'（收入）' if row['net_premium'] < 0 else ''}\n")
+                write(f"   - 最大风险: ${row['max_risk']:,.2f}\n")
+                write(f"   - 最大利润: ${row['max_profit']:,.2f}\n")
+                write(f"   - 盈亏平衡点: {ctx.format_breakevens(row)}\n")
+                write(f"   - 盈亏比: {row['reward_risk_ratio']:.2f}\n")
+                write(f"   - 盈利概率: {row['success_prob']:.1%}\n")
+                write(f"   - 净希腊字母: Delta {row['net_delta']:.3f}, Gamma {row['net_gamma']:.2e}, "
+                      f"Theta {row['net_theta']:.2f}, Vega {row['net_vega']:.2f}\n\n")
+
+        write("---\n\n")
+
+    def write_footer(self, ctx):
+        write = self.write
+        write("## 最优策略推荐与分析\n\n")
+        for category, analysis in ctx.recommendations.items():
+            write(f"### {category}\n\n")
+            write(f"{analysis}\n\n")
+
+        groups = ctx.hedge_groups()
+        if groups:
+            config = ctx.monte_carlo_config
+            write("## 蒙特卡洛对冲效果\n\n")
+            write(f"模型 {config['model']}，{config['n_paths']:,} 条路径（随机种子 "
+                  f"{config['seed']}），每份策略对冲 1 个现货；尾部损失为最差 "
+                  f"{config['tail_quantile']:.0%} 路径的平均损失（CVaR）\n\n")
+            for name, rows in groups:
+                write(f"### {name}\n\n")
+                write("| 到期日 | 合约 | 权利金 | 期望盈亏 | 盈利概率 | 到期实值概率 | 不对冲CVaR | 对冲后CVaR | 尾部损失降低 |\n")
+                write("|--------|------|--------|----------|----------|--------------|------------|------------|--------------|\n")
+                for row in rows.itertuples(index=False):
+                    write(f"| {row.expiration_date} | {row.description} | ${row.premium:,.2f} | "
+                          f"${row.expected_pnl:,.2f} | {row.hit_rate:.1%} | {row.itm_rate:.1%} | "
+                          f"${row.unhedged_cvar:,.0f} | ${row.hedged_cvar:,.0f} | "
+                          f"{row.tail_loss_reduction:.1%} |\n")
+                write("\n")
+
+        write("## 风险提示\n\n")
+        write("1. **时间价值衰减**: 期权时间价值会随时间衰减，临近到期时衰减加速\n")
+        write("2. **隐含波动率风险**: 隐含波动率下降会导致期权价格下跌\n")
+        write("3. **流动性风险**: 深度价外期权可能存在流动性不足的问题\n")
+        write("4. **方向性风险**: 看跌期权在价格上涨时会亏损\n")
+        write("5. **保证金要求**: 价差策略需要满足保证金要求\n\n")
+
+        write("## 使用建议\n\n")
+        write("1. **全面保护策略**: 适合预期大幅下跌的投资者，提供强保护但成本较高\n")
+        write("2. **部分保护策略**: 适合预期中等下跌的投资者，平衡保护效果与成本\n")
+        write("3. **尾部对冲策略**: 适合长期持有者，提供极端情况下的保护\n")
+        write("4. **熊市价差策略**: 适合预期下跌但希望降低成本的投资者\n")
+        write("5. **组合使用**: 可考虑将不同策略组合使用，构建多层次保护体系\n\n")
+
+        write("---\n")
+        write(f"*报告生成时间: {datetime.now():%Y-%m-%d %H:%M:%S}*\n")
+
+
+def _html_table(rows, columns, top_n):
+    columns = [col for col in columns if col in rows.columns]
+    return rows.head(top_n)[columns].to_html(index=False, border=0, float_format=lambda x: f"{x:,.4f}",
+                                             na_rep='-')
+
+
+class HTMLRenderer(FileRenderer):
+    """综合报告（HTML），每个到期日一节，结果以表格展示"""
+
+    prefix = 'comprehensive_report'
+    extension = 'html'
+    title = 'HTML报告'
+
+    def write_header(self, ctx):
+        self.write("<!DOCTYPE html>\n<html lang=\"zh-CN\">\n<head>\n<meta charset=\"utf-8\">\n"
+                   "<title>BTC期权防御策略量化分析综合报告</title>\n"
+                   "<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse;margin:.5em 0}"
+                   "th,td{border:1px solid #ccc;padding:2px 8px;text-align:right}"
+                   "pre{white-space:pre-wrap}</style>\n</head>\n<body>\n")
+        self.write("<h1>BTC期权防御策略量化分析综合报告</h1>\n")
+        self.write(f"<p>分析日期: {ctx.analysis_time:%Y-%m-%d %H:%M:%S}<br>\n"
+                   f"标的现货价格: ${ctx.spot:,.2f}<br>\n"
+                   f"分析期权数量: {ctx.n_options} 个<br>\n"
+                   f"到期日数量: {len(ctx.expiration_dates)} 个</p>\n")
+
+    def expiry(self, group, ctx):
+        write = self.write
+        days_to_exp = (group.exp_date - ctx.analysis_time.date()).days
+        write(f"<h2>到期日: {group.exp_date}</h2>\n")
+        write(f"<p>到期天数: {days_to_exp} 天，该到期日期权数量: {group.n_options} 个</p>\n")
+        for key, _, name, delta_range, _ in SINGLE_STRATEGIES:
+            rows = group.singles.get(key)
+            if rows is None:
+                continue
+            write(f"<h3>{name} ({delta_range})</h3>\n")
+            write(_html_table(rows, SINGLE_COLUMNS, ctx.top_n) if len(rows) > 0 else "<p>无符合条件的期权</p>")
+            write("\n")
+        write("<h3>熊市看跌价差</h3>\n")
+        if group.spread is not None and len(group.spread) > 0:
+            write(_html_table(group.spread, SPREAD_COLUMNS, ctx.top_n))
+        else:
+            write("<p>无符合条件的价差组合</p>")
+        write("\n")
+        for key, rows in group.multi_leg.items():
+            write(f"<h3>{html.escape(ctx.structure_names[key])}</h3>\n")
+            write(_html_table(rows, MULTI_LEG_COLUMNS, ctx.top_n))
+            write("\n")
+
+    def write_footer(self, ctx):
+        write = self.write
+        write("<h2>最优策略推荐与分析</h2>\n")
+        for category, analysis in ctx.recommendations.items():
+            write(f"<h3>{html.escape(category)}</h3>\n<pre>{html.escape(analysis.strip())}</pre>\n")
+        groups = ctx.hedge_groups()
+        if groups:
+            write("<h2>蒙特卡洛对冲效果</h2>\n")
+            for name, rows in groups:
+                write(f"<h3>{html.escape(name)}</h3>\n")
+                write(rows.drop(columns=['strategy']).to_html(index=False, border=0, na_rep='-',
+                                                                float_format=lambda x: f"{x:,.4f}"))
+                write("\n")
+        write(f"<p><em>报告生成时间: {datetime.now():%Y-%m-%d %H:%M:%S}</em></p>\n</body>\n</html>\n")
+
+
+def _json_records(rows):
+    """结果行转为 JSON 数组文本（NaN 为 null，日期为 ISO 格式）"""
+    return rows.to_json(orient='records', date_format='iso', force_ascii=False)
+
+
+class JSONRenderer(FileRenderer):
+    """
+    机器可读报告：{"meta": {...}, "expiries": [{到期日, 各策略全部结果行}, ...], "hedge_simulation": [...]}
+    expiries 数组逐个到期日写入
+    """
+
+    prefix = 'report'
+    extension = 'json'
+    title = 'JSON报告'
+
+    def write_header(self, ctx):
+        meta = {
+            'analysis_time': ctx.analysis_time.isoformat(timespec='seconds'),
+            'spot_price': ctx.spot,
+            'n_options': ctx.n_options,
+            'expiration_dates': [str(exp_date) for exp_date in ctx.expiration_dates],
+        }
+        self.write('{"meta": ' + json.dumps(meta, ensure_ascii=False) + ',\n"expiries": [')
+        self._first = True
+
+    def expiry(self, group, ctx):
+        parts = [f'"expiration_date": {json.dumps(str(group.exp_date))}',
+                 f'"days_to_expiration": {(group.exp_date - ctx.analysis_time.date()).days}',
+                 f'"n_options": {group.n_options}']
+        parts += [f'{json.dumps(key)}: {_json_records(rows)}' for key, rows in group.singles.items()]
+        if group.spread is not None:
+            parts.append(f'"bear_put_spread": {_json_records(group.spread)}')
+        parts.append('"multi_leg": {' + ', '.join(f'{json.dumps(key)}: {_json_records(rows)}'
+                                                  for key, rows in group.multi_leg.items()) + '}')
+        self.write(('\n' if self._first else ',\n') + '{' + ', '.join(parts) + '}')
+        self._first = False
+
+    def write_footer(self, ctx):
+        hedge = '[]' if ctx.hedge_results is None else _json_records(ctx.hedge_results)
+        self.write(f'],\n"hedge_simulation": {hedge}}}\n')
+
+
+RENDERERS = {
+    'console': ConsoleRenderer,
+    'markdown': MarkdownRenderer,
+    'html': HTMLRenderer,
+    'json': JSONRenderer,
+}
+
+
+def make_renderers(formats):
+    unknown = [fmt for fmt in formats if fmt not in RENDERERS]
+    if unknown:
+        raise ValueError(f"不支持的报告格式: {', '.join(unknown)}（可选: {', '.join(REPORT_FORMATS)}）")
+    return [RENDERERS[fmt]() for fmt in formats]
+
+
+def render_report(ctx, groups, renderers):
+    """
+    流式生成报告：每个到期日视图依次交给全部渲染器，渲染完即丢弃
+    groups: iter_expiry_groups 的结果
+    """
+    for renderer in renderers:
+        renderer.begin(ctx)
+    for group in groups:
+        for renderer in renderers:
+            renderer.expiry(group, ctx)
+    for renderer in renderers:
+        renderer.end(ctx)
+    return renderers
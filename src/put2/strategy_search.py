@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多腿期权策略搜索
+在同一到期日内枚举 2~4 腿结构（看跌/看涨垂直价差、看跌比例价差、看跌蝶式、现货领口），
+按每条腿的 Delta 区间与权利金预算剪枝，分块向量化计算组合的到期盈亏与净希腊字母，
+每种结构用容量固定的最小堆保留得分最高的 top_k 个组合。
+
+- 枚举：各腿候选数的笛卡尔积按平铺下标分块（每块 block_size 个组合），内存占用与期权链规模无关
+- 到期盈亏为行权价处折线：只需在 0、各腿行权价处求值，再加最高行权价之后的斜率，
+  即可精确得到最大收益 / 最大亏损 / 盈亏平衡点
+- 盈利概率按对数正态分布（各腿中间IV均值、远期价 = 现货价）对盈利区间积分
+- 默认按可成交价格计算净权利金（买入腿取卖价、卖出腿取买价），并要求最大亏损不低于下限，
+  避免中间价下净支出接近 0 的组合以虚高的盈亏比排在前面
+
+价格单位与 put2.py 一致：mid_price 为美元，bid_price / ask_price 为币本位（按现货价换算为美元），
+delta/gamma/theta/vega 为交易所数值。
+"""
+
+import heapq
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from common.payoff import expiry_pnl, make_strategy
+from common.pricing import norm_cdf
+
+# 结构定义：legs 为 (期权类型, 方向 +1买/-1卖, 数量)；strike_order 为行权价按腿顺序严格递减（desc）或递增（asc）；
+# stock 为持有现货数量（领口策略）
+STRUCTURES = {
+    'bear_put_vertical': {
+        'name': '熊市看跌价差',
+        'legs': [('P', 1, 1), ('P', -1, 1)],
+        'strike_order': 'desc',
+        'stock': 0,
+    },
+    'bull_put_vertical': {
+        'name': '牛市看跌价差（收权利金）',
+        'legs': [('P', -1, 1), ('P', 1, 1)],
+        'strike_order': 'desc',
+        'stock': 0,
+    },
+    'bull_call_vertical': {
+        'name': '牛市看涨价差',
+        'legs': [('C', 1, 1), ('C', -1, 1)],
+        'strike_order': 'asc',
+        'stock': 0,
+    },
+    'bear_call_vertical': {
+        'name': '熊市看涨价差（收权利金）',
+        'legs': [('C', -1, 1), ('C', 1, 1)],
+        'strike_order': 'asc',
+        'stock': 0,
+    },
+    'put_ratio_spread': {
+        'name': '看跌比例价差 (1×2)',
+        'legs': [('P', 1, 1), ('P', -1, 2)],
+        'strike_order': 'desc',
+        'stock': 0,
+    },
+    'put_butterfly': {
+        'name': '看跌蝶式',
+        'legs': [('P', 1, 1), ('P', -1, 2), ('P', 1, 1)],
+        'strike_order': 'desc',
+        'stock': 0,
+    },
+    'collar': {
+        'name': '领口（持有现货 + 买看跌 + 卖看涨）',
+        'legs': [('P', 1, 1), ('C', -1, 1)],
+        'strike_order': 'asc',
+        'stock': 1,
+    },
+}
+
+# 默认搜索参数；delta_bands 与 legs 一一对应
+SEARCH_DEFAULTS = {
+    'structures': {
+        'bear_put_vertical': {'delta_bands': [(-0.60, -0.20), (-0.35, -0.02)]},
+        'bull_put_vertical': {'delta_bands': [(-0.45, -0.15), (-0.25, -0.02)]},
+        'bull_call_vertical': {'delta_bands': [(0.35, 0.75), (0.10, 0.45)]},
+        'bear_call_vertical': {'delta_bands': [(0.15, 0.45), (0.02, 0.25)]},
+        'put_ratio_spread': {'delta_bands': [(-0.55, -0.25), (-0.30, -0.05)]},
+        'put_butterfly': {'delta_bands': [(-0.75, -0.30), (-0.55, -0.15), (-0.35, -0.02)]},
+        'collar': {'delta_bands': [(-0.40, -0.10), (0.10, 0.40)]},
+    },
+    'max_debit_pct': 0.05,        # 权利金预算：净支出不超过现货价的比例（收权利金的组合不受限）
+    'min_risk_pct': 0.002,        # 最大亏损下限（现货价的比例）：过滤净支出接近 0、盈亏比虚高的组合
+    'pricing': 'quote',           # 净权利金计价：quote（买入腿卖价、卖出腿买价）/ mid（中间价）
+    'min_success_prob': 0.25,     # 盈利概率下限，过滤彩票式组合
+    'rank_by': 'reward_risk_ratio',   # 排序指标：reward_risk_ratio / expected_value / success_prob
+    'top_k': 10,                  # 每种结构保留的组合数
+    'block_size': 1 << 18,        # 每块枚举的组合数
+    'max_workers': None,          # 进程池大小（None为CPU核数，1为不启用进程池）
+    'parallel_min_combos': 5_000_000,   # 组合总数达到该值时才启用进程池
+}
+
+RESULT_COLUMNS = [
+    'structure', 'structure_name', 'expiration_date', 'legs', 'net_premium', 'max_profit', 'max_risk',
+    'reward_risk_ratio', 'breakeven_low', 'breakeven_high', 'success_prob', 'failure_prob', 'odds',
+    'expected_value', 'net_delta', 'net_gamma', 'net_theta', 'net_vega', 'days_to_expiration',
+]
+
+
+LEG_FIELDS = {'symbol': 'symbol', 'strike': 'strike_price', 'price': 'mid_price', 'delta': 'delta',
+              'gamma': 'gamma', 'theta': 'theta', 'vega': 'vega', 'iv': 'mid_iv',
+              'bid': 'bid_price', 'ask': 'ask_price'}
+# 币本位报价列（按现货价换算为美元）；期权链缺少时按中间价计价
+QUOTE_FIELDS = ('bid', 'ask')
+
+
+def _expiry_arrays(chain, spot):
+    """单个到期日的期权链转为 NumPy 数组（各结构、各腿筛选候选时共用）"""
+    arrays = {key: chain[col].to_numpy(dtype=float) for key, col in LEG_FIELDS.items()
+              if key != 'symbol' and col in chain.columns}
+    for key in QUOTE_FIELDS:
+        arrays[key] = arrays[key] * spot if key in arrays else arrays['price']
+    arrays['symbol'] = chain['symbol'].astype(str).to_numpy()
+    arrays['option_type'] = chain['option_type'].astype(str).to_numpy()
+    return arrays
+
+
+def _leg_candidates(arrays, option_type, band):
+    """某一腿在单个到期日内的候选合约（按 Delta 区间筛选，价格与希腊字母齐全）"""
+    lo, hi = min(band), max(band)
+    mask = ((arrays['option_type'] == option_type) &
+            (arrays['delta'] >= lo) & (arrays['delta'] <= hi) & (arrays['price'] > 0))
+    for key in ('strike', 'gamma', 'theta', 'vega', 'iv'):
+        mask &= ~np.isnan(arrays[key])
+    return {key: arrays[key][mask] for key in LEG_FIELDS}
+
+
+def _payoff_profile(strikes, types, qty, stock, spot, debit):
+    """
+    到期盈亏折线：在 0 与排序后的各行权价处求值，返回 (拐点 x, 盈亏 y, 末端斜率)
+    strikes: 每条腿一个 (m,) 数组；qty 为带方向的数量
+    """
+    x = np.sort(np.column_stack([np.zeros_like(strikes[0])] + strikes), axis=1)
+    legs = {
+        'strike': np.column_stack(strikes),
+        'is_call': np.array([[t == 'C' for t in types]]),
+        'qty': np.array([qty], dtype=float),
+        'premium': debit,
+        'stock': stock,
+        'spot': spot,
+    }
+    y = expiry_pnl(legs, x)
+    slope = stock + sum(q for t, q in zip(types, qty) if t == 'C')
+    return x, y, np.full(len(debit), float(slope))
+
+
+def _profit_region(x, y, slope):
+    """
+    盈利区间：每个线段（含最高行权价之后的射线）中盈亏 > 0 的部分 [a, b]，无盈利部分为 NaN
+    返回 (a, b, 盈亏平衡点)，形状均为 (m, 段数)
+    """
+    x_end = np.column_stack([x[:, 1:], np.full(len(x), np.inf)])
+    y_end = np.column_stack([y[:, 1:], np.where(slope > 0, np.inf, np.where(slope < 0, -np.inf, y[:, -1]))])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 有限线段用线性插值求根；射线段用斜率求根
+        root = np.where(np.isfinite(x_end), x + (x_end - x) * y / (y - y_end), x - y / slope[:, None])
+    up, down = (y <= 0) & (y_end > 0), (y > 0) & (y_end <= 0)
+    a = np.where(y > 0, x, np.where(up, root, np.nan))
+    b = np.where(y_end > 0, x_end, np.where(down, root, np.nan))
+    return a, b, np.where(up | down, root, np.nan)
+
+
+def _lognormal_cdf(x, spot, sigma_sqrt_t):
+    """远期价为现货价时到期价格的对数正态分布函数"""
+    finite = np.isfinite(x) & (x > 0)
+    z = (np.log(np.where(finite, x, spot) / spot) + 0.5 * sigma_sqrt_t ** 2) / sigma_sqrt_t
+    cdf = np.where(finite, norm_cdf(z), np.where(x <= 0, 0.0, 1.0))
+    return np.where(np.isnan(x), np.nan, cdf)
+
+
+def _leg_prices(legs, qty, pricing):
+    """每条腿的成交价格数组：quote 时买入腿取卖价、卖出腿取买价，mid 时取中间价"""
+    if pricing == 'mid':
+        return [leg['price'] for leg in legs]
+    return [leg['ask'] if q > 0 else leg['bid'] for leg, q in zip(legs, qty)]
+
+
+def _evaluate_block(legs, spec, idx, spot, t, max_debit, min_risk=0.0, pricing='mid'):
+    """
+    计算一块组合的全部指标，返回 (通过剪枝的块内位置, 指标字典)
+    idx: 每条腿一个候选下标数组；缺少成交价格（无买价/卖价）的组合被剔除
+    """
+    types = [t_ for t_, _, _ in spec['legs']]
+    qty = [side * ratio for _, side, ratio in spec['legs']]
+    strikes = [leg['strike'][i] for leg, i in zip(legs, idx)]
+
+    # 行权价顺序（NaN 比较结果为 False，自动剔除）
+    keep = np.ones(len(idx[0]), dtype=bool)
+    for a, b in zip(strikes, strikes[1:]):
+        keep &= (a > b) if spec['strike_order'] == 'desc' else (a < b)
+    debit = sum(q * price[i] for q, price, i in zip(qty, _leg_prices(legs, qty, pricing), idx))
+    keep &= debit <= max_debit
+    pos = np.flatnonzero(keep)
+    if len(pos) == 0:
+        return pos, None
+
+    strikes = [k[pos] for k in strikes]
+    idx = [i[pos] for i in idx]
+    debit = debit[pos]
+    stock = spec['stock']
+    x, y, slope = _payoff_profile(strikes, types, qty, stock, spot, debit)
+
+    max_profit = np.where(slope > 0, np.inf, y.max(axis=1))
+    max_risk = np.where(slope < 0, np.inf, -y.min(axis=1))
+    # 只保留亏损有上限、且不低于最大亏损下限的组合（净支出接近 0 时盈亏比没有意义）
+    bounded = np.isfinite(max_risk) & (max_risk > 0) & (max_risk >= min_risk) & (max_profit > 0)
+
+    iv = sum(leg['iv'][i] for leg, i in zip(legs, idx)) / len(legs)
+    sigma_sqrt_t = iv * np.sqrt(t)
+    a, b, breakeven = _profit_region(x, y, slope)
+    prob = _lognormal_cdf(b, spot, sigma_sqrt_t[:, None]) - _lognormal_cdf(a, spot, sigma_sqrt_t[:, None])
+    success_prob = np.clip(np.nansum(prob, axis=1), 0.0, 1.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics = {
+            'net_premium': debit,
+            'max_profit': max_profit,
+            'max_risk': max_risk,
+            'reward_risk_ratio': max_profit / max_risk,
+            'breakeven_low': np.nanmin(np.where(np.isnan(breakeven), np.inf, breakeven), axis=1),
+            'breakeven_high': np.nanmax(np.where(np.isnan(breakeven), -np.inf, breakeven), axis=1),
+            'success_prob': success_prob,
+            'failure_prob': 1 - success_prob,
+            'odds': np.where(success_prob > 0, (1 - success_prob) / success_prob, np.inf),
+            'expected_value': success_prob * max_profit - (1 - success_prob) * max_risk,
+        }
+    for greek in ('delta', 'gamma', 'theta', 'vega'):
+        metrics[f'net_{greek}'] = sum(q * leg[greek][i] for q, leg, i in zip(qty, legs, idx))
+    metrics['net_delta'] = metrics['net_delta'] + stock
+    for key in ('breakeven_low', 'breakeven_high'):
+        metrics[key] = np.where(np.isfinite(metrics[key]), metrics[key], np.nan)
+
+    metrics['_idx'] = idx
+    return pos[bounded], {k: (v[bounded] if k != '_idx' else [i[bounded] for i in v]) for k, v in metrics.items()}
+
+
+def _describe_legs(spec, legs, idx):
+    """组合描述，例如 '+1 P 70000 / -1 P 60000'"""
+    parts = [f"{'+' if side > 0 else '-'}{ratio} {t} {leg['strike'][i]:,.0f}"
+             for (t, side, ratio), leg, i in zip(spec['legs'], legs, idx)]
+    if spec['stock']:
+        parts.insert(0, f"+{spec['stock']} 现货")
+    return ' / '.join(parts)
+
+
+def _search_expiry(key, exp_date, legs, spot, t, days, config):
+    """
+    单个 (结构, 到期日) 的分块枚举（进程池工作函数）
+    返回按得分降序的 [(得分, 记录), ...]，长度不超过 top_k
+    """
+    spec = STRUCTURES[key]
+    top_k, rank_by = config['top_k'], config['rank_by']
+    max_debit = config['max_debit_pct'] * spot if config['max_debit_pct'] is not None else np.inf
+    min_risk = (config['min_risk_pct'] or 0.0) * spot
+    min_prob = config['min_success_prob'] or 0.0
+    shape = tuple(len(leg['strike']) for leg in legs)
+    total = int(np.prod(shape))
+
+    heap = []   # 最小堆 (得分, 序号, 记录)，容量 top_k
+    counter = itertools.count()
+    for start in range(0, total, config['block_size']):
+        flat = np.arange(start, min(start + config['block_size'], total))
+        pos, metrics = _evaluate_block(legs, spec, np.unravel_index(flat, shape), spot, t, max_debit,
+                                       min_risk, config['pricing'])
+        if metrics is None or len(pos) == 0:
+            continue
+        score = np.nan_to_num(metrics[rank_by], nan=-np.inf, posinf=np.finfo(float).max)
+        ok = metrics['success_prob'] >= min_prob
+        if len(heap) == top_k:
+            ok &= score > heap[0][0]
+        sel = np.flatnonzero(ok)
+        if len(sel) > top_k:
+            sel = sel[np.argpartition(-score[sel], top_k - 1)[:top_k]]
+        for j in sel[np.argsort(-score[sel], kind='stable')]:
+            idx = [i[j] for i in metrics['_idx']]
+            record = {
+                'structure': key,
+                'structure_name': spec['name'],
+                'expiration_date': exp_date,
+                'legs': _describe_legs(spec, legs, idx),
+                **{col: float(metrics[col][j]) for col in RESULT_COLUMNS[4:-1]},
+                'days_to_expiration': days,
+            }
+            for n, (leg, i) in enumerate(zip(legs, idx), start=1):
+                record[f'leg{n}_symbol'] = leg['symbol'][i]
+                record[f'leg{n}_strike'] = float(leg['strike'][i])
+            item = (float(score[j]), next(counter), record)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heapreplace(heap, item)
+    return [(s, rec) for s, _, rec in sorted(heap, key=lambda item: (-item[0], item[1]))]
+
+
+def _resolve_config(config):
+    config = {**SEARCH_DEFAULTS, **(config or {})}
+    structures = {**SEARCH_DEFAULTS['structures'], **(config.get('structures') or {})}
+    config['structures'] = {k: v for k, v in structures.items() if v is not None}
+    for key, params in config['structures'].items():
+        if key not in STRUCTURES:
+            raise ValueError(f"未知策略结构: {key}（可选: {', '.join(STRUCTURES)}）")
+        if len(params['delta_bands']) != len(STRUCTURES[key]['legs']):
+            raise ValueError(f"{key} 需要 {len(STRUCTURES[key]['legs'])} 个 Delta 区间")
+    if config['rank_by'] not in ('reward_risk_ratio', 'expected_value', 'success_prob'):
+        raise ValueError(f"未知排序指标: {config['rank_by']}")
+    if config['pricing'] not in ('quote', 'mid'):
+        raise ValueError(f"未知计价方式: {config['pricing']}（可选: quote, mid）")
+    return config
+
+
+def search_strategies(chain, spot, config=None):
+    """
+    在整条期权链（看涨与看跌，含 mid_price / mid_iv / 希腊字母 / days_to_expiration，
+    按报价计价时另需币本位 bid_price / ask_price）上搜索多腿策略
+    返回 {结构键: DataFrame}，每个 DataFrame 按得分降序、最多 top_k 行
+    """
+    config = _resolve_config(config)
+    tasks = []
+    for exp_date, exp_chain in chain.groupby('expiration_date', sort=True):
+        days = int(exp_chain['days_to_expiration'].iloc[0])
+        t = days / 365
+        if t <= 0:
+            continue
+        arrays = _expiry_arrays(exp_chain, spot)
+        for key, params in config['structures'].items():
+            spec = STRUCTURES[key]
+            legs = [_leg_candidates(arrays, leg_type, band)
+                    for (leg_type, _, _), band in zip(spec['legs'], params['delta_bands'])]
+            if all(len(leg['strike']) > 0 for leg in legs):
+                tasks.append((key, exp_date, legs, spot, t, days, config))
+
+    total = sum(int(np.prod([len(leg['strike']) for leg in task[2]])) for task in tasks)
+    use_pool = len(tasks) > 1 and config['max_workers'] != 1 and total >= config['parallel_min_combos']
+    if use_pool:
+        with ProcessPoolExecutor(max_workers=config['max_workers']) as executor:
+            futures = [executor.submit(_search_expiry, *task) for task in tasks]
+            found = [future.result() for future in futures]
+    else:
+        found = [_search_expiry(*task) for task in tasks]
+
+    results = {}
+    for key in config['structures']:
+        # 各到期日的 top_k 已按得分降序，堆归并后取全局 top_k
+        lists = [items for task, items in zip(tasks, found) if task[0] == key]
+        merged = heapq.merge(*lists, key=lambda item: item[0], reverse=True)
+        rows = [rec for _, rec in itertools.islice(merged, config['top_k'])]
+        results[key] = pd.DataFrame(rows) if rows else pd.DataFrame(columns=RESULT_COLUMNS)
+    return results
+
+
+def count_combinations(chain, config=None):
+    """各结构 Delta 区间筛选后的组合数（行权价顺序与权利金预算剪枝之前），用于评估搜索规模"""
+    config = _resolve_config(config)
+    counts = dict.fromkeys(config['structures'], 0)
+    for _, exp_chain in chain.groupby('expiration_date', sort=True):
+        arrays = _expiry_arrays(exp_chain, 1.0)   # 只计数，报价换算不影响候选
+        for key, params in config['structures'].items():
+            sizes = [len(_leg_candidates(arrays, t, band)['strike'])
+                     for (t, _, _), band in zip(STRUCTURES[key]['legs'], params['delta_bands'])]
+            counts[key] += int(np.prod(sizes))
+    return counts
+
+
+def to_payoff_strategy(row, spot, iv_by_symbol=None):
+    """
+    搜索结果的一行转为 common.payoff 的策略表示（用于盈亏图）
+    iv_by_symbol: 合约代码 → 中间IV（小数），提供时可计算到期前盈亏
+    """
+    spec = STRUCTURES[row['structure']]
+    n_legs = len(spec['legs'])
+    symbols = [row[f'leg{n}_symbol'] for n in range(1, n_legs + 1)]
+    ivs = None if iv_by_symbol is None else [iv_by_symbol.get(symbol, np.nan) for symbol in symbols]
+    return make_strategy(
+        [row[f'leg{n}_strike'] for n in range(1, n_legs + 1)],
+        [t for t, _, _ in spec['legs']],
+        [side * ratio for _, side, ratio in spec['legs']],
+        row['net_premium'], stock=spec['stock'], spot=spot, ivs=ivs,
+        days_to_expiration=row['days_to_expiration'],
+        label=f"{spec['name']}: {row['legs']}（{pd.Timestamp(row['expiration_date']):%Y-%m-%d}）",
+    )
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地期权分析 HTTP 服务
+启动时把 put2 与 call 的期权链一次性读入内存（pandas/matplotlib 等导入与 CSV 清洗只付一次），
+之后按请求参数重新评分，供看板等程序轮询：
+
+- put2 防御策略：按现货价缓存指标表（IV、希腊字母、性价比指标）及其 Delta 区间索引与按到期日分组的行权价索引，
+  每次请求只重跑单腿与熊市看跌价差搜索，可按请求覆盖 STRATEGY_CONFIG 的 Delta 区间
+- put2 区间查询：任意多个自定义 Delta / 行权价 / 价值状态（K/S）区间，每个区间只在缓存的索引上 searchsorted
+- call 性价比排名：启动时为每个文件计算一次特征表，每次请求只按权重/阈值重新评分与排名
+- 多腿策略搜索、蒙特卡洛模拟等重型任务提交到进程池，不阻塞其他请求
+- 相同请求的结果按 LRU 缓存，重新加载数据时清空
+
+只依赖标准库 asyncio（HTTP/1.1，支持 keep-alive），仅用于本机，不做鉴权。
+
+用法:
+    python server.py                                  # 默认监听 127.0.0.1:8765
+    python server.py --port 9000 --workers 2
+    curl -s localhost:8765/put2/defense -d '{"spot_price": 65000, "top_n": 3}'
+    curl -s localhost:8765/put2/bands -d '{"spot_price": 65000, "bands": {"otm": {"moneyness": [0.8, 0.95]}}}'
+    curl -s localhost:8765/call/ranking -d '{"file": "BTC-export.csv", "settings": {"preset": "强势看涨"}}'
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# 共享模块位于 src/common，put2 / call 脚本按模块导入
+sys.path.insert(0, SRC_DIR)
+sys.path.insert(0, os.path.join(SRC_DIR, 'put2'))
+sys.path.insert(0, os.path.join(SRC_DIR, 'call'))
+from common.band_index import BandIndex
+from common.chain_cache import load_chain
+import put2
+import yqcallxjb as call
+
+# =============================================================================
+# 用户配置区域
+# =============================================================================
+
+SERVICE_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8765,
+    'put2_data_folder': os.path.join(SRC_DIR, 'put2', 'data'),
+    'call_data_folder': os.path.join(SRC_DIR, 'call', 'data'),
+    'max_workers': 2,              # 重型任务（多腿搜索、蒙特卡洛）进程池大小
+    'spot_cache_size': 8,          # 按现货价缓存的 put2 指标表数量
+    'result_cache_size': 256,      # 按请求参数缓存的响应数量（0 为不缓存）
+    'max_body_bytes': 1 << 20,     # 请求体大小上限
+    'band_limit': 50,              # /put2/bands 每个区间默认返回的合约数
+}
+
+# /put2/bands 返回的合约字段
+BAND_COLUMNS = ['symbol', 'expiration_date', 'strike_price', 'delta', 'gamma', 'theta', 'vega', 'mid_price', 'mid_iv',
+                'vega_to_theta_ratio', 'vega_per_premium']
+
+# =============================================================================
+
+class RequestError(Exception):
+    """请求参数错误（返回 400）"""
+
+
+def _put2_chain(folder):
+    """读取并清洗 put2 数据文件夹下的全部期权链（与现货价无关，命中列式缓存时直接读取）"""
+    files = sorted(f for f in os.listdir(folder) if f.endswith('.csv'))
+    if not files:
+        raise FileNotFoundError(f"在 '{folder}' 文件夹中未找到CSV文件")
+    return pd.concat([load_chain(os.path.join(folder, f), put2.prepare_chain, tag='put2') for f in files],
+                     ignore_index=True)
+
+
+def _put2_overrides(overrides):
+    """请求中的 strategy_config 逐项覆盖 STRATEGY_CONFIG（只允许已有的策略与参数）"""
+    config = {name: dict(params) for name, params in put2.STRATEGY_CONFIG.items()}
+    for name, params in (overrides or {}).items():
+        if name not in config:
+            raise RequestError(f"未知策略: {name}（可选: {', '.join(config)}）")
+        unknown = set(params) - set(config[name])
+        if unknown:
+            raise RequestError(f"策略 {name} 的未知参数: {', '.join(sorted(unknown))}")
+        config[name].update({key: float(value) for key, value in params.items()})
+    return config
+
+
+# 进程池工作进程的全局期权链（每个进程在初始化时读取一次）
+_worker_chain = None
+
+def _init_worker(folder):
+    global _worker_chain
+    _worker_chain = _put2_chain(folder)
+
+
+def _heavy_put2(config):
+    """进程池工作函数：完整的 put2 分析（含多腿策略搜索 / 蒙特卡洛模拟）"""
+    return put2.run_analysis(_worker_chain, config)
+
+
+class AnalysisService:
+    """
+    内存中的期权链与各级缓存
+    put2 依赖模块级 SPOT_PRICE，同一进程内的 put2 计算由 _put2_lock 串行化
+    """
+
+    def __init__(self, config=None):
+        self.config = {**SERVICE_CONFIG, **(config or {})}
+        self.threads = ThreadPoolExecutor(max_workers=4)
+        self.processes = None
+        self._put2_lock = threading.Lock()
+        self._results_lock = threading.Lock()
+        self.put2_chain, self.call_frames = None, {}
+        self.load()
+
+    def load(self):
+        """（重新）读取全部期权链并清空缓存"""
+        start = time.perf_counter()
+        folder = self.config['put2_data_folder']
+        put2_chain = _put2_chain(folder) if os.path.isdir(folder) else None
+        call_frames = {}
+        for path in sorted(call.find_csv_files(self.config['call_data_folder'])):
+            df, spot_price = call.build_feature_frame(load_chain(path, call.prepare_chain, tag='call'))
+            call_frames[os.path.basename(path)] = (df, spot_price, call.delta_band_index(df))
+        with self._put2_lock, self._results_lock:
+            self.put2_chain, self.call_frames = put2_chain, call_frames
+            self.spot_frames = OrderedDict()
+            self.results = OrderedDict()
+            if self.processes is not None:
+                # 工作进程持有旧的期权链，重新创建
+                self.processes.shutdown(wait=False, cancel_futures=True)
+                self.processes = None
+            self.loaded_at = time.time()
+        n_put2 = 0 if self.put2_chain is None else len(self.put2_chain)
+        print(f"已加载 put2 期权 {n_put2} 条，call 文件 {len(self.call_frames)} 个，"
+              f"耗时 {time.perf_counter() - start:.2f} 秒")
+
+    def close(self):
+        self.threads.shutdown(wait=False, cancel_futures=True)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False, cancel_futures=True)
+
+    def chains(self):
+        put2_info = None
+        if self.put2_chain is not None:
+            puts = self.put2_chain[self.put2_chain['option_type'] == 'P']
+            put2_info = {'contracts': len(self.put2_chain), 'puts': len(puts),
+                         'expiries': sorted(str(d) for d in puts['expiration_date'].unique())}
+        return {
+            'loaded_at': self.loaded_at,
+            'put2': put2_info,
+            'call': {name: {'contracts': len(df), 'spot_price': call._float(spot)}
+                     for name, (df, spot, _) in self.call_frames.items()},
+            'spot_cache': list(self.spot_frames),
+        }
+
+    # ---------- put2 ----------
+
+    def _put2_frame(self, spot):
+        """按现货价取指标表及其 Delta 区间索引、按到期日分组的行权价索引（调用方持有 _put2_lock）"""
+        if spot in self.spot_frames:
+            self.spot_frames.move_to_end(spot)
+            return self.spot_frames[spot]
+        put2.SPOT_PRICE = spot
+        _, df = put2.analysis_chain(self.put2_chain, ('P',))
+        self.spot_frames[spot] = (df, BandIndex(df['delta']), put2.strike_band_index(df))
+        while len(self.spot_frames) > self.config['spot_cache_size']:
+            self.spot_frames.popitem(last=False)
+        return self.spot_frames[spot]
+
+    def put2_defense(self, spot, strategy_config):
+        """单腿与熊市看跌价差（轻量任务，在线程中执行）"""
+        with self._put2_lock:
+            df, delta_index, _ = self._put2_frame(spot)
+            put2.SPOT_PRICE = spot
+            single_put_results, bear_put_spread_results = put2.run_strategy_analysis(
+                df, strategy_config=strategy_config, delta_index=delta_index)
+            return put2.analysis_results(df, single_put_results, bear_put_spread_results)
+
+    def put2_bands(self, spot, bands, limit):
+        """自定义区间查询（轻量任务，在线程中执行）：返回 {名称: {count, contracts}}"""
+        with self._put2_lock:
+            df, delta_index, strike_index = self._put2_frame(spot)
+            put2.SPOT_PRICE = spot
+            found = put2.query_bands(df, bands, delta_index, strike_index)
+        # 各区间的前 limit 行合并后只取行、序列化一次
+        heads = {name: pos[:limit] for name, pos in found.items()}
+        needed = np.unique(np.concatenate(list(heads.values())))
+        table = df.iloc[needed][[c for c in BAND_COLUMNS if c in df.columns]]
+        table = table.assign(expiration_date=table['expiration_date'].astype(str))
+        records = dict(zip(needed.tolist(), json.loads(table.to_json(orient='records'))))
+        return {name: {'count': len(found[name]), 'contracts': [records[p] for p in head.tolist()]}
+                for name, head in heads.items()}
+
+    def _put2_spot(self, body):
+        if self.put2_chain is None:
+            raise RequestError("没有加载 put2 期权数据")
+        if body.get('spot_price') is None:
+            raise RequestError("缺少 spot_price")
+        spot = float(body['spot_price'])
+        if spot <= 0:
+            raise RequestError("spot_price 必须大于0")
+        return spot
+
+    def put2_job(self, body):
+        """解析 put2 请求，返回 (函数, 参数, 是否为重型任务)"""
+        spot = self._put2_spot(body)
+        strategy_config = _put2_overrides(body.get('strategy_config'))
+        heavy = bool(body.get('strategy_search')) or bool(body.get('monte_carlo'))
+        if heavy:
+            config = {'spot_price': spot, 'strategy_config': strategy_config,
+                      'strategy_search': bool(body.get('strategy_search')),
+                      'monte_carlo': bool(body.get('monte_carlo'))}
+            return _heavy_put2, (config,), True
+        return self.put2_defense, (spot, strategy_config), False
+
+    # ---------- call ----------
+
+    def call_job(self, body):
+        """解析 call 请求：settings 与 DEFAULT_SETTINGS 同名（可含 preset），只重新评分与排名"""
+        if not self.call_frames:
+            raise RequestError("没有加载 call 期权数据")
+        name = body.get('file') or next(iter(self.call_frames))
+        matches = [n for n in self.call_frames if n == name or os.path.splitext(n)[0] == name]
+        if not matches:
+            raise RequestError(f"未知文件: {name}（可选: {', '.join(self.call_frames)}）")
+        try:
+            settings = call.resolve_settings(overrides=body.get('settings'), use_env=False)
+        except ValueError as e:
+            raise RequestError(str(e)) from e
+        df, spot_price, delta_index = self.call_frames[matches[0]]
+        return call.rank_feature_frame, (df, spot_price, settings, delta_index), False
+
+    # ---------- 调度 ----------
+
+    async def run(self, job, cache_key):
+        """执行任务：轻量任务在线程池、重型任务在进程池；相同参数命中结果缓存"""
+        with self._results_lock:
+            if cache_key in self.results:
+                self.results.move_to_end(cache_key)
+                return self.results[cache_key], True
+        func, args, heavy = job
+        loop = asyncio.get_running_loop()
+        if heavy:
+            if self.processes is None:
+                self.processes = ProcessPoolExecutor(max_workers=self.config['max_workers'],
+                                                     initializer=_init_worker,
+                                                     initargs=(self.config['put2_data_folder'],))
+            result = await loop.run_in_executor(self.processes, func, *args)
+        else:
+            result = await loop.run_in_executor(self.threads, func, *args)
+        if self.config['result_cache_size'] > 0:
+            with self._results_lock:
+                self.results[cache_key] = result
+                while len(self.results) > self.config['result_cache_size']:
+                    self.results.popitem(last=False)
+        return result, False
+
+
+def _select(result, top_n=None, limit=None, structures=None):
+    """按结构、名次筛选策略（call 结果按综合名次、Score 排序）"""
+    items = list(result)
+    if structures:
+        items = [s for s in items if s.structure in structures]
+    if top_n is not None:
+        items = [s for s in items if 0 < s.rank <= int(top_n)]
+    if result.analysis == 'call':
+        items.sort(key=lambda s: (s.rank == 0, s.rank, -s.score('Score', float('-inf'))))
+    if limit is not None:
+        items = items[:int(limit)]
+    return items
+
+
+def _payload(result, strategies, cached):
+    selected = type(result)(result.analysis, result.spot_price, result.created_at, strategies)
+    return {
+        'analysis': result.analysis,
+        'spot_price': call._float(result.spot_price),
+        'created_at': result.created_at.isoformat(),
+        'cached': cached,
+        'count': len(strategies),
+        'strategies': selected.to_json_records(),
+    }
+
+
+async def _dispatch(service, method, path, body):
+    """路由：返回 (状态码, JSON 对象)"""
+    if method == 'GET' and path == '/health':
+        return HTTPStatus.OK, {'status': 'ok', 'loaded_at': service.loaded_at}
+    if method == 'GET' and path == '/chains':
+        return HTTPStatus.OK, service.chains()
+    if method == 'POST' and path == '/reload':
+        await asyncio.get_running_loop().run_in_executor(service.threads, service.load)
+        return HTTPStatus.OK, service.chains()
+    routes = {'/put2/defense': service.put2_job, '/call/ranking': service.call_job}
+    if path not in routes and path != '/put2/bands':
+        return HTTPStatus.NOT_FOUND, {'error': f"未知路径: {path}"}
+    if method != 'POST':
+        return HTTPStatus.METHOD_NOT_ALLOWED, {'error': f"{path} 只支持 POST"}
+    if not isinstance(body, dict):
+        raise RequestError("请求体必须是 JSON 对象")
+    if path == '/put2/bands':
+        # 区间查询只做 searchsorted 切片，不进入结果缓存
+        spot = service._put2_spot(body)
+        bands = body.get('bands')
+        if not isinstance(bands, dict) or not bands or not all(isinstance(b, dict) for b in bands.values()):
+            raise RequestError("bands 必须是 {名称: 条件} 对象")
+        limit = int(body.get('limit') or service.config['band_limit'])
+        found = await asyncio.get_running_loop().run_in_executor(service.threads, service.put2_bands,
+                                                                 spot, bands, limit)
+        return HTTPStatus.OK, {'analysis': 'put2', 'spot_price': spot, 'bands': found}
+    job = routes[path](body)
+    # 结果缓存键只包含影响计算的参数（top_n / limit 等筛选在缓存之后）
+    params = {k: v for k, v in body.items() if k not in ('top_n', 'limit', 'structures')}
+    result, cached = await service.run(job, (path, json.dumps(params, sort_keys=True, ensure_ascii=False)))
+    strategies = _select(result, body.get('top_n'), body.get('limit'), body.get('structures'))
+    return HTTPStatus.OK, _payload(result, strategies, cached)
+
+
+async def _read_request(reader, max_body):
+    """读取一个 HTTP/1.1 请求，连接关闭时返回 None"""
+    line = await reader.readline()
+    if not line:
+        return None
+    method, target, version = line.decode('latin-1').split()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    if length > max_body:
+        raise RequestError(f"请求体超过 {max_body} 字节")
+    body = await reader.readexactly(length) if length else b''
+    keep_alive = (headers.get('connection', '').lower() != 'close'
+                  if version == 'HTTP/1.1' else headers.get('connection', '').lower() == 'keep-alive')
+    return method.upper(), target.split('?', 1)[0], body, keep_alive
+
+
+def _response(status, payload, keep_alive):
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode('latin-1') + data
+
+
+def make_handler(service):
+    async def handle(reader, writer):
+        try:
+            while True:
+                start = time.perf_counter()
+                keep_alive = False
+                try:
+                    request = await _read_request(reader, service.config['max_body_bytes'])
+                    if request is None:
+                        break
+                    method, path, raw, keep_alive = request
+                    body = json.loads(raw) if raw.strip() else {}
+                    status, payload = await _dispatch(service, method, path, body)
+                except (RequestError, ValueError, TypeError) as e:
+                    status, payload = HTTPStatus.BAD_REQUEST, {'error': str(e)}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"{type(e).__name__}: {e}"}
+                payload['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+                writer.write(_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+    return handle
+
+
+async def serve(service):
+    server = await asyncio.start_server(make_handler(service), service.config['host'], service.config['port'])
+    print(f"分析服务已启动: http://{service.config['host']}:{service.config['port']}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地期权分析 HTTP 服务")
+    parser.add_argument("--host", default=SERVICE_CONFIG['host'])
+    parser.add_argument("--port", type=int, default=SERVICE_CONFIG['port'])
+    parser.add_argument("--put2-data", default=SERVICE_CONFIG['put2_data_folder'], help="put2 期权数据文件夹")
+    parser.add_argument("--call-data", default=SERVICE_CONFIG['call_data_folder'], help="call 期权数据文件夹")
+    parser.add_argument("--workers", type=int, default=SERVICE_CONFIG['max_workers'], help="重型任务进程数")
+    args = parser.parse_args()
+
+    service = AnalysisService({
+        'host': args.host, 'port': args.port, 'max_workers': args.workers,
+        'put2_data_folder': args.put2_data, 'call_data_folder': args.call_data,
+    })
+    try:
+        asyncio.run(serve(service))
+    except KeyboardInterrupt:
+        print("\n分析服务已停止")
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    main()